@@ -1856,45 +1856,41 @@ class BuilderFrame(wx.Frame):
 
         Implicitly calls addToUndoStack() using the current exp as the state
         """
-        self.currentUndoLevel = 1  # 1 is current, 2 is back one setp...
-        self.currentUndoStack = []
+        self.undoHistory = experiment.UndoHistory(self.exp)
         self.addToUndoStack()
         self.updateUndoRedo()
         self.setIsModified(newVal=False)  # update save icon if needed
 
+    @property
+    def currentUndoLevel(self):
+        """1 is current, 2 is back one step..."""
+        return self.undoHistory.level
+
     def addToUndoStack(self, action="", state=None):
-        """Add the given ``action`` to the currentUndoStack, associated
-        with the @state@. ``state`` should be a copy of the exp
-        from *immediately after* the action was taken.
-        If no ``state`` is given the current state of the experiment is used.
+        """Add the given ``action`` to the undo history, associated
+        with the current state of the exp, which should be taken from
+        *immediately after* the action was taken.
 
         If we are at end of stack already then simply append the action.  If
         not (user has done an undo) then remove orphan actions and append.
+
+        Only the Routines, Loops and settings that changed since the last
+        action are stored (see :class:`~psychopy.experiment.UndoHistory`).
+        ``state`` is no longer used and kept for backwards compatibility.
         """
-        if state is None:
-            state = copy.deepcopy(self.exp)
-        # remove actions from after the current level
-        if self.currentUndoLevel > 1:
-            self.currentUndoStack = self.currentUndoStack[
-                                    :-(self.currentUndoLevel - 1)]
-            self.currentUndoLevel = 1
-        # append this action
-        self.currentUndoStack.append({'action': action, 'state': state})
+        self.undoHistory.record(action)
         self.setIsModified(newVal=True)  # update save icon if needed
         self.updateUndoRedo()
 
     def undo(self, event=None):
-        """Step the exp back one level in the @currentUndoStack@ if possible,
+        """Step the exp back one level in the undo history if possible,
         and update the windows.
 
         Returns the final undo level (1=current, >1 for further in past)
         or -1 if redo failed (probably can't undo)
         """
-        if self.currentUndoLevel >= len(self.currentUndoStack):
+        if self.undoHistory.undo() is None:
             return -1  # can't undo
-        self.currentUndoLevel += 1
-        state = self.currentUndoStack[-self.currentUndoLevel]['state']
-        self.exp = copy.deepcopy(state)
         self.updateAllViews()
         self.setIsModified(newVal=True)  # update save icon if needed
         self.updateUndoRedo()
@@ -1902,17 +1898,14 @@ class BuilderFrame(wx.Frame):
         return self.currentUndoLevel
 
     def redo(self, event=None):
-        """Step the exp up one level in the @currentUndoStack@ if possible,
+        """Step the exp up one level in the undo history if possible,
         and update the windows.
         
         Returns the final undo level (0=current, >0 for further in past)
         or -1 if redo failed (probably can't redo)
         """
-        if self.currentUndoLevel <= 1:
+        if self.undoHistory.redo() is None:
             return -1  # can't redo, we're already at latest state
-        self.currentUndoLevel -= 1
-        self.exp = copy.deepcopy(
-            self.currentUndoStack[-self.currentUndoLevel]['state'])
         self.updateUndoRedo()
         self.updateAllViews()
         self.setIsModified(newVal=True)  # update save icon if needed
@@ -1928,14 +1921,14 @@ class BuilderFrame(wx.Frame):
     def updateUndoRedo(self):
         """Defines Undo and Redo commands for the window
         """
-        undoLevel = self.currentUndoLevel
+        history = self.undoHistory
         # check undo
-        if undoLevel >= len(self.currentUndoStack):
+        if not history.canUndo:
             # can't undo if we're at top of undo stack
             label = _translate("Undo\t%s") % self.app.keys['undo']
             enable = False
         else:
-            action = self.currentUndoStack[-undoLevel]['action']
+            action = history.undoAction
             txt = _translate("Undo %(action)s\t%(key)s")
             fmt = {'action': action, 'key': self.app.keys['undo']}
             label = txt % fmt
@@ -1945,11 +1938,11 @@ class BuilderFrame(wx.Frame):
         self.editMenu.Enable(wx.ID_UNDO, enable)
 
         # check redo
-        if undoLevel == 1:
+        if not history.canRedo:
             label = _translate("Redo\t%s") % self.app.keys['redo']
             enable = False
         else:
-            action = self.currentUndoStack[-undoLevel + 1]['action']
+            action = history.redoAction
             txt = _translate("Redo %(action)s\t%(key)s")
             fmt = {'action': action, 'key': self.app.keys['redo']}
             label = txt % fmt
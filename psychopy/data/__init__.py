@@ -10,11 +10,12 @@ from .experiment import ExperimentHandler
 from .trial import TrialHandler, TrialHandler2, TrialHandlerExt, TrialType
 from .staircase import (StairHandler, QuestHandler, PsiHandler,
                         MultiStairHandler)
+from .simulation import PsychometricObserver, StairSimulator
 
 from .utils import (checkValidFilePath, isValidVariableName, importTrialTypes,
                     sliceFromString, indicesFromString, importConditions,
-                    createFactorialTrialList, bootStraps, functionFromStaircase,
-                    getDateStr)
+                    getConditionsFieldNames, createFactorialTrialList,
+                    bootStraps, functionFromStaircase, getDateStr)
 
 from .fit import (FitFunction, FitCumNormal, FitLogistic, FitNakaRushton,
                   FitWeibull)
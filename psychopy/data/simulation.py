@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Vectorized simulation of many simple up/down staircases at once.
+
+Tuning step sizes and reversal rules usually means running thousands of
+simulated observers through a staircase. Doing that with
+:class:`~psychopy.data.StairHandler` moves one trial of one observer at a
+time through Python objects. :class:`StairSimulator` applies exactly the
+same rules (nUp/nDown, stepSizes, stepType, nReversals, nTrials,
+applyInitialRule, minVal/maxVal) to N independent staircases in lockstep,
+using numpy arrays for the state of every observer.
+
+Example::
+
+    from psychopy.data import StairSimulator, PsychometricObserver
+
+    observer = PsychometricObserver(threshold=0.1, slope=3.5)
+    sim = StairSimulator(startVal=0.5, stepSizes=[8, 4, 4, 2, 2, 1],
+                         nTrials=50, nUp=1, nDown=3, stepType='db',
+                         minVal=0, maxVal=1)
+    sim.run(observer, nObservers=10000, seed=1)
+    print(sim.thresholds(nLast=6).mean())
+
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from builtins import object
+from builtins import range
+import numpy as np
+from scipy import special
+
+from psychopy import logging
+
+# codes used for the direction of each staircase
+_START, _UP, _DOWN = 0, 1, -1
+
+
+class PsychometricObserver(object):
+    """A simulated observer whose responses follow a psychometric function.
+
+    All parameters can be scalars or arrays of length `nObservers` (so that
+    each simulated observer can have its own threshold, for instance).
+    The probability of a correct (or 'yes') response is::
+
+        p = chance + (1 - chance - lapse) * F(x)
+
+    where F is one of:
+
+        'weibull':  1 - exp(-(x/threshold)**slope)
+        'logistic': 1 / (1 + exp((threshold - x) * slope))
+        'cumNormal': cumulative normal with mean `threshold` and
+            sd `1/slope`
+
+    The 'weibull' and 'logistic' forms match those of
+    :class:`~psychopy.data.FitWeibull` and
+    :class:`~psychopy.data.FitLogistic` when `lapse` is 0.
+    """
+
+    def __init__(self, threshold, slope=3.5, chance=0.5, lapse=0.0,
+                 function='weibull'):
+        super(PsychometricObserver, self).__init__()
+        self.threshold = np.asarray(threshold, dtype=float)
+        self.slope = np.asarray(slope, dtype=float)
+        self.chance = np.asarray(chance, dtype=float)
+        self.lapse = np.asarray(lapse, dtype=float)
+        if function not in ('weibull', 'logistic', 'cumNormal'):
+            raise ValueError("PsychometricObserver function should be one "
+                             "of 'weibull', 'logistic' or 'cumNormal', "
+                             "not %r" % function)
+        self.function = function
+
+    def pCorrect(self, intensities):
+        """Return the probability of a correct response at each intensity
+        """
+        xx = np.asarray(intensities, dtype=float)
+        if self.function == 'weibull':
+            with np.errstate(invalid='ignore'):
+                ff = 1.0 - np.exp(-(np.clip(xx, 0, None) /
+                                    self.threshold)**self.slope)
+        elif self.function == 'logistic':
+            ff = 1.0 / (1.0 + np.exp((self.threshold - xx) * self.slope))
+        else:
+            ff = 0.5 * (1.0 + special.erf(
+                (xx - self.threshold) * self.slope / np.sqrt(2)))
+        return self.chance + (1.0 - self.chance - self.lapse) * ff
+
+    def respond(self, intensities, uniforms):
+        """Return a boolean array of responses (True is correct) given the
+        current intensities and an equal-sized array of uniform deviates
+        in [0, 1)
+        """
+        return uniforms < self.pCorrect(intensities)
+
+
+class StairSimulator(object):
+    """Run N independent simple up/down staircases in lockstep.
+
+    The arguments (and the rules they imply) are the same as those of
+    :class:`~psychopy.data.StairHandler`, so a simulated observer given the
+    same responses follows exactly the same track of intensities and
+    reversals as a `StairHandler` would.
+
+    After calling :meth:`run` these attributes are available (N is the
+    number of observers, T the length of the longest staircase):
+
+        intensities: (N, T) float array
+            the intensity presented on each trial (NaN once a staircase
+            has finished)
+
+        responses: (N, T) int8 array
+            1 for correct, 0 for incorrect, -1 once finished
+
+        reversals: (N, T) bool array
+            True where that trial was a reversal point
+
+        nTrialsRun: (N,) int array
+            the number of trials each staircase ran
+
+        finished: (N,) bool array
+            whether each staircase terminated within `maxTrials`
+
+    """
+
+    def __init__(self,
+                 startVal,
+                 nReversals=None,
+                 stepSizes=4,  # dB stepsize
+                 nTrials=0,
+                 nUp=1,
+                 nDown=3,  # correct responses before stim goes down
+                 applyInitialRule=True,
+                 stepType='db',
+                 minVal=None,
+                 maxVal=None,
+                 maxTrials=1000):
+        """
+        :Parameters:
+
+            startVal, nReversals, stepSizes, nTrials, nUp, nDown,
+            applyInitialRule, stepType, minVal, maxVal:
+                As for :class:`~psychopy.data.StairHandler`
+
+            maxTrials:
+                A hard limit on the number of trials run by any staircase,
+                to protect against rules that never terminate.
+        """
+        super(StairSimulator, self).__init__()
+        self.startVal = startVal
+        self.nUp = nUp
+        self.nDown = nDown
+        self.applyInitialRule = applyInitialRule
+        if stepType not in ('db', 'log', 'lin'):
+            raise ValueError("stepType should be 'db', 'log' or 'lin', "
+                             "not %r" % stepType)
+        self.stepType = stepType
+        try:
+            self.stepSizes = list(stepSizes)
+        except TypeError:
+            # stepSizes is not array-like / iterable, i.e., a scalar.
+            self.stepSizes = [stepSizes]
+        if nReversals is None:
+            self.nReversals = len(self.stepSizes)
+        elif len(self.stepSizes) > nReversals:
+            msg = ('Increasing number of minimum required reversals to the '
+                   'number of step sizes, (%i).' % len(self.stepSizes))
+            logging.warn(msg)
+            self.nReversals = len(self.stepSizes)
+        else:
+            self.nReversals = nReversals
+        self.nTrials = nTrials
+        self.minVal = minVal
+        self.maxVal = maxVal
+        self.maxTrials = maxTrials
+
+        self.intensities = None
+        self.responses = None
+        self.reversals = None
+        self.nTrialsRun = None
+        self.finished = None
+
+    def run(self, observer, nObservers=1, seed=None):
+        """Simulate `nObservers` staircases with responses drawn from
+        `observer` (typically a :class:`PsychometricObserver`, but anything
+        with a `respond(intensities, uniforms)` method will do).
+
+        On every trial one uniform deviate is drawn for *every* observer
+        (including those whose staircase has finished) from
+        `numpy.random.RandomState(seed)`, so the responses for a given seed
+        are reproducible and independent of when each staircase stops.
+
+        Returns the simulator itself, with the result attributes set.
+        """
+        nObs = int(nObservers)
+        maxTrials = int(self.maxTrials)
+        rng = np.random.RandomState(seed)
+
+        if self.stepType == 'db':
+            factors = 10.0**(np.asarray(self.stepSizes, dtype=float)/20.0)
+        elif self.stepType == 'log':
+            factors = 10.0**np.asarray(self.stepSizes, dtype=float)
+        else:
+            factors = np.asarray(self.stepSizes, dtype=float)
+        lastStep = len(factors) - 1
+
+        intensities = np.full((nObs, maxTrials), np.nan)
+        responses = np.full((nObs, maxTrials), -1, dtype=np.int8)
+        reversals = np.zeros((nObs, maxTrials), dtype=bool)
+
+        nextIntensity = np.full(nObs, self.startVal, dtype=float)
+        direction = np.full(nObs, _START, dtype=np.int8)
+        counter = np.zeros(nObs, dtype=int)
+        lastResp = np.full(nObs, -1, dtype=np.int8)
+        nRev = np.zeros(nObs, dtype=int)
+        nRun = np.zeros(nObs, dtype=int)
+        finished = np.zeros(nObs, dtype=bool)
+
+        for trialN in range(maxTrials):
+            active = ~finished
+            uniforms = rng.random_sample(nObs)
+            if not active.any():
+                break
+            thisIntensity = nextIntensity.copy()
+            intensities[active, trialN] = thisIntensity[active]
+            nRun[active] += 1
+
+            resp = np.asarray(observer.respond(thisIntensity, uniforms),
+                              dtype=bool)
+            responses[active, trialN] = resp[active]
+
+            # run-length counter of correct (+) / incorrect (-) responses
+            same = (lastResp == resp)
+            counter = np.where(resp,
+                               np.where(same, counter + 1, 1),
+                               np.where(same, counter - 1, -1))
+            lastResp = np.where(active, resp, lastResp).astype(np.int8)
+
+            goDown = counter >= self.nDown
+            goUp = counter <= -self.nUp
+            if self.applyInitialRule:
+                # 1-up/1-down until the first reversal
+                initial = (nRev == 0)
+            else:
+                initial = np.zeros(nObs, dtype=bool)
+            goDown = np.where(initial, resp, goDown)
+            goUp = np.where(initial, ~resp, goUp)
+
+            reversal = active & ((goDown & (direction == _UP)) |
+                                 (goUp & (direction == _DOWN)))
+            direction = np.where(active & goDown, _DOWN,
+                                 np.where(active & goUp, _UP, direction))
+            reversals[reversal, trialN] = True
+            nRev += reversal
+
+            finished |= active & (nRev >= self.nReversals) & \
+                (nRun >= self.nTrials)
+
+            # step sizes progress at each reversal
+            stepIdx = np.minimum(nRev, lastStep)
+            stepFactor = factors[stepIdx]
+            dec = active & goDown
+            inc = active & goUp
+            if self.stepType == 'lin':
+                nextIntensity = np.where(dec, nextIntensity - stepFactor,
+                                         nextIntensity)
+                nextIntensity = np.where(inc, nextIntensity + stepFactor,
+                                         nextIntensity)
+            else:
+                nextIntensity = np.where(dec, nextIntensity / stepFactor,
+                                         nextIntensity)
+                nextIntensity = np.where(inc, nextIntensity * stepFactor,
+                                         nextIntensity)
+            if self.minVal is not None:
+                nextIntensity = np.where(
+                    dec & (nextIntensity < self.minVal),
+                    self.minVal, nextIntensity)
+            if self.maxVal is not None:
+                nextIntensity = np.where(
+                    inc & (nextIntensity > self.maxVal),
+                    self.maxVal, nextIntensity)
+            counter = np.where(dec | inc, 0, counter)
+
+        nMax = nRun.max() if nObs else 0
+        self.intensities = intensities[:, :nMax]
+        self.responses = responses[:, :nMax]
+        self.reversals = reversals[:, :nMax]
+        self.nTrialsRun = nRun
+        self.finished = finished
+        if not finished.all():
+            logging.warning('%i of %i simulated staircases did not finish '
+                            'within maxTrials=%i' %
+                            ((~finished).sum(), nObs, maxTrials))
+        return self
+
+    @property
+    def reversalIntensities(self):
+        """A list (one entry per observer) of arrays of reversal
+        intensities, as in `StairHandler.reversalIntensities`
+        """
+        return [row[mask] for row, mask in
+                zip(self.intensities, self.reversals)]
+
+    @property
+    def reversalPoints(self):
+        """A list (one entry per observer) of arrays of the trial indices
+        at which reversals occurred, as in `StairHandler.reversalPoints`
+        """
+        return [np.flatnonzero(mask) for mask in self.reversals]
+
+    def thresholds(self, nLast=None):
+        """Return an array of threshold estimates, one per observer, as the
+        mean of the last `nLast` reversal intensities (or all of them if
+        `nLast` is None). Observers without any reversals give NaN.
+        """
+        if self.reversals is None:
+            raise RuntimeError('StairSimulator.thresholds() called before '
+                               'StairSimulator.run()')
+        revIntens = np.where(self.reversals, self.intensities, np.nan)
+        if nLast is not None:
+            # rank reversals from the end so we can keep only the last few
+            fromEnd = np.cumsum(self.reversals[:, ::-1], axis=1)[:, ::-1]
+            revIntens = np.where(fromEnd <= nLast, revIntens, np.nan)
+        nRevs = np.sum(~np.isnan(revIntens), axis=1)
+        sums = np.nansum(revIntens, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(nRevs > 0, sums / nRevs, np.nan)
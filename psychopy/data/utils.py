@@ -113,6 +113,23 @@ def _getExcelCellName(col, row):
     return "%s%i" % (get_column_letter(col + 1), row + 1)
 
 
+def _assertValidVarNames(fieldNames, fileName):
+    """screens a list of names as candidate variable names. if all
+    names are OK, return silently; else raise  with msg
+    """
+    if not all(fieldNames):
+        msg = ('Conditions file %s: Missing parameter name(s); '
+               'empty cell(s) in the first row?')
+        raise ValueError(msg % fileName)
+    for name in fieldNames:
+        OK, msg = isValidVariableName(name)
+        if not OK:
+            # tailor message to importConditions
+            msg = msg.replace('Variables', 'Parameters (column headers)')
+            raise ValueError('Conditions file %s: %s%s"%s"' %
+                              (fileName, msg, os.linesep * 2, name))
+
+
 def importTrialTypes(fileName, returnFieldNames=False):
     """importTrialTypes is DEPRECATED (as of v1.70.00)
     Please use `importConditions` for identical functionality.
@@ -204,22 +221,6 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
 
     """
 
-    def _assertValidVarNames(fieldNames, fileName):
-        """screens a list of names as candidate variable names. if all
-        names are OK, return silently; else raise  with msg
-        """
-        if not all(fieldNames):
-            msg = ('Conditions file %s: Missing parameter name(s); '
-                   'empty cell(s) in the first row?')
-            raise ValueError(msg % fileName)
-        for name in fieldNames:
-            OK, msg = isValidVariableName(name)
-            if not OK:
-                # tailor message to importConditions
-                msg = msg.replace('Variables', 'Parameters (column headers)')
-                raise ValueError('Conditions file %s: %s%s"%s"' %
-                                  (fileName, msg, os.linesep * 2, name))
-
     if fileName in ['None', 'none', None]:
         if returnFieldNames:
             return [], []
@@ -385,6 +386,64 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
         return trialList
 
 
+# parameter names of the conditions files read by getConditionsFieldNames,
+# by absolute path: ((mtime, size), fieldNames)
+_fieldNamesCache = {}
+
+
+def getConditionsFieldNames(fileName):
+    """Returns the parameter names (column headers) of a conditions file, as
+    `importConditions(fileName, returnFieldNames=True)` would, but reading
+    only the first row of .csv and .xlsx files.
+
+    The names are cached until the file is changed, so this is cheap to call
+    repeatedly (e.g. when loading experiments that use the same conditions).
+    Raises the same errors as `importConditions` for missing files and
+    invalid names.
+    """
+    if fileName in ['None', 'none', None]:
+        return []
+    if not os.path.isfile(fileName):
+        msg = 'Conditions file not found: %s'
+        raise ValueError(msg % os.path.abspath(fileName))
+
+    stat = os.stat(fileName)
+    fileKey = (stat.st_mtime, stat.st_size)
+    absPath = os.path.abspath(fileName)
+    if absPath in _fieldNamesCache and _fieldNamesCache[absPath][0] == fileKey:
+        return list(_fieldNamesCache[absPath][1])
+
+    def namedColumns(dataframe):
+        # the same names as importConditions gets from the full dataframe
+        unnamed = dataframe.columns.to_series().str.contains('^Unnamed: ')
+        dataframe = dataframe.loc[:, ~unnamed]  # clear unnamed cols
+        return list(dataframe.to_records(index=False).dtype.names)
+
+    if fileName.endswith('.csv'):
+        with open(fileName, 'rU') as fileUniv:
+            header = pd.read_csv(fileUniv, encoding='utf-8', nrows=0)
+        fieldNames = namedColumns(header)
+    elif fileName.endswith(('.xlsx', '.xls')) and haveXlrd:
+        fieldNames = namedColumns(pd.read_excel(fileName, nrows=0))
+    elif fileName.endswith('.xlsx') and haveOpenpyxl:
+        wb = load_workbook(filename=fileName, read_only=True, data_only=True)
+        ws = wb.worksheets[0]
+        firstRow = next(ws.iter_rows(min_row=1, max_row=1), ())
+        fieldNames = [cell.value for cell in firstRow]
+        # trailing empty cells are only included up to the last used column
+        # of the whole sheet
+        nCols = ws.max_column or len(fieldNames)
+        fieldNames = (fieldNames + [None] * nCols)[:nCols]
+    else:
+        # anything else (e.g. .pkl) has to be read in full
+        fieldNames = importConditions(fileName, returnFieldNames=True)[1]
+    _assertValidVarNames(fieldNames, fileName)
+
+    _fieldNamesCache[absPath] = (fileKey, fieldNames)
+    logging.debug(u"Read parameter names from {}".format(fileName))
+    return list(fieldNames)
+
+
 def createFactorialTrialList(factors):
     """Create a trialList by entering a list of factors with names (keys)
     and levels (values) it will return a trialList in which all factors
@@ -19,8 +19,9 @@ from builtins import object
 import sys
 import string
 import copy
+import threading
 import numpy
-from collections import namedtuple, OrderedDict, MutableMapping
+from collections import namedtuple, OrderedDict, MutableMapping, deque
 from psychopy.preferences import prefs
 
 # try to import pyglet & pygame and hope the user has at least one of them!
@@ -57,34 +58,148 @@ from psychopy.tools.monitorunittools import cm2pix, deg2pix, pix2cm, pix2deg
 from psychopy import logging
 from psychopy.constants import NOT_STARTED
 
-if havePyglet or haveGLFW:
+# maximum number of events kept in the key and mouse buffers. If they are
+# not collected (with getKeys(), getMouseEvents() or clearEvents()) the
+# oldest events are dropped
+eventBufferSize = 10000
+
+
+class _EventQueue(object):
+    """A bounded queue of input events, indexed by name.
+
+    Events are tuples whose first item is the name of the key (or mouse
+    button) and whose last item is the time of the event. They are kept in
+    the order they were added, so that taking the events with some names
+    only needs to look at those events (not at all the others still
+    waiting in the queue).
+
+    The queue can be used like the list that `_keyBuffer` used to be
+    (append, extend, len, iteration...).
+    """
+
+    def __init__(self, maxlen=None, warnOnDrop=True):
+        super(_EventQueue, self).__init__()
+        self.maxlen = maxlen
+        self.warnOnDrop = warnOnDrop
+        self.nDropped = 0
+        self._events = OrderedDict()  # sequence number: event
+        self._index = {}  # name: deque of sequence numbers
+        self._nextSeq = 0
+        self._lock = threading.RLock()  # events arrive from other threads
+
+    def append(self, event):
+        """Add an event (a tuple of name, ..., time) to the queue"""
+        with self._lock:
+            seq = self._nextSeq
+            self._nextSeq += 1
+            self._events[seq] = event
+            if event[0] in self._index:
+                self._index[event[0]].append(seq)
+            else:
+                self._index[event[0]] = deque([seq])
+            if self.maxlen is not None and len(self._events) > self.maxlen:
+                # drop the oldest event, which is also the oldest of its name
+                oldest = self._events.popitem(last=False)[1]
+                sameName = self._index[oldest[0]]
+                sameName.popleft()
+                if not sameName:
+                    del self._index[oldest[0]]
+                if self.warnOnDrop and not self.nDropped:
+                    logging.warning('More than %i input events are waiting '
+                                    'to be collected, so the oldest are '
+                                    'being dropped' % self.maxlen)
+                self.nDropped += 1
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._index.clear()
+
+    def count(self, name):
+        """The number of events with this name waiting in the queue"""
+        return len(self._index.get(name, ()))
+
+    def take(self, names=None):
+        """Remove and return the events with any of the given names (or all
+        events if names is None), in the order of their times.
+        """
+        with self._lock:
+            if names is None:
+                events = list(self._events.values())
+                self.clear()
+            else:
+                if isinstance(names, basestring):
+                    # as before, `key in keyList` matches substrings
+                    names = [name for name in self._index
+                             if name in names]
+                seqs = []
+                for name in set(names):
+                    if name in self._index:
+                        seqs.extend(self._index.pop(name))
+                seqs.sort()
+                events = [self._events.pop(seq) for seq in seqs]
+        # events are added as they happen, so this is only needed to place
+        # any synthetic events given an earlier time
+        events.sort(key=lambda event: event[-1])
+        return events
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._events.values()))
+
+    def __getitem__(self, index):
+        with self._lock:
+            return list(self._events.values())[index]
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self))
+
+
+_keyBuffer = _EventQueue(eventBufferSize)
+# (button name, 'press'/'release'/'wheel', (x, y) or (dx, dy), time)
+_mouseBuffer = _EventQueue(eventBufferSize, warnOnDrop=False)
+_mouseButtonNames = ('left', 'middle', 'right')
+
+mouseButtons = [0, 0, 0]
+mouseWheelRel = numpy.array([0.0, 0.0])
+# list of 3 clocks that are reset on mouse button presses
+mouseClick = [psychopy.core.Clock(), psychopy.core.Clock(),
+              psychopy.core.Clock()]
+# container for time elapsed from last reset of mouseClick[n] for any
+# button pressed
+mouseTimes = [0.0, 0.0, 0.0]
+# clock for tracking time of mouse movement, reset when mouse is moved,
+# reset on mouse motion:
+mouseMove = psychopy.core.Clock()
+
+if havePyglet:
     # importing from mouse takes ~250ms, so do it now
-    if havePyglet:
-        from pyglet.window.mouse import LEFT, MIDDLE, RIGHT
-        from pyglet.window.key import (
-            MOD_SHIFT,
-            MOD_CTRL,
-            MOD_ALT,
-            MOD_CAPSLOCK,
-            MOD_NUMLOCK,
-            MOD_WINDOWS,
-            MOD_COMMAND,
-            MOD_OPTION,
-            MOD_SCROLLLOCK
-        )
-
-    _keyBuffer = []
-    mouseButtons = [0, 0, 0]
-    mouseWheelRel = numpy.array([0.0, 0.0])
-    # list of 3 clocks that are reset on mouse button presses
-    mouseClick = [psychopy.core.Clock(), psychopy.core.Clock(),
-                  psychopy.core.Clock()]
-    # container for time elapsed from last reset of mouseClick[n] for any
-    # button pressed
-    mouseTimes = [0.0, 0.0, 0.0]
-    # clock for tracking time of mouse movement, reset when mouse is moved,
-    # reset on mouse motion:
-    mouseMove = psychopy.core.Clock()
+    from pyglet.window.mouse import LEFT, MIDDLE, RIGHT
+    from pyglet.window.key import (
+        MOD_SHIFT,
+        MOD_CTRL,
+        MOD_ALT,
+        MOD_CAPSLOCK,
+        MOD_NUMLOCK,
+        MOD_WINDOWS,
+        MOD_COMMAND,
+        MOD_OPTION,
+        MOD_SCROLLLOCK
+    )
+else:
+    # the same values as pyglet, so that the modifiers of synthetic key
+    # events can be given without it
+    (MOD_SHIFT, MOD_CTRL, MOD_ALT, MOD_CAPSLOCK, MOD_NUMLOCK, MOD_WINDOWS,
+     MOD_COMMAND, MOD_OPTION, MOD_SCROLLLOCK) = [2 ** n for n in range(9)]
+
+if havePyglet or haveGLFW:
     # global eventThread
     # eventThread = _EventDispatchThread()
     # eventThread.start()
@@ -179,7 +294,7 @@ def _onPygletKey(symbol, modifiers, emulated=False):
     This is useful for fMRI_launchScan, and for unit testing (in testTheApp)
     Logging distinguishes EmulatedKey events from real Keypress events.
     For emulation, the key added to the buffer is unicode(symbol), instead of
-    pyglet.window.key.symbol_string(symbol).
+    pyglet.window.key.symbol_string(symbol) (see `injectKey()`).
 
     S Mathot 2012: Implement fallback to _onPygletText
 
@@ -190,47 +305,43 @@ def _onPygletKey(symbol, modifiers, emulated=False):
     """
     global useText
 
-    keyTime = psychopy.core.getTime()  # capture when the key was pressed
     if emulated:
-        if not isinstance(modifiers, int):
-            msg = 'Modifiers must be passed as an integer value.'
-            raise ValueError(msg)
+        injectKey(symbol, modifiers)
+        return
 
-        thisKey = str(symbol)
-        keySource = 'EmulatedKey'
-    else:
-        thisKey = pyglet.window.key.symbol_string(
-            symbol).lower()  # convert symbol into key string
-        # convert pyglet symbols to pygame forms ( '_1'='1', 'NUM_1'='[1]')
-        # 'user_key' indicates that Pyglet has been unable to make sense
-        # out of the keypress. In that case, we fall back to _onPygletText
-        # to handle the input.
-        if 'user_key' in thisKey:
-            useText = True
-            return
-        useText = False
-        thisKey = thisKey.lstrip('_').lstrip('NUM_')
-        # Pyglet 1.3.0 returns 'enter' when Return key (0xFF0D) is pressed 
-        # in Windows Python3. So we have to replace 'enter' with 'return'.
-        if thisKey == 'enter':
-            thisKey = 'return'
-        keySource = 'Keypress'
+    keyTime = psychopy.core.getTime()  # capture when the key was pressed
+    thisKey = pyglet.window.key.symbol_string(
+        symbol).lower()  # convert symbol into key string
+    # convert pyglet symbols to pygame forms ( '_1'='1', 'NUM_1'='[1]')
+    # 'user_key' indicates that Pyglet has been unable to make sense
+    # out of the keypress. In that case, we fall back to _onPygletText
+    # to handle the input.
+    if 'user_key' in thisKey:
+        useText = True
+        return
+    useText = False
+    thisKey = thisKey.lstrip('_').lstrip('NUM_')
+    # Pyglet 1.3.0 returns 'enter' when Return key (0xFF0D) is pressed 
+    # in Windows Python3. So we have to replace 'enter' with 'return'.
+    if thisKey == 'enter':
+        thisKey = 'return'
+    keySource = 'Keypress'
     _keyBuffer.append((thisKey, modifiers, keyTime))  # tuple
     logging.data("%s: %s" % (keySource, thisKey))
     _process_global_event_key(thisKey, modifiers)
 
 
-def _process_global_event_key(key, modifiers):
-    if modifiers == 0:
-        modifier_keys = ()
-    else:
-        modifier_keys = ['%s' % m.strip('MOD_').lower() for m in
-                         (pyglet.window.key.modifiers_string(modifiers)
-                          .split('|'))]
+# the modifiers of global keys, in the order that
+# pyglet.window.key.modifiers_string() lists them (Num Lock is ignored)
+_globalKeyModifiers = [(MOD_SHIFT, 'shift'), (MOD_CTRL, 'ctrl'),
+                       (MOD_ALT, 'alt'), (MOD_CAPSLOCK, 'capslock'),
+                       (MOD_SCROLLLOCK, 'scrolllock'),
+                       (MOD_COMMAND, 'command'), (MOD_OPTION, 'option')]
 
-        # Ignore Num Lock.
-        if 'numlock' in modifier_keys:
-            modifier_keys.remove('numlock')
+
+def _process_global_event_key(key, modifiers):
+    modifier_keys = [name for flag, name in _globalKeyModifiers
+                     if modifiers & flag]
 
     index_key = globalKeys._gen_index_key((key, modifier_keys))
 
@@ -246,52 +357,55 @@ def _onPygletMousePress(x, y, button, modifiers, emulated=False):
     """button left=1, middle=2, right=4;
     specify multiple buttons with | operator
     """
-    global mouseButtons, mouseClick, mouseTimes
     now = psychopy.clock.getTime()
     if emulated:
         label = 'Emulated'
     else:
         label = ''
-    if button & LEFT:
-        mouseButtons[0] = 1
-        mouseTimes[0] = now - mouseClick[0].getLastResetTime()
-        label += ' Left'
-    if button & MIDDLE:
-        mouseButtons[1] = 1
-        mouseTimes[1] = now - mouseClick[1].getLastResetTime()
-        label += ' Middle'
-    if button & RIGHT:
-        mouseButtons[2] = 1
-        mouseTimes[2] = now - mouseClick[2].getLastResetTime()
-        label += ' Right'
+    for n, flag in enumerate((LEFT, MIDDLE, RIGHT)):
+        if button & flag:
+            _mousePress(n, (x, y), now)
+            label += ' ' + _mouseButtonNames[n].capitalize()
     logging.data("Mouse: %s button down, pos=(%i,%i)" % (label.strip(), x, y))
 
 
 def _onPygletMouseRelease(x, y, button, modifiers, emulated=False):
-    global mouseButtons
+    now = psychopy.clock.getTime()
     if emulated:
         label = 'Emulated'
     else:
         label = ''
-    if button & LEFT:
-        mouseButtons[0] = 0
-        label += ' Left'
-    if button & MIDDLE:
-        mouseButtons[1] = 0
-        label += ' Middle'
-    if button & RIGHT:
-        mouseButtons[2] = 0
-        label += ' Right'
+    for n, flag in enumerate((LEFT, MIDDLE, RIGHT)):
+        if button & flag:
+            _mouseRelease(n, (x, y), now)
+            label += ' ' + _mouseButtonNames[n].capitalize()
     logging.data("Mouse: %s button up, pos=(%i,%i)" % (label, x, y))
 
 
 def _onPygletMouseWheel(x, y, scroll_x, scroll_y):
-    global mouseWheelRel
-    mouseWheelRel = mouseWheelRel + numpy.array([scroll_x, scroll_y])
+    _mouseWheel((scroll_x, scroll_y), psychopy.clock.getTime())
     msg = "Mouse: wheel shift=(%i,%i), pos=(%i,%i)"
     logging.data(msg % (scroll_x, scroll_y, x, y))
 
 
+def _mousePress(n, pos, t):
+    """Record a press of mouse button n (0=left, 1=middle, 2=right)"""
+    mouseButtons[n] = 1
+    mouseTimes[n] = t - mouseClick[n].getLastResetTime()
+    _mouseBuffer.append((_mouseButtonNames[n], 'press', tuple(pos), t))
+
+
+def _mouseRelease(n, pos, t):
+    mouseButtons[n] = 0
+    _mouseBuffer.append((_mouseButtonNames[n], 'release', tuple(pos), t))
+
+
+def _mouseWheel(scroll, t):
+    global mouseWheelRel
+    mouseWheelRel = mouseWheelRel + numpy.array(scroll)
+    _mouseBuffer.append(('wheel', 'wheel', tuple(scroll), t))
+
+
 # will this work? how are pyglet event handlers defined?
 def _onPygletMouseMotion(x, y, dx, dy):
     global mouseMove
@@ -338,22 +452,136 @@ def resetMoveClock():
 #        return def waitKeys(maxWait = maxWait, keyList=keyList)
 
 
+_modifierNames = ['MOD_SHIFT', 'MOD_CTRL', 'MOD_ALT', 'MOD_CAPSLOCK',
+                  'MOD_NUMLOCK', 'MOD_WINDOWS', 'MOD_COMMAND', 'MOD_OPTION',
+                  'MOD_SCROLLLOCK']
+_modifiersDicts = {}  # modifiers: dict, as there are few combinations
+
+
 def modifiers_dict(modifiers):
     """Return dict where the key is a keyboard modifier flag
     and the value is the boolean state of that flag.
 
     """
-    return {(mod[4:].lower()): modifiers & getattr(sys.modules[__name__], mod) > 0 for mod in [
-        'MOD_SHIFT',
-        'MOD_CTRL',
-        'MOD_ALT',
-        'MOD_CAPSLOCK',
-        'MOD_NUMLOCK',
-        'MOD_WINDOWS',
-        'MOD_COMMAND',
-        'MOD_OPTION',
-        'MOD_SCROLLLOCK'
-    ]}
+    if modifiers not in _modifiersDicts:
+        module = sys.modules[__name__]
+        _modifiersDicts[modifiers] = {
+            (mod[4:].lower()): modifiers & getattr(module, mod) > 0
+            for mod in _modifierNames}
+    return dict(_modifiersDicts[modifiers])
+
+
+def _dispatchPygletEvents():
+    """Dispatch the events of all pyglet windows, which calls the handlers
+    that fill the key and mouse buffers"""
+    defDisplay = pyglet.window.get_platform().get_default_display()
+    for win in defDisplay.get_windows():
+        try:
+            win.dispatch_events()  # pump events on pyglet windows
+        except ValueError as e:  # pragma: no cover
+            # Pressing special keys, such as 'volume-up', results in a
+            # ValueError. This appears to be a bug in pyglet, and may be
+            # specific to certain systems and versions of Python.
+            logging.error(u'Failed to handle keypress')
+
+
+def injectKey(key, modifiers=0, t=None):
+    """Add a synthetic key press to the keyboard buffer, as if the key had
+    been pressed at time `t`.
+
+    No window is needed, so this can be used to test the handling of
+    responses, or to benchmark how long it takes. The keys are returned by
+    `getKeys()` and `waitKeys()` like real key presses, and any global key
+    for them is run.
+
+    :Parameters:
+        key : str or list of str
+            the name of the key (e.g. 'space', 'left', 'a'), or a list of
+            keys pressed one after the other
+        modifiers : int
+            the keyboard modifier flags, e.g. `event.MOD_SHIFT`
+        t : None or float
+            the time of the key press, in `core.getTime()` seconds. None
+            for now
+
+    """
+    if not isinstance(modifiers, int):
+        msg = 'Modifiers must be passed as an integer value.'
+        raise ValueError(msg)
+    if t is None:
+        t = psychopy.core.getTime()
+    if isinstance(key, basestring) or not hasattr(key, '__iter__'):
+        key = [key]
+    for thisKey in key:
+        thisKey = str(thisKey)
+        _keyBuffer.append((thisKey, modifiers, t))
+        logging.data("%s: %s" % ('EmulatedKey', thisKey))
+        _process_global_event_key(thisKey, modifiers)
+
+
+def injectMouseButton(button='left', action='press', pos=(0, 0), t=None):
+    """Add a synthetic mouse button press or release, as if it had happened
+    at time `t`.
+
+    The state of the button (as given by `Mouse.getPressed()`) is updated
+    and the event is added to the buffer of mouse events (see
+    `getMouseEvents()`). The position is only recorded with the event; it
+    doesn't move the mouse. No window is needed.
+
+    :Parameters:
+        button : 'left', 'middle' or 'right'
+        action : 'press', 'release' or 'click' (a press and a release)
+        pos : (x, y)
+        t : None or float
+            the time of the event, in `core.getTime()` seconds. None for now
+
+    """
+    if button not in _mouseButtonNames:
+        raise ValueError("button should be one of %s, not %r"
+                         % (_mouseButtonNames, button))
+    if action not in ('press', 'release', 'click'):
+        raise ValueError("action should be 'press', 'release' or 'click', "
+                         "not %r" % action)
+    if t is None:
+        t = psychopy.core.getTime()
+    n = _mouseButtonNames.index(button)
+    if action in ('press', 'click'):
+        _mousePress(n, pos, t)
+    if action in ('release', 'click'):
+        _mouseRelease(n, pos, t)
+    logging.data("Mouse: Emulated %s button %s, pos=(%i,%i)"
+                 % (button.capitalize(), action, pos[0], pos[1]))
+
+
+def injectMouseWheel(scroll=(0, 1), t=None):
+    """Add a synthetic movement of the mouse wheel by scroll=(dx, dy), as if
+    it had happened at time `t` (None for now). No window is needed.
+    """
+    if t is None:
+        t = psychopy.core.getTime()
+    _mouseWheel(scroll, t)
+    logging.data("Mouse: Emulated wheel shift=(%i,%i)" % tuple(scroll))
+
+
+def getMouseEvents(buttonList=None):
+    """Returns (and removes from the buffer) the mouse button and wheel
+    events since they were last cleared.
+
+    Each event is a tuple of (button, action, pos, time), where button is
+    'left', 'middle', 'right' or 'wheel', action is 'press', 'release' or
+    'wheel', pos is the (x, y) position of the mouse in pixels (or the
+    (dx, dy) of the wheel) and time is in `core.getTime()` seconds.
+
+    :Parameters:
+        buttonList : **None** or []
+            Only events of these buttons are removed from the buffer (all
+            if None).
+
+    """
+    if havePyglet:
+        _dispatchPygletEvents()
+    return _mouseBuffer.take(buttonList)
+
 
 def getKeys(keyList=None, modifiers=False, timeStamped=False):
     """Returns a list of keys that were pressed.
@@ -382,51 +610,21 @@ def getKeys(keyList=None, modifiers=False, timeStamped=False):
         - 2009 timeStamped code provided by Dave Britton
         - 2016 modifiers code provided by 5AM Solutions
     """
-    keys = []
-
     if havePygame and display.get_init():
         # see if pygame has anything instead (if it exists)
         for evts in evt.get(locals.KEYDOWN):
             # pygame has no keytimes
-            keys.append((pygame.key.name(evts.key), 0))
+            _keyBuffer.append((pygame.key.name(evts.key), 0))
     elif havePyglet:
         # for each (pyglet) window, dispatch its events before checking event
         # buffer
-        defDisplay = pyglet.window.get_platform().get_default_display()
-        for win in defDisplay.get_windows():
-            try:
-                win.dispatch_events()  # pump events on pyglet windows
-            except ValueError as e:  # pragma: no cover
-                # Pressing special keys, such as 'volume-up', results in a
-                # ValueError. This appears to be a bug in pyglet, and may be
-                # specific to certain systems and versions of Python.
-                logging.error(u'Failed to handle keypress')
-
-        global _keyBuffer
-        if len(_keyBuffer) > 0:
-            # then pyglet is running - just use this
-            keys = _keyBuffer
-            # _keyBuffer = []  # DO /NOT/ CLEAR THE KEY BUFFER ENTIRELY
-
-    elif haveGLFW:
-        # 'poll_events' is called when a window is flipped, all the callbacks
-        # populate the buffer
-        if len(_keyBuffer) > 0:
-            keys = _keyBuffer
-
-    if keyList is None:
-        _keyBuffer = []  # clear buffer entirely
-        targets = keys  # equivalent behavior to getKeys()
-    else:
-        nontargets = []
-        targets = []
-        # split keys into keepers and pass-thrus
-        for key in keys:
-            if key[0] in keyList:
-                targets.append(key)
-            else:
-                nontargets.append(key)
-        _keyBuffer = nontargets  # save these
+        _dispatchPygletEvents()
+    # with GLFW, 'poll_events' is called when a window is flipped, and the
+    # callbacks populate the buffer
+
+    # take the targets (or all keys if keyList is None) out of the buffer,
+    # the others stay there
+    targets = _keyBuffer.take(keyList)
 
     # now we have a list of tuples called targets
     # did the user want timestamped tuples or keynames?
@@ -444,13 +642,14 @@ def getKeys(keyList=None, modifiers=False, timeStamped=False):
         _last = timeStamped.getLastResetTime()
         _clockLast = psychopy.core.monotonicClock.getLastResetTime()
         timeBaseDiff = _last - _clockLast
-        relTuple = [[_f for _f in (k[0], modifiers and modifiers_dict(k[1]) or None, k[-1] - timeBaseDiff) if _f] for k in targets]
-        return relTuple
     elif timeStamped is True:
-        return [[_f for _f in (k[0], modifiers and modifiers_dict(k[1]) or None, k[-1]) if _f] for k in targets]
+        timeBaseDiff = 0
     elif isinstance(timeStamped, (float, int, int)):
-        relTuple = [[_f for _f in (k[0], modifiers and modifiers_dict(k[1]) or None, k[-1] - timeStamped) if _f] for k in targets]
-        return relTuple
+        timeBaseDiff = timeStamped
+    else:
+        return None
+    return [[_f for _f in (k[0], modifiers and modifiers_dict(k[1]) or None,
+                           k[-1] - timeBaseDiff) if _f] for k in targets]
 
 
 def waitKeys(maxWait=float('inf'), keyList=None, modifiers=False,
@@ -501,13 +700,8 @@ def waitKeys(maxWait=float('inf'), keyList=None, modifiers=False,
     got_keypress = False
 
     while not got_keypress and timer.getTime() < maxWait:
-        # Pump events on pyglet windows if they exist.
-        if havePyglet:
-            defDisplay = pyglet.window.get_platform().get_default_display()
-            for win in defDisplay.get_windows():
-                win.dispatch_events()
-
-        # Get keypresses and return if anything is pressed.
+        # Get keypresses (which pumps the events of pyglet windows) and
+        # return if anything is pressed.
         keys = getKeys(keyList=keyList, modifiers=modifiers,
                        timeStamped=timeStamped)
         if keys:
@@ -812,9 +1006,8 @@ class Mouse(object):
             # False:  # havePyglet: # like in getKeys - pump the events
             # for each (pyglet) window, dispatch its events before checking
             # event buffer
-            defDisplay = pyglet.window.get_platform().get_default_display()
-            for win in defDisplay.get_windows():
-                win.dispatch_events()  # pump events on pyglet windows
+            if havePyglet:
+                _dispatchPygletEvents()
 
             # else:
             if not getTime:
@@ -910,23 +1103,21 @@ def clearEvents(eventType=None):
 
     :Parameters:
         eventType : **None**, 'mouse', 'joystick', 'keyboard'
-            If this is not None then only events of the given type are cleared
+            If this is not None then only events of the given type are
+            cleared ('mouse' clears the events returned by
+            `getMouseEvents()`, not the state of the buttons)
 
     """
     if not havePygame or not display.get_init():  # pyglet
         # For each window, dispatch its events before
         # checking event buffer.
-        defDisplay = pyglet.window.get_platform().get_default_display()
-        for win in defDisplay.get_windows():
-            win.dispatch_events()  # pump events on pyglet windows
+        if havePyglet:
+            _dispatchPygletEvents()
 
-        if eventType == 'mouse':
-            pass
-        elif eventType == 'joystick':
-            pass
-        else:  # eventType='keyboard' or eventType=None.
-            global _keyBuffer
-            _keyBuffer = []
+        if eventType in ('mouse', None):
+            _mouseBuffer.clear()
+        if eventType in ('keyboard', None):
+            _keyBuffer.clear()
     else:  # pygame
         if eventType == 'mouse':
             evt.get([locals.MOUSEMOTION, locals.MOUSEBUTTONUP,
@@ -1195,7 +1386,6 @@ def _onGLFWMouseButton(*args, **kwargs):
     handled by this function as they both invoke the same callback.
 
     """
-    global mouseButtons, mouseClick, mouseTimes
     now = psychopy.core.getTime()
     win_ptr, button, action, modifier = args
     # win = glfw.get_window_user_pointer(win_ptr)
@@ -1204,24 +1394,15 @@ def _onGLFWMouseButton(*args, **kwargs):
     # this might not be at the exact location of the mouse press
     x, y = glfw.get_cursor_pos(win_ptr)
 
+    buttons = (glfw.MOUSE_BUTTON_LEFT, glfw.MOUSE_BUTTON_MIDDLE,
+               glfw.MOUSE_BUTTON_RIGHT)
+    if button not in buttons:
+        return
     # process actions
     if action == glfw.PRESS:
-        if button == glfw.MOUSE_BUTTON_LEFT:
-            mouseButtons[0] = 1
-            mouseTimes[0] = now - mouseClick[0].getLastResetTime()
-        elif button == glfw.MOUSE_BUTTON_MIDDLE:
-            mouseButtons[1] = 1
-            mouseTimes[1] = now - mouseClick[1].getLastResetTime()
-        elif button == glfw.MOUSE_BUTTON_RIGHT:
-            mouseButtons[2] = 1
-            mouseTimes[2] = now - mouseClick[2].getLastResetTime()
+        _mousePress(buttons.index(button), (x, y), now)
     elif action == glfw.RELEASE:
-        if button == glfw.MOUSE_BUTTON_LEFT:
-            mouseButtons[0] = 0
-        elif button == glfw.MOUSE_BUTTON_MIDDLE:
-            mouseButtons[1] = 0
-        elif button == glfw.MOUSE_BUTTON_RIGHT:
-            mouseButtons[2] = 0
+        _mouseRelease(buttons.index(button), (x, y), now)
 
 
 def _onGLFWMouseScroll(*args, **kwargs):
@@ -1230,8 +1411,7 @@ def _onGLFWMouseScroll(*args, **kwargs):
 
     """
     window_ptr, x_offset, y_offset = args
-    global mouseWheelRel
-    mouseWheelRel = mouseWheelRel + numpy.array([x_offset, y_offset])
+    _mouseWheel((x_offset, y_offset), psychopy.core.getTime())
     msg = "Mouse: wheel shift=(%i,%i)"
     logging.data(msg % (x_offset, y_offset))
 
@@ -1250,5 +1430,4 @@ def _getGLFWJoystickAxes(*args, **kwargs):
     pass
 
 
-if havePyglet:
-    globalKeys = _GlobalEventKeys()
+globalKeys = _GlobalEventKeys()
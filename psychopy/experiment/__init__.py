@@ -21,6 +21,7 @@ from __future__ import absolute_import, print_function
 from .params import getCodeFromParamStr, Param
 from .components import getInitVals, getComponents, getAllComponents
 from ._experiment import Experiment
+from .history import UndoHistory
 from .utils import unescapedDollarSign_re, valid_var_re, \
      nonalphanumeric_re
 from psychopy.experiment.utils import CodeGenerationException
@@ -18,7 +18,6 @@ The code that writes out a *_lastrun.py experiment file is (in order):
 
 from __future__ import absolute_import, print_function
 # from future import standard_library
-from past.builtins import basestring
 from builtins import object
 import os
 import codecs
@@ -32,6 +31,7 @@ from .flow import Flow
 from .loops import TrialHandler, LoopInitiator, \
     LoopTerminator, StairHandler, MultiStairHandler
 from .params import _findParam, Param
+from .resources import ResourceScanner
 from .routine import Routine
 from . import utils, py2js
 from .components import getComponents, getAllComponents
@@ -499,9 +499,12 @@ class Experiment(object):
             for componentNode in routineNode:
 
                 componentType = componentNode.tag
-                if componentType in allCompons:
+                # the class is imported the first time it's needed (None if
+                # it can't be)
+                componentClass = allCompons.get(componentType)
+                if componentClass is not None:
                     # create an actual component of that type
-                    component = allCompons[componentType](
+                    component = componentClass(
                         name=componentNode.get('name'),
                         parentName=routineNode.get('name'), exp=self)
                 else:
@@ -594,8 +597,9 @@ class Experiment(object):
                     conditionsFile = None
                 if conditionsFile:
                     try:
-                        trialList, fieldNames = data.importConditions(
-                            conditionsFile, returnFieldNames=True)
+                        # only the header is read (and it's cached)
+                        fieldNames = data.getConditionsFieldNames(
+                            conditionsFile)
                         for fname in fieldNames:
                             if fname != self.namespace.makeValid(fname):
                                 duplicateNames.append(fname)
@@ -647,106 +651,18 @@ class Experiment(object):
     def getResourceFiles(self):
         """Returns a list of known files needed for the experiment
         Interrogates each loop looking for conditions files and each
+        Routine looking for component params that are valid file paths.
 
+        Each entry is a dict with 'rel' and 'abs' paths (and 'size' in bytes).
+        Files are listed once, however many times they are referred to.
         """
-        join = os.path.join
-        abspath = os.path.abspath
-        srcRoot = os.path.split(self.filename)[0]
-
-        def getPaths(filePath):
-            """Helper to return absolute and relative paths (or None)
-
-            :param filePath: str to a potential file path (rel or abs)
-            :return: dict of 'asb' and 'rel' paths or None
-            """
-            thisFile = {}
-            if len(filePath) > 2 and (filePath[0] == "/" or filePath[1] == ":"):
-                thisFile['abs'] = filePath
-                thisFile['rel'] = os.path.relpath(filePath, srcRoot)
-            else:
-                thisFile['rel'] = filePath
-                thisFile['abs'] = os.path.normpath(join(srcRoot, filePath))
-            if os.path.isfile(thisFile['abs']):
-                return thisFile
-            else:
-                return None
-
-        def findPathsInFile(filePath):
-            """Recursively search a conditions file (xlsx or csv)
-             extracting valid file paths in any param/cond
+        return ResourceScanner(self).getFiles()
 
-            :param filePath: str to a potential file path (rel or abs)
-            :return: list of dicts{'rel','abs'} of valid file paths
-            """
-
-            # Clean up filePath that cannot be eval'd
-            if '$' in filePath:
-                try:
-                    filePath = filePath.strip('$')
-                    filePath = eval(filePath)
-                except NameError:
-                    # List files in director and get condition files
-                    if 'xlsx' in filePath or 'xls' in filePath or 'csv' in filePath:
-                        # Get all xlsx and csv files
-                        expPath = self.expPath
-                        if 'html' in self.expPath:  # Get resources from parent directory i.e, original exp path
-                            expPath = self.expPath.split('html')[0]
-                        fileList = (
-                        [getPaths(condFile) for condFile in os.listdir(expPath)
-                         if len(condFile.split('.')) > 1
-                         and condFile.split('.')[1] in ['xlsx', 'xls', 'csv']])
-                        return fileList
-            paths = []
-            # does it look at all like an excel file?
-            if (not isinstance(filePath, basestring)
-                    or not os.path.splitext(filePath)[1] in ['.csv', '.xlsx',
-                                                             '.xls']):
-                return paths
-            thisFile = getPaths(filePath)
-            # does it exist?
-            if not thisFile:
-                return paths
-            # this file itself is valid so add to resources if not already
-            if thisFile not in paths:
-                paths.append(thisFile)
-            conds = data.importConditions(thisFile['abs'])  # load the abs path
-            for thisCond in conds:  # thisCond is a dict
-                for param, val in list(thisCond.items()):
-                    if isinstance(val, basestring) and len(val):
-                        subFile = getPaths(val)
-                    else:
-                        subFile = None
-                    if subFile:
-                        paths.append(subFile)
-                        # if it's a possible conditions file then recursive
-                        if thisFile['abs'][-4:] in ["xlsx", ".xls", ".csv"]:
-                            contained = findPathsInFile(subFile['abs'])
-                            paths.extend(contained)
-            return paths
-
-        resources = []
-        for thisEntry in self.flow:
-            if thisEntry.getType() == 'LoopInitiator':
-                # find all loops and check for conditions filename
-                params = thisEntry.loop.params
-                if 'conditionsFile' in params:
-                    condsPaths = findPathsInFile(params['conditionsFile'].val)
-                    resources.extend(condsPaths)
-            elif thisEntry.getType() == 'Routine':
-                # find all params of all compons and check if valid filename
-                for thisComp in thisEntry:
-                    for paramName in thisComp.params:
-                        thisParam = thisComp.params[paramName]
-                        thisFile = ''
-                        if isinstance(thisParam, basestring):
-                            thisFile = getPaths(thisParam)
-                        elif isinstance(thisParam.val, basestring):
-                            thisFile = getPaths(thisParam.val)
-                        # then check if it's a valid path
-                        if thisFile:
-                            resources.append(thisFile)
-
-        return resources
+    def getResourceManifest(self, hashes=True):
+        """As :meth:`getResourceFiles` but with the md5 'hash' of each file
+        (if `hashes` is True) so that uploads can skip unchanged files.
+        """
+        return ResourceScanner(self).getManifest(hashes=hashes)
 
 
 class ExpFile(list):
@@ -13,13 +13,18 @@ from __future__ import absolute_import, print_function
 from builtins import str
 from past.builtins import basestring
 import os
+import ast
 import glob
 import copy
+import json
 import shutil
+import codecs
+from collections import OrderedDict, MutableMapping
 from os.path import join, dirname, abspath, split
 from importlib import import_module  # helps python 2.7 -> 3.x migration
 from ._base import BaseVisualComponent, BaseComponent
 from ..params import Param
+from psychopy import logging, prefs
 from psychopy.localization import _translate
 
 excludeComponents = ['BaseComponent', 'BaseVisualComponent',  # templates only
@@ -56,16 +61,19 @@ def getAllComponents(folderList=(), fetchIcons=True):
     components = getComponents(fetchIcons=fetchIcons)  # get the built-ins
     for folder in folderList:
         userComps = getComponents(folder)
-        for thisKey in userComps:
-            components[thisKey] = userComps[thisKey]
+        components.update(userComps)  # without importing them
     return components
 
 
 def getComponents(folder=None, fetchIcons=True):
     """Get a dictionary of available components for the Builder experiments.
 
-    If folder is None then the built-in components will be imported and
-    returned, otherwise the components found in the folder provided will be.
+    If folder is None then the built-in components will be returned,
+    otherwise the components found in the folder provided will be.
+
+    The result is a `ComponentRegistry`: the components are found from a
+    manifest of the classes defined in each module (see `_getManifest`),
+    and a module is only imported when one of its classes is first used.
 
     Changed v1.84.00:
     The Builder preference "components folders" should be of the form:
@@ -122,60 +130,254 @@ def getComponents(folder=None, fetchIcons=True):
     if not pth in os.sys.path:
         os.sys.path.insert(0, pth)
 
+    components = ComponentRegistry()
+    for moduleName, classNames in _getManifest(folder, pkg):
+        if classNames is None:
+            # couldn't be read without importing it (e.g. no source file)
+            components.update(_loadModule(moduleName))
+            continue
+        for name in classNames:
+            components.addLazy(name, moduleName)
+    return components
+
+
+class _Unloaded(object):
+    """Stands for a Component class whose module hasn't been imported yet"""
+    __slots__ = ('moduleName',)
+
+    def __init__(self, moduleName):
+        self.moduleName = moduleName
+
+
+class ComponentRegistry(MutableMapping):
+    """A dict of Component classes, by name, that only imports the module of
+    a Component when its class is first needed (e.g. to create one).
+
+    Checking whether a name is a Component (`name in registry`) never
+    imports anything, and `get(name)` only imports that Component's
+    module. Iterating over the registry (or listing its keys, items...)
+    imports all of them, so that it only lists Components that can be
+    used. A Component whose module fails to import is removed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._entries = OrderedDict()  # name: class or _Unloaded
+        self.update(*args, **kwargs)
+
+    def addLazy(self, name, moduleName):
+        """Add the Component `name`, from `moduleName`, without importing it
+        """
+        self._entries[name] = _Unloaded(moduleName)
+
+    def isLoaded(self, name):
+        return not isinstance(self._entries[name], _Unloaded)
+
+    def __getitem__(self, name):
+        entry = self._entries[name]
+        if isinstance(entry, _Unloaded):
+            moduleName = entry.moduleName
+            entry = _loadModule(moduleName).get(name)
+            if entry is None:
+                logging.warning('Could not import the %s Component from %s'
+                                % (name, moduleName))
+                del self._entries[name]
+                raise KeyError(name)
+            self._entries[name] = entry
+        return entry
+
+    def __setitem__(self, name, compClass):
+        self._entries[name] = compClass
+
+    def __delitem__(self, name):
+        del self._entries[name]
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def _loadAll(self):
+        """Import the modules of all the Components not loaded yet (and
+        remove those that can't be imported)
+        """
+        for name, entry in list(self._entries.items()):
+            if isinstance(entry, _Unloaded):
+                try:
+                    self[name]
+                except KeyError:
+                    pass  # its module couldn't be imported
+
+    def __iter__(self):
+        self._loadAll()
+        return iter(list(self._entries))
+
+    def __len__(self):
+        self._loadAll()
+        return len(self._entries)
+
+    def update(self, *args, **kwargs):
+        # copy Components that aren't loaded yet without loading them
+        if len(args) == 1 and isinstance(args[0], ComponentRegistry):
+            self._entries.update(args[0]._entries)
+            args = ()
+        MutableMapping.update(self, *args, **kwargs)
+
+    def copy(self):
+        return ComponentRegistry(self)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(name, self._entries[name]) for name in self]
+
+    def values(self):
+        return [compClass for name, compClass in self.items()]
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, list(self._entries))
+
+
+def _loadModule(moduleName):
+    """Import a Component module and return the Components found in it
+    (an empty dict if it can't be imported)
+    """
+    pkg = moduleName.rsplit('.', 1)[0]
+    try:
+        module = import_module(moduleName, package=pkg)
+    except ImportError:
+        return {}  # not a valid module (no __init__.py?)
+    # check for orphaned pyc files (__file__ is not a .py file)
+    if hasattr(module, '__file__') and module.__file__.endswith('.pyc'):
+        if not os.path.isfile(module.__file__[:-1]):
+            return {}  # looks like an orphaned pyc file
+    # give a default category
+    if not hasattr(module, 'categories'):
+        module.categories = ['Custom']
     components = {}
+    # check if module contains a component
+    for attrib in dir(module):
+        name = None
+        # fetch the attribs that end with 'Component'
+        if (attrib.endswith('omponent') and
+                attrib not in excludeComponents):
+            name = attrib
+            components[attrib] = getattr(module, attrib)
+
+            # skip if this class was imported, not defined here
+            if module.__name__ != components[attrib].__module__:
+                continue  # class was defined in different module
+
+            if hasattr(module, 'tooltip'):
+                tooltips[name] = module.tooltip
+            if hasattr(module, 'iconFile'):
+                iconFiles[name] = module.iconFile
+            # assign the module categories to the Component
+            if not hasattr(components[attrib], 'categories'):
+                components[attrib].categories = ['Custom']
+    return components
+
+
+# bump this if the contents of the manifest change
+_manifestVersion = 1
+# the manifest: {folder: {moduleName: [[mtime, size], classNames]}}, loaded
+# from manifestFile when first needed
+_manifest = None
+manifestFile = join(prefs.paths['userPrefsDir'], 'componentsManifest.json')
+
+
+def _getManifest(folder, pkg):
+    """The (moduleName, classNames) of the Component modules in `folder`,
+    found by reading their source rather than importing them.
+
+    Files are only parsed again when they change, and the results are
+    kept in `manifestFile` for the next session. classNames is None for
+    modules that have to be imported to find their Components.
+    """
+    global _manifest
+    if _manifest is None:
+        _manifest = _loadManifest()
+    known = _manifest.setdefault(folder, {})
+    changed = False
 
     # go through components in directory
     cfiles = glob.glob(os.path.join(folder, '*.py'))  # old-style: just comp.py
     # new-style: directories w/ __init__.py
     dfiles = [d for d in os.listdir(folder)
               if os.path.isdir(os.path.join(folder, d))]
+    modules = []
     for cmpfile in cfiles + dfiles:
         cmpfile = os.path.split(cmpfile)[1]
         if cmpfile[0] in '_0123456789':  # __init__.py, _base.py, leading digit
             continue
-        # can't use imp - breaks py2app:
-        # module = imp.load_source(file[:-3], fullPath)
-        # v1.83.00 used exec(implicit-relative), no go for python3:
-        # exec('import %s as module' % file[:-3])
-
-        # importlib.import_module eases 2.7 -> 3.x migration
         if cmpfile.endswith('.py'):
-            explicit_rel_path = pkg + '.' + cmpfile[:-3]
+            moduleName = pkg + '.' + cmpfile[:-3]
+            srcFile = join(folder, cmpfile)
         else:
-            explicit_rel_path = pkg + '.' + cmpfile
+            moduleName = pkg + '.' + cmpfile
+            srcFile = join(folder, cmpfile, '__init__.py')
         try:
-            module = import_module(explicit_rel_path, package=pkg)
-        except ImportError:
-            continue  # not a valid module (no __init__.py?)
-        # check for orphaned pyc files (__file__ is not a .py file)
-        if hasattr(module, '__file__') and module.__file__.endswith('.pyc'):
-            if not os.path.isfile(module.__file__[:-1]):
-                continue  # looks like an orphaned pyc file
-        # give a default category
-        if not hasattr(module, 'categories'):
-            module.categories = ['Custom']
-        # check if module contains a component
-        for attrib in dir(module):
-            name = None
-            # fetch the attribs that end with 'Component'
-            if (attrib.endswith('omponent') and
-                    attrib not in excludeComponents):
-                name = attrib
-                components[attrib] = getattr(module, attrib)
-
-                # skip if this class was imported, not defined here
-                if module.__name__ != components[attrib].__module__:
-                    continue  # class was defined in different module
-
-                if hasattr(module, 'tooltip'):
-                    tooltips[name] = module.tooltip
-                if hasattr(module, 'iconFile'):
-                    iconFiles[name] = module.iconFile
-                # assign the module categories to the Component
-                if not hasattr(components[attrib], 'categories'):
-                    components[attrib].categories = ['Custom']
-    return components
-
+            stat = os.stat(srcFile)
+            signature = [stat.st_mtime, stat.st_size]
+        except OSError:
+            modules.append((moduleName, None))
+            continue
+        if moduleName not in known or known[moduleName][0] != signature:
+            known[moduleName] = [signature, _findComponentClasses(srcFile)]
+            changed = True
+        modules.append((moduleName, known[moduleName][1]))
+
+    # forget modules that have gone
+    for moduleName in set(known) - set(name for name, _ in modules):
+        del known[moduleName]
+        changed = True
+    if changed:
+        _saveManifest(_manifest)
+    return modules
+
+
+def _findComponentClasses(srcFile):
+    """Names of the Component classes defined in a source file (None if it
+    can't be parsed or none were found)
+    """
+    try:
+        with open(srcFile, 'rb') as f:
+            tree = ast.parse(f.read(), srcFile)
+    except (IOError, OSError, SyntaxError, ValueError):
+        return None
+    names = [node.name for node in tree.body
+             if isinstance(node, ast.ClassDef) and
+             node.name.endswith('omponent') and
+             node.name not in excludeComponents]
+    # classes made in other ways can only be found by importing the module
+    return names or None
+
+
+def _loadManifest():
+    if not os.path.isfile(manifestFile):
+        return {}
+    try:
+        with codecs.open(manifestFile, 'r', 'utf-8') as f:
+            contents = json.load(f)
+        if contents.get('version') == _manifestVersion:
+            return contents['folders']
+    except Exception:
+        logging.warning('Could not read the components manifest %s, so it '
+                        'will be rebuilt' % manifestFile)
+    return {}
+
+
+def _saveManifest(folders):
+    try:
+        # write to a temporary file first, so that the manifest is never
+        # partly written
+        tmpName = manifestFile + '.%i.tmp' % os.getpid()
+        with codecs.open(tmpName, 'w', 'utf-8') as f:
+            json.dump({'version': _manifestVersion, 'folders': folders}, f)
+        if os.path.isfile(manifestFile):
+            os.remove(manifestFile)
+        os.rename(tmpName, manifestFile)
+    except (IOError, OSError) as err:
+        logging.warning('Could not save the components manifest %s: %s'
+                        % (manifestFile, err))
 
 
 def getInitVals(params, target="PsychoPy"):
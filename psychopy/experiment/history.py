@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Undo/redo history for an Experiment, using snapshots that share
+unchanged parts (copy-on-write).
+
+An Experiment is split into units: the settings, each Routine and each
+Loop. A snapshot stores a frozen copy of each unit plus the (cheap)
+structure of the experiment: the order of the Flow, the names of the
+Routines and the user namespace. When a new state is recorded only the
+units whose params have changed since the previous snapshot are copied;
+the others are shared with that snapshot. Undo and redo restore the live
+Experiment in place, thawing only the units that differ between the two
+states, so the cost of an edit depends on what was edited rather than on
+the size of the experiment.
+"""
+
+from __future__ import absolute_import, print_function
+
+from past.builtins import basestring
+from builtins import object
+import copy
+
+from psychopy.experiment.loops import LoopInitiator, LoopTerminator
+
+# approximate overhead (bytes) of each container/param in a frozen unit
+_OVERHEAD = 64
+
+
+def _frozenVal(val):
+    """Return an immutable, comparable version of a param value
+    """
+    if val is None or isinstance(val, (basestring, bool, int, float)):
+        return val
+    return repr(val)
+
+
+def _paramsSignature(params):
+    """A tuple describing the state of a dict of Params (or plain values,
+    as used by Routine.params)
+    """
+    sig = []
+    for name in sorted(params):
+        param = params[name]
+        if hasattr(param, 'val'):
+            sig.append((name, _frozenVal(param.val), param.valType,
+                        param.updates))
+        else:
+            sig.append((name, _frozenVal(param)))
+    return tuple(sig)
+
+
+def _componentSignature(comp):
+    # Static components also keep track of the params they update
+    return (comp.type, _paramsSignature(comp.params),
+            _frozenVal(getattr(comp, 'updatesList', None)))
+
+
+def _unitSignature(key, obj):
+    if key[0] == 'routine':
+        return (_paramsSignature(obj.params),
+                tuple(_componentSignature(comp) for comp in obj))
+    elif key[0] == 'loop':
+        return (obj.type, _paramsSignature(obj.params))
+    else:
+        return _componentSignature(obj)
+
+
+def _estimateSize(sig):
+    """Approximate memory (bytes) used by a unit with this signature
+    """
+    if isinstance(sig, tuple):
+        return _OVERHEAD + sum(_estimateSize(item) for item in sig)
+    elif isinstance(sig, basestring):
+        return len(sig)
+    return 8
+
+
+class UndoHistory(object):
+    """Undo/redo history of an :class:`~psychopy.experiment.Experiment`.
+
+    Call :meth:`record` *immediately after* each change to the experiment
+    (and once after creating/loading it) and :meth:`undo` / :meth:`redo` to
+    step through the recorded states. The experiment is restored in place,
+    so references to `exp` remain valid.
+
+    Levels follow the convention of the Builder: 1 is the current (most
+    recent) state, 2 is back one step, and so on.
+
+    :Parameters:
+
+        exp: Experiment
+            the experiment to track
+
+        maxLevels: int or None
+            the maximum number of states to keep (None is unlimited)
+
+        maxMemory: int or None
+            approximate maximum number of bytes used by the stored states.
+            The oldest states are discarded to stay within this (the current
+            state is always kept). None is unlimited.
+    """
+
+    def __init__(self, exp, maxLevels=None, maxMemory=None):
+        super(UndoHistory, self).__init__()
+        self.exp = exp
+        self.maxLevels = maxLevels
+        self.maxMemory = maxMemory
+        self.reset()
+
+    def reset(self):
+        """Forget all recorded states
+        """
+        self.level = 1
+        self.memoryUsed = 0
+        self._snapshots = []
+        self._frozenUnits = {}  # id(frozen): [refCount, size, frozen]
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    @property
+    def canUndo(self):
+        return self.level < len(self._snapshots)
+
+    @property
+    def canRedo(self):
+        return self.level > 1
+
+    @property
+    def undoAction(self):
+        """The label of the action that :meth:`undo` would revert
+        (or None)
+        """
+        if self.canUndo:
+            return self._snapshots[-self.level]['action']
+
+    @property
+    def redoAction(self):
+        """The label of the action that :meth:`redo` would reapply
+        (or None)
+        """
+        if self.canRedo:
+            return self._snapshots[-self.level + 1]['action']
+
+    def record(self, action=""):
+        """Record the current state of the experiment, labelled with the
+        `action` that led to it.
+
+        If states have been undone, those (orphaned) states are discarded.
+        """
+        # remove actions from after the current level
+        while self.level > 1:
+            self._release(self._snapshots.pop())
+            self.level -= 1
+        if self._snapshots:
+            prevUnits = self._snapshots[-1]['units']
+        else:
+            prevUnits = {}
+
+        units = {}
+        for key, obj in self._liveUnits().items():
+            sig = _unitSignature(key, obj)
+            if key in prevUnits and prevUnits[key][0] == sig:
+                units[key] = prevUnits[key]  # unchanged so share
+            else:
+                units[key] = (sig, self._freeze(obj))
+        snapshot = {'action': action,
+                    'units': units,
+                    'routineNames': tuple(self.exp.routines),
+                    'flow': tuple(self._flowStructure()),
+                    'names': tuple(self.exp.namespace.user),
+                    'libs': tuple(self.exp.psychopyLibs)}
+        for sig, frozen in units.values():
+            self._retain(frozen, sig)
+        self._snapshots.append(snapshot)
+        self._trim()
+
+    def undo(self):
+        """Step the experiment back one recorded state.
+
+        Returns the label of the action that was undone, or None if
+        there was nothing to undo.
+        """
+        if not self.canUndo:
+            return None
+        current = self._snapshots[-self.level]
+        self.level += 1
+        self._restore(current, self._snapshots[-self.level])
+        return current['action']
+
+    def redo(self):
+        """Step the experiment forward one recorded state.
+
+        Returns the label of the action that was redone, or None if
+        there was nothing to redo.
+        """
+        if not self.canRedo:
+            return None
+        current = self._snapshots[-self.level]
+        self.level -= 1
+        target = self._snapshots[-self.level]
+        self._restore(current, target)
+        return target['action']
+
+    def _liveUnits(self):
+        """The units of the live experiment, keyed by type and name
+        """
+        exp = self.exp
+        units = {('settings',): exp.settings}
+        for name, routine in exp.routines.items():
+            units[('routine', name)] = routine
+        for entry in exp.flow:
+            entryType = entry.getType()
+            if entryType == 'LoopInitiator':
+                loop = entry.loop
+                units[('loop', loop.params['name'].val)] = loop
+            elif entryType == 'Routine':
+                units.setdefault(('routine', entry.name), entry)
+        return units
+
+    def _flowStructure(self):
+        for entry in self.exp.flow:
+            entryType = entry.getType()
+            if entryType in ['LoopInitiator', 'LoopTerminator']:
+                yield (entryType, entry.loop.params['name'].val)
+            else:
+                yield (entryType, entry.name)
+
+    def _freeze(self, obj):
+        # copy the unit but not the experiment it belongs to
+        return copy.deepcopy(obj, {id(self.exp): self.exp})
+
+    _thaw = _freeze
+
+    def _restore(self, current, target):
+        """Turn the live experiment (in state `current`) into `target`,
+        keeping the live units that are identical in both
+        """
+        exp = self.exp
+        liveUnits = self._liveUnits()
+        units = {}
+        for key, (sig, frozen) in target['units'].items():
+            if (key in liveUnits and key in current['units'] and
+                    current['units'][key][1] is frozen):
+                units[key] = liveUnits[key]
+            else:
+                units[key] = self._thaw(frozen)
+
+        exp.settings = units[('settings',)]
+        exp.routines.clear()
+        for name in target['routineNames']:
+            exp.routines[name] = units[('routine', name)]
+        flow = []
+        for entryType, name in target['flow']:
+            if entryType == 'LoopInitiator':
+                flow.append(LoopInitiator(units[('loop', name)]))
+            elif entryType == 'LoopTerminator':
+                flow.append(LoopTerminator(units[('loop', name)]))
+            else:
+                flow.append(units[('routine', name)])
+        exp.flow[:] = flow
+        exp.namespace.user[:] = target['names']
+        exp.psychopyLibs[:] = target['libs']
+
+    def _retain(self, frozen, sig):
+        entry = self._frozenUnits.get(id(frozen))
+        if entry is None:
+            size = _estimateSize(sig)
+            self._frozenUnits[id(frozen)] = [1, size, frozen]
+            self.memoryUsed += size
+        else:
+            entry[0] += 1
+
+    def _release(self, snapshot):
+        for sig, frozen in snapshot['units'].values():
+            entry = self._frozenUnits[id(frozen)]
+            entry[0] -= 1
+            if entry[0] == 0:
+                self.memoryUsed -= entry[1]
+                del self._frozenUnits[id(frozen)]
+
+    def _trim(self):
+        """Discard the oldest states to stay within maxLevels/maxMemory
+        """
+        while len(self._snapshots) > 1:
+            tooMany = (self.maxLevels is not None and
+                       len(self._snapshots) > self.maxLevels)
+            tooBig = (self.maxMemory is not None and
+                      self.memoryUsed > self.maxMemory)
+            if not (tooMany or tooBig):
+                break
+            self._release(self._snapshots.pop(0))
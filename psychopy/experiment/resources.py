@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Find the files (conditions files, images, sounds...) needed by an
+Experiment, e.g. to upload them for an online study.
+
+The scan builds a graph of resources: the loops and Routines of the Flow
+refer to files, and conditions files can refer to further files
+(including other conditions files). Each file is stat-ed and each
+conditions file is parsed at most once per scan, conditions files that
+refer to each other don't cause infinite recursion, and independent
+conditions files are parsed concurrently.
+"""
+
+from __future__ import absolute_import, print_function
+
+from past.builtins import basestring
+from builtins import object
+import os
+import hashlib
+from multiprocessing.pool import ThreadPool
+
+from psychopy import data
+
+_condsExtensions = ['.csv', '.xlsx', '.xls']
+
+
+class ResourceScanner(object):
+    """Find the resource files of an experiment (for a single scan).
+
+    Each entry returned is a dict with keys 'rel' and 'abs' (the path
+    relative to the experiment file, and the absolute path), as from
+    :meth:`Experiment.getResourceFiles`, with 'size' (bytes) and optionally
+    'hash' (md5 of the file contents) added for a manifest.
+
+    :Parameters:
+
+        exp: Experiment
+            the experiment to scan
+
+        nThreads: int
+            the number of threads used to stat, parse and hash files
+    """
+
+    def __init__(self, exp, nThreads=4):
+        super(ResourceScanner, self).__init__()
+        self.exp = exp
+        self.nThreads = nThreads
+        self.srcRoot = os.path.split(exp.filename)[0]
+        # per-scan caches
+        self._stats = {}  # abs path: size in bytes (None if not a file)
+        self._condsVals = {}  # abs path: list of str vals in the conditions
+
+    def getFiles(self):
+        """Return the list of {'rel', 'abs', 'size'} resource dicts, without
+        duplicates, in the order they are first referred to in the Flow
+        """
+        refs = self._flowRefs()
+        self._parseAllConditions([ref for isConds, ref in refs if isConds])
+        resources = []
+        found = set()
+        visited = set()
+        for isConds, ref in refs:
+            if isConds:
+                thisFiles = self._condsFileTree(ref, visited)
+            else:
+                thisFile = self.getPaths(ref)
+                thisFiles = [thisFile] if thisFile else []
+            for thisFile in thisFiles:
+                if thisFile['abs'] not in found:
+                    found.add(thisFile['abs'])
+                    thisFile['size'] = self._stats[thisFile['abs']]
+                    resources.append(thisFile)
+        return resources
+
+    def getManifest(self, hashes=True):
+        """As :meth:`getFiles` but (optionally) with the md5 'hash' of each
+        file, so that uploads can skip files that haven't changed
+        """
+        resources = self.getFiles()
+        if hashes:
+            paths = [thisFile['abs'] for thisFile in resources]
+            for thisFile, thisHash in zip(resources,
+                                          self._map(_md5, paths)):
+                thisFile['hash'] = thisHash
+        return resources
+
+    def getPaths(self, filePath):
+        """Helper to return absolute and relative paths (or None)
+
+        :param filePath: str to a potential file path (rel or abs)
+        :return: dict of 'abs' and 'rel' paths or None
+        """
+        thisFile = {}
+        if len(filePath) > 2 and (filePath[0] == "/" or filePath[1] == ":"):
+            thisFile['abs'] = filePath
+            thisFile['rel'] = os.path.relpath(filePath, self.srcRoot)
+        else:
+            thisFile['rel'] = filePath
+            thisFile['abs'] = os.path.normpath(
+                os.path.join(self.srcRoot, filePath))
+        if self._isfile(thisFile['abs']):
+            return thisFile
+        else:
+            return None
+
+    def _isfile(self, absPath):
+        if absPath not in self._stats:
+            try:
+                self._stats[absPath] = os.path.getsize(absPath) \
+                    if os.path.isfile(absPath) else None
+            except OSError:
+                self._stats[absPath] = None
+        return self._stats[absPath] is not None
+
+    def _map(self, func, items):
+        if len(items) < 2 or self.nThreads < 2:
+            return [func(item) for item in items]
+        pool = ThreadPool(min(self.nThreads, len(items)))
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _flowRefs(self):
+        """A list of (isConditionsFile, ref) for the loops and Routines of
+        the Flow, where `ref` is a str from a loop or component param
+        """
+        refs = []
+        for thisEntry in self.exp.flow:
+            if thisEntry.getType() == 'LoopInitiator':
+                # find all loops and check for conditions filename
+                params = thisEntry.loop.params
+                if 'conditionsFile' in params:
+                    refs.append((True, params['conditionsFile'].val))
+            elif thisEntry.getType() == 'Routine':
+                # find all params of all compons and check if valid filename
+                for thisComp in thisEntry:
+                    for paramName in thisComp.params:
+                        thisParam = thisComp.params[paramName]
+                        if isinstance(thisParam, basestring):
+                            refs.append((False, thisParam))
+                        elif isinstance(thisParam.val, basestring):
+                            refs.append((False, thisParam.val))
+        # stat the candidate files concurrently to fill the cache
+        candidates = set(ref for isConds, ref in refs
+                         if not isConds and ref)
+        self._map(self.getPaths, sorted(candidates))
+        return refs
+
+    def _condsFile(self, filePath):
+        """Return the conditions file ({'rel', 'abs'} dict) that `filePath`
+        refers to, or a list of dicts for a $-expression that can't be
+        evaluated, or None
+        """
+        # Clean up filePath that cannot be eval'd
+        if '$' in filePath:
+            try:
+                filePath = filePath.strip('$')
+                filePath = eval(filePath)
+            except NameError:
+                # List files in director and get condition files
+                if 'xlsx' in filePath or 'xls' in filePath or 'csv' in filePath:
+                    # Get all xlsx and csv files
+                    expPath = self.exp.expPath
+                    if 'html' in expPath:  # Get resources from parent directory i.e, original exp path
+                        expPath = expPath.split('html')[0]
+                    fileList = [self.getPaths(condFile)
+                                for condFile in os.listdir(expPath)
+                                if len(condFile.split('.')) > 1 and
+                                condFile.split('.')[1] in ['xlsx', 'xls', 'csv']]
+                    return [thisFile for thisFile in fileList if thisFile]
+        # does it look at all like an excel file?
+        if (not isinstance(filePath, basestring) or
+                os.path.splitext(filePath)[1] not in _condsExtensions):
+            return None
+        return self.getPaths(filePath)
+
+    def _parseConditions(self, absPath):
+        """Return the (non-empty) str values in a conditions file
+        """
+        vals = []
+        for thisCond in data.importConditions(absPath):  # thisCond is a dict
+            for param, val in list(thisCond.items()):
+                if isinstance(val, basestring) and len(val):
+                    vals.append(val)
+        return vals
+
+    def _parseAllConditions(self, condsRefs):
+        """Parse all the conditions files reachable from the loops, one
+        level of the graph at a time, parsing each level concurrently
+        """
+        toParse = []
+        for ref in condsRefs:
+            thisFile = self._condsFile(ref)
+            if isinstance(thisFile, dict):
+                toParse.append(thisFile['abs'])
+        while toParse:
+            toParse = sorted(set(absPath for absPath in toParse
+                                 if absPath not in self._condsVals))
+            for absPath, vals in zip(toParse,
+                                     self._map(self._parseConditions,
+                                               toParse)):
+                self._condsVals[absPath] = vals
+            nextLevel = []
+            for absPath in toParse:
+                for val in self._condsVals[absPath]:
+                    subFile = self.getPaths(val)
+                    if (subFile and os.path.splitext(subFile['abs'])[1]
+                            in _condsExtensions):
+                        nextLevel.append(subFile['abs'])
+            toParse = nextLevel
+
+    def _condsFileTree(self, filePath, visited):
+        """Recursively list a conditions file and the valid file paths in
+        any param/cond (from the cache of parsed conditions)
+
+        :param filePath: str to a potential file path (rel or abs)
+        :param visited: set of abs paths of conditions files already listed
+        :return: list of dicts{'rel','abs'} of valid file paths
+        """
+        thisFile = self._condsFile(filePath)
+        if thisFile is None:
+            return []
+        elif isinstance(thisFile, list):
+            return thisFile
+        paths = [thisFile]
+        if thisFile['abs'] in visited:
+            return paths  # already listed (or a cycle)
+        visited.add(thisFile['abs'])
+        if thisFile['abs'] not in self._condsVals:
+            self._condsVals[thisFile['abs']] = \
+                self._parseConditions(thisFile['abs'])
+        for val in self._condsVals[thisFile['abs']]:
+            subFile = self.getPaths(val)
+            if subFile:
+                paths.append(subFile)
+                # if it's a possible conditions file then recursive
+                paths.extend(self._condsFileTree(subFile['abs'], visited)[1:])
+        return paths
+
+
+def _md5(filePath, blockSize=2**20):
+    md5 = hashlib.md5()
+    with open(filePath, 'rb') as f:
+        block = f.read(blockSize)
+        while block:
+            md5.update(block)
+            block = f.read(blockSize)
+    return md5.hexdigest()
@@ -11,8 +11,9 @@ ports and check for the expected device
 
 from __future__ import absolute_import, division, print_function
 
-from builtins import str
+from builtins import str, range
 import time
+import numpy as np
 from psychopy import logging
 from psychopy.hardware import serialdevice
 
@@ -31,6 +32,149 @@ evtChannels = {
     11: "Mic1",
 }
 
+# one row per line of data: the state of the 12 input channels (bit n is
+# evtChannels[n]) and the time of the change in seconds
+sampleDtype = np.dtype([('time', 'f8'), ('state', 'u2')])
+# one row per channel that changed: the channel (a key of evtChannels),
+# whether it turned on and the state of all channels after the change
+eventDtype = np.dtype([('time', 'f8'), ('channel', 'u1'), ('on', '?'),
+                       ('state', 'u2')])
+
+_nChannels = len(evtChannels)
+_nTimeDigits = 12
+
+
+def _splitDataBlock(data):
+    """Split the bytes of a data dump into its header lines and the bytes
+    of the data lines (which end with a newline)
+    """
+    data = bytes(data)
+    start = data.find(b'SDAT')
+    if start >= 0:
+        data = data[data.find(b'\n', start) + 1:]
+    end = data.find(b'EDAT')
+    if end >= 0:
+        data = data[:end]
+    # drop a line that was cut short
+    data = data[:data.rfind(b'\n') + 1]
+    # 3 header lines: events, microseconds and samples recorded
+    header = []
+    while len(header) < 3 and data:
+        line, data = data.split(b'\n', 1)
+        if line.strip():
+            header.append(line)
+    return header, data
+
+
+def decodeData(data):
+    """Decode the data sent by the BBTK in one block.
+
+    :Parameters:
+
+        data : bytes
+            the data as read from the port, from the line with SDAT (or the
+            line after it) to the one with EDAT (which can be left out)
+
+    Returns (nEvents, samples) where nEvents is the number of events the
+    BBTK reported and samples is an array of `sampleDtype` with a row for
+    each line of data. Raises ValueError if the data can't be decoded.
+    """
+    header, body = _splitDataBlock(data)
+    if not header:
+        return 0, np.zeros(0, dtype=sampleDtype)
+    nEvents = int(header[0].strip().rstrip(b';'))
+
+    # lines usually have the same width, so they can be viewed as rows of
+    # a 2D array without being split
+    width = body.find(b'\n') + 1
+    rows = np.frombuffer(body, dtype=np.uint8)
+    if width and len(rows) % width == 0:
+        rows = rows.reshape(-1, width)
+    if rows.ndim < 2 or np.any(rows[:, -1] != ord('\n')):
+        # differing widths; pad the times back to the same width
+        lines = [line.rstrip(b'\r;') for line in body.split(b'\n')[:-1]]
+        rows = np.frombuffer(
+            b''.join(line[:_nChannels] + line[-_nTimeDigits:].rjust(
+                _nTimeDigits) for line in lines),
+            dtype=np.uint8).reshape(-1, _nChannels + _nTimeDigits)
+    else:
+        # drop the line endings (;\r\n, ;\n, \r\n...)
+        nEnd = 1
+        while (rows.shape[1] > nEnd and
+               rows[0, -nEnd - 1] in (ord('\r'), ord(';'))):
+            nEnd += 1
+        rows = rows[:, :-nEnd]
+    if rows.shape[1] < _nChannels + _nTimeDigits:
+        raise ValueError("BBTK data lines are too short to decode")
+
+    stateChars = rows[:, :_nChannels]
+    timeChars = rows[:, -_nTimeDigits:]
+    if not np.all((stateChars == ord('0')) | (stateChars == ord('1'))):
+        raise ValueError("BBTK data has a state that isn't made of 0s "
+                         "and 1s")
+    isDigit = (timeChars >= ord('0')) & (timeChars <= ord('9'))
+    if not np.all(isDigit | (timeChars == ord(' '))):
+        raise ValueError("BBTK data has a time that isn't a number")
+
+    samples = np.zeros(len(rows), dtype=sampleDtype)
+    bits = (stateChars == ord('1')).astype(np.uint16)
+    samples['state'] = np.dot(bits, 1 << np.arange(_nChannels,
+                                                   dtype=np.uint16))
+    digits = np.where(isDigit, timeChars - ord('0'), 0).astype(np.int64)
+    powers = 10 ** np.arange(_nTimeDigits - 1, -1, -1, dtype=np.int64)
+    samples['time'] = np.dot(digits, powers) / 10.0**6
+    return nEvents, samples
+
+
+def getStateChanges(samples):
+    """The channels that turned on or off, from an array of `sampleDtype`
+    (see `decodeData`), as an array of `eventDtype`. Changes in the same
+    sample are in the order of their channels.
+    """
+    states = samples['state']
+    changed = states[1:] ^ states[:-1]
+    channels = np.arange(_nChannels, dtype=np.uint16)
+    sampleN, channel = np.nonzero((changed[:, np.newaxis] >> channels) & 1)
+    sampleN += 1
+    events = np.zeros(len(sampleN), dtype=eventDtype)
+    events['time'] = samples['time'][sampleN]
+    events['channel'] = channel
+    events['state'] = states[sampleN]
+    events['on'] = (events['state'] >> channel) & 1
+    return events
+
+
+def eventsAsDicts(samples, events=None):
+    """The list of dicts that `BlackBoxToolkit.getEvents` has always
+    returned: one for the first sample (with an empty 'evt') and then one
+    for each change in `events` (from `getStateChanges`), with its name
+    (e.g. 'Opto1_on'), the state as bytes (e.g. b'000000010000') and its
+    time
+    """
+    if not len(samples):
+        return []
+    if events is None:
+        events = getStateChanges(samples)
+    channels = np.arange(_nChannels, dtype=np.uint16)
+
+    def stateBytes(states):
+        chars = np.where((states[:, np.newaxis] >> channels) & 1,
+                         ord('1'), ord('0')).astype(np.uint8)
+        return [row.tobytes() for row in chars]
+
+    names = [[evtChannels[n] + "_off", evtChannels[n] + "_on"]
+             for n in range(_nChannels)]
+    dicts = [{'evt': '',
+              'state': stateBytes(samples['state'][:1])[0],
+              'time': float(samples['time'][0])}]
+    for evt, state in zip(events.tolist(), stateBytes(events['state'])):
+        timeSecs, channel, on, _ = evt
+        dicts.append({'evt': names[channel][on],
+                      'state': state,
+                      'time': timeSecs})
+    return dicts
+
+
 class BlackBoxToolkit(serialdevice.SerialDevice):
     """A base class for serial devices, to be sub-classed by specific devices
     """
@@ -179,9 +323,15 @@ class BlackBoxToolkit(serialdevice.SerialDevice):
         self.sendMessage(b"RUDS")
         logging.flush()
 
-    def getEvents(self, timeout=10):
+    def getEvents(self, timeout=10, asDicts=True):
         """Look for a string that matches SDAT;\n.........EDAT;\n
         and process it as events
+
+        The data are read in one block and decoded with `decodeData`. By
+        default the events are returned as a list of dicts (see
+        `eventsAsDicts`). With asDicts=False they are an array of
+        `eventDtype` (see `getStateChanges`), which is much faster for
+        long recordings.
         """
         foundDataStart = False
         t0 = time.time()
@@ -198,55 +348,35 @@ class BlackBoxToolkit(serialdevice.SerialDevice):
         if not foundDataStart:
             logging.warning("BBTK.getEvents() found no data "
                             "(SDAT was not found on serial port inputs")
-            return []
+            if asDicts:
+                return []
+            return np.zeros(0, dtype=eventDtype)
 
-        # helper function to parse time and event code
-        def parseEventsLine(line, lastState=None):
-            """Returns a list of dictionaries, one for each change
-            detected in the state
-            """
-            state = line[:12]
-            timeSecs = int(line[-14:-2]) / 10.0**6
-            evts = []
-            evt = ''
-            if lastState is None:
-                evts.append({'evt': '',
-                             'state': state,
-                             'time': timeSecs})
-            else:
-                for n in evtChannels:
-                    if state[n] != lastState[n]:
-                        if chr(state[n]) =='1':
-                            evt = evtChannels[n] + "_on"
-                        else:
-                            evt = evtChannels[n] + "_off"
-                        evts.append({'evt': evt,
-                                     'state': state,
-                                     'time': timeSecs})
-            return evts
-
-        # we've been sent data so work through it
-        events = []
-        eventLines = []
-        lastState = None
-        # try to read from port
+        # we've been sent data so read all of it (until nothing arrives
+        # for the timeout)
         self.pause()
         self.com.timeout = 5.0
-        nEvents = int(self.com.readline()[:-2])  # last two chars are ;\n
-        self.com.readline()[:-2]  # microseconds recorded (ignore)
-        self.com.readline()[:-2]  # samples recorded (ignore)
+        data = bytearray()
         while True:
-            line = self.com.readline()
-            if line.startswith(b'EDAT'):  # end of data stream
+            chunk = self.com.read(max(1, self.com.in_waiting))
+            if not chunk:
+                logging.warning("BBTK.getEvents() timed out before the "
+                                "end of the data (EDAT)")
+                break
+            data.extend(chunk)
+            endN = data.find(b'EDAT', max(0, len(data) - len(chunk) - 3))
+            if endN >= 0:
+                if data.find(b'\n', endN) < 0:
+                    self.com.readline()  # the rest of the EDAT line
                 break
-            events.extend(parseEventsLine(line, lastState))
-            lastState = events[-1]['state']
-            eventLines.append(line)
-        if nEvents != len(eventLines):
+        nEvents, samples = decodeData(data)
+        if nEvents != len(samples):
             msg = "BBTK reported %i events but told us to expect %i events!!"
-            logging.warning(msg % (len(events), nEvents))
+            logging.warning(msg % (len(samples), nEvents))
         logging.flush()  # we aren't in a time-critical period
-        return events
+        if asDicts:
+            return eventsAsDicts(samples)
+        return getStateChanges(samples)
 
     def setResponse(self, sensor=None, outputPin = None, testDuration = None,
                     responseTime=None, nTrials=None, setSmoothing = False,
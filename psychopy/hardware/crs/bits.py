@@ -224,6 +224,194 @@ class touch(dict):
         for k,v in value.items(): self[k]=v
 
 
+# A status report line from a Bits# / Display++ is
+# '#sample;sample;time;trigIn;DIN x10;IR x6;ADC x6'
+_statusLineStart = '#sample;'
+_statusNFields = 25
+
+statusDtype = np.dtype([('sample', np.int64),
+                        ('time', np.float64),
+                        ('trigIn', np.int32),
+                        ('DIN', np.int32, (10,)),
+                        ('DWORD', np.int32),
+                        ('IR', np.int32, (6,)),
+                        ('ADC', np.float64, (6,))])
+
+statusEventDtype = np.dtype([('time', np.float64),
+                             ('source', 'U7'),
+                             ('input', np.int32),
+                             ('dir', 'U4')])
+
+
+def parseStatusBuffer(data):
+    """Decode a buffer of status reports, as read from a Bits# or
+    Display++ (or from a recording of its serial output), in one pass.
+
+    Returns (values, remainder) where values is a numpy structured array
+    (see statusDtype) with one entry per status report, with the fields
+    sample, time, trigIn, DIN[10], DWORD, IR[6] and ADC[6], and remainder
+    is the incomplete report at the end of the buffer (if any), to be put in
+    front of the next buffer read.
+
+    Lines that are not status reports (e.g. touch screen events) are
+    skipped, with a warning.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    lines = data.split('\r')
+    remainder = lines.pop()
+    samples = [line for line in lines if line.startswith(_statusLineStart)]
+    if len(samples) < len(lines):
+        nTouch = sum(1 for line in lines if line.startswith('$touch'))
+        nUnknown = len(lines) - len(samples) - nTouch
+        if nTouch:
+            logging.warning("parseStatusBuffer found {} lines of touch data "
+                            "on input so skipping those".format(nTouch))
+        if nUnknown:
+            logging.warning("parseStatusBuffer found {} lines of unknown "
+                            "data on input so skipping those"
+                            .format(nUnknown))
+
+    # every field of every line is converted in a single call
+    nSep = np.array([line.count(';') for line in samples], dtype=int)
+    if not np.all(nSep == _statusNFields):
+        # extra fields are ignored, as are lines with too few
+        samples = [';'.join(line.split(';')[:_statusNFields + 1])
+                   for line, n in zip(samples, nSep) if n >= _statusNFields]
+    values = np.zeros(len(samples), dtype=statusDtype)
+    if not samples:
+        return values, remainder
+    offset = len(_statusLineStart)
+    fields = np.array(';'.join(line[offset:] for line in samples).split(';'),
+                      dtype=np.float64).reshape(-1, _statusNFields)
+    # as int(float(field)) for the integer fields
+    values['sample'] = fields[:, 0]
+    values['time'] = fields[:, 1]
+    values['trigIn'] = fields[:, 2]
+    values['DIN'] = fields[:, 3:13]
+    values['IR'] = fields[:, 13:19]
+    values['ADC'] = fields[:, 19:25]
+    values['DWORD'] = values['DIN'].dot(2 ** np.arange(10))
+    return values, remainder
+
+
+def _digitalEdges(states, base):
+    """Find where 0/1 inputs change state.
+
+    states is an (N, M) array of input values and base the (M,) states
+    before the first row. Values other than 0 and 1 leave the state
+    unchanged.
+
+    Returns the rows, inputs and directions (True for up) of the changes,
+    in row then input order, and the (M,) states after the last row.
+    """
+    full = np.vstack([np.asarray(base, dtype=np.float64)[np.newaxis],
+                      np.asarray(states, dtype=np.float64)])
+    valid = (full == 0) | (full == 1)
+    if not valid.all():
+        # carry the last valid state forward over other values
+        lastValid = np.where(valid, np.arange(len(full))[:, np.newaxis], 0)
+        np.maximum.accumulate(lastValid, axis=0, out=lastValid)
+        full = full[lastValid, np.arange(full.shape[1])]
+    rows, inputs = np.nonzero(full[1:] != full[:-1])
+    up = full[rows + 1, inputs] == 1
+    return rows, inputs, up, full[-1]
+
+
+def _analogEdges(values, base, threshold):
+    """Find where analog inputs change by more than threshold since their
+    last change (or their base value).
+
+    values is an (N, M) array of input values and base the (M,) values
+    before the first row.
+
+    Returns the rows, inputs and directions (True for up) of the changes,
+    in row then input order, and the (M,) values at the last change.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    base = np.array(np.broadcast_to(base, values.shape[1:]), dtype=np.float64)
+    rows, inputs, up = [], [], []
+    for j in range(values.shape[1]):
+        col = values[:, j]
+        colList = col.tolist()
+        b = base[j]
+        start = 0
+        window = 256
+        while start < len(col):
+            # search a (growing) window of values at a time for the next
+            # change from b
+            seg = col[start:start + window]
+            hits = np.flatnonzero((b - seg > threshold) |
+                                  (seg - b > threshold))
+            if not hits.size:
+                start += window
+                window *= 2
+                continue
+            i = start + hits[0]
+            while i is not None:
+                rows.append(i)
+                inputs.append(j)
+                up.append(not b - colList[i] > threshold)
+                b = colList[i]
+                # changes often come in bursts, so check the next few
+                # values one at a time before searching again
+                start = i + 1
+                i = None
+                for k in range(start, min(start + 32, len(colList))):
+                    if (b - colList[k] > threshold or
+                            colList[k] - b > threshold):
+                        i = k
+                        break
+                else:
+                    start = min(start + 32, len(colList))
+            window = 256
+        base[j] = b
+    rows = np.array(rows, dtype=int)
+    inputs = np.array(inputs, dtype=int)
+    up = np.array(up, dtype=bool)
+    order = np.lexsort((inputs, rows))
+    return rows[order], inputs[order], up[order], base
+
+
+def extractStatusEvents(values, DINBase=0b1111111111, IRBase=0b111111,
+                        TrigInBase=0, ADCBase=0, threshold=9999.99,
+                        mode=['up', 'down']):
+    """Find the events in an array of status values (from
+    parseStatusBuffer), as for BitsSharp.setStatusEventParams.
+
+    Returns a numpy structured array (see statusEventDtype) with the fields
+    time, source ('DIN', 'IR', 'ADC' or 'Trigger'), input and dir ('up' or
+    'down'), in time order and then in that order of sources.
+    """
+    DINBase = [(DINBase >> j) & 1 for j in range(10)]
+    IRBase = [(IRBase >> j) & 1 for j in range(6)]
+    sources = [('DIN', _digitalEdges(values['DIN'], DINBase)),
+               ('IR', _digitalEdges(values['IR'], IRBase)),
+               ('ADC', _analogEdges(values['ADC'], ADCBase, threshold)),
+               ('Trigger', _digitalEdges(values['trigIn'][:, np.newaxis],
+                                         [TrigInBase]))]
+    wantUp = 'up' in mode or 'Up' in mode
+    wantDown = 'down' in mode or 'Down' in mode
+
+    rows, ranks, inputs, ups = [], [], [], []
+    for rank, (name, (theseRows, theseInputs, up, _)) in enumerate(sources):
+        keep = (up & wantUp) | (~up & wantDown)
+        rows.append(theseRows[keep])
+        ranks.append(np.full(keep.sum(), rank, dtype=int))
+        inputs.append(theseInputs[keep])
+        ups.append(up[keep])
+    rows, ranks, inputs, ups = [np.concatenate(x)
+                                for x in (rows, ranks, inputs, ups)]
+    order = np.lexsort((inputs, ranks, rows))
+
+    events = np.zeros(len(order), dtype=statusEventDtype)
+    events['time'] = values['time'][rows[order]]
+    events['source'] = np.array([name for name, _ in sources])[ranks[order]]
+    events['input'] = inputs[order]
+    events['dir'] = np.where(ups[order], 'up', 'down')
+    return events
+
+
 
 
 class BitsPlusPlus(object):
@@ -1340,6 +1528,7 @@ class BitsSharp(BitsPlusPlus, serialdevice.SerialDevice):
         # members for storing status logs and reports
         self.statusQ=Queue.Queue(70000) # sets up a queue in which to store bits status events
         self.statusValues=[] # full list of values recorded while logging the Bits# status
+        self.statusArray = np.zeros(0, dtype=statusDtype) # the same values as a numpy array
         self.status_nValues = 0 #number of status values recorded
         self.statusEvents=[] # list of meaningful events extracted from log
         self.status_nEvents = 0 #number of events recorded
@@ -3249,88 +3438,46 @@ class BitsSharp(BitsPlusPlus, serialdevice.SerialDevice):
 
         # Continue reading data until sample time is up or status.End is set
         # Note when used in thread statusEnd can be set from outside this function.
-        firstIn = True # we do something different for the very first status entry
+        remainder = "" # incomplete status line at the end of the last read
+        log = None # input states from the very first status entry on
         while (self.statusBoxEnd == False): 
             self.com.timeout = 0.01
-            raw=""
             nChars = self._inWaiting()
             if nChars >= self._statusSize:  # we many have a status report
                 # use self.com.read() to get exact number of chars
                 raw = self.com.read(nChars) 
-                msg=raw.decode("utf-8")
-                # just in case split message into status lines marked by CR
-                lines = msg.split('\r') 
-                N = len(lines) 
-                values = [button() for  i in range(N)] 
-                for i in range(N-1): # for each status line
-                    # split line into component parts marked by ;
-                    v=lines[i].split(';') 
-                    if v[0] == '#sample': # Check we have read a status line
-                        if not firstIn: # Not first status entry
-                            # Check digital inputs
-                            for sourse in range(17):
-                                # if input has changed and input is mapped
-                                if (v[3+sourse] != log[3+sourse] 
-                                    and self.statusButtonMap[sourse] < 24): 
-                                    if ('Down' in self.statusBoxMode
-                                            or 'down'  in self.statusBoxMode):
-                                        if int(v[3+sourse]) == 0:
-                                            values[i].button = (
-                                                    self.statusButtonMap[sourse])
-                                            values[i].time = float(v[2])
-                                            values[i].dir = 'down'
-                                            self.statusQ.put(values[i])
-                                    if ('Up' in self.statusBoxMode
-                                            or 'up'  in self.statusBoxMode):
-                                        if int(v[3+sourse]) == 1:
-                                            values[i].button = (
-                                                    self.statusButtonMap[sourse])
-                                            values[i].time = float(v[2])
-                                            values[i].dir = 'up'
-                                            self.statusQ.put(values[i])
-                                    # save new state of sourse
-                                    log[3+sourse] = v[3+sourse] 
-                            # Check analog inputs
-                            for analog in range(6):
-                                sourse = analog + 17
-                                fLog = float(log[3+sourse])
-                                fVal = float(v[3+sourse])
-                                # if input has changed enough and input is mapped
-                                if (abs(fVal - fLog)
-                                    > self.statusBoxThreshold
-                                    and self.statusButtonMap[sourse] < 24): 
-                                    if ('Down' in self.statusBoxMode
-                                            or 'down'  in self.statusBoxMode):
-                                        # Is change of input in downward direction
-                                        if fLog > fVal:
-                                            values[i].button = (
-                                                    self.statusButtonMap[sourse])
-                                            values[i].time = float(v[2])
-                                            values[i].dir = 'down'
-                                            self.statusQ.put(values[i])
-
-                                    if ('Up' in self.statusBoxMode
-                                            or 'up'  in self.statusBoxMode):
-                                        # Is change of input in upward direction
-                                        if fVal > fLog:
-                                            values[i].button = (
-                                                    self.statusButtonMap[sourse])
-                                            values[i].time = float(v[2])
-                                            values[i].dir = 'up'
-                                            self.statusQ.put(values[i])
-                                    # save new state of sourse
-                                    log[3+sourse] = v[3+sourse] 
-                        else: # this is the first entry
-                            log = deepcopy(v) # make a copy of status entry
-                            firstIn = False
-                    elif v[0] == '$touch': # We've read a screen touch event by mistake.
-                        warning = ("_statusBox found touch" 
-                                " data on input so skipping that")
-                        logging.warning(warning)
-                    else: # We've read something we can't interpret.
-                        warning = ("_statusBox found unknown data"
-                                " on input so skipping that")
-                        logging.warning(warning)
+                values, remainder = parseStatusBuffer(
+                    remainder + raw.decode("utf-8"))
+                if not len(values):
+                    continue
+                # sources 0-16 are the trigger, digital ins and IR buttons,
+                # 17-22 the analog inputs
+                digital = np.column_stack(
+                    [values['trigIn'], values['DIN'], values['IR']])
+                analog = values['ADC']
+                if log is None: # this is the first entry
+                    log = [digital[0], analog[0]]
+                    values = values[1:]
+                    digital = digital[1:]
+                    analog = analog[1:]
+                dRows, dInputs, dUp, log[0] = _digitalEdges(digital, log[0])
+                aRows, aInputs, aUp, log[1] = _analogEdges(
+                    analog, log[1], self.statusBoxThreshold)
+                rows = np.concatenate([dRows, aRows])
+                sources = np.concatenate([dInputs, aInputs + 17])
+                ups = np.concatenate([dUp, aUp])
+                # put the presses of mapped inputs on the queue, in order
+                for i in np.lexsort((sources, rows)):
+                    sourse = sources[i]
+                    if self.statusButtonMap[sourse] >= 24:
+                        continue
+                    direction = 'up' if ups[i] else 'down'
+                    if (direction.capitalize() in self.statusBoxMode
+                            or direction in self.statusBoxMode):
+                        self.statusQ.put(button(
+                                direction=direction,
+                                button=self.statusButtonMap[sourse],
+                                t=float(values['time'][rows[i]])))
                         
         # clearn up when stop is called.
         # Send stop signal to CRS device to shut it up.
@@ -3942,51 +4089,28 @@ class BitsSharp(BitsPlusPlus, serialdevice.SerialDevice):
         else:
             oneshot = False
         sT=clock() # start time
-        msg=""
+        chunks=[]
+        nChars = 0
         # Continue reading data until sample time is up or status.End is set
         # Note when used in thread statusEnd canbe set from outside this function.
         while (clock() - sT < t) and (self.statusEnd == False):
             smsg=self.read(timeout=0.1)
             # Compile message strings
             if smsg:
-                msg=msg + smsg.decode("utf-8")
+                chunks.append(smsg)
+                nChars += len(smsg)
             # Stop if we have 1 whole status string in one shot mode
-            if len(msg) > self._statusSize and oneshot:
+            if nChars > self._statusSize and oneshot:
                 self.statusEnd = True
         # Send stop signal to CRS device to shut it up.
         self._statusDisable() # Send stop signal to CRS device to shut it up.
         self.statusEnd = True # Confirm that data logging has ended.
-        if msg: # If we actually have a message
-            lines = msg.split('\r') # Split message into status lines marked by CR
-            N = len(lines) 
-            values = [status() for  i in range(N-1)] # ignore last line as likely to be error
-            for i in range(N-1): # for each status line
-                v=lines[i].split(';') # split line into compoment parts marked by ;
-                if v[0] == '#sample': # Check we have read a status line
-                    # Now strip out statsu values into a structure.
-                    values[i].sample = int(float(v[1]))
-                    values[i].time = float(v[2])
-                    values[i].trigIn = int(float(v[3]))
-                    dword = 0;
-                    for j in range(10): #10 digital inputs
-                        values[i].DIN[j] = int(float(v[4+j]))
-                        dword=dword + (2**j) * values[i].DIN[j]
-                    values[i].DWORD = dword
-                    for j in range(6): # 6 IR buttons
-                        values[i].IR[j] = int(float(v[14+j]))
-                    for j in range(6): # 6 Analog inputs
-                        values[i].ADC[j] = float(v[20+j])
-                    # Put the structure onto the cue.
-                    self.statusQ.put(values[i])
-                elif v[0] == '$touch': # We've read a screen touch event by mistake.
-                    warning = ("_statusLog found touch" 
-                            " data on input so skipping that")
-                    logging.warning(warning)
-                else: # We've read something we can't interpret.
-                    warning = ("_statusLog found unknown data"
-                            " on input so skipping that")
-
-
+        if chunks: # If we actually have a message
+            # Decode all the status lines in one go, ignoring the last
+            # line as likely to be error
+            values, _ = parseStatusBuffer(b''.join(chunks))
+            # Put the array of values onto the queue.
+            self.statusQ.put(values)
 
     def _getStatusLog(self):
         """ Read the log Queue
@@ -4000,17 +4124,32 @@ class BitsSharp(BitsPlusPlus, serialdevice.SerialDevice):
         
         They can be accessed as statusValues[i]['sample'] 
         or statusValues[i].sample, statusValues[i].ADC[j]
+
+        The same values are in the numpy structured array statusArray
+        (see parseStatusBuffer).
         
         Also sets status_nValues to the number of values recorded.
         """
 
         if not(self.statusQ.empty()):
-            # emply statusValues of correct size
+            # Take the arrays of status values off the queue
+            arrays = []
+            while not self.statusQ.empty():
+                arrays.append(self.statusQ.get())
+            self.statusArray = np.concatenate(arrays)
             self.statusValues = [
-                        status() for  i in range(self.statusQ.qsize())]
-            # Take the status values off the queue
-            for index in range(0,self.statusQ.qsize()):
-                self.statusValues[index] = self.statusQ.get()
+                status(sample=int(v['sample']), t=float(v['time']),
+                       trigIn=int(v['trigIn']))
+                for v in self.statusArray]
+            for thisStatus, DIN, DWORD, IR, ADC in zip(
+                    self.statusValues, self.statusArray['DIN'].tolist(),
+                    self.statusArray['DWORD'].tolist(),
+                    self.statusArray['IR'].tolist(),
+                    self.statusArray['ADC'].tolist()):
+                thisStatus.DIN = DIN
+                thisStatus.DWORD = DWORD
+                thisStatus.IR = IR
+                thisStatus.ADC = ADC
             self.status_nValues = len(self.statusValues)
         else:
             self.status_nValues = 0
@@ -4042,130 +4181,19 @@ class BitsSharp(BitsPlusPlus, serialdevice.SerialDevice):
         Also set status._nEvents to the number of events recorded
         
         """
-        
-        DIN_baseAll = [0]*10
-        IR_baseAll = [0]*6
-        ADC_baseAll = [self.statusADCBase]*6
-        # Interpret statusDINBase and statusIRBase statusADCBase into lists.
-        for i in range(10):
-            mask = 2**i
-            if mask & self.statusDINBase:
-                DIN_baseAll[i] = 1
-        for i in range(6):
-            mask = 2**i
-            if mask & self.statusIRBase:
-                IR_baseAll[i] = 1
-       
-        Trig_base = self.statusTrigInBase
-        N = len(self.statusValues)
 
-        self.statusEvents = []
-        nEvents = 0
-        for i in range(N):
-            DIN = self.statusValues[i].DIN 
-            IR = self.statusValues[i].IR
-            Trig = self.statusValues[i].trigIn
-            ADC = self.statusValues[i].ADC
-            # For 10 digital inputs
-            for j in range(10):
-                # Has input changed high to low and is that direction being recorded?
-                if (DIN[j] == 0) and (DIN_baseAll[j] == 1): 
-                    if ('down' in self.statusMode
-                        or 'Down' in self.statusMode):
-                        self.statusEvents.append(event())
-                        self.statusEvents[nEvents].source = 'DIN'
-                        self.statusEvents[nEvents].input = j
-                        self.statusEvents[nEvents].dir = 'down'
-                        self.statusEvents[nEvents].time = self.statusValues[i].time
-                        nEvents = nEvents + 1
-                    DIN_baseAll[j] = 0  # Set to the current input state
-                # Has input changed low to high and is that direction being recorded?
-                if (DIN[j] == 1) and (DIN_baseAll[j] == 0):
-                    if ('up' in self.statusMode
-                        or 'Up' in self.statusMode):
-                        self.statusEvents.append(event())
-                        self.statusEvents[nEvents].source = 'DIN'
-                        self.statusEvents[nEvents].input = j
-                        self.statusEvents[nEvents].dir = 'up'
-                        self.statusEvents[nEvents].time = self.statusValues[i].time
-                        nEvents = nEvents + 1
-                    DIN_baseAll[j] = 1 # Set to the current input state
-                    
-            # For 6 IR buttons
-            for j in range(6):
-                # Has button changed high to low and is that direction being recorded?
-                if (IR[j] == 0) and (IR_baseAll[j] == 1):
-                    if ('down' in self.statusMode
-                        or 'Down' in self.statusMode):
-                        self.statusEvents.append(event())
-                        self.statusEvents[nEvents].source = 'IR'
-                        self.statusEvents[nEvents].input = j
-                        self.statusEvents[nEvents].dir = 'down'
-                        self.statusEvents[nEvents].time = self.statusValues[i].time
-                        nEvents = nEvents + 1
-                    IR_baseAll[j] = 0 # Set to the current input state
-                    
-                # Has button changed low to high and is that direction being recorded?
-                if (IR[j] == 1) and (IR_baseAll[j]==0):
-                    if ('up' in self.statusMode
-                        or 'Up' in self.statusMode):
-                        self.statusEvents.append(event())
-                        self.statusEvents[nEvents].source = 'IR'
-                        self.statusEvents[nEvents].input = j
-                        self.statusEvents[nEvents].dir = 'up'
-                        self.statusEvents[nEvents].time = self.statusValues[i].time
-                        nEvents = nEvents + 1
-                    IR_baseAll[j] = 1 # Set to the current input state
-            for j in range(6):
-                # Has analog input changed high to low and is that direction being recorded?
-                if ADC_baseAll[j] - ADC[j] > self.statusThreshold:
-                    if ('down' in self.statusMode
-                        or 'Down' in self.statusMode):
-                        self.statusEvents.append(event())
-                        self.statusEvents[nEvents].source = 'ADC'
-                        self.statusEvents[nEvents].input = j
-                        self.statusEvents[nEvents].dir = 'down'
-                        self.statusEvents[nEvents].time = self.statusValues[i].time
-                        nEvents = nEvents + 1
-                    ADC_baseAll[j] = ADC[j]
-                    
-                # Has analog input changed low to high and is that direction being recorded?
-                if ADC[j] - ADC_baseAll[j]  > self.statusThreshold:
-                    if ('up' in self.statusMode
-                        or 'Up' in self.statusMode):
-                        self.statusEvents.append(event())
-                        self.statusEvents[nEvents].source = 'ADC'
-                        self.statusEvents[nEvents].input = j
-                        self.statusEvents[nEvents].dir = 'up'
-                        self.statusEvents[nEvents].time = self.statusValues[i].time
-                        nEvents = nEvents + 1
-                    ADC_baseAll[j] = ADC[j]
-                    
-            # Has trigger changed high to low and is that direction being recorded?
-            if Trig == 0 and Trig_base == 1:
-                if ('down' in self.statusMode
-                    or 'Down' in self.statusMode):
-                    self.statusEvents.append(event())
-                    self.statusEvents[nEvents].source='Trigger'
-                    self.statusEvents[nEvents].input=0
-                    self.statusEvents[nEvents].dir='down'
-                    self.statusEvents[nEvents].time=self.statusValues[i].time
-                    nEvents=nEvents+1
-                Trig_base = 0 # Set to the current input state
-                
-            # Has trigger changed low to high and is that direction being recorded?
-            if Trig == 1 and Trig_base == 0:
-                if ('up' in self.statusMode
-                    or 'Up' in self.statusMode):
-                    self.statusEvents.append(event())
-                    self.statusEvents[nEvents].source = 'Trigger'
-                    self.statusEvents[nEvents].input = 0
-                    self.statusEvents[nEvents].dir = 'up'
-                    self.statusEvents[nEvents].time = self.statusValues[i].time
-                    nEvents = nEvents + 1
-                Trig_base = 1 # Set to the current input state
-                
-        self.status_nEvents=nEvents
+        events = extractStatusEvents(self.statusArray,
+                                     DINBase=self.statusDINBase,
+                                     IRBase=self.statusIRBase,
+                                     TrigInBase=self.statusTrigInBase,
+                                     ADCBase=self.statusADCBase,
+                                     threshold=self.statusThreshold,
+                                     mode=self.statusMode)
+        self.statusEvents = [
+            event(source=str(e['source']), t=float(e['time']),
+                  input=int(e['input']), direction=str(e['dir']))
+            for e in events]
+        self.status_nEvents = len(self.statusEvents)
 
 
 
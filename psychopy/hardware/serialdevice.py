@@ -15,8 +15,10 @@ from builtins import range
 from builtins import object
 import sys
 import time
+import threading
+from collections import deque
 
-from psychopy import logging
+from psychopy import logging, clock
 try:
     import serial
 except ImportError:
@@ -29,6 +31,11 @@ class SerialDevice(object):
     If port=None then the SerialDevice.__init__() will search for the device
     on known serial ports on the computer and test whether it has found the
     device using isAwake() (which the sub-classes need to implement).
+
+    With backgroundReader=True a thread reads the port continuously, so
+    that the input is timestamped as it arrives and can be collected
+    without waiting (see `startReader`). bufferSize is the number of lines
+    (and reads) it keeps.
     """
     name = b'baseSerialClass'
     longName = ""
@@ -40,7 +47,8 @@ class SerialDevice(object):
                  parity="N",  # 'N'one, 'E'ven, 'O'dd, 'M'ask,
                  eol=b"\n",
                  maxAttempts=1, pauseDuration=0.1,
-                 checkAwake=True):
+                 checkAwake=True, backgroundReader=False,
+                 bufferSize=1000):
 
         if not serial:
             raise ImportError('The module serial is needed to connect to this'
@@ -64,11 +72,26 @@ class SerialDevice(object):
         else:
             self.eol = bytes(eol, 'utf-8')
         self.type = self.name  # for backwards compatibility
+        # for the background reader (see startReader)
+        self._reader = None
+        self._stopReading = threading.Event()
+        self._bufferLock = threading.Lock()
+        self._lines = deque(maxlen=bufferSize)  # (lineN, time, line)
+        self._chunks = deque(maxlen=bufferSize)  # (byteN, time, bytes)
+        self._partialLine = b''
+        self._nLines = 0  # lines received, to number the next one
+        self._nBytes = 0
+        self._bytesRead = 0  # bytes returned by getResponse()
 
         # try to open the port
         for portString in ports:
             try:
-                self.com = serial.Serial(
+                if '://' in portString:
+                    # a URL, e.g. 'loop://' or 'socket://host:port'
+                    openPort = serial.serial_for_url
+                else:
+                    openPort = serial.Serial
+                self.com = openPort(
                     portString,
                     baudrate=baudrate, bytesize=byteSize,    # number of data bits
                     parity=parity,    # enable parity checking
@@ -119,6 +142,8 @@ class SerialDevice(object):
         if self.OK:  # we have successfully sent and read a command
             msg = "Successfully opened %s with a %s"
             logging.info(msg % (self.portString, self.name))
+        if backgroundReader and self.isOpen:
+            self.startReader(bufferSize)
         # we aren't in a time-critical period so flush messages
         logging.flush()
 
@@ -152,7 +177,9 @@ class SerialDevice(object):
     def sendMessage(self, message, autoLog=True):
         """Send a command to the device (does not wait for a reply or sleep())
         """
-        if self.com.inWaiting():
+        if self.isReading:
+            pass  # any input is being kept by the reader
+        elif self.com.inWaiting():
             inStr = self.com.read(self.com.inWaiting())
             msg = "Sending '%s' to %s but found '%s' on the input buffer"
             logging.warning(msg % (message, self.name, inStr))
@@ -178,7 +205,14 @@ class SerialDevice(object):
            2: a multiline reply (use readlines() which *requires* timeout)
            -1: may not be any EOL character; just read whatever chars are
                 there
+
+        If the background reader is running (see `startReader`) the reply
+        comes from its buffer, starting after the bytes that getResponse
+        has already returned (as lines or not). As when reading the port, a
+        line that hasn't ended within the timeout is returned as it is.
         """
+        if self.isReading:
+            return self._getBufferedResponse(length, timeout)
         # get reply (within timeout limit)
         self.com.timeout = timeout
         if length == 1:
@@ -189,7 +223,143 @@ class SerialDevice(object):
             retVal = self.com.read(self.com.inWaiting())
         return retVal
 
+    def _getBufferedResponse(self, length, timeout):
+        """getResponse() from the buffer of the background reader"""
+        endTime = time.time() + timeout
+        while True:
+            unread, nBytes = self._unreadBytes()
+            reply = unread
+            if length == 1 and self.eol in unread:
+                reply = unread[:unread.index(self.eol) + len(self.eol)]
+                break
+            # readlines() waits for the whole timeout
+            if length < 1 or time.time() >= endTime:
+                break
+            time.sleep(0.001)
+        self._bytesRead = nBytes - len(unread) + len(reply)
+        if length <= 1:
+            return reply
+        lines = reply.split(self.eol)
+        return [line + self.eol for line in lines[:-1]] + \
+            ([lines[-1]] if lines[-1] else [])
+
+    def _unreadBytes(self):
+        """The bytes in the reader buffer that getResponse() hasn't returned,
+        and the number of bytes received"""
+        with self._bufferLock:
+            chunks = []
+            for byteN, t, chunk in reversed(self._chunks):
+                if byteN + len(chunk) <= self._bytesRead:
+                    break
+                chunks.append(chunk[max(0, self._bytesRead - byteN):])
+            return b''.join(chunks[::-1]), self._nBytes
+
+    def startReader(self, bufferSize=None):
+        """Start a background thread that continuously reads the port
+
+        The bytes are timestamped as they arrive (with `core.getTime()`)
+        and kept, with the complete lines they make, in buffers of the last
+        `bufferSize` lines and reads. Get them with `getLines()` and
+        `getBytes()`, which don't wait for the device. `getResponse()`
+        then also reads from the buffers rather than the port.
+        """
+        if self.isReading:
+            return
+        if self.com is None or not self.com.isOpen():
+            raise IOError('The serial port of %s is not open' % self.name)
+        if bufferSize is not None:
+            with self._bufferLock:
+                self._lines = deque(self._lines, maxlen=bufferSize)
+                self._chunks = deque(self._chunks, maxlen=bufferSize)
+        self._stopReading.clear()
+        self._reader = threading.Thread(target=self._readContinuously,
+                                        name='%s reader' % self.name)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def stopReader(self):
+        """Stop the background reader (the buffers are kept)"""
+        if self._reader is None:
+            return
+        self._stopReading.set()
+        if self._reader is not threading.current_thread():
+            self._reader.join()
+        self._reader = None
+
+    @property
+    def isReading(self):
+        """True if the background reader is running"""
+        return self._reader is not None and self._reader.is_alive()
+
+    def _readContinuously(self):
+        """The loop of the background reader thread"""
+        com = self.com
+        com.timeout = 0.01  # how often to check whether to stop
+        while not self._stopReading.is_set():
+            try:
+                chunk = com.read(max(1, com.inWaiting()))
+            except Exception as err:
+                if not self._stopReading.is_set():
+                    logging.error('Stopped reading %s: %s' % (self.name, err))
+                break
+            if chunk:
+                self._addChunk(chunk, clock.monotonicClock.getTime())
+
+    def _addChunk(self, chunk, t):
+        """Add bytes received at time t to the buffers of the reader"""
+        with self._bufferLock:
+            self._chunks.append((self._nBytes, t, chunk))
+            self._nBytes += len(chunk)
+            lines = (self._partialLine + chunk).split(self.eol)
+            self._partialLine = lines.pop()  # (empty if chunk ended a line)
+            for line in lines:
+                self._lines.append((self._nLines, t, line))
+                self._nLines += 1
+
+    def getLines(self, since=None, timeStamped=False):
+        """Returns the complete lines received by the background reader
+        (without the eol) that arrived after time `since` (or all the lines
+        still in the buffer if since is None). Doesn't wait or remove them.
+
+        Lines are timestamped (with `core.getTime()`) when their eol
+        arrived. If `timeStamped` is True a list of (time, line) is
+        returned, so the time of the last line can be the next `since`.
+        """
+        return self._getBuffered(self._lines, since, timeStamped)
+
+    def getBytes(self, since=None, timeStamped=False):
+        """Returns the bytes received by the background reader after time
+        `since` (or all those still in the buffer). Doesn't wait or remove
+        them.
+
+        If `timeStamped` is True a list of (time, bytes) is returned, for
+        each read of the port.
+        """
+        chunks = self._getBuffered(self._chunks, since, True)
+        if timeStamped:
+            return chunks
+        return b''.join(chunk for t, chunk in chunks)
+
+    def _getBuffered(self, entries, since, timeStamped):
+        with self._bufferLock:
+            found = []
+            # the newest are at the end, so only look at those we need
+            for n, t, data in reversed(entries):
+                if since is not None and t <= since:
+                    break
+                found.append((t, data) if timeStamped else data)
+        return found[::-1]
+
+    def clearBuffer(self):
+        """Forget all the input kept by the background reader"""
+        with self._bufferLock:
+            self._lines.clear()
+            self._chunks.clear()
+            self._partialLine = b''
+
     def __del__(self):
+        if getattr(self, '_reader', None) is not None:
+            self.stopReader()
         if self.com is not None:
             self.com.close()
 
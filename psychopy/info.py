@@ -487,8 +487,7 @@ class RunTimeInfo(dict):
             winAttrList += winAttrListVerbose
 
         monAttrList = ['name', 'getDistance', 'getWidth', 'currentCalibName']
-        monAttrListVerbose = ['getGammaGrid', 'getLinearizeMethod',
-                              '_gammaInterpolator', '_gammaInterpolator2']
+        monAttrListVerbose = ['getGammaGrid', 'getLinearizeMethod']
         if verbose:
             monAttrList += monAttrListVerbose
         if 'monitor' in winAttrList:
@@ -9,12 +9,16 @@ from __future__ import division, absolute_import, print_function
 import os
 import sys
 import time
+import socket
 import subprocess
 import json
 import signal
+import atexit
+import threading
 from weakref import proxy
 
 import psutil
+import msgpack
 
 try:
     import psychopy.logging as psycho_logging
@@ -36,20 +40,190 @@ getTime = Computer.getTime
 
 _currentSessionInfo = None
 
+class PendingReply(object):
+    """
+    The reply to a request that has been queued, with other requests, to be
+    sent to the iohub server in a single packet (see DeviceRPC.defer).
+
+    Several requests can be waiting for their replies at once; the first
+    call to result() sends the queue and all the replies are received
+    together.
+    """
+    def __init__(self, convert=None):
+        self._flush = None  # set when the request is queued
+        self._convert = convert
+        self._done = False
+        self._value = None
+        self._error = None
+
+    def done(self):
+        """Returns True if the reply has been received."""
+        return self._done
+
+    def result(self):
+        """Returns the reply, sending the queued requests first if needed.
+
+        Raises:
+            ioHubError: if the iohub server replied with an error.
+        """
+        if not self._done and self._flush:
+            self._flush()
+        if self._error is not None:
+            raise ioHubError(self._error)
+        return self._value
+
+    def _setReply(self, reply):
+        self._done = True
+        if (isinstance(reply, basestring) and reply.find('ERROR') >= 0) or \
+                ioHubConnection._isErrorReply(reply):
+            self._error = reply
+        elif self._convert:
+            self._value = self._convert(reply)
+        else:
+            self._value = reply
+
+    def _setError(self, error):
+        self._done = True
+        self._error = error
+
+
+class RequestBatch(object):
+    """
+    A queue of requests to be sent to the iohub server together, as one
+    MULTI request packet, rather than as one request / reply round trip
+    each. ioHubConnection sends the queue:
+
+        * when it holds max_requests requests or max_bytes of packed data.
+        * when the oldest request has been queued for max_delay sec.msec,
+          from a timer thread started when the first request is queued.
+        * before any request that waits for a reply, so requests are
+          always handled by the iohub server in the order they were made.
+        * when ioHubConnection.flush() is called, iohub is shut down, or the
+          experiment script exits.
+
+    Args:
+        max_requests (int): Maximum number of queued requests.
+
+        max_bytes (int): Maximum size of a MULTI request packet. Must be
+                         less than the 8192 bytes read per packet by the
+                         iohub server.
+
+        max_delay (float): Maximum sec.msec a request stays queued.
+
+        onDelay (callable): Called, from a timer thread, max_delay sec.msec
+                            after a request is added to the empty queue,
+                            unless the queue has been taken before then.
+                            None for no timer.
+    """
+    def __init__(self, max_requests=32, max_bytes=8000, max_delay=0.05,
+                 onDelay=None):
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.onDelay = onDelay
+        self._packer = msgpack.Packer()
+        self._queue = []
+        self._nbytes = 0
+        self._first_time = None
+        self._timer = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, request, reply=None):
+        """Queue a request. reply is the PendingReply to give the request
+        result to, or None if the request does not need a reply.
+
+        Returns:
+            bool: True if the queue is due to be sent.
+        """
+        packed = self._packer.pack(request)
+        if not self._queue:
+            self._first_time = getTime()
+            self._startTimer()
+        self._queue.append((packed, reply))
+        self._nbytes += len(packed)
+        return self.isDue()
+
+    def isDue(self):
+        """Returns True if the queue is due to be sent."""
+        if not self._queue:
+            return False
+        return (len(self._queue) >= self.max_requests or
+                self._nbytes >= self.max_bytes or
+                getTime() - self._first_time >= self.max_delay)
+
+    def take(self):
+        """Empties the queue.
+
+        Returns:
+            list: (packet, replies) tuples; the packed MULTI requests to send,
+            each holding at most max_bytes of requests when possible, and
+            the PendingReply (or None) of each request in the packet.
+        """
+        self.cancelTimer()
+        queue = self._queue
+        self._queue = []
+        self._nbytes = 0
+        self._first_time = None
+
+        packets = []
+        start = size = 0
+        for i, (packed, _) in enumerate(queue):
+            if i > start and size + len(packed) > self.max_bytes:
+                packets.append(self._packMulti(queue[start:i]))
+                start = i
+                size = 0
+            size += len(packed)
+        if queue:
+            packets.append(self._packMulti(queue[start:]))
+        return packets
+
+    def cancelTimer(self):
+        """Stops the max_delay timer, if it is running."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _startTimer(self):
+        if self.onDelay is None:
+            return
+        self._timer = threading.Timer(self.max_delay, self.onDelay)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _packMulti(self, requests):
+        # The requests are already packed, so the MULTI request is built
+        # from msgpack array headers rather than packing them again.
+        pack = self._packer
+        replies = [reply for _, reply in requests]
+        want_reply = any(reply is not None for reply in replies)
+        chunks = [pack.pack_array_header(3), pack.pack('MULTI'),
+                  pack.pack(want_reply), pack.pack_array_header(len(requests))]
+        chunks.extend(packed for packed, _ in requests)
+        return b''.join(chunks), replies
+
+
 class DeviceRPC(object):
     '''
     ioHubDeviceView creates an RPC interface with the iohub server. Each
     iohub device method exposed by an ioHubDeviceView is represented
     by an associated DeviceRPC instance.
+
+    Calling the DeviceRPC waits for the method return value. post() and
+    defer() queue the call to be sent to the iohub server with other
+    requests instead (see RequestBatch), if queueForHub is given.
     '''
     _log_time_index = DeviceEvent.EVENT_HUB_TIME_INDEX
     _log_text_index = LogEvent.CLASS_ATTRIBUTE_NAMES.index('text')
     _log_level_index = LogEvent.CLASS_ATTRIBUTE_NAMES.index('log_level')
 
-    def __init__(self, sendToHub, device_class, method_name):
+    def __init__(self, sendToHub, device_class, method_name,
+                 queueForHub=None):
         self.device_class = device_class
         self.method_name = method_name
         self.sendToHub = sendToHub
+        self.queueForHub = queueForHub
 
     @staticmethod
     def _returnarg(a): # pragma: no cover
@@ -58,8 +232,33 @@ class DeviceRPC(object):
     def __call__(self, *args, **kwargs):
         # Send the device method call request to the ioHub Server and wait
         # for the method return value sent back from the ioHub Server.
-        r = self.sendToHub(('EXP_DEVICE', 'DEV_RPC', self.device_class,
-                            self.method_name, args, kwargs))
+        r = self.sendToHub(self._request(args, kwargs))
+        return self._convertReply(r, kwargs)
+
+    def post(self, *args, **kwargs):
+        """Queue the device method call, without waiting for, or returning,
+        the method return value."""
+        if self.queueForHub is None:
+            self.sendToHub(self._request(args, kwargs))
+        else:
+            self.queueForHub(self._request(args, kwargs))
+
+    def defer(self, *args, **kwargs):
+        """Queue the device method call, returning a PendingReply for the
+        method return value. The calls deferred before PendingReply.result()
+        is called are all answered by the iohub server in one round trip."""
+        reply = PendingReply(lambda r: self._convertReply(r, kwargs))
+        if self.queueForHub is None:
+            reply._setReply(self.sendToHub(self._request(args, kwargs)))
+        else:
+            self.queueForHub(self._request(args, kwargs), reply)
+        return reply
+
+    def _request(self, args, kwargs):
+        return ('EXP_DEVICE', 'DEV_RPC', self.device_class,
+                self.method_name, args, kwargs)
+
+    def _convertReply(self, r, kwargs):
         r = r[1:]
         if len(r) == 1:
             r = r[0]
@@ -135,7 +334,7 @@ class ioHubDeviceView(object):
             #    f, ka = self._preRemoteMethodCallFunctions[name]
             #    f(ka)
             r = DeviceRPC(self.hubClient._sendToHubServer, self.device_class,
-                          name)
+                          name, self.hubClient._queueForHubServer)
             #if name in self._postRemoteMethodCallFunctions:
             #    f, ka = self._postRemoteMethodCallFunctions[name]
             #    f(ka)
@@ -285,6 +484,19 @@ class ioHubConnection(object):
         self._shutdown_attempted = False
         self._cv_order = None
 
+        # Requests queued to be sent to the iohub server in one packet; the
+        # lock is held while using the udp socket, which the RequestBatch
+        # timer thread shares with the experiment script. The timer only
+        # holds a proxy, so that __del__ still shuts the iohub server down.
+        self._requestLock = threading.RLock()
+        hubClient = proxy(self)
+        self.requestBatch = RequestBatch(
+            onDelay=lambda: hubClient._flushQueued())
+
+        # udp socket the iohub server sends new event notifications to,
+        # when enableEventPush() has been called.
+        self._event_sock = None
+
         self.iohub_status = self._startServer(ioHubConfig, ioHubConfigAbsPath)
         if self.iohub_status != 'OK':
             raise RuntimeError('Error starting ioHub server')
@@ -430,7 +642,8 @@ class ioHubConnection(object):
             if d:
                 d.clearEvents()
 
-    def sendMessageEvent(self, text, category='', offset=0.0, sec_time=None):
+    def sendMessageEvent(self, text, category='', offset=0.0, sec_time=None,
+                         wait=True):
         """
         Create and send an Experiment MessageEvent to the ioHub Server
         for storage in the ioDataStore hdf5 file.
@@ -453,6 +666,12 @@ class ioHubConnection(object):
                               is time stamped when this method is called
                               using the global timer (core.getTime()).
 
+            wait (bool): If True (the default), the method waits for the
+                         iohub server to receive the message. If False, the
+                         message is queued, to be sent to the iohub server
+                         with other requests (see RequestBatch). The message
+                         time stamp is not affected.
+
         Returns:
             bool: True
 
@@ -461,7 +680,11 @@ class ioHubConnection(object):
                                              category=category,
                                              msg_offset=offset,
                                              sec_time=sec_time)
-        self._sendToHubServer(('EXP_DEVICE', 'EVENT_TX', [msg_evt, ]))
+        request = ('EXP_DEVICE', 'EVENT_TX', [msg_evt, ])
+        if wait:
+            self._sendToHubServer(request)
+        else:
+            self._queueForHubServer(request)
         return True
 
     def getHubServerConfig(self):
@@ -528,6 +751,11 @@ class ioHubConnection(object):
               not becaome too large, which could result in a longer than
               normal getEvents() call time.
 
+        If enableEventPush() has been called, events are instead received as
+        soon as the iohub server notifies that new events are available,
+        blocking on the notification socket rather than sleeping, and
+        check_hub_interval is not used.
+
         Args:
             delay (float): The sec.msec delay until method returns.
 
@@ -543,7 +771,19 @@ class ioHubConnection(object):
         if check_hub_interval < 0:
             check_hub_interval = 0
 
-        if check_hub_interval > 0:
+        if self._event_sock is not None:
+            remainingSec = targetEndTime - Computer.getTime()
+            while remainingSec > 0.002:
+                # block until notified, waking at least every 100 msec to
+                # call win32MessagePump
+                if self._waitForEventNotification(
+                        min(remainingSec - 0.002, 0.1)):
+                    events = self.getEvents(as_type='list')
+                    if events:
+                        self.allEvents.extend(events)
+                win32MessagePump()
+                remainingSec = targetEndTime - Computer.getTime()
+        elif check_hub_interval > 0:
             remainingSec = targetEndTime - Computer.getTime()
             while remainingSec > check_hub_interval+0.025:
                 time.sleep(check_hub_interval)
@@ -562,6 +802,87 @@ class ioHubConnection(object):
 
         return Computer.getTime() - stime
 
+    def waitForEvents(self, maxWait=None, as_type='namedtuple',
+                      check_hub_interval=0.002):
+        """Wait until events are available from the ioHub Process, and return
+        them, as getEvents() does. If enableEventPush() has been called, the
+        iohub server is only asked for events after it has notified that
+        new events (of the subscribed types) are available, so the method
+        returns within microseconds of the notification.
+
+        Args:
+            maxWait (float): Maximum sec.msec to wait for events, or None
+                             to wait until there are events.
+
+            as_type (str): As for getEvents().
+
+            check_hub_interval (float): The sec.msec interval between calls to
+                                        getEvents() if event push is not
+                                        enabled.
+        Returns:
+            list: The events, or an empty list if maxWait elapsed first.
+        """
+        endTime = None
+        if maxWait is not None:
+            endTime = Computer.getTime() + maxWait
+
+        poll = True
+        while True:
+            if poll:
+                events = self.getEvents(as_type=as_type)
+                if events:
+                    return events
+            timeout = 0.1
+            if endTime is not None:
+                timeout = endTime - Computer.getTime()
+                if timeout <= 0.0:
+                    return []
+                timeout = min(timeout, 0.1)
+
+            if self._event_sock is None:
+                time.sleep(min(timeout, check_hub_interval))
+            else:
+                poll = self._waitForEventNotification(timeout)
+            win32MessagePump()
+
+    def enableEventPush(self, event_types=None):
+        """Ask the ioHub Process to notify this process as soon as new events
+        are available, so that wait() and waitForEvents() block until
+        notified rather than polling getEvents(). While any process has
+        event push enabled, the ioHub Process handles device events every
+        event_push_interval sec.msec (from the iohub config, 0.001 by
+        default).
+
+        Args:
+            event_types (list): The EventConstants ids of the event types to
+                                be notified of, or None for all event types.
+        Returns:
+            None
+        """
+        if self._event_sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((self.udp_client._remote_host, 0))
+            self._event_sock = sock
+        if event_types is not None:
+            event_types = list(event_types)
+        self._sendToHubServer(('SUBSCRIBE_EVENTS',
+                               self._event_sock.getsockname()[1],
+                               event_types))
+
+    def disableEventPush(self):
+        """Stop the new event notifications started by enableEventPush().
+
+        Args:
+            None
+        Returns:
+            None
+        """
+        if self._event_sock is not None:
+            self._sendToHubServer(('UNSUBSCRIBE_EVENTS',
+                                   self._event_sock.getsockname()[1]))
+            self._event_sock.close()
+            self._event_sock = None
+
     def createTrialHandlerRecordTable(self, trials, cv_order=None):
         """
         Create a condition variable table in the ioHub data file based on
@@ -631,11 +952,14 @@ class ioHubConnection(object):
         r = self._sendToHubServer(cvt_rpc)
         return r[2]
 
-    def addTrialHandlerRecord(self, cv_row):
+    def addTrialHandlerRecord(self, cv_row, wait=True):
         """Adds the values from a TriaHandler row / record to the iohub data
         file for future data analysis use.
 
         :param cv_row:
+        :param wait: if False, the record is queued, to be sent to the
+                     iohub server with other requests (see RequestBatch),
+                     and None is returned.
         :return: None
 
         """
@@ -654,9 +978,46 @@ class ioHubConnection(object):
 
         cvt_rpc = ('RPC', 'extendConditionVariableTable',
                    (self.experimentID, self.experimentSessionID, data))
+        if not wait:
+            self._queueForHubServer(cvt_rpc)
+            return None
         r = self._sendToHubServer(cvt_rpc)
         return r[2]
 
+    def flush(self):
+        """Sends the requests queued by sendMessageEvent(),
+        addTrialHandlerRecord(), or the post() and defer() methods of a device
+        method, to the iohub server now. Replies to deferred calls are
+        received before the method returns.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self._requestLock:
+            for packet, replies in self.requestBatch.take():
+                try:
+                    self.udp_client.sendPacked(packet)
+                except Exception as e: # pylint: disable=broad-except
+                    import traceback
+                    traceback.print_exc()
+                    self.shutdown()
+                    raise e
+
+                if not any(reply is not None for reply in replies):
+                    continue
+                result = self._receiveFromHubServer()
+                if not result or result[0] != 'MULTI_RESULT':
+                    for reply in replies:
+                        if reply is not None:
+                            reply._setError(result)
+                    continue
+                for reply, r in zip(replies, result[1]):
+                    if reply is not None:
+                        reply._setReply(self._decodeReply(r))
+
     def registerWindowHandles(self, *winHandles):
         """
         Sends 1 - n Window handles to iohub so it can determine if kb or
@@ -1091,25 +1452,61 @@ class ioHubConnection(object):
             printExceptionDetailsToStdErr()
         return None
 
+    def _queueForHubServer(self, tx_data, reply=None):
+        """Queues a request to be sent to the iohub server with other requests
+        (see RequestBatch), sending the queue if it is due.
+
+        Args:
+            tx_data (tuple): data to send to iohub server
+            reply (PendingReply): to give the request result to, or None if
+                                  the request does not need a reply.
+        """
+        if reply is not None:
+            reply._flush = self.flush
+        with self._requestLock:
+            if self.requestBatch.add(tx_data, reply):
+                self.flush()
+
+    def _flushQueued(self):
+        """Sends the queued requests, if there are any. Called from the
+        RequestBatch timer thread once a request has been queued for
+        max_delay sec.msec."""
+        try:
+            with self._requestLock:
+                if len(self.requestBatch) and not self._shutdown_attempted:
+                    self.flush()
+        except Exception: # pylint: disable=broad-except
+            printExceptionDetailsToStdErr()
+
     def _sendToHubServer(self, tx_data):
         """General purpose local <-> iohub server process UDP based
         request - reply code. The method blocks until the request is fulfilled
-        and and a response is received from the ioHub server.
+        and and a response is received from the ioHub server. Any queued
+        requests are sent first.
 
         Args:
             tx_data (tuple): data to send to iohub server
 
         Return (object): response from the ioHub Server process.
         """
-        try:
-            # send request to host, return is # bytes sent.
-            self.udp_client.sendTo(tx_data)
-        except Exception as e: # pylint: disable=broad-except
-            import traceback
-            traceback.print_exc()
-            self.shutdown()
-            raise e
+        with self._requestLock:
+            if len(self.requestBatch):
+                self.flush()
+
+            try:
+                # send request to host, return is # bytes sent.
+                self.udp_client.sendTo(tx_data)
+            except Exception as e: # pylint: disable=broad-except
+                import traceback
+                traceback.print_exc()
+                self.shutdown()
+                raise e
+
+            return self._receiveFromHubServer()
 
+    def _receiveFromHubServer(self):
+        """Waits for, and returns, the response to a request sent to the
+        iohub server, raising an ioHubError if it is an error response."""
         try:
             # wait for response from ioHub server, which will be the
             # result data and iohub server address (ip4,port).
@@ -1130,18 +1527,26 @@ class ioHubConnection(object):
             raise ioHubError(result)
 
         # Otherwise return the result
+        return self._decodeReply(result)
+
+    @staticmethod
+    def _decodeReply(result):
+        """Converts the bytes in a response (to two levels of nesting) to
+        str, under Python 3."""
         if constants.PY3 and not result is None:
             if isinstance(result, list):
                 for ind, items in enumerate(result):
-                    if isinstance(items, list) and not items is None:
+                    if isinstance(items, list):
                         for nextInd, nested in enumerate(items):
-                            if type(nested) not in [dict, list, int, float, bool] and not nested is None :
+                            if isinstance(nested, bytes):
                                 result[ind][nextInd] = str(nested, 'utf-8')
-                    elif type(items) not in [dict, list, int, float, bool] and not items is None:
+                    elif isinstance(items, bytes):
                         result[ind] = str(items, 'utf-8')
                     elif type(items) is dict:
-                        result[ind] = {str(keys, 'utf-8'): vals for keys, vals in items.items()}
-            else:
+                        result[ind] = {
+                            str(keys, 'utf-8') if isinstance(keys, bytes)
+                            else keys: vals for keys, vals in items.items()}
+            elif isinstance(result, bytes):
                 result = str(result, 'utf-8')
         return result
 
@@ -1231,6 +1636,28 @@ class ioHubConnection(object):
         return EventConstants.getClass(etype).createEventAsNamedTuple(evt_data)
 
     # client utility methods.
+    def _waitForEventNotification(self, timeout):
+        """Block until the iohub server notifies that new events are
+        available, or timeout sec.msec have passed.
+
+        Returns:
+            bool: True if a notification was received.
+        """
+        sock = self._event_sock
+        sock.settimeout(max(timeout, 0.0))
+        try:
+            sock.recv(64)
+        except socket.error:
+            return False
+        # several notifications may have been sent since the last wait
+        sock.setblocking(False)
+        try:
+            while True:
+                sock.recv(64)
+        except socket.error:
+            pass
+        return True
+
     def _getDeviceList(self):
         r = self._sendToHubServer(('EXP_DEVICE', 'GET_DEVICE_LIST'))
         return r[2]
@@ -1246,8 +1673,15 @@ class ioHubConnection(object):
             self._shutdown_attempted = True
             TimeoutError = psutil.TimeoutExpired
             try:
-                self.udp_client.sendTo(('STOP_IOHUB_SERVER',))
-                self.udp_client.close()
+                with self._requestLock:
+                    if len(self.requestBatch):
+                        self.flush()
+                    self.requestBatch.cancelTimer()
+                    self.udp_client.sendTo(('STOP_IOHUB_SERVER',))
+                    self.udp_client.close()
+                if self._event_sock is not None:
+                    self._event_sock.close()
+                    self._event_sock = None
                 if Computer.iohub_process:
                     r = Computer.iohub_process.wait(timeout=5)
                     print('ioHub Server Process Completed With Code: ', r)
@@ -1304,6 +1738,18 @@ class ioHubConnection(object):
         except Exception: # pylint: disable=broad-except
             pass
 
+
+def _flushActiveConnection():
+    """Sends the requests still queued by the active ioHubConnection when the
+    experiment script exits without shutting iohub down."""
+    try:
+        if ioHubConnection.ACTIVE_CONNECTION is not None:
+            ioHubConnection.ACTIVE_CONNECTION.flush()
+    except Exception: # pylint: disable=broad-except
+        pass
+
+atexit.register(_flushActiveConnection)
+
 ##############################################################################
 
 class ioEvent(object):
@@ -18,6 +18,12 @@ except ImportError:
 
 from weakref import proxy
 
+import numpy as np
+
+# number of points tested against a polygon at a time (limits the size of
+# the temporary arrays when filtering millions of samples)
+BATCH_SIZE = 2**16
+
 
 class Polygon(shapely.geometry.Polygon):
     _next_id = 1
@@ -43,12 +49,42 @@ class Polygon(shapely.geometry.Polygon):
         return shapely.geometry.Polygon.contains(
             self, spy.geometry.Point(v[0], v[1]))
 
+    def contains_points(self, x, y):
+        """Return a bool array that is True where the points (x[i], y[i])
+        are within the polygon, as for calling contains() on each point.
+
+        Points outside the bounding box of the polygon are rejected first.
+        The rest are classified in batches by a vectorised (even-odd)
+        point-in-polygon test; the few that are within rounding error of an
+        edge, where that test is ambiguous, are passed to shapely so that
+        the result matches contains() exactly.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        result = np.zeros(x.shape, dtype=bool)
+        minx, miny, maxx, maxy = self.bounds
+        # points on (or outside) the bounding box can't be in the interior
+        with np.errstate(invalid='ignore'):
+            candidates = np.flatnonzero((x > minx) & (x < maxx) &
+                                        (y > miny) & (y < maxy))
+        coords = np.asarray(self.exterior.coords, dtype=np.float64)
+        scale = max(np.abs(coords).max(), 1.0)
+        tolerance = (scale * 1e-9)**2
+        for i in range(0, len(candidates), BATCH_SIZE):
+            batch = candidates[i:i + BATCH_SIZE]
+            inside, nearEdge = _points_in_ring(x[batch], y[batch], coords,
+                                               tolerance)
+            for j in np.flatnonzero(nearEdge):
+                inside[j] = self.contains((x[batch[j]], y[batch[j]]))
+            result[batch] = inside
+        return result
+
     def filter(self, target_df, x_col='x_position', y_col='y_position'):
         if self._last_target_df is not target_df:
             self._last_target_df = proxy(target_df)
             self._ia_df = None
-            self._ia_df = target_df[
-                target_df[[x_col, y_col]].apply(self.contains, axis=1)]
+            self._ia_df = target_df[self.contains_points(
+                target_df[x_col].values, target_df[y_col].values)]
             self._ia_df['ia_name'] = self.name
             self._ia_df['ia_id'] = self.ia_id
             self._ia_df['ia_name'] = self.name
@@ -56,6 +92,33 @@ class Polygon(shapely.geometry.Polygon):
         return self._ia_df
 
 
+def _points_in_ring(x, y, coords, tolerance):
+    """Even-odd test of the points x, y against the closed ring `coords`
+    (an N x 2 array with coords[0] == coords[-1]).
+
+    Returns the bool arrays (inside, nearEdge), where nearEdge marks points
+    within sqrt(tolerance) of an edge (for which `inside` isn't reliable).
+    """
+    inside = np.zeros(x.shape, dtype=bool)
+    nearEdge = np.zeros(x.shape, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for (x1, y1), (x2, y2) in zip(coords[:-1], coords[1:]):
+            dx = x2 - x1
+            dy = y2 - y1
+            # does a ray from the point towards +x cross this edge?
+            spans = (y1 > y) != (y2 > y)
+            crossX = x1 + dx * (y - y1) / dy
+            inside ^= spans & (x < crossX)
+            # squared distance from the point to the edge
+            length2 = dx * dx + dy * dy
+            if length2 == 0:
+                continue
+            t = np.clip(((x - x1) * dx + (y - y1) * dy) / length2, 0.0, 1.0)
+            dist2 = (x - x1 - t * dx)**2 + (y - y1 - t * dy)**2
+            nearEdge |= dist2 <= tolerance
+    return inside, nearEdge
+
+
 class Circle(Polygon):
 
     def __init__(self, name, center_point, radius):
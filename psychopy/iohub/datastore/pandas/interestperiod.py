@@ -37,33 +37,66 @@ class InterestPeriodDefinition(object):
         return self._ipid
 
     def find(self, target, ip_cols=None):
-        df = target[:]
-        df['ip_id_num'] = np.nan
+        """Return the events of target that are within each interest period
+        (start_time <= time <= end_time), with the ip_id_num of the period
+        they are in. An event within several (overlapping) periods is
+        returned once for each of them.
+
+        Rather than slicing target once per period, the events of each
+        session are sorted by time once, and the events of all the periods
+        are found by a binary search of their start and end times.
+        """
+        ips = self.ip_df
+        times = target['time'].values
+        ip_starts = ips['start_time'].values.astype(np.float64)
+        ip_ends = ips['end_time'].values.astype(np.float64)
+        ip_id_nums = ips['ip_id_num'].values
+
+        target_groups = target.groupby(level=[0, 1]).indices
+        ip_groups = ips.groupby(level=[0, 1]).indices
+        rows = []
+        row_ip_id_nums = []
+        for group_id in sorted(target_groups):
+            if group_id not in ip_groups:
+                continue
+            group_rows = target_groups[group_id]
+            group_ips = ip_groups[group_id]
+            order = np.argsort(times[group_rows], kind='mergesort')
+            sorted_times = times[group_rows][order]
+
+            starts = ip_starts[group_ips]
+            ends = ip_ends[group_ips]
+            lo = np.searchsorted(sorted_times, starts, side='left')
+            hi = np.searchsorted(sorted_times, ends, side='right')
+            counts = np.maximum(hi - lo, 0)
+            counts[np.isnan(starts) | np.isnan(ends)] = 0
+
+            # expand each ip to the positions (in sorted_times) of its events
+            ip_index = np.repeat(np.arange(len(group_ips)), counts)
+            offsets = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            in_ip = order[offsets + np.arange(counts.sum())]
+            # events of each ip in the order they are in target
+            in_order = np.lexsort((in_ip, ip_index))
+            rows.append(group_rows[in_ip[in_order]])
+            row_ip_id_nums.append(ip_id_nums[group_ips][ip_index[in_order]])
+
+        if rows:
+            rows = np.concatenate(rows)
+            row_ip_id_nums = np.concatenate(row_ip_id_nums)
+        else:
+            rows = np.array([], dtype=np.intp)
+            row_ip_id_nums = np.array([], dtype=np.float64)
+
+        df = target.iloc[rows].copy()
+        df['ip_id_num'] = row_ip_id_nums.astype(np.float64)
         df['ip_id'] = self.ipid
         df['ip_name'] = self.name
-        df = df.groupby(level=[0, 1], group_keys=False).apply(self.__find)
 
         if ip_cols is not None:
             df = self._merge_ip_cols(df, ip_cols)
 
         return df
 
-    def __find(self, target_group):
-        group_id = target_group.index[0]
-        group_ips = self.ip_df.ix[group_id]
-        if len(group_ips) > 0:
-            overlapping = []
-            for index, ip in group_ips.iterrows():
-                in_ip = ((target_group['time'] >= ip['start_time']) &
-                         (target_group['time'] <= ip['end_time']))
-                target_in_ip = target_group[in_ip]
-                target_in_ip['ip_id_num'] = ip['ip_id_num']
-                overlapping += [target_in_ip]
-            target_filtered = pd.concat(overlapping)
-        else:
-            target_filtered = target_group[[False] * len(target_group)]
-        return target_filtered
-
     def filter(self, target, ip_cols=None):
         df = target[:]
         df['ip_id'] = self.ipid
@@ -15,6 +15,8 @@ import os
 from collections import namedtuple
 import json
 
+import numpy as np
+
 from ..errors import print2err
 
 from pkg_resources import parse_version
@@ -25,12 +27,14 @@ if parse_version(tables.__version__) < parse_version('3'):
     list_nodes = "listNodes"
     get_node = "getNode"
     read_where = "readWhere"
+    create_index = "createIndex"
 else:
     from tables import open_file
     walk_groups = "walk_groups"
     list_nodes = "list_nodes"
     get_node = "get_node"
     read_where = "read_where"
+    create_index = "create_index"
 
 
 _hubFiles = []
@@ -124,7 +128,8 @@ class ExperimentDataAccessUtility(object):
             hdfFileName,
             experimentCode=None,
             sessionCodes=[],
-            mode='r'):
+            mode='r',
+            indexOnClose=False):
         """An instance of the ExperimentDataAccessUtility class is created by
         providing the location and name of the file to read, as well as any
         session code filtering you want applied to the retieved datasets.
@@ -138,6 +143,10 @@ class ExperimentDataAccessUtility(object):
 
             sessionCodes (str or list): The experiment session code to filter data by. If a list of codes is given, then all codes in the list will be used.
 
+            mode (str): The mode to open the file with ('r', 'a' or 'r+').
+
+            indexOnClose (bool): If True (and mode is not 'r'), indexes of the time and session_id columns of the event tables are created and saved in the file when it is closed (see createIndexes), so later analyses of the file run faster.
+
         Returns:
             object: the created instance of the ExperimentDataAccessUtility, ready to get your data!
 
@@ -146,6 +155,7 @@ class ExperimentDataAccessUtility(object):
         self.hdfFileName = hdfFileName
         self.mode = mode
         self.hdfFile = None
+        self._indexOnClose = indexOnClose and mode != 'r'
 
         self._experimentCode = experimentCode
         self._sessionCodes = sessionCodes
@@ -287,6 +297,8 @@ class ExperimentDataAccessUtility(object):
                 return None
 
             tablePathString = result[0][3]
+            if isinstance(tablePathString, bytes):
+                tablePathString = tablePathString.decode('utf-8')
             return getattr(self.hdfFile, get_node)(tablePathString)
         return None
 
@@ -428,7 +440,8 @@ class ExperimentDataAccessUtility(object):
             filter_id=None,
             conditionVariablesFilter=None,
             startConditions=None,
-            endConditions=None):
+            endConditions=None,
+            intervalJoin=True):
         """
         **Docstr TBC.**
 
@@ -438,6 +451,14 @@ class ExperimentDataAccessUtility(object):
             conditionVariablesFilter
             startConditions
             endConditions
+            intervalJoin (bool): If True (the default), the events of each
+                session are read from the event table once, and when the
+                start and end conditions are bounds on a single column
+                (e.g. dict(time=('>=', '@TRIAL_START@')) and
+                dict(time=('<=', '@TRIAL_END@'))) the events of every
+                condition variable row are found by one sorted interval
+                join on that column. Other conditions, or intervalJoin=False,
+                run one query per condition variable row.
 
         Returns:
             Values for the specified event type and event attribute columns which match the provided experiment condition variable filter, starting condition filer, and ending condition filter criteria.
@@ -451,11 +472,16 @@ class ExperimentDataAccessUtility(object):
                 row.fetch_all_fields() for row in klassTables.where(
                     '(class_id == %d) & (class_type_id == 1)' %
                     (event_type_id))]
-            if len(result) is not 1:
+            if len(result) != 1:
                 raise ExperimentDataAccessException("event_type_id passed to getEventAttribute should only return one row from CLASS_MAPPINGS.")
             tablePathString = result[0][3]
+            if isinstance(tablePathString, bytes):
+                tablePathString = tablePathString.decode('utf-8')
             deviceEventTable = getattr(self.hdfFile, get_node)(tablePathString)
 
+            if not isinstance(event_attribute_names, (list, tuple)):
+                event_attribute_names = [event_attribute_names, ]
+
             for ename in event_attribute_names:
                 if ename not in deviceEventTable.colnames:
                     raise ExperimentDataAccessException(
@@ -470,9 +496,6 @@ class ExperimentDataAccessUtility(object):
             EventAttributeResults = namedtuple('EventAttributeResults', csier)
 
             if deviceEventTable is not None:
-                if not isinstance(event_attribute_names, (list, tuple)):
-                    event_attribute_names = [event_attribute_names, ]
-
                 filteredConditionVariableList = None
                 if conditionVariablesFilter is None:
                     filteredConditionVariableList= self.getConditionVariables()
@@ -482,82 +505,150 @@ class ExperimentDataAccessUtility(object):
 
                 cvNames = self.getConditionVariableNames()
 
-                # no further where clause building needed; get reseults and
-                # return
-                if startConditions is None and endConditions is None:
-                    for cv in filteredConditionVariableList:
-
-                        wclause = '( experiment_id == {0} ) & ( session_id == {1} )'.format(
-                            self._experimentID, cv.session_id)
-
-                        wclause += ' & ( type == {0} ) '.format(event_type_id)
-
-                        if filter_id is not None:
-                            wclause += '& ( filter_id == {0} ) '.format(
-                                filter_id)
-
-                        resultSetList.append([])
-
-                        for ename in event_attribute_names:
-                            resultSetList[-1].append(getattr(deviceEventTable, read_where)(wclause, field=ename))
-                        resultSetList[-1].append(wclause)
-                        resultSetList[-1].append(cv)
-
-                        eventAttributeResults = EventAttributeResults(
-                            *resultSetList[-1])
-                        resultSetList[-1]=eventAttributeResults
+                joinColumn = None
+                if intervalJoin:
+                    joinColumn = _getJoinColumn(
+                        startConditions, endConditions, deviceEventTable)
 
+                if not intervalJoin or joinColumn is False:
+                    # one query per condition variable row
+                    for cv in filteredConditionVariableList:
+                        wclause = self._getWhereClause(
+                            cv, cvNames, event_type_id, filter_id,
+                            startConditions, endConditions)
+                        events = getattr(deviceEventTable, read_where)(wclause)
+                        resultSet = [events[ename]
+                                     for ename in event_attribute_names]
+                        resultSet.extend([wclause, cv])
+                        resultSetList.append(EventAttributeResults(*resultSet))
                     return resultSetList
 
-                #start or end conditions exist....
-                for cv in filteredConditionVariableList:
-                    resultSetList.append([])
-
-                    wclause = '( experiment_id == {0} ) & ( session_id == {1} )'.format(
-                        self._experimentID, cv.session_id)
-
-                    wclause += ' & ( type == {0} ) '.format(event_type_id)
-
-                    if filter_id is not None:
-                        wclause += '& ( filter_id == {0} ) '.format(filter_id)
-
-                    # start Conditions need to be added to where clause
-                    if startConditions is not None:
-                        wclause += '& ('
-                        for conditionAttributeName, conditionAttributeComparitor in startConditions.items():
-                            avComparison,value=conditionAttributeComparitor
-                            value = self.getValuesForVariables(
-                                cv, value, cvNames)
-                            wclause += ' ( {0} {1} {2} ) & '.format(
-                                conditionAttributeName, avComparison, value)
-                        wclause=wclause[:-3]
-                        wclause += ' ) '
-
-                    # end Conditions need to be added to where clause
-                    if endConditions is not None:
-                        wclause += ' & ('
-                        for conditionAttributeName, conditionAttributeComparitor in endConditions.items():
-                            avComparison,value=conditionAttributeComparitor
-                            value = self.getValuesForVariables(
-                                cv, value, cvNames)
-                            wclause += ' ( {0} {1} {2} ) & '.format(
-                                conditionAttributeName, avComparison, value)
-                        wclause=wclause[:-3]
-                        wclause += ' ) '
-
+                # read the events of each session once, then join the
+                # (sorted) interval of each condition variable row to them
+                sessionRows = dict()
+                for i, cv in enumerate(filteredConditionVariableList):
+                    sessionRows.setdefault(cv.session_id, []).append(i)
+
+                resultSetList = [None] * len(filteredConditionVariableList)
+                for session_id, rowIndices in sessionRows.items():
+                    cvs = [filteredConditionVariableList[i]
+                           for i in rowIndices]
+                    wclause = self._getWhereClause(
+                        cvs[0], cvNames, event_type_id, filter_id)
+                    events = getattr(deviceEventTable, read_where)(wclause)
+                    columns = dict()
                     for ename in event_attribute_names:
-                        resultSetList[-1].append(getattr(deviceEventTable, read_where)(wclause, field=ename))
-                    resultSetList[-1].append(wclause)
-                    resultSetList[-1].append(cv)
+                        columns[ename] = events[ename]
 
-                    eventAttributeResults = EventAttributeResults(
-                        *resultSetList[-1])
-                    resultSetList[-1]=eventAttributeResults
+                    if joinColumn is None:
+                        # no start or end conditions; all the events of
+                        # the session for every row
+                        slices = [slice(None)] * len(cvs)
+                    else:
+                        slices = _intervalJoin(
+                            events[joinColumn],
+                            [self._getJoinBounds(cv, cvNames, startConditions,
+                                                 endConditions)
+                             for cv in cvs])
+
+                    for i, cv, rowSlice in zip(rowIndices, cvs, slices):
+                        resultSet = [columns[ename][rowSlice]
+                                     for ename in event_attribute_names]
+                        resultSet.append(self._getWhereClause(
+                            cv, cvNames, event_type_id, filter_id,
+                            startConditions, endConditions))
+                        resultSet.append(cv)
+                        resultSetList[i] = EventAttributeResults(*resultSet)
 
                 return resultSetList
 
             return None
 
+    def _getWhereClause(self, cv, cvNames, event_type_id, filter_id=None,
+                        startConditions=None, endConditions=None):
+        """Return the PyTables where clause selecting the events of the
+        given type for a condition variable row.
+        """
+        wclause = '( experiment_id == {0} ) & ( session_id == {1} )'.format(
+            self._experimentID, cv.session_id)
+
+        wclause += ' & ( type == {0} ) '.format(event_type_id)
+
+        if filter_id is not None:
+            wclause += '& ( filter_id == {0} ) '.format(filter_id)
+
+        # start Conditions need to be added to where clause
+        if startConditions is not None:
+            wclause += '& ('
+            for conditionAttributeName, conditionAttributeComparitor in startConditions.items():
+                avComparison,value=conditionAttributeComparitor
+                value = self.getValuesForVariables(
+                    cv, value, cvNames)
+                wclause += ' ( {0} {1} {2} ) & '.format(
+                    conditionAttributeName, avComparison, value)
+            wclause=wclause[:-3]
+            wclause += ' ) '
+
+        # end Conditions need to be added to where clause
+        if endConditions is not None:
+            wclause += ' & ('
+            for conditionAttributeName, conditionAttributeComparitor in endConditions.items():
+                avComparison,value=conditionAttributeComparitor
+                value = self.getValuesForVariables(
+                    cv, value, cvNames)
+                wclause += ' ( {0} {1} {2} ) & '.format(
+                    conditionAttributeName, avComparison, value)
+            wclause=wclause[:-3]
+            wclause += ' ) '
+        return wclause
+
+    def _getJoinBounds(self, cv, cvNames, startConditions, endConditions):
+        """Return the (lower, lowerInclusive, upper, upperInclusive) bounds
+        of the join column for a condition variable row. A missing bound is
+        None.
+        """
+        bounds = [None, False, None, False]
+        for conditions in (startConditions, endConditions):
+            if conditions is None:
+                continue
+            for avComparison, value in conditions.values():
+                value = float(self.getValuesForVariables(cv, value, cvNames))
+                avComparison = avComparison.strip()
+                if avComparison in ('>', '>='):
+                    bounds[0:2] = value, avComparison == '>='
+                else:
+                    bounds[2:4] = value, avComparison == '<='
+        return bounds
+
+    def createIndexes(self, columns=('time', 'session_id')):
+        """Create (and save in the file) PyTables indexes of the given
+        columns of every event table, so that queries selecting rows by
+        those columns (e.g. by getEventAttributeValues) don't need to scan
+        the full table. Columns that are already indexed are skipped.
+
+        The file must have been opened with a mode other than 'r'.
+
+        Args:
+            columns (list): The names of the columns to index.
+        """
+        if self.mode == 'r':
+            raise ExperimentDataAccessException(
+                'createIndexes: the DataStore file is read-only')
+        klassTables = self.hdfFile.root.class_table_mapping
+        tablePaths = set(row['table_path'] for row in
+                         klassTables.where('class_type_id == 1'))
+        for tablePath in sorted(tablePaths):
+            if isinstance(tablePath, bytes):
+                tablePath = tablePath.decode('utf-8')
+            eventTable = getattr(self.hdfFile, get_node)(tablePath)
+            for colname in columns:
+                if colname not in eventTable.colnames:
+                    continue
+                column = eventTable.cols._f_col(colname)
+                if not column.is_indexed:
+                    getattr(column, create_index)()
+        self.hdfFile.flush()
+
     def getEventIterator(self, event_type):
         """
         **Docstr TBC.**
@@ -574,6 +665,9 @@ class ExperimentDataAccessUtility(object):
         """Close the ExperimentDataAccessUtility and associated DataStore
         File."""
         global _hubFiles
+        if self._indexOnClose:
+            self._indexOnClose = False
+            self.createIndexes()
         if self.hdfFile in _hubFiles:
             _hubFiles.remove(self.hdfFile)
         self.hdfFile.close()
@@ -591,5 +685,75 @@ class ExperimentDataAccessUtility(object):
             pass
 
 
+def _getJoinColumn(startConditions, endConditions, eventTable):
+    """Return the column that the start and end conditions bound, None if
+    there are no conditions, or False if the conditions can't be evaluated
+    as a single interval join (e.g. they refer to several columns or use
+    == or != comparisons).
+    """
+    joinColumn = None
+    nLower = nUpper = 0
+    for conditions in (startConditions, endConditions):
+        if conditions is None:
+            continue
+        for colname, (avComparison, value) in conditions.items():
+            if joinColumn not in (None, colname):
+                return False
+            joinColumn = colname
+            avComparison = avComparison.strip()
+            if avComparison in ('>', '>='):
+                nLower += 1
+            elif avComparison in ('<', '<='):
+                nUpper += 1
+            else:
+                return False
+    if joinColumn is None:
+        return None
+    if (joinColumn not in eventTable.colnames or nLower > 1 or nUpper > 1 or
+            eventTable.coldtypes[joinColumn].kind not in 'iuf'):
+        return False
+    return joinColumn
+
+
+def _intervalJoin(values, bounds):
+    """Find the elements of `values` within each interval of `bounds`.
+
+    All the intervals are found with a single sort of `values` and a
+    binary search for each bound, rather than a scan of `values` per
+    interval.
+
+    Args:
+        values (ndarray): 1D array of the join column.
+        bounds (list): (lower, lowerInclusive, upper, upperInclusive) for
+            each interval. A bound of None is unbounded.
+
+    Returns:
+        list: for each interval, a slice (if `values` is sorted) or an
+        array of the (ascending) indices of the values within it.
+    """
+    order = None
+    if len(values) > 1 and np.any(values[1:] < values[:-1]):
+        order = np.argsort(values, kind='mergesort')
+        values = values[order]
+
+    lowers = np.array([b[0] if b[0] is not None else -np.inf
+                       for b in bounds], dtype=np.float64)
+    uppers = np.array([b[2] if b[2] is not None else np.inf
+                       for b in bounds], dtype=np.float64)
+    lowerInclusive = np.array([b[1] for b in bounds], dtype=bool)
+    upperInclusive = np.array([b[3] for b in bounds], dtype=bool)
+    starts = np.where(lowerInclusive,
+                      np.searchsorted(values, lowers, side='left'),
+                      np.searchsorted(values, lowers, side='right'))
+    stops = np.where(upperInclusive,
+                     np.searchsorted(values, uppers, side='right'),
+                     np.searchsorted(values, uppers, side='left'))
+    stops = np.maximum(starts, stops)
+
+    if order is None:
+        return [slice(start, stop) for start, stop in zip(starts, stops)]
+    return [np.sort(order[start:stop]) for start, stop in zip(starts, stops)]
+
+
 class ExperimentDataAccessException(Exception):
     pass
@@ -7,6 +7,8 @@ from __future__ import division, absolute_import
 import struct
 from weakref import proxy
 
+import numpy
+
 from gevent import sleep, Greenlet
 import msgpack
 try:
@@ -72,9 +74,11 @@ class SocketConnection(object): # pylint: disable=too-many-instance-attributes
         self.sock.setblocking(blocking)
 
     def sendTo(self, data, address=None):
+        return self.sendPacked(self.pack(data), address)
+
+    def sendPacked(self, packed_data, address=None):
         if address is None:
             address = self._remote_host, self._remote_port
-        packed_data = self.pack(data)
         self.sock.sendto(packed_data, address)
         return len(packed_data)
 
@@ -232,21 +236,9 @@ class ioHubTimeGreenSyncManager(Greenlet):
             if self._sync_socket:
                 r = self._sync_socket.sync()
                 min_delay, min_local_time, min_remote_time = r
-                sync_state_target = self.sync_state_target
-                sync_state_target.RTTs.append(min_delay)
-                sync_state_target.L_times.append(min_local_time)
-                sync_state_target.R_times.append(min_remote_time)
-
-                if calc_drift_and_offset is True:
-                    l1 = sync_state_target.L_times[-2]
-                    l2 = sync_state_target.L_times[-1]
-                    r1 = sync_state_target.R_times[-2]
-                    r2 = sync_state_target.R_times[-1]
-                    self.sync_state_target.drifts.append((r2 - r1) / (l2 - l1))
-
-                    l = sync_state_target.L_times[-1]
-                    r = sync_state_target.R_times[-1]
-                    self.sync_state_target.offsets = (r - l)
+                self.sync_state_target.addSample(
+                    min_delay, min_local_time, min_remote_time,
+                    fit=calc_drift_and_offset)
         except Exception: # pylint: disable=broad-except
             return False
         return True
@@ -273,21 +265,9 @@ class ioHubTimeSyncManager(object):
         if self._sync_socket:
             r = self._sync_socket.sync()
             min_delay, min_local_time, min_remote_time = r
-            sync_state_target = self.sync_state_target
-            sync_state_target.RTTs.append(min_delay)
-            sync_state_target.L_times.append(min_local_time)
-            sync_state_target.R_times.append(min_remote_time)
-
-            if calc_drift_and_offset is True:
-                l1 = sync_state_target.L_times[-2]
-                l2 = sync_state_target.L_times[-1]
-                r1 = sync_state_target.R_times[-2]
-                r2 = sync_state_target.R_times[-1]
-                self.sync_state_target.drifts.append((r2 - r1) / (l2 - l1))
-
-                l = sync_state_target.L_times[-1]
-                r = sync_state_target.R_times[-1]
-                self.sync_state_target.offsets = (r - l)
+            self.sync_state_target.addSample(
+                min_delay, min_local_time, min_remote_time,
+                fit=calc_drift_and_offset)
 
     def close(self):
         if self._sync_socket:
@@ -301,29 +281,125 @@ class ioHubTimeSyncManager(object):
 class TimeSyncState(object):
     """Container class used by an ioHubSyncManager to hold the data necessary
     to calculate the current time base offset and drift between an ioHub Server
-    and a ioHubRemoteEventSubscriber client."""
-    RTTs = RingBuffer(10)
-    L_times = RingBuffer(10)
-    R_times = RingBuffer(10)
-    drifts = RingBuffer(20)
-    offsets = RingBuffer(20)
+    and a ioHubRemoteEventSubscriber client.
+
+    The remote time is modelled as remote = drift * local + offset, fitted by
+    a linear regression over the last `window` sync samples, with each
+    sample weighted by 1 / RTT**2 (the uncertainty of a sample is
+    proportional to its round trip time). Samples whose RTT is more than
+    `max_rtt_ratio` times the median RTT of the last `window` samples
+    (rejected ones included, so that a lasting rise of the RTT is
+    accepted once it is the new normal) are rejected as outliers.
+    """
+
+    def __init__(self, window=32, max_rtt_ratio=3.0):
+        self.window = window
+        self.max_rtt_ratio = max_rtt_ratio
+        self.RTTs = RingBuffer(window, dtype=numpy.float64)
+        self.L_times = RingBuffer(window, dtype=numpy.float64)
+        self.R_times = RingBuffer(window, dtype=numpy.float64)
+        self.recent_RTTs = RingBuffer(window, dtype=numpy.float64)
+        self.recent_count = 0  # samples, accepted or not, in recent_RTTs
+        self.sample_count = 0  # samples in the window
+        self.rejected_count = 0  # outlier samples rejected in total
+        self._drift = 1.0
+        self._offset = 0.0
+        self._uncertainty = None  # (var_drift, var_offset, mean_local)
+
+    def _getWindow(self):
+        n = self.sample_count
+        return (self.RTTs.getElements()[-n:], self.L_times.getElements()[-n:],
+                self.R_times.getElements()[-n:])
+
+    def addSample(self, rtt, local_time, remote_time, fit=True):
+        """Add a sync sample: the round trip time of a sync request, and the
+        local and remote times at its midpoint. Returns False if the sample
+        was rejected as an outlier.
+        """
+        self.recent_RTTs.append(rtt)
+        self.recent_count = min(self.recent_count + 1, self.window)
+        if self.sample_count >= 3:
+            rtts = self.recent_RTTs.getElements()[-self.recent_count:]
+            if rtt > numpy.median(rtts) * self.max_rtt_ratio:
+                self.rejected_count += 1
+                return False
+        self.RTTs.append(rtt)
+        self.L_times.append(local_time)
+        self.R_times.append(remote_time)
+        self.sample_count = min(self.sample_count + 1, self.window)
+        if fit:
+            self.fit()
+        return True
+
+    def fit(self):
+        """Update the drift and offset estimates from the samples in the
+        window."""
+        if self.sample_count == 0:
+            return
+        rtts, ltimes, rtimes = self._getWindow()
+        if self.sample_count == 1:
+            self._drift = 1.0
+            self._offset = rtimes[0] - ltimes[0]
+            self._uncertainty = None
+            return
+        # regression of the remote on (mean centred) local times
+        weights = 1.0 / numpy.maximum(rtts, 1e-9) ** 2
+        mean_local = numpy.average(ltimes, weights=weights)
+        mean_remote = numpy.average(rtimes, weights=weights)
+        dl = ltimes - mean_local
+        sxx = numpy.sum(weights * dl * dl)
+        if sxx <= 0:
+            self._drift = 1.0
+        else:
+            self._drift = numpy.sum(weights * dl * (rtimes - mean_remote)) / sxx
+        self._offset = mean_remote - self._drift * mean_local
+
+        # variance of the fit, from the residuals if there are enough
+        # samples, otherwise from the RTTs (a sample is within +-RTT/2)
+        residuals = rtimes - (self._drift * ltimes + self._offset)
+        sum_w = numpy.sum(weights)
+        if self.sample_count > 2:
+            sigma2 = (numpy.sum(weights * residuals ** 2) /
+                      (self.sample_count - 2))
+        else:
+            sigma2 = 0.0
+        sigma2 = max(sigma2, self.sample_count / sum_w / 4.0)
+        var_offset_c = sigma2 / sum_w  # of the remote time at mean_local
+        var_drift = sigma2 / sxx if sxx > 0 else 0.0
+        self._uncertainty = (var_drift, var_offset_c, mean_local)
 
     def getDrift(self):
         """Current drift between two time bases."""
-        return self.drifts.mean()
+        return self._drift
 
     def getOffset(self):
         """Current offset between two time bases."""
-        return self.offsets.mean()
+        return self._offset
 
     def getAccuracy(self):
         """Current accuracy of the time synchronization, as calculated as the.
 
         average of the last 10 round trip time sync request - response delays
-        divided by two.
+        divided by two, or None if there are no samples yet.
 
         """
-        return self.RTTs.mean() / 2.0
+        if self.sample_count == 0:
+            return None
+        return self._getWindow()[0][-10:].mean() / 2.0
+
+    def getUncertainty(self, local_time=None):
+        """Standard error (sec) of the remote time estimated for local_time
+        (default now) by local2RemoteTime(). This grows the further
+        local_time is from the sync samples in the window."""
+        if self._uncertainty is None:
+            if self.sample_count == 0:
+                return None
+            return self.getAccuracy()
+        if local_time is None:
+            local_time = Computer.getTime()
+        var_drift, var_offset_c, mean_local = self._uncertainty
+        return numpy.sqrt(var_offset_c +
+                          var_drift * (local_time - mean_local) ** 2)
 
     def local2RemoteTime(self, local_time=None):
         """Converts a local time (sec.msec format) to the corresponding remote
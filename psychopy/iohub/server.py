@@ -51,6 +51,8 @@ class udpServer(DatagramServer):
         self.unpacker = msgpack.Unpacker(use_list=True)
         self.unpack = self.unpacker.unpack
         self.feed = self.unpacker.feed
+        # replies of the requests in a MULTI request, while it is handled
+        self._multi_replies = None
         DatagramServer.__init__(self, address)
 
     def handle(self, request, replyTo):
@@ -59,8 +61,13 @@ class udpServer(DatagramServer):
         self.feed(request)
         request = self.unpack()
         # print2err(">> Rx Packet: {}, {}".format(request, replyTo))
+        return self.handleRequest(request, replyTo)
+
+    def handleRequest(self, request, replyTo):
         request_type = unicode(request.pop(0), 'utf-8') # convert bytes to string for compatibility
-        if request_type == 'SYNC_REQ':
+        if request_type == 'MULTI':
+            return self.handleMultiRequest(request, replyTo)
+        elif request_type == 'SYNC_REQ':
             self.sendResponse(['SYNC_REPLY', getTime()], replyTo)
             return True
         elif request_type == 'PING':
@@ -119,6 +126,17 @@ class udpServer(DatagramServer):
                 printExceptionDetailsToStdErr()
                 self.sendResponse('RPC_NOT_CALLABLE_ERROR', replyTo)
                 return False
+        elif request_type == 'SUBSCRIBE_EVENTS':
+            port = request.pop(0)
+            event_types = request.pop(0) if request else None
+            self.iohub.subscribeToEvents((replyTo[0], port), event_types)
+            self.sendResponse(('SUBSCRIBE_EVENTS_RESULT', True), replyTo)
+            return True
+        elif request_type == 'UNSUBSCRIBE_EVENTS':
+            port = request.pop(0)
+            self.iohub.unsubscribeFromEvents((replyTo[0], port))
+            self.sendResponse(('UNSUBSCRIBE_EVENTS_RESULT', True), replyTo)
+            return True
         elif request_type == 'GET_IOHUB_STATUS':
             self.sendResponse((request_type, self.iohub.getStatus()), replyTo)
             return True
@@ -130,6 +148,56 @@ class udpServer(DatagramServer):
             self.sendResponse('RPC_NOT_CALLABLE_ERROR', replyTo)
             return False
 
+    def handleMultiRequest(self, request, replyTo):
+        """Handle the batch of requests sent by the client in one packet, in
+        order. The reply of each request is collected rather than sent, and
+        the list of replies is returned in a single MULTI_RESULT response,
+        or not at all if the client is not waiting for it.
+        """
+        want_reply = request.pop(0)
+        sub_requests = request.pop(0)
+        if self._multi_replies is not None:
+            print2err('MULTI_REQUEST_ERROR: MULTI requests can not be nested')
+            self.sendResponse('MULTI_REQUEST_ERROR', replyTo)
+            return False
+
+        replies = self._multi_replies = []
+        try:
+            for sub_request in sub_requests:
+                reply_count = len(replies)
+                try:
+                    self.handleRequest(sub_request, replyTo)
+                except Exception:
+                    print2err('MULTI_REQUEST_ERROR')
+                    printExceptionDetailsToStdErr()
+                    del replies[reply_count:]
+                    replies.append('MULTI_REQUEST_ERROR')
+                if len(replies) == reply_count:
+                    replies.append(None)
+        finally:
+            self._multi_replies = None
+
+        if want_reply:
+            self.sendResponse(('MULTI_RESULT', replies), replyTo)
+        return True
+
+    def sendEventNotifications(self, subscribers):
+        """Send an EVENTS_READY packet, with the number of new events, to
+        each subscriber (see ioServer.subscribeToEvents) that has matching
+        events waiting to be read."""
+        for address, sub in list(subscribers.items()):
+            if sub[1] == 0:
+                continue
+            try:
+                self.socket.sendto(self.pack(('EVENTS_READY', sub[1])),
+                                   address)
+                sub[1] = 0
+            except Exception:
+                print2err('Error sending event notification to ', address,
+                          ', removing subscriber.')
+                printExceptionDetailsToStdErr()
+                del subscribers[address]
+
     def handleCustomTaskRequest(self, request, replyTo):
         custom_tasks = self.iohub.custom_tasks
         subtype = request.pop(0)
@@ -178,6 +246,7 @@ class udpServer(DatagramServer):
             self.iohub.processDeviceEvents()
             currentEvents = list(self.iohub.eventBuffer)
             self.iohub.eventBuffer.clear()
+            self.iohub.resetEventNotifications()
 
             if len(currentEvents) > 0:
                 currentEvents = sorted(
@@ -314,6 +383,9 @@ class udpServer(DatagramServer):
             return False
 
     def sendResponse(self, data, address):
+        if self._multi_replies is not None:
+            self._multi_replies.append(data)
+            return
         reply_data_sz = -1
         max_pkt_sz = int(MAX_PACKET_SIZE / 2 - 20)
         pkt_cnt = -1
@@ -508,6 +580,9 @@ class ioServer(object):
         self.devices = []
         self.deviceMonitors = []
         self.custom_tasks = OrderedDict()
+        # address: [event type id set or None for all, new event count]
+        self._event_subscribers = {}
+        self._event_push_interval = config.get('event_push_interval', 0.001)
         self.sessionInfoDict = None
         self.experimentInfoList = None
         self.filterLookupByInput = {}
@@ -859,9 +934,32 @@ class ioServer(object):
         while self._running:
             stime = Computer.getTime()
             self.processDeviceEvents()
-            dur = sleep_interval - (Computer.getTime() - stime)
+            interval = sleep_interval
+            if self._event_subscribers:
+                # clients are waiting to be told about new events
+                self.udpService.sendEventNotifications(self._event_subscribers)
+                interval = min(sleep_interval, self._event_push_interval)
+            dur = interval - (Computer.getTime() - stime)
             gevent.sleep(max(0.0, dur))
 
+    def subscribeToEvents(self, address, event_types=None):
+        """Notify the client listening on address (host, port) when new
+        events, of one of the event_types ids or of any type if None, have
+        been added to the global event buffer. While there are subscribers,
+        device events are processed every event_push_interval sec.msec.
+        """
+        if event_types is not None:
+            event_types = set(event_types)
+        self._event_subscribers[tuple(address)] = [event_types, 0]
+
+    def unsubscribeFromEvents(self, address):
+        self._event_subscribers.pop(tuple(address), None)
+
+    def resetEventNotifications(self):
+        # the global event buffer has been read or cleared
+        for sub in self._event_subscribers.values():
+            sub[1] = 0
+
     def processDeviceEvents(self):
         for device in self.devices:
             evt = []
@@ -894,12 +992,18 @@ class ioServer(object):
 
     def _handleEvent(self, event):
         self.eventBuffer.append(event)
+        if self._event_subscribers:
+            etype = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
+            for sub in self._event_subscribers.values():
+                if sub[0] is None or etype in sub[0]:
+                    sub[1] += 1
 
     def clearEventBuffer(self, call_proc_events=True):
         if call_proc_events is True:
             self.processDeviceEvents()
         l = len(self.eventBuffer)
         self.eventBuffer.clear()
+        self.resetEventNotifications()
         return l
 
     def checkForPsychopyProcess(self, sleep_interval):
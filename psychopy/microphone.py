@@ -19,6 +19,7 @@ from builtins import object
 import os
 import glob
 import threading
+import multiprocessing
 from psychopy.constants import PY3
 
 if PY3:
@@ -517,13 +518,10 @@ def getMarkerOnset(filename, chunk=128, secs=0.5, marker_hz=19000,
         data = abs(data)
         if not thr:
             thr = mult * np.std(data)
-        val = data[(data > thr)]
-        if not len(val):
+        above = np.flatnonzero(data > thr)
+        if not len(above):
             return len(data) + 1, thr
-        first = val[0]
-        for i, v in enumerate(data):
-            if v == first:
-                return i, thr
+        return above[0], thr
 
     # read data from file:
     data, sampleRate = readWavFile(filename)
@@ -559,6 +557,58 @@ def getMarkerOnset(filename, chunk=128, secs=0.5, marker_hz=19000,
     return onsetSecs, offSecs
 
 
+def _markerOnsetWorker(args):
+    filename, kwargs = args
+    try:
+        return filename, getMarkerOnset(filename, **kwargs), None
+    except (ValueError, AttributeError, SoundFileError) as err:
+        return filename, None, str(err)
+
+
+def getMarkerOnsets(files, chunk=128, secs=0.5, marker_hz=19000,
+                    marker_duration=0.015, processes=None):
+    """Like `getMarkerOnset()`, but for many .wav files, which are analysed
+    in parallel by a pool of processes. Intended for post-experiment
+    processing of all the recordings of a study.
+
+    If `files` is a string, it will be used as a directory name for glob
+    (matching all `*.wav` files), otherwise it should be a list of
+    filenames. `processes` is the size of the pool (default: the number of
+    CPUs); with 1 the files are analysed in this process.
+
+    Returns a list of `(filename, (onset, offset))` tuples in the order of
+    the files. Files that can't be analysed are logged and given
+    `(filename, None)`.
+    """
+    if isinstance(files, basestring) and os.path.isdir(files):
+        fileList = sorted(glob.glob(os.path.join(files, '*.wav')))
+    else:
+        fileList = list(files)
+    kwargs = dict(chunk=chunk, secs=secs, marker_hz=marker_hz,
+                  marker_duration=marker_duration)
+    jobs = [(filename, kwargs) for filename in fileList]
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(jobs)))
+    if processes == 1:
+        results = [_markerOnsetWorker(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_markerOnsetWorker, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+    onsets = []
+    for filename, onset, error in results:
+        if error is not None:
+            logging.warning('getMarkerOnsets: %s: %s' % (filename, error))
+        onsets.append((filename, onset))
+    return onsets
+
+
 def readWavFile(filename):
     """Return (data, sampleRate) as read from a wav file, expects int16 data.
     """
@@ -581,6 +631,28 @@ def readWavFile(filename):
     return data, sampleRate
 
 
+def _chunks(data, chunk, step=None):
+    """Return a (nChunks, chunk) strided view of the consecutive windows of
+    ``chunk`` samples of 1D ``data``, starting every ``step`` samples
+    (default ``chunk``, i.e. non-overlapping). Incomplete windows at the end
+    are dropped.
+    """
+    data = np.ascontiguousarray(data)
+    if data.ndim != 1:
+        raise ValueError('_chunks: expected 1D data, got shape %s' %
+                         (data.shape,))
+    step = step or chunk
+    nChunks = max(0, (len(data) - chunk) // step + 1)
+    return np.lib.stride_tricks.as_strided(
+        data, shape=(nChunks, chunk),
+        strides=(data.strides[0] * step, data.strides[0]),
+        writeable=False)
+
+
+# max number of chunks transformed at a time, to bound memory use
+_maxChunksPerBlock = 2 ** 14
+
+
 def getDftBins(data=None, sampleRate=None, low=100, high=8000, chunk=64):
     """Return DFT (discrete Fourier transform) of ``data``, doing so in
     time-domain bins, each of size ``chunk`` samples.
@@ -589,23 +661,43 @@ def getDftBins(data=None, sampleRate=None, low=100, high=8000, chunk=64):
 
     If given a sampleRate, the data are bandpass filtered (low, high).
     """
-    # good to reshape & vectorize data rather than use a python loop
     if data is None:
         data = []
-    bins = []
-    i = chunk
+    data = np.asarray(data)
+    if data.ndim != 1:
+        bins = []
+        i = chunk
+        if sampleRate:
+            _junk, freq = getDft(data[:chunk], sampleRate)
+            band = (freq > low) & (freq < high)
+        while i <= len(data):
+            magn = getDft(data[i - chunk:i])
+            if sampleRate:
+                bins.append(np.std(magn[band]))
+            else:
+                bins.append(np.std(magn))
+            i += chunk
+        return np.array(bins)
+    chunks = _chunks(data, chunk)
+    if not len(chunks):
+        return np.array([])
+    # as getDft(), for all chunks at once
+    samples = 2 ** int(np.log2(chunk))
+    samplesHalf = samples // 2
     if sampleRate:
         # just to get freq vector
         _junk, freq = getDft(data[:chunk], sampleRate)
         band = (freq > low) & (freq < high)  # band (frequency range)
-    while i <= len(data):
-        magn = getDft(data[i - chunk:i])
-        if sampleRate:
-            bins.append(np.std(magn[band]))  # filtered by frequency
-        else:
-            bins.append(np.std(magn))  # unfiltered
-        i += chunk
-    return np.array(bins)
+    else:
+        band = slice(None)
+    bins = np.empty(len(chunks))
+    for i in range(0, len(chunks), _maxChunksPerBlock):
+        block = chunks[i:i + _maxChunksPerBlock, :samples]
+        dftHalf = np.fft.fft(block, axis=1)[:, :samplesHalf] / samples
+        magn = abs(dftHalf) * 2
+        magn[:, 0] /= 2.
+        bins[i:i + len(block)] = np.std(magn[:, band], axis=1)
+    return bins
 
 
 def getDft(data, sampleRate=None, wantPhase=False):
@@ -646,14 +738,21 @@ def getDft(data, sampleRate=None, wantPhase=False):
 def getRMSBins(data, chunk=64):
     """Return RMS (loudness) in bins of ``chunk`` samples
     """
-    # better to vectorize
-    bins = []
-    i = chunk
-    while i <= len(data):
-        r = getRMS(data[i - chunk:i])
-        bins.append(r)
-        i += chunk
-    return np.array(bins)
+    data = np.asarray(data)
+    if data.ndim != 1:
+        bins = []
+        i = chunk
+        while i <= len(data):
+            r = getRMS(data[i - chunk:i])
+            bins.append(r)
+            i += chunk
+        return np.array(bins)
+    chunks = _chunks(data, chunk)
+    bins = np.empty(len(chunks))
+    for i in range(0, len(chunks), _maxChunksPerBlock):
+        block = chunks[i:i + _maxChunksPerBlock]
+        bins[i:i + len(block)] = np.std(block, axis=1)
+    return bins
 
 
 def getRMS(data):
@@ -13,7 +13,6 @@ from __future__ import absolute_import, division, print_function
 # from future import standard_library
 # standard_library.install_aliases()
 from builtins import str
-from builtins import range
 from past.builtins import basestring
 from past.utils import old_div
 from builtins import object
@@ -30,7 +29,7 @@ import time
 import glob
 import pickle
 import sys
-from copy import deepcopy, copy
+from copy import deepcopy
 
 import numpy as np
 import scipy.optimize as optim
@@ -118,8 +117,7 @@ class Monitor(object):
         self.currentCalibName = strFromDate(time.mktime(time.localtime()))
         self.calibs = {}
         self.calibNames = []
-        self._gammaInterpolator = None
-        self._gammaInterpolator2 = None
+        self._linearizer = None  # (key, Linearizer) for the last calib
         self._loadAll()
         if len(self.calibNames) > 0:
             self.setCurrent(-1)  # will fetch previous vals if monitor exists
@@ -572,95 +570,57 @@ class Monitor(object):
                       overrideGamma=None):
         """lums should be uncalibrated luminance values (e.g. a linear ramp)
         ranging 0:1
+
+        A 1D array is linearized for the luminance (white) and an Nx3
+        (or HxWx3...) array for each gun. See `getLinearizer`.
+        """
+        linearizer = self.getLinearizer(newInterpolators=newInterpolators,
+                                        overrideGamma=overrideGamma)
+        if linearizer is None:
+            return desiredLums
+        return linearizer(desiredLums)
+
+    def getLinearizer(self, newInterpolators=False, overrideGamma=None):
+        """Gets a :class:`Linearizer` for the current calibration (and
+        linearize method), or None if it can't be linearized.
+
+        The linearizer is kept until the calibration changes, so calling
+        it directly saves the checks that linearizeLums makes on each call.
+        With newInterpolators=True it is always rebuilt.
         """
         linMethod = self.getLinearizeMethod()
-        desiredLums = np.asarray(desiredLums)
-        output = desiredLums * 0.0  # needs same size as input
+        gammaGrid = self.getGammaGrid()
+        gamma = self.currentCalib.get('gamma')
+        lumsPre = self.getLumsPre()
+        levelsPre = self.getLevelsPre()
+        key = (linMethod, repr(overrideGamma), repr(gamma))
+        for arr in (gammaGrid, lumsPre, levelsPre):
+            key += (None,) if arr is None else (
+                np.shape(arr), np.asarray(arr, 'd').tobytes())
+        if (self._linearizer is not None and not newInterpolators and
+                self._linearizer[0] == key):
+            return self._linearizer[1]
 
-        # gamma interpolation
         if linMethod == 3:
-            lumsPre = copy(self.getLumsPre())
-            if self._gammaInterpolator is not None and not newInterpolators:
-                pass  # we already have an interpolator
-            elif lumsPre is not None:
-                if self.autoLog:
-                    logging.info('Creating linear interpolation for gamma')
-                # we can make an interpolator
-                self._gammaInterpolator = []
-                self._gammaInterpolator2 = []
-                # each of these interpolators is a function!
-                levelsPre = old_div(self.getLevelsPre(), 255.0)
-                for gun in range(4):
-                    # scale to 0:1
-                    lumsPre[gun, :] = (old_div((lumsPre[gun, :] - lumsPre[gun, 0]),
-                                       (lumsPre[gun, -1] - lumsPre[gun, 0])))
-                    self._gammaInterpolator.append(
-                        interpolate.interp1d(lumsPre[gun, :],
-                                             levelsPre,
-                                             kind='linear'))
-                    # interpFunc = Interpolation.InterpolatingFunction(
-                    #    (lumsPre[gun,:],), levelsPre)
-                    # polyFunc = interpFunc.fitPolynomial(3)
-                    # self._gammaInterpolator2.append( [polyFunc.coeff])
-            else:
+            if lumsPre is None:
                 # no way to do this! Calibrate the monitor
                 logging.error("Can't do a gamma interpolation on your "
                               "monitor without calibrating!")
-                return desiredLums
-
-            # then do the actual interpolations
-            if len(desiredLums.shape) > 1:
-                for gun in range(3):
-                    # gun+1 because we don't want luminance interpolator
-                    _gammaIntrpGun = self._gammaInterpolator[gun + 1]
-                    output[:, gun] = _gammaIntrpGun(desiredLums[:, gun])
-
-            else:
-                # just luminance
-                output = self._gammaInterpolator[0](desiredLums)
-
-        # use a fitted gamma equation (1 or 2)
+                return None
+            if self.autoLog:
+                logging.info('Creating linear interpolation for gamma')
+            linearizer = Linearizer(3, lumsPre=lumsPre, levelsPre=levelsPre)
         elif linMethod in [1, 2, 4]:
-
-            # get the min,max lums
-            gammaGrid = self.getGammaGrid()
-            if gammaGrid is not None:
-                # if we have info about min and max luminance then use it
-                minLum = gammaGrid[1, 0]
-                maxLum = gammaGrid[1:4, 1]
-                b = gammaGrid[1:4, 4]
-                if overrideGamma is not None:
-                    gamma = overrideGamma
-                else:
-                    gamma = gammaGrid[1:4, 2]
-                maxLumWhite = gammaGrid[0, 1]
-                gammaWhite = gammaGrid[0, 2]
-                if self.autoLog:
-                    logging.debug('using gamma grid' + str(gammaGrid))
-            else:
-                # just do the calculation using gamma
-                minLum = 0
-                maxLumR, maxLumG, maxLumB, maxLumWhite = 1, 1, 1, 1
-                gamma = self.currentCalib['gamma']
-                gammaWhite = np.average(gamma)
-
-            # get the inverse gamma
-            if len(desiredLums.shape) > 1:
-                for gun in range(3):
-                    output[:, gun] = gammaInvFun(desiredLums[:, gun],
-                                                 minLum, maxLum[gun],
-                                                 gamma[gun],
-                                                 eq=linMethod, b=b[gun])
-            else:
-                output = gammaInvFun(desiredLums, minLum, maxLumWhite,
-                                     gammaWhite, eq=linMethod)
-
+            if gammaGrid is not None and self.autoLog:
+                logging.debug('using gamma grid' + str(gammaGrid))
+            linearizer = Linearizer(linMethod, gammaGrid=gammaGrid,
+                                    gamma=gamma, overrideGamma=overrideGamma)
         else:
             msg = "Don't know how to linearise with method %i"
             logging.error(msg % linMethod)
-            output = desiredLums
-
-        return output
+            return None
+        self._linearizer = (key, linearizer)
+        return linearizer
 
     def lineariseLums(self, desiredLums, newInterpolators=False,
                       overrideGamma=None):
@@ -671,6 +631,191 @@ class Monitor(object):
                                   overrideGamma=overrideGamma)
 
 
+class Linearizer(object):
+    """Converts desired luminances (0:1) into the values to send to the
+    guns, for one calibration. Everything that depends only on the
+    calibration (the constants of the inverse gamma functions, or the
+    tables to interpolate) is worked out once, so that each call is a few
+    numpy operations over the whole array, whatever its size.
+
+    Usually made by :func:`~psychopy.monitors.Monitor.getLinearizer`.
+
+    :Parameters:
+
+        method : 1, 2, 3 or 4
+            the linearize method (see `gammaInvFun` for 1, 2 and 4; 3
+            interpolates the measured luminances)
+
+        gammaGrid : 4x6 array or None
+            the min, max, gamma, a, b and k for the luminance and each gun
+            (for methods 1, 2 and 4). Without it the min and max are 0 and 1
+
+        gamma : float, 3 floats or None
+            the gamma of the guns if there is no gammaGrid
+
+        overrideGamma : float, 3 floats or None
+            the gamma to use for the guns instead of the ones calibrated
+
+        lumsPre, levelsPre : arrays
+            the luminances measured at each level for the luminance and
+            each gun (4xN) and the levels (N, 0:255), for method 3
+
+    Calling it with a 1D array linearizes the luminance. An array whose
+    last dimension has 3 values (Nx3, HxWx3...) is linearized for each gun.
+    """
+
+    # the constants for the guns are repeated for this many rows, so that
+    # numpy can apply them along long rows instead of 3 values at a time
+    _blockRows = 256
+
+    def __init__(self, method, gammaGrid=None, gamma=None,
+                 overrideGamma=None, lumsPre=None, levelsPre=None):
+        super(Linearizer, self).__init__()
+        self.method = method
+        if method == 3:
+            steps = self._makeInterpolation(lumsPre, levelsPre)
+        elif method in [1, 2, 4]:
+            steps = self._makeConstants(gammaGrid, gamma, overrideGamma)
+        else:
+            raise ValueError("Don't know how to linearise with method %s"
+                             % method)
+        # (ufunc, the constant for the luminance and each gun, the constants
+        # for the guns repeated for _blockRows)
+        self._steps = [(ufunc, values, np.tile(values[1:], self._blockRows))
+                       for ufunc, values in steps]
+
+    def _makeInterpolation(self, lumsPre, levelsPre):
+        """Tables of levels against the luminances (scaled to 0:1) for the
+        luminance and each gun, laid end to end so that all of them are
+        interpolated in one call of np.interp
+        """
+        lumsPre = np.array(lumsPre, 'd')
+        levels = np.asarray(levelsPre, 'd') / 255.0
+        lumsPre = ((lumsPre - lumsPre[:, :1]) /
+                   (lumsPre[:, -1:] - lumsPre[:, :1]))
+        order = np.argsort(lumsPre, axis=1, kind='mergesort')
+        lumsPre = lumsPre[np.arange(len(lumsPre))[:, np.newaxis], order]
+        self._lumRange = lumsPre[:, [0, -1]].T  # (2, 4) lowest, highest
+        span = np.max(lumsPre[:, -1]) - np.min(lumsPre[:, 0]) + 1.0
+        offsets = np.arange(len(lumsPre)) * span
+        self._xp = (lumsPre + offsets[:, np.newaxis]).ravel()
+        self._fp = levels[order].ravel()
+        return [(np.add, offsets)]
+
+    def _makeConstants(self, gammaGrid, gamma, overrideGamma):
+        """The constants of the inverse gamma function, for the luminance
+        and each gun
+        """
+        if gammaGrid is not None:
+            gammaGrid = np.asarray(gammaGrid, 'd')
+            minLum = gammaGrid[1, 0]
+            maxLum = gammaGrid[0:4, 1]
+            gammas = gammaGrid[0:4, 2].copy()
+            b = gammaGrid[0:4, 4]
+            if overrideGamma is not None:
+                gammas[1:] = overrideGamma
+        else:
+            minLum = 0.0
+            maxLum = np.ones(4)
+            if overrideGamma is not None:
+                gamma = overrideGamma
+            gammas = np.ones(4)
+            gammas[1:] = gamma
+            gammas[0] = np.average(gamma)
+            b = np.zeros(4) * np.nan
+        power = 1.0 / gammas
+        if self.method == 1:
+            # x = y**(1/gamma)
+            return [(np.power, power)]
+        elif self.method == 2:
+            # x = ((y * (maxLum - minLum) + minLum)**(1/gamma) - a) / b,
+            # then scaled to go from the min to max of the LUT
+            a = minLum**power
+            b = maxLum**power - a
+            maxLUT = (maxLum**power - a) / b
+            minLUT = (minLum**power - a) / b
+            yScale = maxLum - minLum
+            yOffset = np.ones(4) * minLum
+            xScale = 1.0 / (b * (maxLUT - minLUT))
+            xOffset = -a * xScale - minLUT
+        else:
+            # x = (((1 - y) * b**gamma + y * (b + k)**gamma)**(1/gamma)
+            #      - b) / k
+            a = minLum - b**gammas
+            k = (maxLum - a)**power - b
+            yOffset = b**gammas
+            yScale = (b + k)**gammas - yOffset
+            xScale = 1.0 / k
+            xOffset = -b / k
+        return [(np.multiply, yScale), (np.add, yOffset), (np.power, power),
+                (np.multiply, xScale), (np.add, xOffset)]
+
+    def __call__(self, desiredLums):
+        """Linearize an array of luminances (see :class:`Linearizer`)
+        """
+        lums = np.array(desiredLums, 'd')  # a copy to work on in place
+        if lums.ndim > 1 and lums.shape[-1] != 3:
+            raise ValueError("Linearizer needs a 1D array of luminances "
+                             "or an array of RGB values (Nx3, HxWx3...), "
+                             "not shape %s" % (lums.shape,))
+        if lums.size == 0:
+            return lums
+        if self.method == 3:
+            self._checkTable(lums)
+            self._apply(lums)
+            return np.interp(lums, self._xp, self._fp)
+        self._checkRange(lums)
+        self._apply(lums)
+        return lums
+
+    def _apply(self, lums):
+        """Apply the steps of the conversion to lums, in place"""
+        if lums.ndim == 1:
+            for ufunc, values, tiled in self._steps:
+                ufunc(lums, values[0], out=lums)
+            return
+        flat = lums.reshape(-1)
+        nHead = len(flat) // len(self._steps[0][2]) * len(self._steps[0][2])
+        head = flat[:nHead].reshape(-1, len(self._steps[0][2]))
+        tail = flat[nHead:].reshape(-1, 3)
+        for ufunc, values, tiled in self._steps:
+            ufunc(head, tiled, out=head)
+            ufunc(tail, values[1:], out=tail)
+
+    def _checkRange(self, lums):
+        """Scale values that go up to 255 (for each gun) into 0:1, in place,
+        and warn about any others outside 0:1, as `gammaInvFun` does
+        """
+        if 0 <= lums.min() and lums.max() <= 1:
+            return
+        flat = lums.reshape(-1, 3 if lums.ndim > 1 else 1)
+        highest = flat.max(axis=0)
+        lowest = flat.min(axis=0)
+        is255 = highest == 255
+        if np.any((~is255) & ((lowest < 0) | (highest > 1))):
+            logging.warning(
+                'User supplied values outside the expected range (0:1)')
+        if np.any(is255):
+            flat /= np.where(is255, 255.0, 1.0)
+
+    def _checkTable(self, lums):
+        """Raise ValueError if lums are outside the table (method 3)"""
+        if lums.ndim > 1:
+            flat = lums.reshape(-1, 3)
+            lowest, highest = self._lumRange[:, 1:]
+        else:
+            flat = lums
+            lowest, highest = self._lumRange[:, 0]
+        if lums.min() >= np.max(lowest) and lums.max() <= np.min(highest):
+            return
+        if np.any(flat < lowest):
+            raise ValueError("A value in x_new is below the interpolation "
+                             "range.")
+        if np.any(flat > highest):
+            raise ValueError("A value in x_new is above the interpolation "
+                             "range.")
+
+
 class GammaCalculator(object):
     """Class for managing gamma tables
 
@@ -1176,7 +1321,7 @@ def gammaFun(xx, minLum, maxLum, gamma, eq=1, a=None, b=None, k=None):
     """
     # scale x to be in range minLum:maxLum
     xx = np.array(xx, 'd')
-    maxXX = max(xx)
+    maxXX = np.max(xx)
     if maxXX > 2.0:
         # xx = xx * maxLum / 255.0 + minLum
         xx = old_div(xx, 255.0)
@@ -1243,9 +1388,11 @@ def gammaInvFun(yy, minLum, maxLum, gamma, b=None, eq=1):
     # eq1: y = a + (b * xx)**gamma
     # eq2: y = (a + b * xx)**gamma
     # eq4: y = a + (b + kxx)**gamma
-    if max(yy) == 255:
+    yy = np.asarray(yy)
+    maxYY = np.max(yy)
+    if maxYY == 255:
         yy = old_div(np.asarray(yy, 'd'), 255.0)
-    elif min(yy) < 0 or max(yy) > 1:
+    elif np.min(yy) < 0 or maxYY > 1:
         logging.warning(
             'User supplied values outside the expected range (0:1)')
     else:
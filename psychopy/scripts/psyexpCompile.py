@@ -7,14 +7,39 @@
 
 import argparse
 import codecs
-from psychopy.app.builder import experiment
-from psychopy import logging
+import glob
+import hashlib
+import json
+import os
+import time
+import multiprocessing
+from psychopy import experiment
+from psychopy import logging, prefs, __version__
 
 # parse args for subprocess
 parser = argparse.ArgumentParser(description='Compile your python file from here')
-parser.add_argument('infile', help='The input (psyexp) file to be compiled')
+parser.add_argument('infile', nargs='+',
+                    help='The input (psyexp) file to be compiled. With --batch, '
+                         'any number of files, folders or glob patterns')
 parser.add_argument('--version', '-v', help='The PsychoPy version to use for compiling the script. e.g. 1.84.1')
 parser.add_argument('--outfile', '-o', help='The output (py) file to be generated (defaults to the ')
+parser.add_argument('--batch', '-b', action='store_true',
+                    help='Compile all psyexp files found in the given files, '
+                         'folders and glob patterns, in parallel')
+parser.add_argument('--target', '-t', default='PsychoPy',
+                    choices=['PsychoPy', 'PsychoJS'],
+                    help='The type of script to generate in batch mode')
+parser.add_argument('--jobs', '-j', type=int, default=None,
+                    help='Number of processes to use in batch mode '
+                         '(defaults to the number of CPUs)')
+parser.add_argument('--cache', default=None,
+                    help='The compile cache file to use in batch mode')
+parser.add_argument('--force', '-f', action='store_true',
+                    help='Recompile all files, ignoring the compile cache')
+
+# stages reported by compileBatch(), in order
+batchStages = ['hash', 'load', 'generate', 'write']
+
 
 def compileScript(infile=None, version=None, outfile=None):
     """
@@ -39,6 +64,14 @@ def compileScript(infile=None, version=None, outfile=None):
         # Write version to experiment init text
         thisExp.psychopyVersion = version
 
+    # Output script to file
+    _writeScripts(_generateScripts(thisExp, outfile))
+
+
+def _generateScripts(thisExp, outfile):
+    """Return a dict of {filename: script} for the experiment, with the
+    target (PsychoPy or PsychoJS) determined from the outfile extension
+    """
     # Set output type, either JS or Python
     if outfile.endswith(".js"):
         targetOutput = "PsychoJS"
@@ -52,29 +85,234 @@ def compileScript(infile=None, version=None, outfile=None):
         # Write no module JS code
         outfileNoModule = outfile.replace('.js', 'NoModule.js')  # For no JS module script
         scriptNoModule = thisExp.writeScript(outfileNoModule, target=targetOutput, modular=False)
-        # Store scripts in list
-        scriptDict = {'outfile': script, 'outfileNoModule': scriptNoModule}
+        # Store scripts in dict
+        scriptDict = {outfile: script, outfileNoModule: scriptNoModule}
     else:
         script = thisExp.writeScript(outfile, target=targetOutput)
-        scriptDict = {'outfile': script}
+        scriptDict = {outfile: script}
+    return scriptDict
+
+
+def _writeScripts(scriptDict):
+    for filename in scriptDict:
+        with codecs.open(filename, 'w', 'utf-8') as f:
+            f.write(scriptDict[filename])
+
+
+def findPsyexpFiles(paths):
+    """Return a sorted list of the .psyexp files given by a list of files,
+    folders (searched recursively) and/or glob patterns
+    """
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for f in files:
+                    if f.endswith('.psyexp'):
+                        found.add(os.path.abspath(os.path.join(root, f)))
+        elif os.path.isfile(path):
+            found.add(os.path.abspath(path))
+        else:
+            for f in glob.glob(path):
+                if f.endswith('.psyexp') and os.path.isfile(f):
+                    found.add(os.path.abspath(f))
+    return sorted(found)
+
+
+def _fileHash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _loadCache(cacheFile):
+    if cacheFile is None or not os.path.isfile(cacheFile):
+        return {}
+    try:
+        with codecs.open(cacheFile, 'r', 'utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        logging.warning("Compile cache {} could not be read, so it will be "
+                        "rebuilt".format(cacheFile))
+        return {}
+
+
+def _saveCache(cacheFile, cache):
+    if cacheFile is None:
+        return
+    with codecs.open(cacheFile, 'w', 'utf-8') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+
+def _initWorker():
+    """Runs once in each worker process so that the components are found
+    once per process, rather than once per file (their modules are then
+    imported as they're needed)
+    """
+    experiment.getAllComponents(prefs.builder['componentsFolders'],
+                                fetchIcons=False)
+
+
+def _compileWorker(job):
+    """Compile a single file in a worker process.
+
+    Returns a dict with the outfiles, the timings of each stage and any
+    error message (errors are returned rather than raised so that one bad
+    file doesn't stop the batch)
+    """
+    infile, outfile = job
+    timings = {}
+    result = {'infile': infile, 'outfiles': [], 'timings': timings,
+              'error': None}
+    try:
+        t0 = time.time()
+        thisExp = experiment.Experiment()
+        thisExp.loadFromXML(infile)
+        thisExp.psychopyVersion = None  # as for compileScript()
+        t1 = time.time()
+        scriptDict = _generateScripts(thisExp, outfile)
+        t2 = time.time()
+        _writeScripts(scriptDict)
+        t3 = time.time()
+        timings.update(load=t1 - t0, generate=t2 - t1, write=t3 - t2)
+        result['outfiles'] = sorted(scriptDict)
+    except Exception as err:
+        result['error'] = "{}: {}".format(type(err).__name__, err)
+    return result
+
+
+def compileBatch(paths, target='PsychoPy', nProcesses=None,
+                 cacheFile='default', force=False):
+    """Compile many .psyexp files, in parallel, skipping those that haven't
+    changed since they were last compiled.
+
+        :param paths: a list of .psyexp files, folders (searched recursively)
+                      and/or glob patterns
+        :param target: 'PsychoPy' (to write .py files) or 'PsychoJS' (to
+                       write .js files) next to each .psyexp file
+        :param nProcesses: the number of worker processes (defaults to the
+                           number of CPUs). With 1 the files are compiled
+                           in this process.
+        :param cacheFile: a json file recording the hash of each compiled
+                          .psyexp file and the PsychoPy version used.
+                          Files whose hash and version match (and whose
+                          scripts still exist) are skipped. 'default'
+                          stores this in the user prefs folder and None
+                          disables the cache.
+        :param force: compile every file, ignoring the cache
+
+    Returns a list of dicts (one per file) with keys 'infile', 'outfiles',
+    'timings' (seconds spent in each of `batchStages`), 'skipped' and
+    'error'.
+    """
+    if target not in ['PsychoPy', 'PsychoJS']:
+        raise ValueError("target should be 'PsychoPy' or 'PsychoJS', "
+                         "not {!r}".format(target))
+    ext = '.js' if target == 'PsychoJS' else '.py'
+    if cacheFile == 'default':
+        cacheFile = os.path.join(prefs.paths['userPrefsDir'],
+                                 'compileCache.json')
+    cache = _loadCache(cacheFile)
+
+    results = {}
+    jobs = []
+    hashes = {}
+    for infile in findPsyexpFiles(paths):
+        t0 = time.time()
+        hashes[infile] = thisHash = _fileHash(infile)
+        key = "{}:{}".format(target, infile)
+        cached = cache.get(key)
+        skip = (not force and cached is not None and
+                cached['hash'] == thisHash and
+                cached['version'] == __version__ and
+                all(os.path.isfile(f) for f in cached['outfiles']))
+        results[infile] = {'infile': infile, 'skipped': skip,
+                           'outfiles': cached['outfiles'] if skip else [],
+                           'timings': {'hash': time.time() - t0},
+                           'error': None}
+        if not skip:
+            outfile = os.path.splitext(infile)[0] + ext
+            jobs.append((infile, outfile))
+
+    if nProcesses is None:
+        nProcesses = multiprocessing.cpu_count()
+    nProcesses = max(1, min(nProcesses, len(jobs)))
+    if nProcesses == 1:
+        compiled = [_compileWorker(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(nProcesses, initializer=_initWorker)
+        try:
+            compiled = pool.map(_compileWorker, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    for thisResult in compiled:
+        infile = thisResult['infile']
+        results[infile]['timings'].update(thisResult['timings'])
+        results[infile]['outfiles'] = thisResult['outfiles']
+        results[infile]['error'] = thisResult['error']
+        key = "{}:{}".format(target, infile)
+        if thisResult['error'] is None:
+            cache[key] = {'hash': hashes[infile], 'version': __version__,
+                          'outfiles': thisResult['outfiles']}
+        else:
+            logging.error("Failed to compile {}: {}".format(
+                infile, thisResult['error']))
+            cache.pop(key, None)
+    if jobs:
+        _saveCache(cacheFile, cache)
+    return [results[infile] for infile in sorted(results)]
+
+
+def reportBatch(results):
+    """Return a text summary of compileBatch() results, with the
+    time spent in each stage
+    """
+    lines = []
+    totals = dict.fromkeys(batchStages, 0.0)
+    nCompiled = nSkipped = nFailed = 0
+    for thisResult in results:
+        timings = thisResult['timings']
+        for stage in timings:
+            totals[stage] += timings[stage]
+        if thisResult['skipped']:
+            nSkipped += 1
+            status = 'cached'
+        elif thisResult['error']:
+            nFailed += 1
+            status = 'FAILED ({})'.format(thisResult['error'])
+        else:
+            nCompiled += 1
+            status = ' '.join('{}={:.3f}s'.format(stage, timings[stage])
+                              for stage in batchStages if stage in timings)
+        lines.append('{}: {}'.format(thisResult['infile'], status))
+    lines.append('{} compiled, {} cached, {} failed'.format(
+        nCompiled, nSkipped, nFailed))
+    lines.append('total ' + ' '.join('{}={:.3f}s'.format(stage, totals[stage])
+                                     for stage in batchStages))
+    return '\n'.join(lines)
 
-    # Output script to file
-    for scripts in scriptDict:
-        with codecs.open(eval(scripts), 'w', 'utf-8') as f:
-            f.write(scriptDict[scripts])
-        f.close()
 
 if __name__ == "__main__":
 
     # define args
     args = parser.parse_args()
-    if args.outfile is None:
-        args.outfile = args.infile.replace(".psyexp", ".py")
 
-    # Set version
-    if args.version:
-        from psychopy import useVersion
-        useVersion(args.version)
+    if args.batch:
+        cacheFile = args.cache or 'default'
+        results = compileBatch(args.infile, target=args.target,
+                               nProcesses=args.jobs, cacheFile=cacheFile,
+                               force=args.force)
+        print(reportBatch(results))
+    else:
+        infile = args.infile[0]
+        if args.outfile is None:
+            args.outfile = infile.replace(".psyexp", ".py")
+
+        # Set version
+        if args.version:
+            from psychopy import useVersion
+            useVersion(args.version)
 
-    # run PsychoPy with useVersion active
-    compileScript(args.infile, args.version, args.outfile)
+        # run PsychoPy with useVersion active
+        compileScript(infile, args.version, args.outfile)
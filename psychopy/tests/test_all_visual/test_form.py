@@ -128,6 +128,42 @@ class Test_Form(object):
         with pytest.raises(AssertionError):
             assert self.survey._inRange(self.survey._items['question'][2])
 
+    def test_visible_rows(self):
+        survey = self.survey
+        for markerPos in [1, 0.5, 0]:
+            survey.scrollbar.markerPos = markerPos
+            offset = survey._getScrollOffet()
+            visible = survey._visibleRows(offset)
+            for idx, baseY in enumerate(survey._baseYpositions):
+                halfHeight = survey._rowHeights[idx] / 2
+                y = survey.size[1]/2 + baseY - offset
+                inside = (y - halfHeight < survey.size[1]/2 and
+                          y + halfHeight > -survey.size[1]/2)
+                assert (idx in visible) == inside
+        survey.scrollbar.markerPos = 1
+
+    def test_draw_positions(self):
+        survey = Form(self.win, items=self.questions, size=(1.0, 0.3), pos=(0.0, 0.0))
+        survey.draw()
+        offset = survey._getScrollOffet()
+        for idx in survey._visibleRows(offset):
+            for element in ['question', 'response']:
+                item = survey._items[element][idx]
+                assert isclose(item.pos[1], survey.size[1]/2
+                               + survey._baseYpositions[idx] - offset)
+        # items are only moved again when the form is scrolled
+        question = survey._items['question'][0]
+        lastPos = question.pos
+        survey.draw()
+        assert question.pos is lastPos
+        survey.scrollbar.markerPos = 0
+        survey.draw()
+        offset = survey._getScrollOffet()
+        lastRow = len(survey._baseYpositions) - 1
+        assert lastRow in survey._visibleRows(offset)
+        assert isclose(survey._items['question'][lastRow].pos[1],
+                       survey.size[1]/2 + survey._baseYpositions[lastRow] - offset)
+
     def teardown_class(self):
         self.win.close()
 
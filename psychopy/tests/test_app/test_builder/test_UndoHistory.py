@@ -0,0 +1,115 @@
+from __future__ import print_function
+from builtins import object
+
+import codecs
+import shutil
+from os import path
+from tempfile import mkdtemp
+
+import psychopy.experiment
+from psychopy.tests.utils import TESTS_DATA_PATH
+
+
+class TestUndoHistory(object):
+    def setup_method(self):
+        self.tmp_dir = mkdtemp(prefix='psychopy-tests-undo')
+        self.exp = psychopy.experiment.Experiment()
+        self.exp.loadFromXML(path.join(TESTS_DATA_PATH,
+                                       'ghost_stroop.psyexp'))
+        self.history = psychopy.experiment.UndoHistory(self.exp)
+        self.history.record()
+        self._nSaved = 0
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _xml(self):
+        """The current state of the experiment as saved to file"""
+        self._nSaved += 1
+        filename = path.join(self.tmp_dir, 'exp%i.psyexp' % self._nSaved)
+        self.exp.saveToXML(filename)
+        with codecs.open(filename, 'r', 'utf-8') as f:
+            return f.read()
+
+    def test_undoRedo(self):
+        exp, history = self.exp, self.history
+        states = [self._xml()]
+
+        text = exp.routines['trial'].getComponentFromName('word')
+        text.params['text'].val = 'edited'
+        history.record("EDIT `word`")
+        states.append(self._xml())
+
+        exp.addRoutine('extra')
+        exp.flow.addRoutine(exp.routines['extra'], pos=1)
+        history.record("NEW Routine `extra`")
+        states.append(self._xml())
+
+        exp.flow.removeComponent(exp.routines['instruct'])
+        del exp.routines['instruct']
+        history.record("REMOVE Routine `instruct`")
+        states.append(self._xml())
+
+        assert history.undoAction == "REMOVE Routine `instruct`"
+        assert history.redoAction is None
+        for level in [2, 1, 0]:
+            assert history.undo() is not None
+            assert self._xml() == states[level]
+        assert history.undo() is None
+        assert history.redoAction == "EDIT `word`"
+        for level in [1, 2, 3]:
+            assert history.redo() is not None
+            assert self._xml() == states[level]
+        assert history.redo() is None
+
+        # a new action after undo discards the orphaned states
+        history.undo()
+        history.undo()
+        exp.settings.params['expName'].val = 'renamed'
+        history.record("EDIT experiment settings")
+        assert len(history) == 3
+        assert not history.canRedo
+        history.undo()
+        assert self._xml() == states[1]
+
+    def test_sharing(self):
+        exp, history = self.exp, self.history
+        first = history._snapshots[-1]['units']
+        text = exp.routines['trial'].getComponentFromName('word')
+        text.params['text'].val = 'edited'
+        history.record("EDIT `word`")
+        second = history._snapshots[-1]['units']
+        # only the edited routine was copied again
+        for key in first:
+            if key == ('routine', 'trial'):
+                assert first[key][1] is not second[key][1]
+            else:
+                assert first[key][1] is second[key][1]
+
+        # undo keeps the unchanged live routines
+        instruct = exp.routines['instruct']
+        trial = exp.routines['trial']
+        history.undo()
+        assert exp.routines['instruct'] is instruct
+        assert exp.routines['trial'] is not trial
+        word = exp.routines['trial'].getComponentFromName('word')
+        assert word.params['text'].val != 'edited'
+        assert word.exp is exp
+
+    def test_limits(self):
+        exp, history = self.exp, self.history
+        history.maxLevels = 3
+        text = exp.routines['trial'].getComponentFromName('word')
+        for ii in range(5):
+            text.params['text'].val = 'edit%i' % ii
+            history.record("EDIT %i" % ii)
+        assert len(history) == 3
+
+        # memory cap always keeps the current state
+        history.maxLevels = None
+        history.maxMemory = 1
+        text.params['text'].val = 'last'
+        history.record("EDIT last")
+        assert len(history) == 1
+        assert not history.canUndo
+        assert history.memoryUsed > 0
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the lazy registry of Builder components
+"""
+from __future__ import print_function
+
+import os
+import sys
+import json
+import shutil
+from tempfile import mkdtemp
+
+from psychopy.experiment import components
+
+myCompSrc = """
+from psychopy.experiment.components import BaseComponent
+
+tooltip = 'my tooltip'
+
+
+class MyComponent(BaseComponent):
+    categories = ['Custom']
+"""
+
+
+class TestComponentRegistry(object):
+    def setup_method(self):
+        self.tmpDir = mkdtemp(prefix='psychopy-tests-components')
+        self.origManifest = components.manifestFile
+        self.origLoaded = components._manifest
+        components.manifestFile = os.path.join(self.tmpDir, 'manifest.json')
+        components._manifest = None
+        # as in prefs.builder['componentsFolders'], with the modules in a
+        # package of the same name
+        self.prefsFolder = os.path.join(self.tmpDir, 'myCompts')
+        self.folder = os.path.join(self.prefsFolder, 'myCompts')
+        os.makedirs(self.folder)
+        open(os.path.join(self.folder, '__init__.py'), 'w').close()
+        with open(os.path.join(self.folder, 'myComp.py'), 'w') as f:
+            f.write(myCompSrc)
+
+    def teardown_method(self):
+        components.manifestFile = self.origManifest
+        components._manifest = self.origLoaded
+        sys.modules.pop('myCompts.myComp', None)
+        sys.modules.pop('myCompts', None)
+        sys.path.remove(self.prefsFolder)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_lazy(self):
+        allComps = components.getAllComponents([self.prefsFolder],
+                                               fetchIcons=False)
+        assert 'MyComponent' in allComps and 'TextComponent' in allComps
+        # nothing of the user folder has been imported yet
+        assert not allComps.isLoaded('MyComponent')
+        assert 'myCompts.myComp' not in sys.modules
+        assert 'MyComponent' not in components.tooltips
+
+        myComp = allComps['MyComponent']
+        assert myComp.__name__ == 'MyComponent'
+        assert allComps.isLoaded('MyComponent')
+        assert components.tooltips['MyComponent'] == 'my tooltip'
+        assert allComps.get('NoSuchComponent') is None
+
+        # the registry is a copy, so can be changed
+        del allComps['TextComponent']
+        assert 'TextComponent' in components.getComponents(fetchIcons=False)
+
+    def test_unloadable(self):
+        # a Component whose module can't be imported is never listed
+        with open(os.path.join(self.folder, 'broken.py'), 'w') as f:
+            f.write('import noSuchModuleForTests\n\n\n'
+                    'class BrokenComponent(object):\n    pass\n')
+        found = components.getComponents(self.prefsFolder)
+        assert 'BrokenComponent' in found  # not imported yet
+        assert list(found) == ['MyComponent']
+        assert 'BrokenComponent' not in found
+        assert found.get('BrokenComponent') is None
+        for name in found:
+            assert found[name].__name__ == name
+        # and iterating loads the others, so their tooltips are there
+        assert components.tooltips['MyComponent'] == 'my tooltip'
+
+        found = components.getComponents(self.prefsFolder)
+        assert found.get('BrokenComponent') is None
+        assert len(found) == 1 and list(found.items())[0][0] == 'MyComponent'
+        sys.modules.pop('myCompts.broken', None)
+
+    def test_manifest(self):
+        components.getComponents(self.prefsFolder)
+        with open(components.manifestFile) as f:
+            manifest = json.load(f)
+        entries = manifest['folders'][self.folder]
+        assert entries['myCompts.myComp'][1] == ['MyComponent']
+
+        # the manifest is read again in a new session, and updated when
+        # files change
+        components._manifest = None
+        with open(os.path.join(self.folder, 'myComp.py'), 'a') as f:
+            f.write('\n\nclass OtherComponent(MyComponent):\n    pass\n')
+        found = components.getComponents(self.prefsFolder)
+        assert sorted(found) == ['MyComponent', 'OtherComponent']
+        os.remove(os.path.join(self.folder, 'myComp.py'))
+        assert len(components.getComponents(self.prefsFolder)) == 0
@@ -0,0 +1,71 @@
+from __future__ import print_function
+from builtins import object
+
+import hashlib
+import os
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
+import psychopy.experiment
+from psychopy.experiment.loops import TrialHandler
+from psychopy.experiment.resources import ResourceScanner
+
+
+def _write(filename, text):
+    with open(filename, 'w') as f:
+        f.write(text)
+
+
+class TestResources(object):
+    def setup_method(self):
+        self.tmp_dir = mkdtemp(prefix='psychopy-tests-resources')
+        d = self.tmp_dir
+        os.mkdir(join(d, 'stims'))
+        for name in ['a.png', 'b.png', 'c.png']:
+            _write(join(d, 'stims', name), name * 10)
+        # outer.csv -> inner.csv -> outer.csv is a cycle
+        _write(join(d, 'outer.csv'),
+               'image,subConds\nstims/a.png,inner.csv\nstims/b.png,\n')
+        _write(join(d, 'inner.csv'),
+               'image,back\nstims/c.png,outer.csv\nstims/a.png,\n')
+
+        exp = psychopy.experiment.Experiment()
+        exp.filename = join(d, 'test.psyexp')
+        exp.addRoutine('trial')
+        exp.flow.addRoutine(exp.routines['trial'], 0)
+        # two loops using the same conditions file
+        for name in ['trials', 'practice']:
+            loop = TrialHandler(exp, name, conditionsFile='outer.csv')
+            exp.flow.addLoop(loop, 0, len(exp.flow))
+        imageComp = psychopy.experiment.getAllComponents()['ImageComponent']
+        img = imageComp(exp, parentName='trial', image='stims/b.png')
+        exp.routines['trial'].addComponent(img)
+        self.exp = exp
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_getResourceFiles(self):
+        resources = self.exp.getResourceFiles()
+        rels = [thisFile['rel'] for thisFile in resources]
+        assert rels == ['outer.csv', 'stims/a.png', 'inner.csv',
+                        'stims/c.png', 'stims/b.png']
+        for thisFile in resources:
+            assert thisFile['abs'] == os.path.normpath(
+                join(self.tmp_dir, thisFile['rel']))
+            assert thisFile['size'] == os.path.getsize(thisFile['abs'])
+
+    def test_cachesAndManifest(self):
+        scanner = ResourceScanner(self.exp)
+        manifest = scanner.getManifest()
+        # each conditions file was parsed once
+        assert sorted(scanner._condsVals) == [join(self.tmp_dir, 'inner.csv'),
+                                              join(self.tmp_dir, 'outer.csv')]
+        for thisFile in manifest:
+            with open(thisFile['abs'], 'rb') as f:
+                assert thisFile['hash'] == hashlib.md5(f.read()).hexdigest()
+        noHashes = ResourceScanner(self.exp, nThreads=1).getManifest(
+            hashes=False)
+        assert [f['abs'] for f in noHashes] == [f['abs'] for f in manifest]
+        assert 'hash' not in noHashes[0]
@@ -0,0 +1,86 @@
+"""Test StairSimulator against StairHandler"""
+
+from __future__ import division, print_function
+
+from builtins import range
+import numpy as np
+import pytest
+
+from psychopy import data
+
+
+def _runStairHandler(observer, uniforms, obsN, **kwargs):
+    """Run a single StairHandler with responses taken from the same
+    uniform deviates that StairSimulator uses for observer `obsN`
+    """
+    maxTrials = kwargs.pop('maxTrials')
+    stairs = data.StairHandler(autoLog=False, **kwargs)
+    for trialN, intensity in enumerate(stairs):
+        assert trialN < maxTrials
+        pCorrect = observer.pCorrect(intensity)
+        if pCorrect.ndim:
+            pCorrect = pCorrect[obsN]
+        stairs.addResponse(int(uniforms[trialN, obsN] < pCorrect))
+    return stairs
+
+
+@pytest.mark.parametrize('kwargs', [
+    dict(startVal=0.8, stepSizes=[8, 4, 4, 2, 2, 1], nTrials=30,
+         nUp=1, nDown=3, stepType='db', minVal=0, maxVal=1),
+    dict(startVal=0.5, stepSizes=0.05, nReversals=8, nTrials=10,
+         nUp=1, nDown=2, stepType='lin', minVal=0, maxVal=1),
+    dict(startVal=0.3, stepSizes=[0.4, 0.2, 0.1], nTrials=20,
+         nUp=2, nDown=2, stepType='log', applyInitialRule=False),
+])
+def test_agreesWithStairHandler(kwargs):
+    nObs = 40
+    seed = 100
+    observer = data.PsychometricObserver(
+        threshold=np.linspace(0.05, 0.4, nObs), slope=3.0, chance=0.5)
+    sim = data.StairSimulator(maxTrials=500, **kwargs)
+    sim.run(observer, nObservers=nObs, seed=seed)
+    assert sim.finished.all()
+
+    # the same stream of uniforms that the simulator drew
+    rng = np.random.RandomState(seed)
+    uniforms = np.array([rng.random_sample(nObs) for ii in range(500)])
+
+    for obsN in range(nObs):
+        stairs = _runStairHandler(observer, uniforms, obsN,
+                                  maxTrials=500, **kwargs)
+        nRun = sim.nTrialsRun[obsN]
+        assert nRun == len(stairs.intensities)
+        assert np.allclose(sim.intensities[obsN, :nRun], stairs.intensities)
+        assert list(sim.responses[obsN, :nRun]) == stairs.data
+        assert list(sim.reversalPoints[obsN]) == stairs.reversalPoints
+        assert np.allclose(sim.reversalIntensities[obsN],
+                           stairs.reversalIntensities)
+        assert np.isnan(sim.intensities[obsN, nRun:]).all()
+
+
+def test_thresholds():
+    nObs = 2000
+    observer = data.PsychometricObserver(threshold=0.1, slope=3.5)
+    sim = data.StairSimulator(startVal=0.5, stepSizes=[8, 4, 4, 2, 2, 1],
+                              nReversals=14, nTrials=40, nUp=1, nDown=3,
+                              stepType='db', minVal=0, maxVal=1)
+    sim.run(observer, nObservers=nObs, seed=1)
+    thresholds = sim.thresholds(nLast=6)
+    assert thresholds.shape == (nObs,)
+    for obsN in range(0, nObs, 97):
+        expected = np.mean(sim.reversalIntensities[obsN][-6:])
+        assert np.allclose(thresholds[obsN], expected)
+    # 3-down/1-up converges near 79% correct, i.e. around the threshold
+    assert 0.05 < np.median(thresholds) < 0.2
+
+
+def test_observer():
+    with pytest.raises(ValueError):
+        data.PsychometricObserver(threshold=1, function='gaussian')
+    for func in ['weibull', 'logistic', 'cumNormal']:
+        observer = data.PsychometricObserver(threshold=0.5, slope=10,
+                                             chance=0.5, lapse=0.02,
+                                             function=func)
+        pp = observer.pCorrect([0.0, 0.5, 1000])
+        assert pp[0] >= 0.5 and pp[0] < pp[1] < pp[2]
+        assert np.allclose(pp[2], 0.98)
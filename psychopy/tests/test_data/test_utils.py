@@ -55,6 +55,26 @@ class Test_utilsClass:
             utils.importConditions(fileName_docx)
         assert ('Your conditions file should be an ''xlsx, csv or pkl file') == str(errMsg.value)
 
+    def test_getConditionsFieldNames(self, tmpdir):
+        for ext in ['xlsx', 'xls', 'csv', 'pkl']:
+            fileName = os.path.join(fixturesPath, 'trialTypes.' + ext)
+            expected = utils.importConditions(fileName,
+                                              returnFieldNames=True)[1]
+            assert utils.getConditionsFieldNames(fileName) == expected
+        assert utils.getConditionsFieldNames(None) == []
+        with pytest.raises(ValueError):
+            utils.getConditionsFieldNames('raiseErrorfileName')
+
+        # the names are cached until the file changes
+        fileName = str(tmpdir.join('conds.csv'))
+        with open(fileName, 'w') as f:
+            f.write('ori,sf\n0,1\n')
+        assert utils.getConditionsFieldNames(fileName) == ['ori', 'sf']
+        with open(fileName, 'w') as f:
+            f.write('ori,sf,bad name\n0,1,2\n')
+        with pytest.raises(ValueError):
+            utils.getConditionsFieldNames(fileName)
+
     def test_isValidVariableName(self):
         assert utils.isValidVariableName('Name') == (True, '')
         assert utils.isValidVariableName('a_b_c') == (True, '')
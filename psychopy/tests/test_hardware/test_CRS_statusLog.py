@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Tests of decoding Bits# / Display++ status reports, from a synthetic
+dump of the serial output (no hardware needed)
+"""
+from __future__ import division
+
+import numpy as np
+
+from psychopy.hardware.crs.bits import parseStatusBuffer, extractStatusEvents
+
+
+def _statusLine(sample, DIN=(1,) * 10, IR=(1,) * 6, trigIn=0, ADC=(0.0,) * 6):
+    fields = [sample, sample * 0.002, trigIn] + list(DIN) + list(IR) + \
+        ['%.3f' % v for v in ADC]
+    return '#sample;' + ';'.join(str(f) for f in fields)
+
+
+def test_parseStatusBuffer():
+    DIN = (1, 0, 1, 1, 1, 1, 1, 1, 1, 0)
+    lines = [_statusLine(0), '$touch;1;2;3', _statusLine(1, DIN=DIN, trigIn=1),
+             _statusLine(2, ADC=(1.25, 0, 0, 0, 0, -2.5))]
+    data = ('\r'.join(lines) + '\r#sample;3;0.0').encode('utf-8')
+    values, remainder = parseStatusBuffer(data)
+    assert remainder == '#sample;3;0.0'
+    assert list(values['sample']) == [0, 1, 2]
+    assert np.allclose(values['time'], [0, 0.002, 0.004])
+    assert list(values['trigIn']) == [0, 1, 0]
+    assert list(values['DIN'][1]) == list(DIN)
+    assert values['DWORD'][0] == 0b1111111111
+    assert values['DWORD'][1] == 0b0111111101
+    assert list(values['ADC'][2]) == [1.25, 0, 0, 0, 0, -2.5]
+
+    # the remainder is completed by the next buffer
+    more, remainder = parseStatusBuffer(
+        remainder + ';0' * 23 + '\r' + _statusLine(4) + '\r')
+    assert list(more['sample']) == [3, 4] and remainder == ''
+
+
+def test_extractStatusEvents():
+    DIN = (0,) + (1,) * 9
+    IR = (1, 1, 0, 1, 1, 1)
+    lines = [_statusLine(0),
+             _statusLine(1, DIN=DIN, IR=IR),
+             _statusLine(2, DIN=DIN, IR=IR, trigIn=1,
+                         ADC=(0.5, 0, 0, 0, 0, 0)),
+             _statusLine(3, ADC=(2.0, 0, 0, 0, 0, 0)),
+             _statusLine(4, ADC=(2.5, 0, 0, 0, 0, -1.5))]
+    values, _ = parseStatusBuffer('\r'.join(lines) + '\r')
+    events = extractStatusEvents(values, threshold=1.0)
+    assert [(e['source'], e['input'], e['dir']) for e in events] == [
+        ('DIN', 0, 'down'), ('IR', 2, 'down'),
+        ('Trigger', 0, 'up'),
+        ('DIN', 0, 'up'), ('IR', 2, 'up'), ('ADC', 0, 'up'),
+        ('Trigger', 0, 'down'),
+        ('ADC', 5, 'down')]
+    assert np.allclose(events['time'], [0.002, 0.002, 0.004, 0.006, 0.006,
+                                        0.006, 0.006, 0.008])
+
+    downs = extractStatusEvents(values, threshold=1.0, mode=['down'])
+    assert list(downs['dir']) == ['down'] * 4
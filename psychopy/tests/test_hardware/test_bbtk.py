@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for decoding the data of the BlackBoxToolkit from byte dumps, against
+the line by line parser that BlackBoxToolkit.getEvents used before
+"""
+from __future__ import division
+
+import numpy as np
+import pytest
+
+from psychopy.hardware import bbtk
+
+dump = (b'SDAT;\r\n'
+        b'4;\r\n'
+        b'2000000;\r\n'
+        b'4;\r\n'
+        b'000000000000 000000000000;\r\n'
+        b'000000010000 000000016667;\r\n'
+        b'100000010001 000000250000;\r\n'
+        b'000000000001 000001000000;\r\n'
+        b'EDAT;\r\n')
+
+
+def _oldParse(lines):
+    """The events as parsed by the old BlackBoxToolkit.getEvents"""
+    events = []
+    lastState = None
+    for line in lines:
+        state = line[:12]
+        timeSecs = int(line[-14:-2]) / 10.0**6
+        if lastState is None:
+            events.append({'evt': '', 'state': state, 'time': timeSecs})
+        else:
+            for n in bbtk.evtChannels:
+                if state[n] != lastState[n]:
+                    if state[n:n + 1] == b'1':
+                        evt = bbtk.evtChannels[n] + "_on"
+                    else:
+                        evt = bbtk.evtChannels[n] + "_off"
+                    events.append({'evt': evt, 'state': state,
+                                   'time': timeSecs})
+        lastState = events[-1]['state']
+    return events
+
+
+def test_decodeData():
+    nEvents, samples = bbtk.decodeData(dump)
+    assert nEvents == 4
+    assert samples.dtype == bbtk.sampleDtype
+    assert samples['time'].tolist() == [0.0, 0.016667, 0.25, 1.0]
+    # bit n is channel n (Key4 is the first character)
+    assert samples['state'].tolist() == [0, 1 << 7, 1 | 1 << 7 | 1 << 11,
+                                         1 << 11]
+
+    events = bbtk.getStateChanges(samples)
+    assert [(bbtk.evtChannels[e['channel']], bool(e['on']), e['time'])
+            for e in events] == [('Opto1', True, 0.016667),
+                                 ('Key4', True, 0.25),
+                                 ('Mic1', True, 0.25),
+                                 ('Key4', False, 1.0),
+                                 ('Opto1', False, 1.0)]
+    lines = dump.split(b'\n')[4:-2]
+    assert bbtk.eventsAsDicts(samples, events) == _oldParse(
+        [line.replace(b';\r', b';') + b'\n' for line in lines])
+
+    # without the SDAT line or the end, and with other line endings
+    body = dump.replace(b';\r\n', b';\n')
+    body = body[body.find(b'\n') + 1:body.find(b'EDAT')]
+    assert np.array_equal(bbtk.decodeData(body)[1], samples)
+    # lines of different widths
+    body = body.replace(b' 000000016667', b'    16667')
+    assert np.array_equal(bbtk.decodeData(body)[1], samples)
+    # a dump with no events
+    nEvents, samples = bbtk.decodeData(b'SDAT;\n0;\n0;\n0;\nEDAT;\n')
+    assert nEvents == 0 and len(samples) == 0
+    assert bbtk.eventsAsDicts(samples) == []
+
+    with pytest.raises(ValueError):
+        bbtk.decodeData(dump.replace(b'100000010001', b'1000000100x1'))
+
+
+def test_sameAsBefore():
+    rng = np.random.RandomState(0)
+    nLines = 2000
+    states = rng.randint(0, 2, size=(nLines, 12)) * (rng.rand(nLines, 1) > 0.5)
+    times = np.cumsum(rng.randint(1, 10**5, size=nLines))
+    lines = [b''.join(b'1' if s else b'0' for s in state) +
+             b' %012i;\n' % t for state, t in zip(states, times)]
+    data = b'SDAT;\n%i;\n0;\n0;\n' % nLines + b''.join(lines) + b'EDAT;\n'
+
+    nEvents, samples = bbtk.decodeData(data)
+    assert nEvents == len(samples) == nLines
+    assert bbtk.eventsAsDicts(samples) == _oldParse(lines)
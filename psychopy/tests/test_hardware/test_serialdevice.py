@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the background reader of psychopy.hardware.serialdevice, using
+pyserial's loop:// URL (everything written is read back)
+"""
+from __future__ import print_function
+
+import time
+import pytest
+
+from psychopy import core
+from psychopy.hardware.serialdevice import SerialDevice
+
+serial = pytest.importorskip('serial')
+
+
+def _waitFor(func, timeout=1.0):
+    """Wait until func() returns something true, and return it"""
+    endTime = time.time() + timeout
+    while time.time() < endTime:
+        result = func()
+        if result:
+            return result
+        time.sleep(0.005)
+    return func()
+
+
+class TestSerialDevice(object):
+    def setup_method(self):
+        self.device = SerialDevice('loop://', checkAwake=False,
+                                   backgroundReader=True, bufferSize=5)
+        assert self.device.isReading
+
+    def teardown_method(self):
+        self.device.stopReader()
+        self.device.com.close()
+
+    def test_getLines(self):
+        device = self.device
+        t0 = core.getTime()
+        device.sendMessage(b'first')
+        device.com.write(b'second\nthi')  # the last line isn't complete
+        lines = _waitFor(lambda: len(device.getLines()) == 2 and
+                         device.getLines(timeStamped=True))
+        assert [line for t, line in lines] == [b'first', b'second']
+        assert t0 <= lines[0][0] <= lines[1][0] <= core.getTime()
+        # lines aren't removed, but can be got since a time
+        assert device.getLines() == [b'first', b'second']
+        assert device.getLines(since=lines[-1][0]) == []
+        device.com.write(b'rd\n')
+        assert _waitFor(lambda: device.getLines(since=lines[-1][0])) == \
+            [b'third']
+        assert device.getBytes() == b'first\nsecond\nthird\n'
+
+        # the buffer is bounded
+        for n in range(10):
+            device.sendMessage(b'line%i' % n)
+        assert _waitFor(lambda: device.getLines()[-1:] == [b'line9'])
+        assert device.getLines() == [b'line%i' % n for n in range(5, 10)]
+        device.clearBuffer()
+        assert device.getLines() == [] and device.getBytes() == b''
+
+    def test_getResponse(self):
+        device = self.device
+        device.sendMessage(b'one')
+        device.sendMessage(b'two')
+        assert device.getResponse(timeout=1) == b'one\n'
+        assert device.getResponse(timeout=1) == b'two\n'
+        assert device.getResponse(timeout=0.01) == b''
+        device.sendMessage(b'three')
+        device.sendMessage(b'four')
+        assert device.getResponse(length=2, timeout=0.1) == \
+            [b'three\n', b'four\n']
+        # the lines have been returned, so there are no bytes left
+        assert device.getResponse(length=-1) == b''
+
+        # a line that hasn't ended by the timeout is returned as it is
+        device.com.write(b'fi')
+        assert _waitFor(lambda: device.getBytes().endswith(b'fi'))
+        assert device.getResponse(timeout=0.05) == b'fi'
+        device.com.write(b've\nsix\nsev')
+        assert device.getResponse(timeout=1) == b've\n'
+        assert _waitFor(lambda: device.getBytes().endswith(b'sev'))
+        assert device.getResponse(length=-1) == b'six\nsev'
+        device.com.write(b'en\neight')
+        assert _waitFor(lambda: device.getBytes().endswith(b'eight'))
+        assert device.getResponse(length=2, timeout=0.05) == \
+            [b'en\n', b'eight']
+        assert device.getResponse(length=2, timeout=0.01) == []
+
+        # reading the port directly again
+        device.stopReader()
+        assert not device.isReading
+        device.sendMessage(b'five')
+        assert device.getResponse(timeout=1) == b'five\n'
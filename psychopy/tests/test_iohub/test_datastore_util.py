@@ -0,0 +1,229 @@
+""" Test getEventAttributeValues of the iohub ExperimentDataAccessUtility,
+and the interval join it uses, against the query per condition variable
+row (and per attribute) that it replaces
+"""
+from __future__ import division
+
+import os
+
+import numpy as np
+import pytest
+
+tables = pytest.importorskip('tables')
+
+from psychopy.iohub.datastore import (ClassTableMappings, ExperimentMetaData,
+                                      SessionMetaData)
+from psychopy.iohub.datastore import util
+from psychopy.iohub.datastore.util import (ExperimentDataAccessUtility,
+                                           ExperimentDataAccessException,
+                                           _intervalJoin)
+
+PRESS = 22
+RELEASE = 23
+START = dict(time=('>=', '@TRIAL_START@'))
+END = dict(time=('<=', '@TRIAL_END@'))
+
+
+class EventRow(tables.IsDescription):
+    experiment_id = tables.UInt32Col(pos=1)
+    session_id = tables.UInt32Col(pos=2)
+    type = tables.UInt8Col(pos=3)
+    filter_id = tables.Int16Col(pos=4)
+    time = tables.Float64Col(pos=5)
+    key_id = tables.UInt32Col(pos=6)
+
+
+def makeHubFile(folder, name='events.hdf5', sortedTimes=False):
+    """A DataStore file with 2 sessions of random key events and trials
+    whose start and end times are random, overlapping, touching, or on the
+    time of an event."""
+    rng = np.random.RandomState(0)
+    hubFile = tables.open_file(os.path.join(folder, name), 'w')
+    root = hubFile.root
+    mappings = hubFile.create_table(root, 'class_table_mapping',
+                                    ClassTableMappings)
+    dc = hubFile.create_group(root, 'data_collection')
+    events = hubFile.create_group(dc, 'events')
+    keyboard = hubFile.create_group(events, 'keyboard')
+    cvs = hubFile.create_group(dc, 'condition_variables')
+
+    experiments = hubFile.create_table(dc, 'experiment_meta_data',
+                                       ExperimentMetaData)
+    experiments.append([(1, b'test', b'', b'', b'1', 2)])
+    sessions = hubFile.create_table(dc, 'session_meta_data', SessionMetaData)
+    sessions.append([(1, 1, b's1', b'', b'', b'{}'),
+                     (2, 1, b's2', b'', b'', b'{}')])
+
+    table = hubFile.create_table(keyboard, 'KeyboardInputEvent', EventRow)
+    mappings.append([(PRESS, 1, b'KeyboardPressEvent',
+                      table._v_pathname.encode('utf-8')),
+                     (RELEASE, 1, b'KeyboardReleaseEvent',
+                      table._v_pathname.encode('utf-8'))])
+    n = 2000
+    times = rng.randint(0, 5000, size=n) / 100.0
+    if sortedTimes:
+        times.sort()
+    rows = np.zeros(n, dtype=table.dtype)
+    rows['experiment_id'] = 1
+    rows['session_id'] = rng.randint(1, 3, size=n)
+    rows['type'] = rng.choice([PRESS, RELEASE], size=n)
+    rows['filter_id'] = rng.randint(0, 2, size=n)
+    rows['time'] = times
+    rows['key_id'] = np.arange(n)
+    table.append(rows)
+
+    starts = list(rng.randint(0, 5000, size=20) / 100.0)
+    ends = [start + rng.randint(0, 500) / 100.0 for start in starts]
+    starts += [times[0], 10.0, 20.0, 30.0, 45.0]
+    ends += [times[0], 20.0, 30.0, 25.0, 100.0]
+    cvRows = np.zeros(len(starts), dtype=[('experiment_id', 'u4'),
+                                          ('session_id', 'u4'),
+                                          ('trial', 'u4'),
+                                          ('TRIAL_START', 'f8'),
+                                          ('TRIAL_END', 'f8')])
+    cvRows['experiment_id'] = 1
+    cvRows['session_id'] = rng.randint(1, 3, size=len(starts))
+    cvRows['trial'] = np.arange(len(starts))
+    cvRows['TRIAL_START'] = starts
+    cvRows['TRIAL_END'] = ends
+    hubFile.create_table(cvs, 'EXP_CV_1', cvRows)
+    hubFile.close()
+    return name
+
+
+def oldGetEventAttributeValues(dataUtil, event_type_id, event_attribute_names,
+                               filter_id=None, startConditions=None,
+                               endConditions=None):
+    """getEventAttributeValues, as it was: a query per condition variable
+    row and per attribute"""
+    table = dataUtil.getEventTable(event_type_id)
+    cvNames = dataUtil.getConditionVariableNames()
+    results = []
+    for cv in dataUtil.getConditionVariables():
+        wclause = '( experiment_id == {0} ) & ( session_id == {1} )'.format(
+            dataUtil._experimentID, cv.session_id)
+        wclause += ' & ( type == {0} ) '.format(event_type_id)
+        if filter_id is not None:
+            wclause += '& ( filter_id == {0} ) '.format(filter_id)
+        for conditions, join in [(startConditions, '& ('),
+                                 (endConditions, ' & (')]:
+            if conditions is not None:
+                wclause += join
+                for name, (avComparison, value) in conditions.items():
+                    value = dataUtil.getValuesForVariables(cv, value, cvNames)
+                    wclause += ' ( {0} {1} {2} ) & '.format(
+                        name, avComparison, value)
+                wclause = wclause[:-3]
+                wclause += ' ) '
+        results.append([table.read_where(wclause, field=ename)
+                        for ename in event_attribute_names] + [wclause, cv])
+    return results
+
+
+def assertSameResults(results, expected):
+    assert len(results) == len(expected)
+    for result, old in zip(results, expected):
+        assert len(result) == len(old)
+        for values, oldValues in zip(result[:-2], old[:-2]):
+            assert np.array_equal(values, oldValues)
+        assert tuple(result[-2:]) == tuple(old[-2:])
+
+
+def test_intervalJoin():
+    rng = np.random.RandomState(1)
+    for values in [rng.randint(0, 50, size=500) / 2.0,
+                   np.sort(rng.randint(0, 50, size=500)), np.array([])]:
+        bounds = [(rng.randint(-5, 30), rng.randint(2), None, False)
+                  for i in range(10)]
+        bounds += [(lower, lowerInclusive, lower + rng.randint(0, 10),
+                    rng.randint(2))
+                   for lower, lowerInclusive, _, _ in bounds]
+        bounds += [(None, False, 10, True), (None, False, None, False),
+                   (20, True, 10, True)]
+        for rows, (lower, lowerIn, upper, upperIn) in zip(
+                _intervalJoin(values, bounds), bounds):
+            mask = np.ones(len(values), dtype=bool)
+            if lower is not None:
+                mask &= (values >= lower) if lowerIn else (values > lower)
+            if upper is not None:
+                mask &= (values <= upper) if upperIn else (values < upper)
+            assert np.array_equal(np.arange(len(values))[rows],
+                                  np.flatnonzero(mask))
+
+
+@pytest.mark.parametrize('sortedTimes', [False, True])
+def test_getEventAttributeValues(tmpdir, sortedTimes):
+    name = makeHubFile(str(tmpdir), sortedTimes=sortedTimes)
+    dataUtil = ExperimentDataAccessUtility(str(tmpdir), name)
+    try:
+        names = ['time', 'key_id']
+        for kwargs in [dict(startConditions=START, endConditions=END),
+                       dict(startConditions=START, endConditions=END,
+                            filter_id=1),
+                       dict(startConditions=dict(time=('>', '@TRIAL_START@')),
+                            endConditions=dict(time=('<', '@TRIAL_END@'))),
+                       dict(startConditions=START),
+                       dict(endConditions=END),
+                       dict()]:
+            expected = oldGetEventAttributeValues(dataUtil, PRESS, names,
+                                                  **kwargs)
+            assert sum(len(old[0]) for old in expected) > 0
+            assertSameResults(dataUtil.getEventAttributeValues(
+                PRESS, names, **kwargs), expected)
+            # the same rows from one query per condition variable row
+            assertSameResults(dataUtil.getEventAttributeValues(
+                PRESS, names, intervalJoin=False, **kwargs), expected)
+
+        # conditions that can't be joined on one column are queried per row
+        for start in [dict(time=('>=', '@TRIAL_START@'),
+                           key_id=('>=', '@trial@')),
+                      dict(time=('==', '@TRIAL_START@'))]:
+            expected = oldGetEventAttributeValues(
+                dataUtil, RELEASE, ['key_id'], startConditions=start,
+                endConditions=END)
+            assertSameResults(dataUtil.getEventAttributeValues(
+                RELEASE, 'key_id', startConditions=start, endConditions=END),
+                expected)
+    finally:
+        dataUtil.close()
+
+
+def test_createIndexes(tmpdir):
+    name = makeHubFile(str(tmpdir))
+    dataUtil = ExperimentDataAccessUtility(str(tmpdir), name)
+    with pytest.raises(ExperimentDataAccessException):
+        dataUtil.createIndexes()
+    dataUtil.close()
+
+    dataUtil = ExperimentDataAccessUtility(str(tmpdir), name, mode='a')
+    table = dataUtil.getEventTable(PRESS)
+    assert not table.cols.time.is_indexed
+    dataUtil.createIndexes(columns=('time', 'no_such_column'))
+    assert table.cols.time.is_indexed
+    assert not table.cols.session_id.is_indexed
+    dataUtil.createIndexes()  # time is skipped, being indexed
+    assert table.cols.session_id.is_indexed
+    expected = oldGetEventAttributeValues(dataUtil, PRESS, ['key_id'],
+                                          startConditions=START,
+                                          endConditions=END)
+    assertSameResults(dataUtil.getEventAttributeValues(
+        PRESS, ['key_id'], startConditions=START, endConditions=END),
+        expected)
+    dataUtil.close()
+
+    # indexes are saved in the file, on closing it with indexOnClose
+    name = makeHubFile(str(tmpdir), name='other.hdf5')
+    dataUtil = ExperimentDataAccessUtility(str(tmpdir), name, mode='a',
+                                           indexOnClose=True)
+    dataUtil.close()
+    dataUtil = ExperimentDataAccessUtility(str(tmpdir), name)
+    try:
+        table = dataUtil.getEventTable(PRESS)
+        assert table.cols.time.is_indexed
+        assert table.cols.session_id.is_indexed
+        assertSameResults(dataUtil.getEventAttributeValues(
+            PRESS, ['key_id'], startConditions=START, endConditions=END),
+            expected)
+    finally:
+        dataUtil.close()
+    assert not util._hubFiles
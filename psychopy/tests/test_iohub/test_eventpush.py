@@ -0,0 +1,131 @@
+""" Test the new event notifications of the iohub server, without starting
+a server process
+"""
+from __future__ import division
+
+import socket
+from collections import deque
+
+import msgpack
+import pytest
+
+from psychopy.iohub.constants import EventConstants
+from psychopy.iohub.devices import DeviceEvent
+from psychopy.iohub.server import ioServer, udpServer
+
+PRESS = EventConstants.KEYBOARD_PRESS
+MOVE = EventConstants.MOUSE_MOVE
+
+
+def makeHub():
+    """An ioServer with no devices, without running its __init__"""
+    hub = ioServer.__new__(ioServer)
+    hub.devices = []
+    hub.deviceMonitors = []
+    hub._hookManager = hub.dsfile = None
+    hub.eventBuffer = deque(maxlen=32)
+    hub._event_subscribers = {}
+    hub._session_id = hub._experiment_id = None
+    return hub
+
+
+def makeEvent(etype, time=0.0):
+    event = [0] * (max(DeviceEvent.EVENT_TYPE_ID_INDEX,
+                       DeviceEvent.EVENT_HUB_TIME_INDEX) + 1)
+    event[DeviceEvent.EVENT_TYPE_ID_INDEX] = etype
+    event[DeviceEvent.EVENT_HUB_TIME_INDEX] = time
+    return event
+
+
+def udpSocket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(1.0)
+    return sock
+
+
+def receive(sock):
+    unpacker = msgpack.Unpacker(use_list=True, raw=False)
+    unpacker.feed(sock.recv(1024))
+    return unpacker.unpack()
+
+
+def test_subscriptions():
+    hub = makeHub()
+    presses = ('127.0.0.1', 5000)
+    everything = ('127.0.0.1', 5001)
+    hub.subscribeToEvents(list(presses), [PRESS])
+    hub.subscribeToEvents(everything)
+    assert hub._event_subscribers == {presses: [set([PRESS]), 0],
+                                      everything: [None, 0]}
+
+    for etype in [PRESS, MOVE, MOVE]:
+        hub._handleEvent(makeEvent(etype))
+    assert len(hub.eventBuffer) == 3
+    assert hub._event_subscribers[presses][1] == 1
+    assert hub._event_subscribers[everything][1] == 3
+
+    # counts are reset when the event buffer is read or cleared
+    hub.resetEventNotifications()
+    assert [sub[1] for sub in hub._event_subscribers.values()] == [0, 0]
+    hub._handleEvent(makeEvent(PRESS))
+    assert hub.clearEventBuffer() == 4
+    assert [sub[1] for sub in hub._event_subscribers.values()] == [0, 0]
+
+    # subscribing again replaces the event types
+    hub.subscribeToEvents(presses, [MOVE])
+    hub._handleEvent(makeEvent(PRESS))
+    assert hub._event_subscribers[presses] == [set([MOVE]), 0]
+
+    hub.unsubscribeFromEvents(presses)
+    hub.unsubscribeFromEvents(presses)
+    assert list(hub._event_subscribers) == [everything]
+
+
+def test_sendEventNotifications():
+    hub = makeHub()
+    server = udpServer(hub, udpSocket())
+    client = udpSocket()
+    other = udpSocket()
+    try:
+        # subscribing as the client does, with the port to notify
+        server.handleRequest([b'SUBSCRIBE_EVENTS', client.getsockname()[1],
+                              [PRESS]], other.getsockname())
+        assert receive(other) == ['SUBSCRIBE_EVENTS_RESULT', True]
+        assert client.getsockname() in hub._event_subscribers
+        hub.subscribeToEvents(other.getsockname())
+        hub.subscribeToEvents(('256.0.0.1', 5000))
+
+        for etype in [MOVE, PRESS, PRESS]:
+            hub._handleEvent(makeEvent(etype))
+        server.sendEventNotifications(hub._event_subscribers)
+        assert receive(client) == ['EVENTS_READY', 2]
+        assert receive(other) == ['EVENTS_READY', 3]
+        # the unreachable subscriber is dropped, the others have been told
+        assert sorted(hub._event_subscribers) == sorted(
+            [client.getsockname(), other.getsockname()])
+        assert [sub[1] for sub in hub._event_subscribers.values()] == [0, 0]
+
+        # no notifications without new (matching) events
+        hub._handleEvent(makeEvent(MOVE))
+        server.sendEventNotifications(hub._event_subscribers)
+        assert receive(other) == ['EVENTS_READY', 1]
+        client.settimeout(0.05)
+        with pytest.raises(socket.timeout):
+            client.recv(1024)
+
+        # or once the events have been read
+        hub._handleEvent(makeEvent(PRESS))
+        server.handleRequest([b'GET_EVENTS'], other.getsockname())
+        assert receive(other)[0] == 'GET_EVENTS_RESULT'
+        server.sendEventNotifications(hub._event_subscribers)
+        with pytest.raises(socket.timeout):
+            client.recv(1024)
+
+        server.handleRequest([b'UNSUBSCRIBE_EVENTS', client.getsockname()[1]],
+                             other.getsockname())
+        assert receive(other) == ['UNSUBSCRIBE_EVENTS_RESULT', True]
+        assert list(hub._event_subscribers) == [other.getsockname()]
+    finally:
+        for sock in [server.socket, client, other]:
+            sock.close()
@@ -0,0 +1,144 @@
+""" Test the interest area and interest period filtering of iohub DataFrames
+against the row by row (and period by period) algorithms they replace.
+"""
+from __future__ import division
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('shapely')
+pytest.importorskip('tables')
+
+from psychopy.iohub.datastore.pandas.interestarea import (Polygon, Rectangle,
+                                                          Circle, Ellipse)
+from psychopy.iohub.datastore.pandas.interestperiod import \
+    ConditionVariableBasedIP
+
+
+def _oldContains(ia, x, y):
+    """Polygon.filter() mask, as it was (contains() for each row)"""
+    return np.array([ia.contains((xi, yi)) for xi, yi in zip(x, y)],
+                    dtype=bool)
+
+
+def _randomPolygon(rng, name):
+    """A random (often concave) star-shaped polygon"""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, size=rng.randint(3, 12)))
+    radii = rng.uniform(20, 200, size=len(angles))
+    center = rng.uniform(-300, 300, size=2)
+    points = center + np.column_stack([radii * np.cos(angles),
+                                       radii * np.sin(angles)])
+    return Polygon(name, points.round(rng.randint(0, 3)))
+
+
+def _testPoints(rng, ia, n=2000):
+    """Random points, plus points on the vertices, edges and bounding box"""
+    coords = np.asarray(ia.exterior.coords)
+    minx, miny, maxx, maxy = ia.bounds
+    x = [rng.uniform(minx - 50, maxx + 50, size=n)]
+    y = [rng.uniform(miny - 50, maxy + 50, size=n)]
+    x.append(coords[:, 0])
+    y.append(coords[:, 1])
+    for t in [0.5, 0.25, rng.uniform()]:
+        x.append(coords[:-1, 0] + t * np.diff(coords[:, 0]))
+        y.append(coords[:-1, 1] + t * np.diff(coords[:, 1]))
+    x.append([minx, maxx, (minx + maxx) / 2, (minx + maxx) / 2])
+    y.append([(miny + maxy) / 2, (miny + maxy) / 2, miny, maxy])
+    return np.concatenate(x), np.concatenate(y)
+
+
+def test_contains_points():
+    rng = np.random.RandomState(0)
+    areas = [Rectangle('rect', -10, -20, 30, 40),
+             Rectangle('cw', -10, -20, 30, 40, ccw=False),
+             Rectangle('touching', 30, -20, 50, 40),
+             Circle('circle', (5.5, -3.25), 25),
+             Ellipse('ellipse', (100, 50), 20, 60, 30)]
+    areas += [_randomPolygon(rng, 'random%i' % i) for i in range(20)]
+    for ia in areas:
+        x, y = _testPoints(rng, ia)
+        assert np.array_equal(ia.contains_points(x, y),
+                              _oldContains(ia, x, y)), ia.name
+
+    # a grid of integer points, many of them on the edges
+    x, y = [values.ravel() for values in np.mgrid[-15:60, -25:45]]
+    masks = [ia.contains_points(x, y) for ia in areas[:3]]
+    for ia, mask in zip(areas[:3], masks):
+        assert np.array_equal(mask, _oldContains(ia, x, y))
+    assert np.array_equal(masks[0], masks[1])
+    # the shared edge is in neither of the touching areas
+    assert not (masks[0] & masks[2]).any()
+    assert not masks[0][x == 30].any() and not masks[2][x == 30].any()
+
+    assert areas[0].contains_points([], []).shape == (0,)
+    assert not areas[0].contains_points([np.nan, 0], [0, np.nan]).any()
+
+
+def test_filter():
+    rng = np.random.RandomState(1)
+    ia = Circle('circle', (0, 0), 100)
+    df = pd.DataFrame({'x_position': rng.uniform(-150, 150, size=500),
+                       'y_position': rng.uniform(-150, 150, size=500),
+                       'time': np.arange(500.0)})
+    ia_df = ia.filter(df)
+    mask = _oldContains(ia, df['x_position'], df['y_position'])
+    assert ia_df['time'].tolist() == df['time'][mask].tolist()
+    assert (ia_df['ia_name'] == 'circle').all()
+    assert ia_df['ia_id_num'].tolist() == list(range(1, mask.sum() + 1))
+
+
+def _oldFind(ip, target):
+    """InterestPeriodDefinition.find(), as it was"""
+    df = target[:]
+    df['ip_id_num'] = np.nan
+    df['ip_id'] = ip.ipid
+    df['ip_name'] = ip.name
+    found = []
+    for group_id, group in df.groupby(level=[0, 1]):
+        for index, period in ip.ip_df.loc[[group_id]].iterrows():
+            in_ip = ((group['time'] >= period['start_time']) &
+                     (group['time'] <= period['end_time']))
+            group_in_ip = group[in_ip].copy()
+            group_in_ip['ip_id_num'] = period['ip_id_num']
+            found.append(group_in_ip)
+    return pd.concat(found)
+
+
+def _session_index(sessions):
+    return pd.MultiIndex.from_arrays([[1] * len(sessions), sessions],
+                                     names=['experiment_id', 'session_id'])
+
+
+def test_find():
+    rng = np.random.RandomState(2)
+    n = 3000
+    sessions = rng.randint(1, 4, size=n)
+    # unsorted, with repeated times
+    times = rng.randint(0, 1000, size=n) / 10.0
+    target = pd.DataFrame({'time': times, 'event_id': np.arange(n)},
+                          index=_session_index(sessions))
+
+    # random (overlapping) periods, and ones that touch or are empty
+    starts = list(rng.randint(0, 1000, size=30) / 10.0)
+    ends = [start + rng.randint(0, 100) / 10.0 for start in starts]
+    starts += [10.0, 20.0, 20.0, 50.0, 60.0]
+    ends += [20.0, 30.0, 20.0, 40.0, 200.0]
+    ip_sessions = list(rng.randint(1, 4, size=30)) + [1, 1, 2, 2, 3]
+    source = pd.DataFrame({'TRIAL_START': starts, 'TRIAL_END': ends},
+                          index=_session_index(ip_sessions))
+    source = source.sort_index(kind='mergesort')
+    ip = ConditionVariableBasedIP('trials', source_df=source,
+                                  start_col_name='TRIAL_START',
+                                  end_col_name='TRIAL_END')
+
+    found = ip.find(target)
+    expected = _oldFind(ip, target)
+    assert len(found) > 0
+    pd.testing.assert_frame_equal(found, expected, check_dtype=False)
+
+    # no events in sessions without interest periods
+    target.index = _session_index(sessions + 10)
+    found = ip.find(target)
+    assert len(found) == 0
+    assert list(found.columns) == list(expected.columns)
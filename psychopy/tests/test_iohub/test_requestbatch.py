@@ -0,0 +1,144 @@
+""" Test the queueing and packing of batched iohub client requests
+(no server needed)
+"""
+from __future__ import division
+
+import socket
+import threading
+import time
+
+import msgpack
+import pytest
+
+from psychopy.iohub import client
+from psychopy.iohub.client import RequestBatch, PendingReply, ioHubConnection
+from psychopy.iohub.errors import ioHubError
+from psychopy.iohub.net import UDPClientConnection
+
+
+def unpackMulti(packet):
+    unpacker = msgpack.Unpacker(use_list=True, raw=False)
+    unpacker.feed(packet)
+    return unpacker.unpack()
+
+
+def test_sizeTriggers():
+    batch = RequestBatch(max_requests=3, max_bytes=8000, max_delay=60.0)
+    assert not batch.isDue()
+    assert not batch.add(('RPC', 'getTime'))
+    assert not batch.add(('RPC', 'getTime'))
+    assert batch.add(('RPC', 'getTime'))
+    assert len(batch) == 3
+
+    batch = RequestBatch(max_requests=100, max_bytes=100, max_delay=60.0)
+    assert not batch.add(('EXP_DEVICE', 'EVENT_TX', ['x' * 40]))
+    assert batch.add(('EXP_DEVICE', 'EVENT_TX', ['x' * 40]))
+
+
+def test_delayTrigger():
+    batch = RequestBatch(max_requests=100, max_bytes=8000, max_delay=0.0)
+    assert batch.add(('RPC', 'getTime'))
+
+
+def test_delayTimer():
+    delayed = threading.Event()
+    batch = RequestBatch(max_requests=100, max_bytes=8000, max_delay=0.05,
+                         onDelay=delayed.set)
+    batch.add(('RPC', 'getTime'))
+    batch.add(('RPC', 'getTime'))
+    assert delayed.wait(1.0)
+
+    # no call once the queue has been taken
+    delayed.clear()
+    batch.add(('RPC', 'getTime'))
+    batch.take()
+    assert not delayed.wait(0.2)
+
+
+def test_take():
+    batch = RequestBatch(max_requests=100, max_bytes=200, max_delay=60.0)
+    requests = [['EXP_DEVICE', 'EVENT_TX', [[i, 'x' * 20]]] for i in range(10)]
+    for request in requests:
+        batch.add(request)
+    reply = PendingReply()
+    batch.add(['RPC', 'getTime'], reply)
+
+    packets = batch.take()
+    assert len(batch) == 0 and batch.take() == []
+    assert len(packets) > 1
+    sent = []
+    for packet, replies in packets:
+        assert len(packet) <= 200
+        request_type, want_reply, sub_requests = unpackMulti(packet)
+        assert request_type == 'MULTI'
+        assert want_reply == (reply in replies)
+        assert len(replies) == len(sub_requests)
+        sent.extend(sub_requests)
+    assert sent == requests + [['RPC', 'getTime']]
+    assert packets[-1][1][-1] is reply
+
+
+def test_pendingReply():
+    flushed = []
+    reply = PendingReply(lambda r: r[2])
+    reply._flush = lambda: (flushed.append(True),
+                            reply._setReply(['RPC_RESULT', 'getTime', 1.5]))
+    assert not reply.done()
+    assert reply.result() == 1.5
+    assert reply.result() == 1.5
+    assert reply.done() and len(flushed) == 1
+
+    reply = PendingReply()
+    reply._setReply('RPC_RUNTIME_ERROR')
+    with pytest.raises(ioHubError):
+        reply.result()
+
+
+def makeConnection(server):
+    """An ioHubConnection sending to the server socket, without starting an
+    iohub server process"""
+    hub = ioHubConnection.__new__(ioHubConnection)
+    hub._shutdown_attempted = False
+    hub._event_sock = None
+    hub.udp_client = UDPClientConnection(remote_port=server.getsockname()[1])
+    hub._requestLock = threading.RLock()
+    hub.requestBatch = RequestBatch(max_delay=0.05,
+                                    onDelay=hub._flushQueued)
+    return hub
+
+
+def test_connectionFlush():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(1.0)
+    hub = makeConnection(server)
+    try:
+        # messages are sent at once by default
+        assert hub.sendMessageEvent('sent')
+        request = unpackMulti(server.recv(8192))
+        assert request[:2] == ['EXP_DEVICE', 'EVENT_TX']
+        assert len(hub.requestBatch) == 0
+
+        # queued ones by the timer, when nothing else sends them
+        for text in ['queued', 'and batched']:
+            hub.sendMessageEvent(text, wait=False)
+        assert len(hub.requestBatch) == 2
+        start = time.time()
+        request_type, want_reply, requests = unpackMulti(server.recv(8192))
+        assert time.time() - start < 0.5
+        assert request_type == 'MULTI' and not want_reply
+        assert [r[1] for r in requests] == ['EVENT_TX', 'EVENT_TX']
+
+        # or at exit
+        hub.requestBatch.max_delay = 60.0
+        hub.sendMessageEvent('at exit', wait=False)
+        ioHubConnection.ACTIVE_CONNECTION = hub
+        client._flushActiveConnection()
+        assert unpackMulti(server.recv(8192))[0] == 'MULTI'
+        assert len(hub.requestBatch) == 0
+    finally:
+        ioHubConnection.ACTIVE_CONNECTION = None
+        hub.requestBatch.cancelTimer()
+        hub._shutdown_attempted = True  # nothing to shut down in __del__
+        hub.udp_client.close()
+        server.close()
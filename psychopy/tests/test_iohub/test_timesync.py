@@ -0,0 +1,94 @@
+""" Test the time sync model used with remote iohub servers, using
+simulated clocks (no server or network needed)
+"""
+from __future__ import division
+from builtins import object
+
+import numpy
+import pytest
+
+from psychopy.iohub.net import TimeSyncState
+
+
+class SimulatedSync(object):
+    """Sync samples between a local clock and a remote clock that runs
+    `drift` times as fast, offset by `offset` sec, with random network
+    delays."""
+    def __init__(self, drift=1.00002, offset=12.5, seed=0):
+        self.drift = drift
+        self.offset = offset
+        self.rng = numpy.random.RandomState(seed)
+        self.local = 100.0
+        self.delay = 0.0  # added to the time to the remote, and back
+
+    def remote(self, local):
+        return self.drift * local + self.offset
+
+    def sample(self, interval=0.2, outlier=False):
+        self.local += interval
+        # time to reach the remote, and to get back
+        out, back = self.rng.exponential(0.0002, 2) + 0.0001 + self.delay
+        if outlier:
+            out += 0.05  # e.g. a delayed packet
+        rtt = out + back
+        remote = self.remote(self.local + out)
+        return rtt, self.local + rtt / 2.0, remote
+
+
+def test_fit():
+    sim = SimulatedSync()
+    state = TimeSyncState(window=32)
+    for i in range(200):
+        state.addSample(*sim.sample())
+    assert state.sample_count == 32
+    assert abs(state.getDrift() - sim.drift) < 1e-5
+    now = sim.local
+    error = state.local2RemoteTime(now) - sim.remote(now)
+    assert abs(error) < 0.001
+    assert state.remote2LocalTime(sim.remote(now)) == pytest.approx(now,
+                                                                   abs=0.001)
+    assert 0 < state.getUncertainty(now) < 0.001
+    # extrapolating further from the samples is less certain
+    assert state.getUncertainty(now + 3600) > state.getUncertainty(now)
+
+
+def test_outliers():
+    sim = SimulatedSync()
+    state = TimeSyncState(window=16)
+    for i in range(100):
+        accepted = state.addSample(*sim.sample(outlier=(i % 10 == 9)))
+        if i % 10 == 9:
+            assert not accepted
+    assert 10 <= state.rejected_count < 15
+    now = sim.local
+    assert abs(state.local2RemoteTime(now) - sim.remote(now)) < 0.001
+
+
+def test_rttStep():
+    sim = SimulatedSync()
+    state = TimeSyncState(window=16)
+    for i in range(50):
+        state.addSample(*sim.sample())
+    # e.g. the network route changed: all later RTTs are ~50 times longer
+    sim.delay = 0.005
+    accepted = [state.addSample(*sim.sample()) for i in range(50)]
+    assert not accepted[0]
+    # accepted again once they are most of the recent samples
+    assert all(accepted[10:])
+    assert state.rejected_count < 10
+    assert state.getAccuracy() == pytest.approx(0.0053, abs=0.0005)
+    now = sim.local
+    assert abs(state.local2RemoteTime(now) - sim.remote(now)) < 0.001
+
+
+def test_fewSamples():
+    state = TimeSyncState()
+    assert state.getUncertainty() is None
+    assert state.getAccuracy() is None
+    state.addSample(0.001, 10.0, 15.0)
+    assert state.getDrift() == 1.0
+    assert state.getOffset() == 5.0
+    assert state.getUncertainty() == pytest.approx(0.0005)
+    state.addSample(0.001, 20.0, 25.001)
+    assert state.getDrift() == pytest.approx(1.0001)
+    assert state.local2RemoteTime(20.0) == pytest.approx(25.001)
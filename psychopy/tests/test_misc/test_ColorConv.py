@@ -1,5 +1,8 @@
 from psychopy.tools.colorspacetools import hsv2rgb
+from psychopy.tools import colorspacetools
+from psychopy.tools.coordinatetools import sph2cart
 import numpy
+import pytest
 
 #We need more tests of these conversion routines. Feel free to jump in and help! ;-)
 
@@ -40,5 +43,59 @@ def test_HSV_RGB():
     RGB = hsv2rgb(HSV)
     assert numpy.allclose(RGB,expectedRGB,0.0001)
 
+def _oldDkl2rgb(dkl_Nx3, conversionMatrix):
+    """dkl2rgb for Nx3 arrays, as it was"""
+    dkl_3xN = numpy.transpose(dkl_Nx3)
+    RG, BY, LUM = sph2cart(dkl_3xN[0, :], dkl_3xN[1, :], dkl_3xN[2, :])
+    return numpy.transpose(numpy.dot(conversionMatrix,
+                                     numpy.asarray([LUM, RG, BY])))
+
+
+def test_ColorPipeline():
+    rng = numpy.random.RandomState(0)
+    dkl = rng.uniform(-90, 90, size=(5000, 3))  # more than a block
+    matrix = rng.uniform(-1, 1, size=(3, 3))
+    expected = _oldDkl2rgb(dkl, matrix)
+    assert numpy.allclose(colorspacetools.dkl2rgb(dkl, matrix), expected)
+    assert numpy.allclose(colorspacetools.dkl2rgb(dkl[0], matrix),
+                          expected[0])
+    pipeline = colorspacetools.ColorPipeline('dkl', matrix)
+    # any leading shape, converted in place
+    colors = dkl.reshape(50, 20, 5, 3).astype('float32')
+    assert pipeline.apply(colors, out=colors) is colors
+    assert numpy.allclose(colors.reshape(-1, 3), expected, atol=1e-4)
+    assert colorspacetools.getColorPipeline('dkl', matrix) is \
+        colorspacetools.getColorPipeline('dkl', matrix.tolist())
+
+    lms = rng.uniform(size=(100, 3))
+    assert numpy.allclose(colorspacetools.lms2rgb(lms, matrix),
+                          numpy.dot(matrix, lms.T).T)
+    lum, lm, s = lms.T
+    assert numpy.allclose(
+        colorspacetools.ColorPipeline('dklCart', matrix)(lms),
+        colorspacetools.dklCart2rgb(lum, lm, s, matrix))
+
+    lab = numpy.column_stack([rng.uniform(0, 100, 100),
+                              rng.uniform(-50, 50, (100, 2))])
+    for clip in [False, True]:
+        pipeline = colorspacetools.ColorPipeline(
+            'cielab', transferFunc=colorspacetools.srgbTF, clip=clip)
+        assert numpy.allclose(
+            pipeline(lab),
+            colorspacetools.cielab2rgb(
+                lab, transferFunc=colorspacetools.srgbTF, clip=clip),
+            equal_nan=True)
+    lch = numpy.column_stack([lab[:, 0], numpy.hypot(lab[:, 1], lab[:, 2]),
+                              numpy.degrees(numpy.arctan2(lab[:, 2],
+                                                          lab[:, 1]))])
+    assert numpy.allclose(colorspacetools.ColorPipeline('cielch')(lch),
+                          colorspacetools.cielab2rgb(lab))
+
+    with pytest.raises(ValueError):
+        colorspacetools.ColorPipeline('hsv')
+    with pytest.raises(ValueError):
+        pipeline.apply(lab, out=numpy.zeros((100, 3), dtype=int))
+
+
 if __name__=='__main__':
     test_HSV_RGB()
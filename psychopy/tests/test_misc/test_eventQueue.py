@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the key and mouse buffers of psychopy.event, using synthetic
+events (no window needed)
+
+"""
+from __future__ import division
+
+import pytest
+
+from psychopy import event, core
+
+
+class TestEventQueue(object):
+    def setup_method(self):
+        event.clearEvents()
+
+    def teardown_method(self):
+        event.clearEvents()
+
+    def test_queue(self):
+        queue = event._EventQueue(maxlen=4)
+        assert not queue
+        queue.extend([('a', 0, 1.0), ('b', 0, 2.0), ('a', 0, 3.0)])
+        assert len(queue) == 3 and queue.count('a') == 2
+        assert queue[-1] == ('a', 0, 3.0)
+        assert queue.take(['a', 'z']) == [('a', 0, 1.0), ('a', 0, 3.0)]
+        assert list(queue) == [('b', 0, 2.0)]
+
+        # the oldest events are dropped when it's full
+        queue.extend([('c', 0, t) for t in range(3, 8)])
+        assert len(queue) == 4 and queue.nDropped == 2
+        assert queue.count('b') == 0 and queue.count('c') == 4
+        assert [e[-1] for e in queue.take()] == [4, 5, 6, 7]
+        assert not queue
+
+        # a string keyList matches substrings, as it always has
+        queue.extend([('space', 0, 1.0), ('s', 0, 2.0), ('x', 0, 3.0)])
+        assert queue.take('space') == [('space', 0, 1.0), ('s', 0, 2.0)]
+
+    def test_injectKey(self):
+        event.injectKey(['a', 'b'], t=2.0)
+        event.injectKey('c', modifiers=event.MOD_SHIFT, t=1.0)
+        event.injectKey('a', t=3.0)
+        assert len(event._keyBuffer) == 4
+        # only the targets are removed, in the order of their times
+        assert event.getKeys(keyList=['c', 'a'], timeStamped=True) == \
+            [['c', 1.0], ['a', 2.0], ['a', 3.0]]
+        assert event.getKeys(modifiers=True) == \
+            [('b', event.modifiers_dict(0))]
+        assert not event._keyBuffer
+
+        event.injectKey('c', modifiers=event.MOD_SHIFT | event.MOD_CTRL)
+        (key, mods), = event.getKeys(modifiers=True)
+        assert mods['shift'] and mods['ctrl'] and not mods['alt']
+
+        clock = core.Clock()
+        event.injectKey('d')
+        (key, rt), = event.getKeys(timeStamped=clock)
+        assert key == 'd' and 0 <= rt < 0.1
+
+        with pytest.raises(ValueError):
+            event.injectKey('e', modifiers='shift')
+
+    def test_injectKey_globalKeys(self):
+        pressed = []
+        event.globalKeys.add('g', pressed.append, func_args=['g'])
+        event.globalKeys.add('g', pressed.append, func_args=['ctrl+alt+g'],
+                             modifiers=['ctrl', 'alt'])
+        event.globalKeys.add('o', pressed.append, func_args=['option+o'],
+                             modifiers=['option'])
+        try:
+            event.injectKey(['g', 'h'])
+            event.injectKey('g', modifiers=event.MOD_CTRL)
+            # Num Lock is ignored
+            event.injectKey('g', modifiers=(event.MOD_CTRL | event.MOD_ALT |
+                                            event.MOD_NUMLOCK))
+            event.injectKey('o', modifiers=event.MOD_OPTION)
+            assert pressed == ['g', 'ctrl+alt+g', 'option+o']
+            # the keys are in the buffer too
+            assert event.getKeys() == ['g', 'h', 'g', 'g', 'o']
+        finally:
+            event.globalKeys.remove('g')
+            event.globalKeys.remove('g', modifiers=['ctrl', 'alt'])
+            event.globalKeys.remove('o', modifiers=['option'])
+
+    def test_injectMouse(self):
+        event.mouseButtons = [0, 0, 0]
+        event.injectMouseButton('left', 'press', pos=(10, 20), t=1.0)
+        assert event.mouseButtons == [1, 0, 0]
+        event.injectMouseButton('right', 'click', t=2.0)
+        event.injectMouseWheel((0, -2), t=3.0)
+        event.injectMouseButton('left', 'release', pos=(30, 20), t=4.0)
+        assert event.mouseButtons == [0, 0, 0]
+        assert list(event.mouseWheelRel) == [0, -2]
+
+        assert event.getMouseEvents(['left']) == [
+            ('left', 'press', (10, 20), 1.0),
+            ('left', 'release', (30, 20), 4.0)]
+        assert [e[:2] for e in event.getMouseEvents()] == [
+            ('right', 'press'), ('right', 'release'), ('wheel', 'wheel')]
+
+        event.injectMouseButton('middle')
+        event.injectKey('x')
+        event.clearEvents('mouse')
+        assert event.getMouseEvents() == []
+        assert event.getKeys() == ['x']
+        event.injectMouseButton('middle', 'release')
+
+        with pytest.raises(ValueError):
+            event.injectMouseButton('fourth')
@@ -4,9 +4,10 @@ from builtins import object
 from past.utils import old_div
 from psychopy import microphone, core, web
 from psychopy.microphone import *
-from psychopy.microphone import _getFlacPath
+from psychopy.microphone import _getFlacPath, _chunks
 import pytest
 import shutil, os, glob
+import numpy as np
 from tempfile import mkdtemp
 from os.path import abspath, dirname, join
 
@@ -216,3 +217,64 @@ class TestMicrophoneNoSound(object):
         marker = getMarkerOnset(testFile)  # 19kHz marker sound
         assert 0.0666 < marker[0] < 0.06677  # start
         assert 0.0773 < marker[1] < 0.07734  # end
+
+    def test_bins_match_chunks(self):
+        testFile = join(self.tmp, 'green_48000.wav')
+        data, sampleRate = readWavFile(testFile)
+        chunk = 128
+        nBins = len(data) // chunk
+
+        rmsb = getRMSBins(data, chunk=chunk)
+        assert len(rmsb) == nBins
+        for i in [0, nBins // 2, nBins - 1]:
+            assert np.isclose(rmsb[i], getRMS(data[i * chunk:(i + 1) * chunk]))
+
+        dftb = getDftBins(data, chunk=chunk)
+        assert len(dftb) == nBins
+        for i in [0, nBins // 2, nBins - 1]:
+            magn = getDft(data[i * chunk:(i + 1) * chunk])
+            assert np.isclose(dftb[i], np.std(magn))
+
+    def test_bins_not_1d(self):
+        testFile = join(self.tmp, 'green_48000.wav')
+        data, sampleRate = readWavFile(testFile)
+        chunk = 128
+        nBins = len(data) // chunk
+        stereo = np.column_stack([data, data // 2])
+
+        # a channel of stereo data (not contiguous) is binned as a copy
+        left = stereo[:, 0]
+        assert not left.flags['C_CONTIGUOUS']
+        assert np.allclose(getRMSBins(left, chunk=chunk),
+                           getRMSBins(data, chunk=chunk))
+        assert np.allclose(getDftBins(left, chunk=chunk),
+                           getDftBins(data, chunk=chunk))
+
+        # 2D data are binned chunk by chunk, as they always were
+        rmsb = getRMSBins(stereo, chunk=chunk)
+        dftb = getDftBins(stereo, sampleRate, chunk=chunk)
+        assert len(rmsb) == len(dftb) == nBins
+        for i in [0, nBins // 2, nBins - 1]:
+            block = stereo[i * chunk:(i + 1) * chunk]
+            assert np.allclose(rmsb[i], getRMS(block))
+            magn, freq = getDft(block, sampleRate)
+            band = (freq > 100) & (freq < 8000)
+            assert np.isclose(dftb[i], np.std(magn[band]))
+        with pytest.raises(ValueError):
+            _chunks(stereo, chunk)
+
+    def test_getMarkerOnsets(self):
+        testFile = join(self.tmp, 'green_48000.wav')
+        tmp = join(self.tmp, 'batch')
+        os.mkdir(tmp)
+        for i in range(3):
+            shutil.copy(testFile, join(tmp, 'green_%i.wav' % i))
+        with open(join(tmp, 'bad.wav'), 'wb') as fd:
+            fd.write(b'x')
+
+        onsets = getMarkerOnsets(tmp, processes=2)
+        assert [os.path.basename(f) for f, onset in onsets] == [
+            'bad.wav', 'green_0.wav', 'green_1.wav', 'green_2.wav']
+        assert onsets[0][1] is None
+        for filename, onset in onsets[1:]:
+            assert onset == getMarkerOnset(testFile)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the voicekey filter bank, ring buffers and (headless) replay
+"""
+from __future__ import division
+
+import numpy as np
+import pytest
+
+pytest.importorskip('scipy')
+
+from scipy.signal import sosfilt
+from psychopy import voicekey
+from psychopy.voicekey.vk_tools import FilterBank, RingBuffer, _butter_sos
+
+rate = 44100
+
+
+def _signal(onset=0.5, sec=1.0):
+    """Quiet noise, then a loud 440 Hz tone from `onset`"""
+    rng = np.random.RandomState(0)
+    t = np.arange(int(sec * rate)) / rate
+    samples = rng.normal(scale=1e-5, size=len(t))
+    samples[t >= onset] += 0.5 * np.sin(2 * np.pi * 440 * t[t >= onset])
+    return samples
+
+
+def test_FilterBank():
+    samples = _signal() * 2 ** 15
+    bands = [(100, 3000), (2000, 8000)]
+    bank = FilterBank(bands, rate=rate)
+    n = 88  # msPerChunk=2
+    chunks = [bank.process(samples[i:i + n])
+              for i in range(0, len(samples), n)]
+    filtered = np.concatenate(chunks, axis=1)
+    assert filtered.shape == (len(bands), len(samples))
+    # filtering chunk by chunk == filtering the whole signal at once
+    for band, row in zip(bands, filtered):
+        whole = sosfilt(_butter_sos(6, band, rate), samples)
+        assert np.allclose(row, whole)
+
+    bank.reset()
+    assert np.allclose(bank.process(samples[:n]), filtered[:, :n])
+
+
+def test_RingBuffer():
+    buf = RingBuffer(4)
+    assert len(buf) == 0 and buf[:].tolist() == []
+    for value in range(3):
+        buf.append(value)
+    assert list(buf) == [0, 1, 2]
+    assert buf[-1] == 2
+    # wraps around, keeping the last 4 values, oldest first
+    for value in range(3, 10):
+        buf.append(value)
+    assert len(buf) == 4 and buf.total == 10
+    assert np.asarray(buf).tolist() == [6, 7, 8, 9]
+    assert buf[0] == 6 and buf[-1] == 9 and buf[-4] == 6
+    assert buf[-2:].tolist() == [8, 9]
+    assert buf[::2].tolist() == [6, 8]
+    assert buf[-10:].tolist() == [6, 7, 8, 9]
+    with pytest.raises(IndexError):
+        buf[4]
+    with pytest.raises(IndexError):
+        buf[-5]
+
+    # arrays, e.g., chunks of data
+    chunks = RingBuffer(2, np.int16)
+    for value in range(3):
+        chunks.append(np.full(5, value))
+    assert np.asarray(chunks).shape == (2, 5)
+    assert chunks[-1].tolist() == [2] * 5
+
+    buf.clear()
+    assert len(buf) == 0
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_replay():
+    samples = _signal()
+    vk = voicekey.OnsetVoiceKey(file_in=samples, replay=True, rate=rate)
+    vk.start()
+    assert vk.stopped
+    assert vk.baseline >= 1
+    assert vk.event_detected
+    # onset = time of the chunk that tripped it - 5 chunks
+    assert vk.event_time == vk.event_onset
+    assert abs(vk.event_onset - 0.5) < 0.01
+    assert len(vk.data) == vk.count + 1 == len(samples) // 88
+    assert len(vk.t_proc) == len(vk.data)
+
+    # the convenience classes replay too (and do no analysis)
+    player = voicekey.Player(source=samples, rate=rate, replay=True)
+    player.play()
+    assert player.stopped and not player.event_detected
+    assert not player.baseline
+    assert len(player.data) == len(samples) // 88
+
+    with pytest.raises(voicekey.VoiceKeyException):
+        voicekey.OnsetVoiceKey(file_in='no_such_file.wav', replay=True)
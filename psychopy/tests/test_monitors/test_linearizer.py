@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.monitors.Linearizer, against the gun by gun
+Monitor.linearizeLums that it replaces. Run this file to compare their
+speeds.
+"""
+from __future__ import division, print_function
+
+import timeit
+
+import numpy as np
+import pytest
+from scipy import interpolate
+
+from psychopy.monitors.calibTools import Monitor, Linearizer, gammaInvFun
+
+gammaGrid = np.array([[0.5, 110.0, 2.2, 0.0, 0.6, 0.0],
+                      [0.5, 30.0, 2.1, 0.0, 0.5, 0.0],
+                      [0.5, 70.0, 2.3, 0.0, 0.7, 0.0],
+                      [0.5, 10.0, 2.0, 0.0, 0.4, 0.0]])
+levelsPre = np.linspace(0, 255, 9)
+lumsPre = np.array([gammaGrid[gun, 0] + gammaGrid[gun, 1] *
+                    (levelsPre / 255.0)**gammaGrid[gun, 2]
+                    for gun in range(4)])
+
+
+def _oldLinearize(mon, desiredLums, overrideGamma=None):
+    """Monitor.linearizeLums, as it was"""
+    linMethod = mon.getLinearizeMethod()
+    desiredLums = np.asarray(desiredLums)
+    output = desiredLums * 0.0
+    if linMethod == 3:
+        lumsPre = mon.getLumsPre().copy()
+        interpolators = []
+        levels = mon.getLevelsPre() / 255.0
+        for gun in range(4):
+            lumsPre[gun, :] = ((lumsPre[gun, :] - lumsPre[gun, 0]) /
+                               (lumsPre[gun, -1] - lumsPre[gun, 0]))
+            interpolators.append(interpolate.interp1d(lumsPre[gun, :],
+                                                      levels, kind='linear'))
+        if len(desiredLums.shape) > 1:
+            for gun in range(3):
+                output[:, gun] = interpolators[gun + 1](desiredLums[:, gun])
+        else:
+            output = interpolators[0](desiredLums)
+    else:
+        grid = mon.getGammaGrid()
+        minLum = grid[1, 0]
+        maxLum = grid[1:4, 1]
+        b = grid[1:4, 4]
+        gamma = grid[1:4, 2] if overrideGamma is None else overrideGamma
+        if len(desiredLums.shape) > 1:
+            for gun in range(3):
+                output[:, gun] = gammaInvFun(desiredLums[:, gun], minLum,
+                                             maxLum[gun], gamma[gun],
+                                             eq=linMethod, b=b[gun])
+        else:
+            output = gammaInvFun(desiredLums, minLum, grid[0, 1],
+                                 grid[0, 2], eq=linMethod, b=grid[0, 4])
+    return output
+
+
+def _makeMonitor(method):
+    mon = Monitor('testLinearizer', autoLog=False)
+    mon.setGammaGrid(gammaGrid)
+    mon.setLumsPre(lumsPre)
+    mon.setLevelsPre(levelsPre)
+    mon.setLineariseMethod(method)
+    return mon
+
+
+@pytest.mark.monitors
+@pytest.mark.parametrize('method', [1, 2, 3, 4])
+def test_sameAsBefore(method):
+    mon = _makeMonitor(method)
+    rng = np.random.RandomState(method)
+    rgb = rng.uniform(size=(100, 3))
+    lums = rng.uniform(size=100)
+    assert np.allclose(mon.linearizeLums(rgb), _oldLinearize(mon, rgb))
+    assert np.allclose(mon.linearizeLums(lums), _oldLinearize(mon, lums))
+    # images are linearized for each gun too
+    image = rgb.reshape(10, 10, 3)
+    assert np.allclose(mon.linearizeLums(image),
+                       _oldLinearize(mon, rgb).reshape(10, 10, 3))
+    if method != 3:
+        # values up to 255 are scaled (separately for each gun)
+        rgb255 = rgb * [255, 1, 1]
+        rgb255[0, 0] = 255
+        assert np.allclose(mon.linearizeLums(rgb255),
+                           _oldLinearize(mon, rgb255))
+        assert np.allclose(mon.linearizeLums(rgb, overrideGamma=1.8),
+                           _oldLinearize(mon, rgb, overrideGamma=[1.8] * 3))
+
+
+@pytest.mark.monitors
+def test_getLinearizer():
+    mon = _makeMonitor(2)
+    linearizer = mon.getLinearizer()
+    assert mon.getLinearizer() is linearizer
+    assert mon.getLinearizer(newInterpolators=True) is not linearizer
+    # it's rebuilt when the calibration changes
+    linearizer = mon.getLinearizer()
+    mon.currentCalib['gammaGrid'][1, 2] = 2.5
+    assert mon.getLinearizer() is not linearizer
+    mon.setLineariseMethod(3)
+    assert mon.getLinearizer().method == 3
+
+    with pytest.raises(ValueError):
+        mon.linearizeLums([[0.5, 1.2, 0.1]])  # outside the table
+    with pytest.raises(ValueError):
+        mon.linearizeLums(np.zeros((5, 4)))
+    with pytest.raises(ValueError):
+        Linearizer(5)
+
+    # an unknown method or a missing calibration leave values as they are
+    mon.setLineariseMethod(5)
+    assert mon.getLinearizer() is None
+    assert mon.linearizeLums([0.2, 0.3]) == [0.2, 0.3]
+
+
+def _benchmark(nValues, number):
+    rgb = np.random.RandomState(0).uniform(size=(nValues, 3))
+    print("linearizing %i RGB values (ms per call):" % nValues)
+    for method in [1, 2, 3, 4]:
+        mon = _makeMonitor(method)
+        linearizer = mon.getLinearizer()
+        timings = [min(timeit.repeat(func, number=number, repeat=5)) *
+                   1000 / number
+                   for func in [lambda: _oldLinearize(mon, rgb),
+                                lambda: mon.linearizeLums(rgb),
+                                lambda: linearizer(rgb)]]
+        print("  method %i: before %.3f, linearizeLums %.3f, "
+              "Linearizer %.3f" % ((method,) + tuple(timings)))
+
+
+if __name__ == '__main__':
+    _benchmark(256, 100)  # a LUT
+    _benchmark(10**6, 1)  # an image
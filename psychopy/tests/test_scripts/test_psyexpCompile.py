@@ -0,0 +1,78 @@
+from __future__ import print_function
+from builtins import object
+
+import codecs
+import os
+import shutil
+from os.path import join
+from tempfile import mkdtemp
+
+from psychopy.scripts import psyexpCompile
+from psychopy.tests.utils import TESTS_DATA_PATH
+
+
+def _read(filename):
+    with codecs.open(filename, 'r', 'utf-8') as f:
+        # skip the header, which includes the date
+        return f.read().split('\n')[10:]
+
+
+class TestCompileBatch(object):
+    def setup_method(self):
+        self.tmp_dir = mkdtemp(prefix='psychopy-tests-compile')
+        self.cacheFile = join(self.tmp_dir, 'cache.json')
+        for name in ['ghost_stroop.psyexp', 'testLoopsBlocks.psyexp']:
+            sub = join(self.tmp_dir, 'exps', name.split('.')[0])
+            os.makedirs(sub)
+            shutil.copy(join(TESTS_DATA_PATH, name), sub)
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_findFiles(self):
+        expDir = join(self.tmp_dir, 'exps')
+        found = psyexpCompile.findPsyexpFiles([expDir])
+        assert len(found) == 2
+        pattern = join(expDir, '*', 'ghost*.psyexp')
+        assert psyexpCompile.findPsyexpFiles([pattern, expDir]) == found
+
+    def test_batch(self):
+        expDir = join(self.tmp_dir, 'exps')
+        results = psyexpCompile.compileBatch([expDir], nProcesses=2,
+                                             cacheFile=self.cacheFile)
+        assert len(results) == 2
+        for thisResult in results:
+            assert thisResult['error'] is None
+            assert not thisResult['skipped']
+            for stage in psyexpCompile.batchStages:
+                assert stage in thisResult['timings']
+            pyFile = thisResult['infile'].replace('.psyexp', '.py')
+            assert thisResult['outfiles'] == [pyFile]
+            # same script as compiling a single file
+            batchScript = _read(pyFile)
+            psyexpCompile.compileScript(thisResult['infile'], None, pyFile)
+            assert batchScript == _read(pyFile)
+
+        # unchanged files are skipped, changed ones are recompiled
+        with open(results[0]['infile'], 'a') as f:
+            f.write('\n')
+        results = psyexpCompile.compileBatch([expDir], nProcesses=1,
+                                             cacheFile=self.cacheFile)
+        assert [r['skipped'] for r in results] == [False, True]
+        results = psyexpCompile.compileBatch([expDir], nProcesses=1,
+                                             cacheFile=self.cacheFile,
+                                             force=True)
+        assert [r['skipped'] for r in results] == [False, False]
+        assert 'compiled' in psyexpCompile.reportBatch(results)
+
+    def test_batchJS(self):
+        expDir = join(self.tmp_dir, 'exps')
+        results = psyexpCompile.compileBatch([expDir], target='PsychoJS',
+                                             nProcesses=1, cacheFile=None)
+        for thisResult in results:
+            assert thisResult['error'] is None
+            jsFile = thisResult['infile'].replace('.psyexp', '.js')
+            assert thisResult['outfiles'] == sorted(
+                [jsFile, jsFile.replace('.js', 'NoModule.js')])
+            for f in thisResult['outfiles']:
+                assert os.path.isfile(f)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.tools.meshtools
+
+"""
+from __future__ import division
+
+import os
+import shutil
+import time
+from collections import OrderedDict
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+
+from psychopy.tools.meshtools import parseObjFile, parseMtlFile
+
+cubeObj = """# a cube, with quads, a pentagon and relative indices
+mtllib cube.mtl
+o Cube
+v 1.0 -1.0 -1.0
+v 1.0 -1.0 1.0
+v -1.0 -1.0 1.0
+v -1.0 -1.0 -1.0
+v 1.0 1.0 -1.0
+v 1.0 1.0 1.0
+v -1.0 1.0 1.0
+v -1.0 1.0 -1.0
+vt 0.0 0.0
+vt 1.0 0.0
+vt 1.0 1.0
+vt 0.0 1.0
+vn 0.0 -1.0 0.0
+vn 0.0 1.0 0.0
+usemtl Red
+f 1/1/1 2/2/1 3/3/1 4/4/1
+f 5/1/2 8/2/2 7/3/2 6/4/2
+usemtl Blue
+f 1/1/1 5/2/1 6/3/1
+f -8/1/-2 -7/2/-2 -6/3/-2 -5/4/-2 -4/1/-2
+usemtl Red
+f 2/1/1 6/2/1 7/3/1
+"""
+
+cubeMtl = """# materials
+newmtl Red
+Ns 96.0
+Ka 0.0 0.0 0.0
+Kd 0.8 0.0 0.0
+map_Kd red.png
+
+newmtl Blue
+Kd 0.0 0.0 0.8
+illum 2
+"""
+
+
+def _oldLoad(text):
+    """Triangles as loaded by the old gltools.loadObjFile, for comparison"""
+    positionDefs, texCoordDefs, normalDefs = [], [], []
+    positions, texCoords, normals = [], [], []
+    vertexIndices = OrderedDict()
+    groups = OrderedDict()
+    group = None
+    for line in text.splitlines():
+        if line.startswith('v '):
+            positionDefs.append(tuple(map(float, line[2:].split())))
+        elif line.startswith('vt '):
+            texCoordDefs.append(tuple(map(float, line[3:].split())))
+        elif line.startswith('vn '):
+            normalDefs.append(tuple(map(float, line[3:].split())))
+        elif line.startswith('f '):
+            for attrs in line[2:].split():
+                if attrs not in vertexIndices:
+                    p, t, n = map(int, attrs.split('/'))
+                    positions.append(positionDefs[p - 1])
+                    texCoords.append(texCoordDefs[t - 1])
+                    normals.append(normalDefs[n - 1])
+                    vertexIndices[attrs] = len(vertexIndices)
+                groups[group].append(vertexIndices[attrs])
+        elif line.startswith('usemtl '):
+            group = line[7:]
+            groups.setdefault(group, [])
+    return positions, texCoords, normals, groups
+
+
+class TestObj(object):
+    def setup_method(self):
+        self.tmpDir = mkdtemp(prefix='psychopy-tests-meshtools')
+        self.objFile = os.path.join(self.tmpDir, 'cube.obj')
+        with open(self.objFile, 'w') as f:
+            f.write(cubeObj)
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_parse(self):
+        mesh = parseObjFile(self.objFile, useCache=False)
+        assert mesh.mtlFile == 'cube.mtl'
+        assert list(mesh.groups.keys()) == ['Red', 'Blue']
+        assert mesh.positions.shape == mesh.normals.shape == (14, 3)
+        assert mesh.texCoords.shape == (14, 2)
+        # quads and the pentagon are split into fans of triangles
+        assert mesh.groups['Red'].tolist() == [0, 1, 2, 0, 2, 3,
+                                               4, 5, 6, 4, 6, 7,
+                                               11, 12, 13]
+        assert mesh.groups['Blue'].tolist() == [0, 8, 9,
+                                                0, 1, 2, 0, 2, 3, 0, 3, 10]
+        # relative indices refer back from the face
+        assert np.array_equal(mesh.positions[10], [1.0, 1.0, -1.0])
+        assert np.array_equal(mesh.texCoords[10], [0.0, 0.0])
+        assert np.array_equal(mesh.normals[10], [0.0, -1.0, 0.0])
+        assert not os.path.isfile(self.objFile + '.npz')
+
+    def test_sameAsBefore(self):
+        rng = np.random.RandomState(0)
+        nVerts = 50
+        lines = ['v %f %f %f' % tuple(p) for p in rng.rand(nVerts, 3)]
+        lines += ['vt %f %f' % tuple(p) for p in rng.rand(nVerts, 2)]
+        lines += ['vn %f %f %f' % tuple(p) for p in rng.rand(nVerts, 3)]
+        for faceN in range(200):
+            if faceN % 50 == 0:
+                lines.append('usemtl mat%i' % (faceN // 50 % 3))
+            corners = rng.randint(1, nVerts + 1, size=(3, 3))
+            lines.append('f ' + ' '.join('%i/%i/%i' % tuple(c)
+                                         for c in corners))
+        text = '\n'.join(lines) + '\n'
+        with open(self.objFile, 'w') as f:
+            f.write(text)
+
+        mesh = parseObjFile(self.objFile, useCache=False)
+        positions, texCoords, normals, groups = _oldLoad(text)
+        assert np.allclose(mesh.positions, positions)
+        assert np.allclose(mesh.texCoords, texCoords)
+        assert np.allclose(mesh.normals, normals)
+        assert list(mesh.groups.keys()) == list(groups.keys())
+        for name, elements in groups.items():
+            assert mesh.groups[name].tolist() == elements
+
+    def test_formats(self):
+        with open(self.objFile, 'w') as f:
+            f.write('v 0 0 0\nv 1 0 0\nv 1 1 0 1.0\nvn 0 0 1\n'
+                    'f 1//1 2//1 3//1\nf  3  2\t1 \nf 1 2\n')
+        mesh = parseObjFile(self.objFile, useCache=False)
+        # no material, and the line (f 1 2) is skipped
+        assert list(mesh.groups.keys()) == [None]
+        assert mesh.groups[None].tolist() == [0, 1, 2, 3, 4, 5]
+        assert np.array_equal(mesh.normals[:3], [[0, 0, 1]] * 3)
+        assert np.array_equal(mesh.normals[3:], np.zeros((3, 3)))
+        assert np.array_equal(mesh.texCoords, np.zeros((6, 2)))
+
+        with open(self.objFile, 'w') as f:
+            f.write('v 0 0 0\nf 1 2 3\n')
+        with pytest.raises(RuntimeError):
+            parseObjFile(self.objFile, useCache=False)
+
+    def test_cache(self):
+        mesh = parseObjFile(self.objFile)
+        cacheFile = self.objFile + '.npz'
+        assert os.path.isfile(cacheFile)
+        cached = parseObjFile(self.objFile)
+        assert cached.mtlFile == mesh.mtlFile
+        assert list(cached.groups.keys()) == list(mesh.groups.keys())
+        for name in mesh.groups:
+            assert np.array_equal(cached.groups[name], mesh.groups[name])
+        for field in ('positions', 'texCoords', 'normals'):
+            assert np.array_equal(getattr(cached, field),
+                                  getattr(mesh, field))
+
+        # the cache is rebuilt when the file changes
+        time.sleep(0.01)
+        with open(self.objFile, 'w') as f:
+            f.write('v 0 0 0\nv 1 0 0\nv 1 1 0\nf 1 2 3\n')
+        changed = parseObjFile(self.objFile)
+        assert changed.mtlFile is None and len(changed.positions) == 3
+        assert list(parseObjFile(self.objFile).groups.keys()) == [None]
+
+    def test_mtl(self):
+        mtlFile = os.path.join(self.tmpDir, 'cube.mtl')
+        with open(mtlFile, 'w') as f:
+            f.write(cubeMtl)
+        materials = parseMtlFile(mtlFile)
+        assert list(materials.keys()) == ['Red', 'Blue']
+        assert materials['Red'] == {'Ns': 96.0, 'Ka': (0.0, 0.0, 0.0),
+                                    'Kd': (0.8, 0.0, 0.0),
+                                    'map_Kd': 'red.png'}
+        assert materials['Blue'] == {'Kd': (0.0, 0.0, 0.8), 'illum': 2.0}
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.tools.movietools
+
+"""
+from __future__ import division
+
+import os
+import shutil
+import threading
+import time
+from tempfile import mkdtemp
+
+import numpy
+import pytest
+from PIL import Image
+
+from psychopy.tools.movietools import FrameQueue, MovieFrameWriter
+
+fps = 30.0
+duration = 2.0
+shape = (12, 16, 3)
+
+
+class SyntheticClip(object):
+    """A movie whose frames are filled with their frame number"""
+    def __init__(self, decodeTime=0.0, badFrames=()):
+        self.decodeTime = decodeTime
+        self.badFrames = badFrames
+
+    def get_frame(self, t):
+        frameN = int(round(t * fps))
+        if frameN in self.badFrames:
+            raise OSError("can't decode frame %i" % frameN)
+        time.sleep(self.decodeTime)
+        return numpy.full(shape, frameN % 256, dtype=numpy.uint8)
+
+
+def _waitFull(queue, n, timeout=2.0):
+    t0 = time.time()
+    while queue.getStats()['queued'] < n and time.time() - t0 < timeout:
+        time.sleep(0.001)
+
+
+def test_inOrder():
+    queue = FrameQueue(SyntheticClip().get_frame, fps, duration,
+                       queueSize=4, dropLate=False)
+    queue.start(0.0)
+    shown = []
+    t = 0.0
+    while not queue.finished and t < 10:
+        frame = queue.getFrame(t, block=True, timeout=1.0)
+        if frame is not None:
+            frameT, buff = frame
+            assert frameT <= duration
+            assert numpy.all(buff == int(round(frameT * fps)))
+            shown.append(frameT)
+        t += 1 / fps
+    queue.stop()
+    assert numpy.allclose(shown, numpy.arange(len(shown)) / fps)
+    assert len(shown) == int(duration * fps) + 1
+    stats = queue.getStats()
+    assert stats['nDropped'] == 0
+    assert stats['nShown'] == len(shown)
+
+
+def test_timingAndDrops():
+    queue = FrameQueue(SyntheticClip().get_frame, fps, duration,
+                       queueSize=6, dropLate=True)
+    queue.start(0.0)
+    _waitFull(queue, 6)
+    # nothing is due before the first frame
+    assert queue.getFrame(-0.01) is None
+    frameT, buff = queue.getFrame(0.0)
+    assert frameT == 0.0
+    assert queue.getFrame(0.5 / fps) is None  # frame 1 not due yet
+    # three frame intervals late: frames 1 and 2 are dropped
+    frameT, buff = queue.getFrame(3.2 / fps)
+    assert numpy.isclose(frameT, 3 / fps)
+    assert numpy.all(buff == 3)
+    stats = queue.getStats()
+    assert stats['nDropped'] == 2
+    assert numpy.isclose(stats['maxLag'], 0.2 / fps)
+    queue.stop()
+
+
+def test_buffersReused():
+    queue = FrameQueue(SyntheticClip().get_frame, fps, duration,
+                       queueSize=3, dropLate=False)
+    queue.start(0.0)
+    ids = set()
+    t = 0.0
+    while not queue.finished:
+        frame = queue.getFrame(t, block=True, timeout=1.0)
+        if frame is not None:
+            ids.add(id(frame[1]))
+        t += 1 / fps
+    queue.stop()
+    assert len(ids) <= 3 + 2
+
+
+def test_seekAndErrors():
+    clip = SyntheticClip(badFrames=[31])
+    queue = FrameQueue(clip.get_frame, fps, duration, queueSize=4)
+    queue.start(0.0)
+    _waitFull(queue, 4)
+    queue.seek(1.0)  # frame 30
+    frameT, buff = queue.getFrame(1.0, block=True, timeout=1.0)
+    assert numpy.isclose(frameT, 1.0) and numpy.all(buff == 30)
+    # frame 31 can't be decoded so is skipped
+    frameT, buff = queue.getFrame(1.0 + 1 / fps, block=True, timeout=1.0)
+    assert numpy.isclose(frameT, 1.0 + 2 / fps) and numpy.all(buff == 32)
+    assert queue.getStats()['nDecodeErrors'] == 1
+    queue.stop()
+
+
+def test_underruns():
+    # decoding (20 ms) slower than the frame rate (33 ms per 1/30 s)
+    # would be fine, but we ask for frames faster than real time
+    clip = SyntheticClip(decodeTime=0.02)
+    queue = FrameQueue(clip.get_frame, fps, duration, queueSize=2)
+    queue.start(0.0)
+    for frameN in range(5):
+        queue.getFrame(frameN / fps)
+    queue.stop()
+    assert queue.getStats()['nUnderruns'] > 0
+
+
+class TestMovieFrameWriter(object):
+    def setup_method(self):
+        self.tmpDir = mkdtemp(prefix='psychopy-tests-movietools')
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_imageSequence(self):
+        writer = MovieFrameWriter(os.path.join(self.tmpDir, 'frame.png'),
+                                  queueSize=2)
+        for frameN in range(10):
+            writer.addFrame(numpy.full(shape, frameN, dtype=numpy.uint8))
+        writer.close()
+        stats = writer.getStats()
+        assert stats['nWritten'] == 10 and stats['nDropped'] == 0
+        assert stats['maxQueued'] <= 2
+        for frameN in range(10):
+            im = Image.open(os.path.join(self.tmpDir,
+                                         'frame%05d.png' % (frameN + 1)))
+            assert numpy.all(numpy.array(im) == frameN)
+
+    def test_dropAndBlock(self):
+        release = threading.Event()
+
+        def slowConvert(frame):
+            release.wait(2.0)
+            return frame
+
+        frame = numpy.zeros(shape, dtype=numpy.uint8)
+        writer = MovieFrameWriter(os.path.join(self.tmpDir, 'frame.png'),
+                                  queueSize=2, dropFrames=True,
+                                  convert=slowConvert)
+        # one frame is being converted and two wait, so the rest are dropped
+        queued = [writer.addFrame(frame) for frameN in range(10)]
+        assert queued[:2] == [True, True] and not all(queued)
+        release.set()
+        writer.close()
+        stats = writer.getStats()
+        assert stats['nDropped'] == queued.count(False)
+        assert stats['nWritten'] == queued.count(True)
+
+        # without dropping, the caller waits for the writer instead
+        release.clear()
+        threading.Timer(0.2, release.set).start()
+        writer = MovieFrameWriter(os.path.join(self.tmpDir, 'frame.png'),
+                                  queueSize=1, convert=slowConvert)
+        t0 = time.time()
+        for frameN in range(4):
+            writer.addFrame(frame)
+        assert time.time() - t0 > 0.1
+        writer.close()
+        assert writer.getStats()['nWritten'] == 4
+
+    def test_errors(self):
+        def badConvert(frame):
+            raise ValueError('bad frame')
+
+        writer = MovieFrameWriter(os.path.join(self.tmpDir, 'frame.png'),
+                                  convert=badConvert)
+        writer.addFrame(numpy.zeros(shape, dtype=numpy.uint8))
+        with pytest.raises(ValueError):
+            writer.close()
+        with pytest.raises(RuntimeError):
+            writer.addFrame(numpy.zeros(shape, dtype=numpy.uint8))
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.tools.polygontools
+
+"""
+from __future__ import division
+
+import numpy
+import pytest
+
+from psychopy.tools import polygontools
+from psychopy.tools.polygontools import (tesselate, clearTesselateCache,
+                                         TesselateError, WINDING_NONZERO)
+
+square = [(0, 0), (1, 0), (1, 1), (0, 1)]
+hole = [(0.25, 0.25), (0.75, 0.25), (0.75, 0.75), (0.25, 0.75)]
+
+
+def _areas(triangles):
+    """Signed areas of the triangles (positive for anticlockwise)"""
+    t = numpy.asarray(triangles).reshape(-1, 3, 2)
+    return ((t[:, 1, 0] - t[:, 0, 0]) * (t[:, 2, 1] - t[:, 0, 1]) -
+            (t[:, 2, 0] - t[:, 0, 0]) * (t[:, 1, 1] - t[:, 0, 1])) / 2
+
+
+def _covers(triangles, points):
+    """Whether each point is inside any of the triangles"""
+    t = numpy.asarray(triangles).reshape(-1, 3, 2)[:, numpy.newaxis]
+    p = numpy.asarray(points, dtype=float)[numpy.newaxis]
+    inside = numpy.ones(t.shape[:1] + p.shape[1:2], dtype=bool)
+    for i in range(3):
+        a, b = t[..., i, :], t[..., (i + 1) % 3, :]
+        inside &= ((b[..., 0] - a[..., 0]) * (p[..., 1] - a[..., 1]) -
+                   (b[..., 1] - a[..., 1]) * (p[..., 0] - a[..., 0])) >= 0
+    return inside.any(axis=0)
+
+
+def test_simpleShapes():
+    triangles = tesselate(square)
+    assert triangles.shape[1] == 2 and len(triangles) % 3 == 0
+    assert numpy.all(_areas(triangles) > 0)
+    assert numpy.isclose(_areas(triangles).sum(), 1.0)
+
+    # a concave shape, given clockwise
+    arrow = [(0, 0), (0.5, 1), (1, 0), (0.5, 0.3)][::-1]
+    assert numpy.isclose(_areas(tesselate(arrow)).sum(), 0.35)
+    assert list(_covers(tesselate(arrow), [(0.5, 0.2), (0.5, 0.5)])) == \
+        [False, True]
+
+    # a line has no area
+    assert len(tesselate([(0, 0), (1, 1)])) == 0
+    assert len(tesselate([(0, 0), (1, 1), (2, 2)])) == 0
+
+
+def test_windingRules():
+    points = [(0.1, 0.5), (0.5, 0.5)]  # in the outer square, in the hole
+    assert numpy.isclose(_areas(tesselate([square, hole])).sum(), 0.75)
+    assert list(_covers(tesselate([square, hole]), points)) == [True, False]
+    # both loops go the same way, so the hole is filled with nonzero...
+    filled = tesselate([square, hole], WINDING_NONZERO)
+    assert numpy.isclose(_areas(filled).sum(), 1.0)
+    # ...and is a hole again if it goes the other way
+    assert numpy.isclose(
+        _areas(tesselate([square, hole[::-1]], 'nonzero')).sum(), 0.75)
+    assert numpy.isclose(
+        _areas(tesselate([square, hole], 'abs_geq_two')).sum(), 0.25)
+    assert len(tesselate([square, hole], 'negative')) == 0
+
+    # a self-crossing star: the centre is crossed twice
+    angles = numpy.pi / 2 + numpy.arange(5) * 4 * numpy.pi / 5
+    star = numpy.column_stack([numpy.cos(angles), numpy.sin(angles)])
+    assert not _covers(tesselate(star), [(0, 0)])[0]
+    assert _covers(tesselate(star, 'nonzero'), [(0, 0)])[0]
+    assert _covers(tesselate(star), [(0, 0.8)])[0]
+
+    with pytest.raises(TesselateError):
+        tesselate(square, 'sideways')
+
+
+def _randomLoop(rng, n, center=(0, 0), radii=(0.2, 1.0), decimals=None):
+    """A random (often very concave) anticlockwise star-shaped loop"""
+    angles = numpy.sort(rng.uniform(0, 2 * numpy.pi, size=n))
+    r = rng.uniform(radii[0], radii[1], size=n)
+    loop = numpy.column_stack([center[0] + r * numpy.cos(angles),
+                               center[1] + r * numpy.sin(angles)])
+    return loop if decimals is None else loop.round(decimals)
+
+
+def _slabs(loops, windingRule='odd'):
+    return polygontools._tesselateSlabs(polygontools._toLoops(loops),
+                                        polygontools._windingRule(windingRule))
+
+
+def test_earClipping():
+    rng = numpy.random.RandomState(0)
+    points = rng.uniform(-1.2, 4.2, size=(2000, 2))
+    for i in range(200):
+        decimals = [None, 1, 2][i % 3]  # (rounding makes collinear points)
+        loops = [_randomLoop(rng, rng.randint(3, 30), decimals=decimals)]
+        if i % 2:
+            inner = _randomLoop(rng, rng.randint(3, 10), radii=(0.02, 0.15),
+                                decimals=decimals)
+            loops.append(inner[::rng.choice([1, -1])])
+        if i % 5 == 0:
+            loops.append(_randomLoop(rng, 5, center=(3, 0)))
+        windingRule = ['odd', 'nonzero', 'positive', 'abs_geq_two'][i % 4]
+        triangles = tesselate(loops, windingRule, cache=False)
+        expected = _slabs(loops, windingRule)
+        # (points that are almost in line can make triangles with no area)
+        assert numpy.all(_areas(triangles) > -1e-12)
+        assert numpy.isclose(_areas(triangles).sum(),
+                             _areas(expected).sum())
+        inside = _covers(triangles, points)
+        assert numpy.array_equal(inside, _covers(expected, points))
+
+    # n - 2 triangles for a loop of n points, 2 more for each hole
+    loop = _randomLoop(rng, 500)
+    assert len(tesselate(loop, cache=False)) == 498 * 3
+    assert len(tesselate([square, hole], cache=False)) == 8 * 3
+    circle = numpy.exp(2j * numpy.pi * numpy.arange(100) / 100)
+    circle = numpy.column_stack([circle.real, circle.imag])
+    rings = [circle, circle * 0.8, circle * 0.5, circle * 0.2]
+    triangles = tesselate(rings, cache=False)
+    assert len(triangles) == 2 * 200 * 3
+    assert numpy.isclose(_areas(triangles).sum(),
+                         _areas(_slabs(rings)).sum())
+
+
+def test_touching():
+    # loops that touch or cross are split by the slab method; spikes (with
+    # no area) are dropped
+    corner = [(1, 1), (2, 1), (2, 2), (1, 2)]
+    spike = [(0, 0), (1, 0), (1, 1), (0.5, 1), (0.5, 0.5), (0.5, 1), (0, 1)]
+    bowtie = [(0, 0), (1, 1), (1, 0), (0, 1)]
+    for loops, area in [([square, corner], 2.0),
+                        ([square, [(0, 0), (0.5, 0), (0.5, 0.5)]], 0.875),
+                        (spike, 1.0), (bowtie, 0.5)]:
+        triangles = tesselate(loops, cache=False)
+        assert numpy.isclose(_areas(triangles).sum(), area)
+        assert numpy.all(_areas(triangles) > 0)
+
+
+def test_cache():
+    clearTesselateCache()
+    verts = numpy.array(square, dtype=float)
+    first = tesselate(verts)
+    assert tesselate(verts.copy()) is first
+    assert not first.flags.writeable
+    assert tesselate(verts, 'nonzero') is not first
+    moved = verts + 1
+    assert tesselate(moved) is not first
+    assert tesselate(verts, cache=False) is not first
+    clearTesselateCache()
+    assert tesselate(verts) is not first
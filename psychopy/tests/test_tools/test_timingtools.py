@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.tools.timingtools
+
+"""
+from __future__ import division
+
+import numpy
+import pytest
+
+from psychopy.tools.timingtools import FrameIntervalRecorder
+
+
+class MockClock(object):
+    """A clock that returns a preset list of flip times"""
+    def __init__(self, times):
+        self.times = list(times)
+
+    def getTime(self):
+        return self.times.pop(0)
+
+
+def _flipTimes(intervals, t0=10.0):
+    return t0 + numpy.concatenate([[0], numpy.cumsum(intervals)])
+
+
+def test_statistics():
+    rng = numpy.random.RandomState(1)
+    intervals = 1 / 60 + rng.normal(0, 0.0005, 2000)
+    intervals[[100, 900]] = 2 / 60  # two dropped frames
+    dropped = []
+    recorder = FrameIntervalRecorder(
+        bufferSize=500, threshold=1.5 / 60,
+        onDroppedFrame=lambda interval, t: dropped.append((interval, t)),
+        clock=MockClock(_flipTimes(intervals)))
+    assert recorder.record() is None  # just starts timing
+    for interval in intervals:
+        assert numpy.isclose(recorder.record(), interval)
+
+    # the buffer only keeps the most recent intervals...
+    assert len(recorder) == 500
+    assert numpy.allclose(recorder.intervals, intervals[-500:])
+    assert numpy.allclose(recorder.getIntervals(3), intervals[-3:])
+    assert numpy.allclose(numpy.diff(recorder.getTimestamps()),
+                          intervals[-499:])
+    # ...but the statistics cover all of them
+    assert recorder.nIntervals == 2000
+    assert numpy.isclose(recorder.mean, intervals.mean())
+    assert numpy.isclose(recorder.std, intervals.std(ddof=1))
+    assert numpy.isclose(recorder.min, intervals.min())
+    assert numpy.isclose(recorder.max, intervals.max())
+    for q in (5, 50, 95):
+        assert abs(recorder.percentile(q) -
+                   numpy.percentile(intervals, q)) < 0.0002
+    assert numpy.isclose(recorder.percentile(100), intervals.max())
+
+    assert recorder.nDropped == 2
+    assert [numpy.isclose(interval, 2 / 60) for interval, t in dropped] == \
+        [True, True]
+    assert numpy.isclose(dropped[0][1], _flipTimes(intervals)[101])
+    stats = recorder.getStats()
+    assert stats['nDropped'] == 2 and stats['nIntervals'] == 2000
+
+
+def test_skipAndClear():
+    recorder = FrameIntervalRecorder(bufferSize=10, threshold=0.1,
+                                     clock=MockClock([]))
+    for t in (0.0, 0.01, 0.02):
+        recorder.record(t)
+    # a long pause without recording isn't a dropped frame
+    recorder.skipNext()
+    assert recorder.record(5.0) is None
+    recorder.record(5.01)
+    assert numpy.allclose(recorder.intervals, [0.01, 0.01, 0.01])
+    assert recorder.nDropped == 0
+
+    recorder.clear()
+    assert len(recorder) == 0 and recorder.nIntervals == 0
+    assert recorder.mean is None and recorder.std is None
+    assert len(recorder.intervals) == 0
+    assert numpy.isnan(recorder.percentile(50))
+    recorder.record(1.0)
+    recorder.record(1.5)
+    assert recorder.nDropped == 1 and recorder.mean == 0.5
+
+    with pytest.raises(ValueError):
+        FrameIntervalRecorder(bufferSize=0)
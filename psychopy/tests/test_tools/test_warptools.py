@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.tools.warptools, against the quad loops that
+visual.windowwarp.Warper used before (no window needed)
+
+"""
+from __future__ import division
+
+import os
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+import pytest
+
+from psychopy.tools import warptools
+
+
+def _loopQuads(xgrid, ygrid, x_coords, y_coords, u_coords, v_coords):
+    """The quads as built by Warper.projectionSphericalOrCylindrical"""
+    vertices = np.zeros(((xgrid - 1) * (ygrid - 1) * 4, 2), dtype='float32')
+    tcoords = np.zeros(((xgrid - 1) * (ygrid - 1) * 4, 2), dtype='float32')
+    vdex = 0
+    for y in range(0, ygrid - 1):
+        for x in range(0, xgrid - 1):
+            for i, (dy, dx) in enumerate([(0, 0), (0, 1), (1, 1), (1, 0)]):
+                vertices[vdex + i] = x_coords[y + dy, x + dx], \
+                    y_coords[y + dy, x + dx]
+                tcoords[vdex + i] = u_coords[y + dy, x + dx], \
+                    v_coords[y + dy, x + dx]
+            vdex += 4
+    return vertices, tcoords
+
+
+def _loopSpherical(grid, width, height, dist, eyepoint, isCylindrical):
+    """Warper.projectionSphericalOrCylindrical, as it was"""
+    xEye = eyepoint[0] * width
+    yEye = eyepoint[1] * height
+    equalDistanceX = np.linspace(0, width, grid)
+    equalDistanceY = np.linspace(0, height, grid)
+    x_c = np.linspace(-1.0, 1.0, grid)
+    y_c = np.linspace(-1.0, 1.0, grid)
+    x_coords, y_coords = np.meshgrid(x_c, y_c)
+    x = np.zeros((grid, grid), dtype='float32')
+    y = np.zeros((grid, grid), dtype='float32')
+    x[:, :] = equalDistanceX - xEye
+    y[:, :] = equalDistanceY - yEye
+    y = np.transpose(y)
+    r = np.sqrt(np.square(x) + np.square(y) + np.square(dist))
+    azimuth = np.arctan(x / dist)
+    altitude = np.arcsin(y / r)
+    if isCylindrical:
+        tx = dist * np.sin(azimuth)
+        ty = dist * np.sin(altitude)
+    else:
+        tx = dist * (1 + x / r) - dist
+        ty = dist * (1 + y / r) - dist
+    azimuth[azimuth == 0] = np.finfo(np.float32).eps
+    altitude[altitude == 0] = np.finfo(np.float32).eps
+    if isCylindrical:
+        tx = tx * azimuth / np.sin(azimuth)
+        ty = ty * altitude / np.sin(altitude)
+    else:
+        centralAngle = np.arccos(np.cos(altitude) * np.cos(np.abs(azimuth)))
+        arcLength = centralAngle * dist
+        theta = np.arctan2(ty, tx)
+        tx = arcLength * np.cos(theta)
+        ty = arcLength * np.sin(theta)
+    u_coords = tx / width + 0.5
+    v_coords = ty / height + 0.5
+    return _loopQuads(grid, grid, x_coords, y_coords, u_coords, v_coords)
+
+
+@pytest.mark.parametrize('isCylindrical', [False, True])
+@pytest.mark.parametrize('eyepoint', [(0.5, 0.5), (0.2, 0.7)])
+def test_sphericalMesh(isCylindrical, eyepoint):
+    expected = _loopSpherical(17, 50.0, 30.0, 25.0, eyepoint, isCylindrical)
+    mesh = warptools.sphericalMesh(17, 17, 50.0, 30.0, 25.0, eyepoint,
+                                   isCylindrical)
+    for arr, expectedArr in zip(mesh, expected):
+        assert arr.dtype == np.float32 and arr.shape == (16 * 16 * 4, 2)
+        assert np.array_equal(arr, expectedArr)
+
+    # grids needn't be square
+    vertices, tcoords = warptools.sphericalMesh(9, 5, 50.0, 30.0, 25.0)
+    assert vertices.shape == tcoords.shape == (8 * 4 * 4, 2)
+
+
+class TestWarpfile(object):
+    def setup_method(self):
+        self.tmpDir = mkdtemp(prefix='psychopy-tests-warptools')
+        cols, rows = 6, 4
+        self.warpdata = np.random.RandomState(0).uniform(
+            size=(cols * rows, 5))
+        self.warpfile = os.path.join(self.tmpDir, 'test.data')
+        with open(self.warpfile, 'w') as f:
+            f.write('2\n%i %i\n' % (cols, rows))
+            np.savetxt(f, self.warpdata)
+
+    def teardown_method(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_warpfileMesh(self):
+        cols, rows, warpdata = warptools.readWarpfile(self.warpfile)
+        assert (cols, rows) == (6, 4)
+        vertices, tcoords, opacity = warptools.warpfileMesh(cols, rows,
+                                                            warpdata)
+        grid = warpdata.reshape(rows, cols, 5)
+        expected = _loopQuads(cols, rows, grid[..., 0], grid[..., 1],
+                              grid[..., 2], grid[..., 3])
+        assert np.array_equal(vertices, expected[0])
+        assert np.array_equal(tcoords, expected[1])
+        alpha = _loopQuads(cols, rows, grid[..., 4], grid[..., 4],
+                           grid[..., 4], grid[..., 4])[0][:, 0]
+        assert np.array_equal(opacity[:, 3], alpha)
+        assert np.all(opacity[:, :3] == 1)
+
+        with open(self.warpfile, 'w') as f:
+            f.write('2\n5 4\n')
+            np.savetxt(f, self.warpdata)
+        with pytest.raises(ValueError):
+            warptools.readWarpfile(self.warpfile)
+
+    def test_cachedMesh(self):
+        cacheDir = os.path.join(self.tmpDir, 'cache')
+        calls = []
+
+        def makeMesh():
+            calls.append(True)
+            return warptools.sphericalMesh(9, 9, 50.0, 30.0, 25.0) + (None,)
+
+        params = dict(warp='spherical', eyepoint=(0.5, 0.5),
+                      warpfileHash=warptools.fileHash(self.warpfile))
+        first = warptools.cachedMesh(cacheDir, params, makeMesh)
+        again = warptools.cachedMesh(cacheDir, params, makeMesh)
+        assert len(calls) == 1
+        assert np.array_equal(first[0], again[0])
+        assert np.array_equal(first[1], again[1])
+        assert again[2] is None
+
+        # any change to the parameters builds a new mesh
+        params['eyepoint'] = (0.5, 0.6)
+        warptools.cachedMesh(cacheDir, params, makeMesh)
+        assert len(calls) == 2
+        warptools.cachedMesh(None, params, makeMesh)
+        assert len(calls) == 3
+
+    def test_pruneCache(self):
+        cacheDir = os.path.join(self.tmpDir, 'cache')
+
+        def makeMesh():
+            return warptools.sphericalMesh(9, 9, 50.0, 30.0, 25.0)
+
+        # meshes used at times 0, 10, 20..., the oldest mesh last
+        names = []
+        for i in range(5):
+            warptools.cachedMesh(cacheDir, dict(eyepoint=i), makeMesh)
+            names.extend(set(os.listdir(cacheDir)) - set(names))
+            os.utime(os.path.join(cacheDir, names[-1]), (i * 10, i * 10))
+        size = os.path.getsize(os.path.join(cacheDir, names[0]))
+        os.utime(os.path.join(cacheDir, names[0]), (100, 100))
+        with open(os.path.join(cacheDir, 'other.txt'), 'w') as f:
+            f.write('not a mesh')
+
+        warptools.pruneCache(cacheDir, maxFiles=4)
+        assert sorted(os.listdir(cacheDir)) == sorted(
+            ['other.txt'] + names[:1] + names[2:])
+        # by size, never removing the mesh to keep
+        warptools.pruneCache(cacheDir, maxBytes=size * 2,
+                             keep=os.path.join(cacheDir, names[2]))
+        assert sorted(os.listdir(cacheDir)) == sorted(
+            ['other.txt', names[0], names[2]])
+
+        # caching a new mesh prunes the cache
+        maxCachedMeshes = warptools.maxCachedMeshes
+        warptools.maxCachedMeshes = 2
+        try:
+            warptools.cachedMesh(cacheDir, dict(eyepoint=5), makeMesh)
+        finally:
+            warptools.maxCachedMeshes = maxCachedMeshes
+        remaining = os.listdir(cacheDir)
+        assert len(remaining) == 3 and names[0] in remaining
+        assert names[2] not in remaining
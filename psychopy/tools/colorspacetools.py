@@ -9,11 +9,51 @@
 """
 from __future__ import absolute_import, division, print_function
 
+from builtins import range
 from past.utils import old_div
 import numpy
 
 from psychopy import logging
-from psychopy.tools.coordinatetools import sph2cart
+
+# conversion matrices used when the monitor hasn't been color-calibrated
+# DKL (cartesian) -> RGB for generic Sony Trinitron phosphors
+# (note that dkl has to be in cartesian coords first!)
+defaultDKL2RGB = numpy.asarray([
+    # LUMIN    %L-M    %L+M-S
+    [1.0000, 1.0000, -0.1462],  # R
+    [1.0000, -0.3900, 0.2094],  # G
+    [1.0000, 0.0180, -1.0000]])  # B
+# and its inverse (as used by rgb2dklCart)
+defaultRGB2DKL = numpy.asarray([
+    # LUMIN->    %L-M->        L+M-S
+    [0.25145542, 0.64933633, 0.09920825],
+    [0.78737943, -0.55586618, -0.23151325],
+    [0.26562825, 0.63933074, -0.90495899]])
+# LMS -> RGB for generic Sony Trinitron phosphors
+defaultLMS2RGB = numpy.asarray([
+    # L        M        S
+    [4.97068857, -4.14354132, 0.17285275],  # R
+    [-0.90913894, 2.15671326, -0.24757432],  # G
+    [-0.03976551, -0.14253782, 1.18230333]])  # B
+# XYZ -> sRGB conversion matrix, assumes D65 white point
+# mdc - computed using makeXYZ2RGB with sRGB primaries
+defaultXYZ2RGB = numpy.asarray([
+    [3.24096994, -1.53738318, -0.49861076],
+    [-0.96924364, 1.8759675, 0.04155506],
+    [0.05563008, -0.20397696, 1.05697151]])
+# D65 white point in CIE-XYZ color space
+#   See: https://en.wikipedia.org/wiki/SRGB
+whiteD65 = numpy.asarray([0.9505, 1.0000, 1.0890])
+
+_warnedUncalibrated = set()  # the spaces that have been warned about
+
+
+def _warnUncalibrated(space):
+    """Warn (once for each space) that a default matrix is being used"""
+    if space not in _warnedUncalibrated:
+        _warnedUncalibrated.add(space)
+        logging.warning('This monitor has not been color-calibrated. '
+                        'Using default %s conversion matrix.' % space)
 
 
 def unpackColors(colors):
@@ -171,18 +211,11 @@ def cielab2rgb(lab,
     lab, orig_shape, orig_dim = unpackColors(lab)
 
     if conversionMatrix is None:
-        # XYZ -> sRGB conversion matrix, assumes D65 white point
-        # mdc - computed using makeXYZ2RGB with sRGB primaries
-        conversionMatrix = numpy.asmatrix([
-            [3.24096994, -1.53738318, -0.49861076],
-            [-0.96924364, 1.8759675, 0.04155506],
-            [0.05563008, -0.20397696, 1.05697151]
-        ])
+        conversionMatrix = defaultXYZ2RGB
+    conversionMatrix = numpy.asarray(conversionMatrix)
 
     if whiteXYZ is None:
-        # D65 white point in CIE-XYZ color space
-        #   See: https://en.wikipedia.org/wiki/SRGB
-        whiteXYZ = numpy.asarray([0.9505, 1.0000, 1.0890])
+        whiteXYZ = whiteD65
 
     L = lab[:, 0]  # lightness
     a = lab[:, 1]  # green (-)  <-> red (+)
@@ -276,8 +309,8 @@ def cielch2rgb(lch,
     # convert values to L*a*b*
     lab = numpy.empty(lch.shape, dtype=lch.dtype)
     lab[:, 0] = lch[:, 0]
-    lab[:, 1] = lch[:, 1] * numpy.math.cos(numpy.math.radians(lch[:, 2]))
-    lab[:, 2] = lch[:, 1] * numpy.math.sin(numpy.math.radians(lch[:, 2]))
+    lab[:, 1] = lch[:, 1] * numpy.cos(numpy.radians(lch[:, 2]))
+    lab[:, 2] = lch[:, 1] * numpy.sin(numpy.radians(lch[:, 2]))
 
     # convert to RGB using the CIE L*a*b* function
     rgb_out = cielab2rgb(lab,
@@ -309,43 +342,12 @@ def dkl2rgb(dkl, conversionMatrix=None):
         rgb(Nx3) = dkl2rgb(dkl_Nx3(el,az,radius), conversionMatrix)
         rgb(NxNx3) = dkl2rgb(dkl_NxNx3(el,az,radius), conversionMatrix)
 
+    To convert many colors, or the same colors often, use a
+    :class:`ColorPipeline` directly.
     """
-    if conversionMatrix is None:
-        conversionMatrix = numpy.asarray([
-            # (note that dkl has to be in cartesian coords first!)
-            # LUMIN    %L-M    %L+M-S
-            [1.0000, 1.0000, -0.1462],  # R
-            [1.0000, -0.3900, 0.2094],  # G
-            [1.0000, 0.0180, -1.0000]])  # B
-        logging.warning('This monitor has not been color-calibrated. '
-                        'Using default DKL conversion matrix.')
-
-    if len(dkl.shape) == 3:
-        dkl_NxNx3 = dkl
-        # convert a 2D (image) of Spherical DKL colours to RGB space
-        origShape = dkl_NxNx3.shape  # remember for later
-        NxN = origShape[0] * origShape[1]  # find nPixels
-        dkl = numpy.reshape(dkl_NxNx3, [NxN, 3])  # make Nx3
-        rgb = dkl2rgb(dkl, conversionMatrix)  # convert
-        return numpy.reshape(rgb, origShape)  # reshape and return
-
-    else:
-        dkl_Nx3 = dkl
-        # its easier to use in the other orientation!
-        dkl_3xN = numpy.transpose(dkl_Nx3)
-        if numpy.size(dkl_3xN) == 3:
-            RG, BY, LUM = sph2cart(dkl_3xN[0],
-                                   dkl_3xN[1],
-                                   dkl_3xN[2])
-        else:
-            RG, BY, LUM = sph2cart(dkl_3xN[0, :],
-                                   dkl_3xN[1, :],
-                                   dkl_3xN[2, :])
-        dkl_cartesian = numpy.asarray([LUM, RG, BY])
-        rgb = numpy.dot(conversionMatrix, dkl_cartesian)
-
-        # return in the shape we received it:
-        return numpy.transpose(rgb)
+    dkl = numpy.asarray(dkl)
+    return getColorPipeline('dkl', conversionMatrix).apply(
+        dkl, out=numpy.empty(dkl.shape))
 
 
 def dklCart2rgb(LUM, LM, S, conversionMatrix=None):
@@ -360,12 +362,7 @@ def dklCart2rgb(LUM, LM, S, conversionMatrix=None):
         [LUM.reshape([-1]), LM.reshape([-1]), S.reshape([-1])])
 
     if conversionMatrix is None:
-        conversionMatrix = numpy.asarray([
-            # (note that dkl has to be in cartesian coords first!)
-            # LUMIN    %L-M    %L+M-S
-            [1.0000, 1.0000, -0.1462],  # R
-            [1.0000, -0.3900, 0.2094],  # G
-            [1.0000, 0.0180, -1.0000]])  # B
+        conversionMatrix = defaultDKL2RGB
     rgb = numpy.dot(conversionMatrix, dkl_cartesian)
     return numpy.reshape(numpy.transpose(rgb), NxNx3)
 
@@ -434,25 +431,12 @@ def lms2rgb(lms_Nx3, conversionMatrix=None):
 
         rgb_Nx3 = lms2rgb(dkl_Nx3(el,az,radius), conversionMatrix)
 
+    To convert many colors, or the same colors often, use a
+    :class:`ColorPipeline` directly.
     """
-
-    # its easier to use in the other orientation!
-    lms_3xN = numpy.transpose(lms_Nx3)
-
-    if conversionMatrix is None:
-        cones_to_rgb = numpy.asarray([
-            # L        M        S
-            [4.97068857, -4.14354132, 0.17285275],  # R
-            [-0.90913894, 2.15671326, -0.24757432],  # G
-            [-0.03976551, -0.14253782, 1.18230333]])  # B
-
-        logging.warning('This monitor has not been color-calibrated. '
-                        'Using default LMS conversion matrix.')
-    else:
-        cones_to_rgb = conversionMatrix
-
-    rgb = numpy.dot(cones_to_rgb, lms_3xN)
-    return numpy.transpose(rgb)  # return in the shape we received it
+    lms_Nx3 = numpy.asarray(lms_Nx3)
+    return getColorPipeline('lms', conversionMatrix).apply(
+        lms_Nx3, out=numpy.empty(lms_Nx3.shape))
 
 
 def rgb2dklCart(picture, conversionMatrix=None):
@@ -465,13 +449,8 @@ def rgb2dklCart(picture, conversionMatrix=None):
 
     # this is the inversion of the dkl2rgb conversion matrix
     if conversionMatrix is None:
-        conversionMatrix = numpy.asarray([
-            # LUMIN->    %L-M->        L+M-S
-            [0.25145542, 0.64933633, 0.09920825],
-            [0.78737943, -0.55586618, -0.23151325],
-            [0.26562825, 0.63933074, -0.90495899]])
-        logging.warning('This monitor has not been color-calibrated. '
-                        'Using default DKL conversion matrix.')
+        conversionMatrix = defaultRGB2DKL
+        _warnUncalibrated('DKL')
     else:
         conversionMatrix = numpy.linalg.inv(conversionMatrix)
 
@@ -510,17 +489,201 @@ def rgb2lms(rgb_Nx3, conversionMatrix=None):
     rgb_3xN = numpy.transpose(rgb_Nx3)
 
     if conversionMatrix is None:
-        cones_to_rgb = numpy.asarray([
-            # L        M        S
-            [4.97068857, -4.14354132, 0.17285275],  # R
-            [-0.90913894, 2.15671326, -0.24757432],  # G
-            [-0.03976551, -0.14253782, 1.18230333]])  # B
-
-        logging.warning('This monitor has not been color-calibrated. '
-                        'Using default LMS conversion matrix.')
+        cones_to_rgb = defaultLMS2RGB
+        _warnUncalibrated('LMS')
     else:
         cones_to_rgb = conversionMatrix
     rgb_to_cones = numpy.linalg.inv(cones_to_rgb)
 
     lms = numpy.dot(rgb_to_cones, rgb_3xN)
     return numpy.transpose(lms)  # return in the shape we received it
+
+
+class ColorPipeline(object):
+    """Converts colors from a color space to RGB, with everything that
+    depends only on the monitor calibration worked out once.
+
+    The conversion from the coordinates of the space (spherical DKL, L*C*h*
+    ...) to the ones the conversion matrix takes, the matrix (with the white
+    point folded into it) and the transfer function are applied to blocks
+    of colors that fit in the CPU cache, in place. Converting a float32 or
+    float64 array that is C-contiguous needs no other copies of it.
+
+    Parameters
+    ----------
+    colorSpace : str
+        'dkl' (elevation, azimuth, radius), 'dklCart' (LUM, L-M, S), 'lms',
+        'cielab' or 'cielch' (hue in degrees)
+    conversionMatrix : tuple, list, ndarray or None
+        3x3 matrix to convert to linear RGB (from cartesian DKL, LMS or
+        CIE-XYZ). If None, the defaults of `dkl2rgb`, `lms2rgb` and
+        `cielab2rgb` are used
+    whiteXYZ : tuple, list, ndarray or None
+        white point for 'cielab' and 'cielch' (D65 if None)
+    transferFunc : pyfunc or None
+        transfer function for 'cielab' and 'cielch' (see `cielab2rgb`),
+        which is passed any other keyword arguments
+    clip : boolean
+        clip the values to 0:1 (before they are made signed RGB) for
+        'cielab' and 'cielch'
+
+    Example
+    -------
+    import psychopy.tools.colorspacetools as cst
+    toRGB = cst.ColorPipeline('dkl', win.dkl_rgb)
+    colors = numpy.zeros((nElements, 3), dtype='float32')
+    ...
+    toRGB.apply(colors, out=colors)  # each frame, in place
+
+    """
+    colorSpaces = ('dkl', 'dklCart', 'lms', 'cielab', 'cielch')
+    # number of colors converted at a time
+    blockSize = 4096
+
+    def __init__(self,
+                 colorSpace,
+                 conversionMatrix=None,
+                 whiteXYZ=None,
+                 transferFunc=None,
+                 clip=False,
+                 **kwargs):
+        if colorSpace not in self.colorSpaces:
+            raise ValueError("ColorPipeline can't convert from %s (use one "
+                             "of %s)" % (colorSpace, self.colorSpaces))
+        self.colorSpace = colorSpace
+        self._isLab = colorSpace in ('cielab', 'cielch')
+        if conversionMatrix is None:
+            if self._isLab:
+                conversionMatrix = defaultXYZ2RGB
+            elif colorSpace == 'lms':
+                conversionMatrix = defaultLMS2RGB
+                _warnUncalibrated('LMS')
+            else:
+                conversionMatrix = defaultDKL2RGB
+                _warnUncalibrated('DKL')
+        matrix = numpy.array(conversionMatrix, dtype=float)
+        if matrix.shape != (3, 3):
+            raise ValueError("conversionMatrix should be 3x3")
+        if self._isLab:
+            # multiply in the white values before the matrix
+            if whiteXYZ is None:
+                whiteXYZ = whiteD65
+            matrix *= numpy.asarray(whiteXYZ, dtype=float)
+        self.transferFunc = transferFunc
+        self.clip = clip
+        self._kwargs = kwargs
+        # transposed, as the colors are rows
+        self._matrices = {numpy.dtype('float64'): matrix.T.copy(),
+                          numpy.dtype('float32'): matrix.T.astype('float32')}
+
+    def __call__(self, colors, out=None):
+        return self.apply(colors, out=out)
+
+    def apply(self, colors, out=None):
+        """Convert colors to RGB.
+
+        Parameters
+        ----------
+        colors : tuple, list or ndarray
+            array of any shape whose last dimension has the 3 coordinates
+            of each color
+        out : ndarray or None
+            C-contiguous float32 or float64 array of the same shape for the
+            result, which can be `colors` itself. If None, a new array is
+            made (float32 for float32 colors, otherwise float64)
+
+        Returns
+        -------
+        ndarray
+            the RGB values, in the shape of `colors`
+
+        """
+        colors = numpy.asarray(colors)
+        if colors.shape[-1:] != (3,):
+            raise ValueError("Invalid input dimensions or shape for input "
+                             "colors.")
+        if out is None:
+            dtype = colors.dtype if colors.dtype == numpy.float32 else float
+            out = numpy.empty(colors.shape, dtype=dtype)
+        elif (out.dtype not in self._matrices or
+                not out.flags.c_contiguous or out.shape != colors.shape):
+            raise ValueError("ColorPipeline output must be a C-contiguous "
+                             "float32 or float64 array the same shape as "
+                             "the colors")
+        src = colors.reshape(-1, 3)
+        dst = out.reshape(-1, 3)  # a view, as it's contiguous
+        for start in range(0, len(dst), self.blockSize):
+            end = start + self.blockSize
+            self._applyBlock(src[start:end], dst[start:end])
+        return out
+
+    def _applyBlock(self, src, dst):
+        """Convert a block of colors (Nx3) from src into dst (which can be
+        the same array)
+        """
+        space = self.colorSpace
+        if space == 'dkl':
+            # spherical to cartesian (LUM, L-M, S)
+            elev = numpy.radians(src[:, 0])
+            azim = numpy.radians(src[:, 1])
+            radius = src[:, 2]
+            cart = numpy.empty_like(dst)
+            cart[:, 0] = radius * numpy.sin(elev)
+            radius = radius * numpy.cos(elev)
+            cart[:, 1] = radius * numpy.cos(azim)
+            cart[:, 2] = radius * numpy.sin(azim)
+        elif self._isLab:
+            lightness = src[:, 0]
+            if space == 'cielch':
+                hue = numpy.radians(src[:, 2])
+                a = src[:, 1] * numpy.cos(hue)
+                b = src[:, 1] * numpy.sin(hue)
+            else:
+                a = src[:, 1]
+                b = src[:, 2]
+            # convert Lab to CIE-XYZ (without the white values, which are
+            # in the matrix), as in cielab2rgb
+            cart = numpy.empty_like(dst)
+            cart[:, 1] = (lightness + 16.0) / 116.0
+            cart[:, 0] = cart[:, 1] + a / 500.0
+            cart[:, 2] = cart[:, 1] - b / 200.0
+            delta = 6.0 / 29.0
+            isAbove = cart > delta
+            cart = numpy.where(isAbove, cart ** 3,
+                               (cart - (4.0 / 29.0)) * (3.0 * delta ** 2))
+            cart = cart.astype(dst.dtype, copy=False)
+        elif src.dtype != dst.dtype or numpy.may_share_memory(src, dst):
+            cart = src.astype(dst.dtype)
+        else:
+            cart = src
+
+        numpy.dot(cart, self._matrices[dst.dtype], out=dst)
+
+        if self._isLab:
+            if self.transferFunc is not None:
+                dst[...] = self.transferFunc(dst, **self._kwargs)
+            if self.clip:
+                numpy.clip(dst, 0.0, 1.0, out=dst)
+            dst *= 2.0
+            dst -= 1.0
+
+
+_colorPipelines = {}
+
+
+def getColorPipeline(colorSpace, conversionMatrix=None, **kwargs):
+    """Get a :class:`ColorPipeline`, from those made before for the same
+    color space and conversion matrix if possible (the other arguments of
+    ColorPipeline must be hashable)
+    """
+    if conversionMatrix is not None:
+        conversionMatrix = numpy.asarray(conversionMatrix, dtype=float)
+    key = (colorSpace,
+           None if conversionMatrix is None else conversionMatrix.tobytes(),
+           tuple(sorted(kwargs.items())))
+    if key not in _colorPipelines:
+        if len(_colorPipelines) >= 32:
+            _colorPipelines.clear()
+        _colorPipelines[key] = ColorPipeline(colorSpace, conversionMatrix,
+                                             **kwargs)
+    return _colorPipelines[key]
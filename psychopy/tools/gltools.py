@@ -10,13 +10,13 @@
 
 import ctypes
 import array
-from io import StringIO
-from collections import namedtuple, OrderedDict
+from collections import namedtuple
 import pyglet.gl as GL  # using Pyglet for now
 from contextlib import contextmanager
 from PIL import Image
 import numpy as np
 import os
+from psychopy.tools.meshtools import parseObjFile, parseMtlFile
 
 # -----------------------------------
 # Framebuffer Objects (FBO) Functions
@@ -671,8 +671,10 @@ def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
 
     Parameters
     ----------
-    data : :obj:`list` or :obj:`tuple` of :obj:`float` or :obj:`int`
+    data : :obj:`list` or :obj:`tuple` of :obj:`float` or :obj:`int`, or ndarray
         Coordinates as a 1D array of floats (e.g. [X0, Y0, Z0, X1, Y1, Z1, ...])
+        Numpy arrays (of any shape) are uploaded directly, without copying
+        them value by value.
     size : :obj:`int`
         Number of coordinates per-vertex, default is 3.
     dtype : :obj:`int`
@@ -712,14 +714,22 @@ def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
     # convert values to ctypes float array
     if dtype == GL.GL_FLOAT:
         useType = GL.GLfloat
+        npType = np.float32
     elif dtype == GL.GL_UNSIGNED_INT:
         useType = GL.GLuint
+        npType = np.uint32
     elif dtype == GL.GL_UNSIGNED_SHORT:
         useType = GL.GLushort
+        npType = np.uint16
     else:
         raise TypeError("Invalid type specified.")
 
-    if isinstance(data, array.array):
+    if isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data, dtype=npType).ravel()
+        count = data.size
+        c_array = data.ctypes.data_as(
+            ctypes.POINTER(useType * count)).contents
+    elif isinstance(data, array.array):
         addr, count = data.buffer_info()
         c_array = ctypes.cast(addr, ctypes.POINTER((useType * count)))[0]
     else:
@@ -1174,24 +1184,30 @@ WavefrontObj = namedtuple(
 )
 
 
-def loadObjFile(objFile):
+def loadObjFile(objFile, useCache=True):
     """Load a Wavefront OBJ file (*.obj).
 
     Parameters
     ----------
     objFile : :obj:`str`
         Path to the *.OBJ file to load.
+    useCache : :obj:`bool`
+        Keep a binary copy of the mesh data next to the OBJ file, so the file
+        is only parsed again if it changes (see
+        `psychopy.tools.meshtools.parseObjFile`).
 
     Returns
     -------
-    WavefrontObjModel
+    WavefrontObj
 
     Notes
     -----
     1. This importer should work fine for most sanely generated files.
        Export your model with Blender for best results, even if you used some
        other package to create it.
-    2. The model must be triangulated, quad faces are not supported.
+    2. Quads and other polygon faces are split into triangles.
+    3. The file is parsed with `psychopy.tools.meshtools.parseObjFile`, which
+       doesn't need an OpenGL context, then uploaded to the graphics device.
 
     Examples
     --------
@@ -1223,95 +1239,7 @@ def loadObjFile(objFile):
     useLights(None)
 
     """
-    # open the file, read it into memory
-    with open(objFile, 'r') as objFile:
-        objBuffer = StringIO(objFile.read())
-
-    nVertices = nTextureCoords = nNormals = nFaces = nObjects = nMaterials = 0
-    matLibPath = None
-
-    # first pass, examine the file
-    for line in objBuffer.readlines():
-        if line.startswith('v '):
-            nVertices += 1
-        elif line.startswith('vt '):
-            nTextureCoords += 1
-        elif line.startswith('vn '):
-            nNormals += 1
-        elif line.startswith('f '):
-            nFaces += 1
-        elif line.startswith('o '):
-            nObjects += 1
-        elif line.startswith('usemtl '):
-            nMaterials += 1
-        elif line.startswith('mtllib '):
-            matLibPath = line.strip()[7:]
-
-    # error check
-    if nVertices == 0:
-        raise RuntimeError(
-            "Failed to load OBJ file, file contains no vertices.")
-
-    objBuffer.seek(0)
-
-    # attribute data lists
-    positionDefs = []
-    texCoordDefs = []
-    normalDefs = []
-
-    # attribute lists to upload
-    vertexAttrList = []
-    texCoordAttrList = []
-    normalAttrList = []
-
-    # store vertex attributes in dictionaries for easy re-mapping if needed
-    vertexAttrs = OrderedDict()
-    vertexIndices = OrderedDict()
-
-    # group faces by material, each one will get its own VAO
-    materialGroups = OrderedDict()
-    materialOffsets = OrderedDict()
-
-    # Parse the buffer for vertex attributes. We would like to create an index
-    # buffer were there are no duplicate vertices. So we load attributes and
-    # check if it's a duplicate against previously loaded attributes. If so, we
-    # re-map it instead of creating a new attribute. Attributes are considered
-    # equal if they share the same position, texture coordinate and normal.
-    #
-    vertexIdx = faceIdx = 0
-    materialGroup = None
-    for line in objBuffer.readlines():
-        line = line.strip()
-
-        if line.startswith('v '):  # new vertex position
-            positionDefs.append(tuple(map(float, line[2:].split(' '))))
-        elif line.startswith('vt '):  # new vertex texture coordinate
-            texCoordDefs.append(tuple(map(float, line[3:].split(' '))))
-        elif line.startswith('vn '):  # new vertex normal
-            normalDefs.append(tuple(map(float, line[3:].split(' '))))
-        elif line.startswith('f '):
-            faceDef = []
-            for attrs in line[2:].split(' '):
-                # check if vertex attribute already loaded, create a new index
-                # if not.
-                if attrs not in vertexAttrs.keys():
-                    p, t, n = map(int, attrs.split('/'))
-                    # add to attribute lists
-                    vertexAttrList.extend(positionDefs[p - 1])
-                    texCoordAttrList.extend(texCoordDefs[t - 1])
-                    normalAttrList.extend(normalDefs[n - 1])
-                    vertexIndices[attrs] = vertexIdx
-                    vertexIdx += 1
-                faceDef.append(vertexIndices[attrs])  # attribute exists? remap
-            materialGroups[materialGroup].extend(faceDef)
-            faceIdx += 1  # for computing material offsets
-        # elif line.startswith('o '):
-        #    pass
-        elif line.startswith('usemtl '):
-            materialGroup = line[7:]
-            if materialGroup not in materialGroups.keys():
-                materialGroups[materialGroup] = []
-                materialOffsets[materialGroup] = faceIdx
+    mesh = parseObjFile(objFile, useCache=useCache)
 
     # Load all vertex attribute data to the graphics device. If anyone cares,
     # try to make this work by interleaving attributes so we can read from a
@@ -1319,15 +1247,15 @@ def loadObjFile(objFile):
     # primitives which speeds things up considerably, so it's not needed right
     # now.
     #
-    posVBO = createVBO(vertexAttrList)
-    texVBO = createVBO(texCoordAttrList, 2)
-    normVBO = createVBO(normalAttrList)
+    posVBO = createVBO(mesh.positions)
+    texVBO = createVBO(mesh.texCoords, 2)
+    normVBO = createVBO(mesh.normals)
 
     # Create a VAO for each material in the file, each gets it own element
     # buffer array for indexed drawing.
     #
     objVAOs = {}
-    for group, elements in materialGroups.items():
+    for group, elements in mesh.groups.items():
         objVAOs[group] = createVAO((
             (GL.GL_VERTEX_ARRAY, posVBO),
             (GL.GL_TEXTURE_COORD_ARRAY, texVBO),
@@ -1336,45 +1264,36 @@ def loadObjFile(objFile):
                       dtype=GL.GL_UNSIGNED_INT,
                       target=GL.GL_ELEMENT_ARRAY_BUFFER))
 
-    return WavefrontObj(matLibPath, objVAOs, posVBO, texVBO, normVBO, dict())
+    return WavefrontObj(mesh.mtlFile, objVAOs, posVBO, texVBO, normVBO,
+                        dict())
 
 
 def loadMtlFile(mtlFilePath, texParameters=None):
     """Load a material library (*.mtl).
 
     """
-    # open the file, read it into memory
-    with open(mtlFilePath, 'r') as mtlFile:
-        mtlBuffer = StringIO(mtlFile.read())
-
     # default texture parameters
     if texParameters is None:
         texParameters = [(GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR),
                          (GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)]
 
+    colorParams = (('Ks', GL.GL_SPECULAR),
+                   ('Kd', GL.GL_DIFFUSE),
+                   ('Ka', GL.GL_AMBIENT))
+
     foundMaterials = {}
     foundTextures = {}
-    thisMaterial = 0
-    for line in mtlBuffer.readlines():
-        line = line.strip()
-        if line.startswith('newmtl '):  # new material
-            thisMaterial = line[7:]
-            foundMaterials[thisMaterial] = createMaterial()
-        elif line.startswith('Ns '):  # specular exponent
-            foundMaterials[thisMaterial].params[GL.GL_SHININESS] = \
-                GL.GLfloat(float(line[3:]))
-        elif line.startswith('Ks '):  # specular color
-            foundMaterials[thisMaterial].params[GL.GL_SPECULAR] = \
-                (GL.GLfloat * 4)(*list(map(float, line[3:].split(' '))) + [1.0])
-        elif line.startswith('Kd '):  # diffuse color
-            foundMaterials[thisMaterial].params[GL.GL_DIFFUSE] = \
-                (GL.GLfloat * 4)(*list(map(float, line[3:].split(' '))) + [1.0])
-        elif line.startswith('Ka '):  # ambient color
-            foundMaterials[thisMaterial].params[GL.GL_AMBIENT] = \
-                (GL.GLfloat * 4)(*list(map(float, line[3:].split(' '))) + [1.0])
-        elif line.startswith('map_Kd '):  # diffuse color map
+    for name, params in parseMtlFile(mtlFilePath).items():
+        material = foundMaterials[name] = createMaterial()
+        if 'Ns' in params:  # specular exponent
+            material.params[GL.GL_SHININESS] = GL.GLfloat(params['Ns'])
+        for key, mode in colorParams:  # specular, diffuse and ambient colors
+            if key in params:
+                material.params[mode] = \
+                    (GL.GLfloat * 4)(*(list(params[key][:3]) + [1.0]))
+        if 'map_Kd' in params:  # diffuse color map
             # load a diffuse texture from file
-            textureName = line[7:]
+            textureName = params['map_Kd']
             if textureName not in foundTextures.keys():
                 im = Image.open(
                     os.path.join(os.path.split(mtlFilePath)[0], textureName))
@@ -1392,8 +1311,7 @@ def loadMtlFile(mtlFilePath, texParameters=None):
                     data=pixelData,
                     unpackAlignment=1,
                     texParameters=texParameters)
-            foundMaterials[thisMaterial].textures[GL.GL_TEXTURE0] = \
-                foundTextures[textureName]
+            material.textures[GL.GL_TEXTURE0] = foundTextures[textureName]
 
     return foundMaterials
 
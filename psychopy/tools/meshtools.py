@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Loading 3D model data (Wavefront OBJ and MTL files) into numpy arrays.
+
+These functions don't need an OpenGL context, see `psychopy.tools.gltools`
+for uploading the data to the graphics device.
+
+"""
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+import io
+import os
+import re
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+
+from psychopy import logging
+
+# bump this when the parsed data (or the cache layout) changes
+_objCacheVersion = 1
+
+# Mesh data from an OBJ file
+ObjMeshData = namedtuple(
+    'ObjMeshData',
+    ['mtlFile',
+     'positions',
+     'texCoords',
+     'normals',
+     'groups']
+)
+
+# statements, matched after a newline (which is much faster than with re.M),
+# so the text must start with one
+_reLines = {prefix: re.compile(r'\n[ \t]*%s[ \t]+([^\n]*)' % prefix)
+            for prefix in ('v', 'vt', 'vn', 'f', 'mtllib')}
+_reUseMtl = re.compile(r'\n[ \t]*usemtl[ \t]+([^\n]*)')
+
+
+def _parseFloats(lines, nValues):
+    """Parse lines of whitespace separated numbers into an (N, nValues)
+    float array, ignoring any extra values on a line.
+    """
+    if not lines:
+        return np.zeros((0, nValues), dtype=np.float32)
+    tokens = ' '.join(lines).split()
+    if len(tokens) == len(lines) * nValues:
+        values = np.array(tokens, dtype=np.float64)
+    else:  # some lines have more (or fewer) values
+        values = np.array([(line.split() + ['0'] * nValues)[:nValues]
+                           for line in lines], dtype=np.float64)
+    return values.reshape(-1, nValues).astype(np.float32)
+
+
+def _parseCorners(tokens):
+    """Parse face corner tokens ('p', 'p/t', 'p//n' or 'p/t/n') into an
+    (N, 3) array of indices, with 0 for missing indices.
+    """
+    nCorners = len(tokens)
+    joined = ' '.join(tokens)
+    nSlashes = joined.count('/')
+    nDouble = joined.count('//')
+    if nSlashes == 2 * nCorners and nDouble in (0, nCorners):
+        # all 'p/t/n', or all 'p//n'
+        joined = joined.replace('//', '/0/').replace('/', ' ')
+        return np.array(joined.split(), dtype=np.int64).reshape(-1, 3)
+    elif nSlashes == nCorners and not nDouble:  # all 'p/t'
+        indices = np.zeros((nCorners, 3), dtype=np.int64)
+        indices[:, :2] = np.array(joined.replace('/', ' ').split(),
+                                  dtype=np.int64).reshape(-1, 2)
+        return indices
+    elif not nSlashes:  # all 'p'
+        indices = np.zeros((nCorners, 3), dtype=np.int64)
+        indices[:, 0] = np.array(tokens, dtype=np.int64)
+        return indices
+    # a mixture, one corner at a time
+    return np.array([[int(i) if i else 0
+                      for i in (token.split('/') + ['', ''])[:3]]
+                     for token in tokens], dtype=np.int64)
+
+
+def _lineOffsets(pattern, text):
+    return np.array([m.start() for m in pattern.finditer(text)], dtype=int)
+
+
+def _splitFaces(faces):
+    """Split the text of faces into a list of corner tokens and an array of
+    the number of corners of each face.
+    """
+    joined = '\n'.join(faces)
+    if ('\t' in joined or '\r' in joined or '  ' in joined or
+            ' \n' in joined or joined.endswith(' ')):
+        joined = re.sub(r'[ \t\r]+', ' ', joined)
+        joined = re.sub(r' ?\n ?', '\n', joined).strip(' ')
+    # corners = spaces + 1 on each line, counted with numpy
+    chars = np.frombuffer(joined.encode('utf-8'), dtype=np.uint8)
+    nSpaces = np.cumsum(chars == ord(' '))
+    lineEnds = np.concatenate([np.flatnonzero(chars == ord('\n')),
+                               [len(chars) - 1]])
+    spacesBefore = nSpaces[lineEnds]
+    faceSizes = np.diff(np.concatenate([[0], spacesBefore])) + 1
+    return joined.split(), faceSizes
+
+
+def _parseObj(text):
+    """Parse the text of an OBJ file into an ObjMeshData"""
+    text = '\n' + text
+    positions = _parseFloats(_reLines['v'].findall(text), 3)
+    if not len(positions):
+        raise RuntimeError(
+            "Failed to load OBJ file, file contains no vertices.")
+    texCoords = _parseFloats(_reLines['vt'].findall(text), 2)
+    normals = _parseFloats(_reLines['vn'].findall(text), 3)
+    mtlLibs = _reLines['mtllib'].findall(text)
+    mtlFile = mtlLibs[0] if mtlLibs else None
+
+    # faces, and the materials they use (the text between usemtl statements)
+    chunks = _reUseMtl.split(text)
+    materials = [None] + [name.strip() for name in chunks[1::2]]
+    faces = []
+    faceMaterial = []
+    for matN, chunk in enumerate(chunks[::2]):
+        chunkFaces = _reLines['f'].findall(chunk)
+        faces.extend(chunkFaces)
+        faceMaterial.append(np.full(len(chunkFaces), matN, dtype=int))
+    faceMaterial = np.concatenate(faceMaterial)
+    if not faces:
+        raise RuntimeError("Failed to load OBJ file, file contains no faces.")
+    tokens, faceSizes = _splitFaces(faces)
+    corners = _parseCorners(tokens)
+    keep = faceSizes >= 3  # skip degenerate faces (points and lines)
+    if not keep.all():
+        corners = corners[np.repeat(keep, faceSizes)]
+        faceSizes = faceSizes[keep]
+        faceMaterial = faceMaterial[keep]
+
+    # the face each corner belongs to
+    faceStarts = np.concatenate([[0], np.cumsum(faceSizes)[:-1]])
+    cornerFace = np.repeat(np.arange(len(faceSizes)), faceSizes)
+
+    # negative indices count back from the last item defined before the face
+    if (corners < 0).any():
+        faceOffsets = _lineOffsets(_reLines['f'], text)[keep]
+        for col, prefix in enumerate(('v', 'vt', 'vn')):
+            negative = corners[:, col] < 0
+            if negative.any():
+                nDefined = np.searchsorted(
+                    _lineOffsets(_reLines[prefix], text), faceOffsets)
+                corners[negative, col] += \
+                    nDefined[cornerFace[negative]] + 1
+
+    # from 1-based indices, with -1 for missing ones
+    corners -= 1
+    for col, defs in enumerate((positions, texCoords, normals)):
+        if ((corners[:, col] >= len(defs)).any() or
+                (corners[:, col] < -1).any()):
+            raise RuntimeError("Failed to load OBJ file, face refers to a "
+                               "vertex attribute that doesn't exist.")
+
+    # combine identical p/t/n triples into one vertex, numbered in order of
+    # first use
+    key = corners + 1
+    key = (key[:, 0] * (len(texCoords) + 1) + key[:, 1]) * \
+        (len(normals) + 1) + key[:, 2]
+    _, firstUse, vertexOfCorner = np.unique(
+        key, return_index=True, return_inverse=True)
+    order = np.argsort(firstUse)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    vertexOfCorner = rank[vertexOfCorner.ravel()]
+    vertexCorners = corners[firstUse[order]]
+
+    def gather(defs, indices, nValues):
+        values = np.zeros((len(indices), nValues), dtype=np.float32)
+        found = indices >= 0
+        values[found] = defs[indices[found]]
+        return values
+
+    # triangulate faces (quads and n-gons) as fans from their first corner
+    nTriangles = faceSizes - 2
+    triFace = np.repeat(np.arange(len(faceSizes)), nTriangles)
+    triN = np.arange(len(triFace)) - np.repeat(
+        np.cumsum(nTriangles) - nTriangles, nTriangles)
+    first = faceStarts[triFace]
+    triangles = np.column_stack([first, first + triN + 1, first + triN + 2])
+    elements = vertexOfCorner[triangles].astype(np.uint32)
+
+    # group faces by the material they use, in the order they are first used
+    # (under None for faces before any material)
+    groupOfMaterial = np.array([materials.index(name) for name in materials])
+    triGroup = groupOfMaterial[faceMaterial[triFace]]
+    groups = OrderedDict()
+    for groupN, name in enumerate(materials):
+        if name in groups:
+            continue
+        inGroup = triGroup == groupN
+        if inGroup.any() or groupN:
+            groups[name] = elements[inGroup].ravel()
+
+    return ObjMeshData(mtlFile,
+                       positions[vertexCorners[:, 0]],
+                       gather(texCoords, vertexCorners[:, 1], 2),
+                       gather(normals, vertexCorners[:, 2], 3),
+                       groups)
+
+
+def _objCacheFile(objFile):
+    return objFile + '.npz'
+
+
+def _readObjCache(cacheFile, stat):
+    with np.load(cacheFile) as cached:
+        header = cached['header']
+        if (header[0] != _objCacheVersion or
+                header[1] != stat.st_size or
+                header[2] != int(stat.st_mtime * 1e6)):
+            return None
+        names = [str(name) for name in cached['groupNames']]
+        noneGroup = int(cached['noneGroup'])
+        groupEnds = cached['groupEnds']
+        elements = cached['elements']
+        groups = OrderedDict()
+        start = 0
+        for groupN, (name, end) in enumerate(zip(names, groupEnds)):
+            groups[None if groupN == noneGroup else name] = \
+                elements[start:end]
+            start = end
+        mtlFile = str(cached['mtlFile'])
+        return ObjMeshData(mtlFile if cached['hasMtlFile'] else None,
+                           cached['positions'], cached['texCoords'],
+                           cached['normals'], groups)
+
+
+def _writeObjCache(cacheFile, stat, mesh):
+    names = list(mesh.groups.keys())
+    noneGroup = names.index(None) if None in names else -1
+    header = np.array([_objCacheVersion, stat.st_size,
+                       int(stat.st_mtime * 1e6)], dtype=np.int64)
+    groupEnds = np.cumsum([len(elements)
+                           for elements in mesh.groups.values()])
+    tmpFile = cacheFile[:-4] + '_%i.tmp.npz' % os.getpid()
+    np.savez(tmpFile,
+             header=header,
+             mtlFile=np.array(mesh.mtlFile or u''),
+             hasMtlFile=np.array(mesh.mtlFile is not None),
+             positions=mesh.positions,
+             texCoords=mesh.texCoords,
+             normals=mesh.normals,
+             groupNames=np.array([u'' if name is None else name
+                                  for name in names], dtype=np.unicode_),
+             noneGroup=np.array(noneGroup),
+             groupEnds=groupEnds.astype(np.int64),
+             elements=np.concatenate(list(mesh.groups.values())))
+    if os.path.isfile(cacheFile):
+        os.remove(cacheFile)
+    os.rename(tmpFile, cacheFile)
+
+
+def parseObjFile(objFile, useCache=True):
+    """Load the mesh data from a Wavefront OBJ file (*.obj) into numpy arrays.
+
+    Parameters
+    ----------
+    objFile : :obj:`str`
+        Path to the *.OBJ file to load.
+    useCache : :obj:`bool`
+        Keep a binary copy of the data in '<objFile>.npz', next to the OBJ
+        file, and load from it instead if the OBJ file hasn't changed.
+
+    Returns
+    -------
+    ObjMeshData
+        With fields `mtlFile` (the material library named in the file, or
+        None), `positions` (Nx3), `texCoords` (Nx2) and `normals` (Nx3) of the
+        vertices as float32 arrays, and `groups`, an ordered dict of the
+        element (uint32 vertex index) arrays of the triangles using each
+        material, in the order they are first used (under None for faces
+        before any material).
+
+    Notes
+    -----
+    1. Each distinct combination of position, texture coordinate and normal
+       in the faces becomes one vertex, numbered in order of first use.
+    2. Quads and other polygons are split into triangles (as fans from their
+       first vertex). Missing texture coordinates and normals are zero.
+
+    Examples
+    --------
+    # load a model, then draw the triangles of each material
+    mesh = parseObjFile('/path/to/file.obj')
+    for material, elements in mesh.groups.items():
+        triangles = mesh.positions[elements].reshape(-1, 3, 3)
+
+    """
+    cacheFile = _objCacheFile(objFile)
+    stat = os.stat(objFile)
+    if useCache and os.path.isfile(cacheFile):
+        try:
+            mesh = _readObjCache(cacheFile, stat)
+        except Exception:
+            mesh = None
+            logging.warning("Cached mesh {} could not be read, so it will be "
+                            "rebuilt".format(cacheFile))
+        if mesh is not None:
+            return mesh
+
+    with io.open(objFile, 'r', encoding='utf-8', errors='replace') as f:
+        mesh = _parseObj(f.read())
+
+    if useCache:
+        try:
+            _writeObjCache(cacheFile, stat, mesh)
+        except (IOError, OSError) as err:
+            logging.warning("Could not cache the mesh from {}: {}".format(
+                objFile, err))
+    return mesh
+
+
+def parseMtlFile(mtlFilePath):
+    """Load the materials from a material library (*.mtl).
+
+    Parameters
+    ----------
+    mtlFilePath : :obj:`str`
+        Path to the *.MTL file to load.
+
+    Returns
+    -------
+    :obj:`OrderedDict`
+        The parameters of each material, by name, as a dict of the
+        statements in the file. Numbers are parsed (a float for 'Ns', 'Ni',
+        'd' and 'illum', a tuple of floats for colors such as 'Kd') and
+        everything else (such as the texture file of 'map_Kd') is left as a
+        string.
+
+    """
+    materials = OrderedDict()
+    params = None
+    with io.open(mtlFilePath, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            statement, _, value = line.partition(' ')
+            value = value.strip()
+            if statement == 'newmtl':
+                params = materials[value] = dict()
+            elif params is None:
+                continue
+            elif statement in ('Ns', 'Ni', 'd', 'Tr', 'illum'):
+                params[statement] = float(value)
+            elif statement in ('Ka', 'Kd', 'Ks', 'Ke', 'Tf'):
+                params[statement] = tuple(float(v) for v in value.split())
+            else:
+                params[statement] = value
+    return materials
@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Classes and functions for decoding movie frames ahead of time, and for
+writing captured frames as they arrive
+"""
+from __future__ import absolute_import, division, print_function
+
+from builtins import object
+import os
+import threading
+import time
+from collections import deque
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import numpy
+
+from psychopy import logging
+
+
+class FrameQueue(object):
+    """Decode the upcoming frames of a movie in a background thread.
+
+    A bounded queue of decoded frames is kept ahead of the movie clock, so
+    that decoding doesn't count against the frame budget of `draw()`.
+    Frames are copied into a pool of preallocated buffers which are reused
+    once a frame has been replaced on screen.
+
+    Only the decoding thread calls `getFrame` (the decoder), so it should
+    not be used from elsewhere while the queue is running.
+
+    :Parameters:
+
+        getFrame: callable
+            `getFrame(t)` returns the frame at time `t` (s) of the movie as
+            a numpy array (e.g. `VideoFileClip.get_frame` from moviepy)
+
+        fps: float
+            frame rate of the movie
+
+        duration: float
+            duration of the movie (s). No frames are decoded beyond this
+
+        queueSize: int
+            the maximum number of decoded frames waiting to be shown
+
+        dropLate: bool
+            if True, when several decoded frames are due only the most
+            recent is returned and the others are dropped (keeping the
+            movie in sync with its clock). If False every frame is shown
+            in turn, even if that means showing it late
+
+        name: str
+            used in log messages
+    """
+
+    def __init__(self, getFrame, fps, duration, queueSize=8, dropLate=True,
+                 name=''):
+        super(FrameQueue, self).__init__()
+        self._decode = getFrame
+        self.frameInterval = 1.0 / fps
+        self.duration = duration
+        self.queueSize = max(1, int(queueSize))
+        self.dropLate = dropLate
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._queue = deque()  # (frameTime, buffer), oldest first
+        self._freeBuffers = []
+        self._nBuffers = 0
+        self._current = None  # the (frameTime, buffer) last returned
+        self._startT = 0.0
+        self._frameN = 0  # of the next frame to decode (from _startT)
+        self._generation = 0  # incremented on seek to discard old frames
+        self._decoderDone = False
+        self._running = False
+        self._thread = None
+        self.resetStats()
+
+    @property
+    def nextDecodeTime(self):
+        """The time of the next frame the decoder will read
+        """
+        return self._startT + self._frameN * self.frameInterval
+
+    @property
+    def finished(self):
+        """True when all frames up to the duration have been returned
+        """
+        with self._cond:
+            return self._decoderDone and not self._queue
+
+    def start(self, t=0.0):
+        """Start the decoding thread from time `t`
+        """
+        self.seek(t)
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run,
+                                            name='FrameQueue %s' % self.name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the decoding thread (it can't be restarted)
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def seek(self, t):
+        """Discard queued frames and continue decoding from time `t`
+        """
+        with self._cond:
+            self._generation += 1
+            while self._queue:
+                self._freeBuffers.append(self._queue.popleft()[1])
+            self._startT = t
+            self._frameN = 0
+            self._decoderDone = False
+            self._cond.notify_all()
+
+    def getFrame(self, t, block=False, timeout=None):
+        """Return the `(frameTime, frame)` to show at time `t` on the movie
+        clock, or None if no new frame is due yet (so the current one should
+        stay on screen).
+
+        With `block=True` this waits (up to `timeout`) for a frame to be
+        decoded if none is available, and returns it even if it isn't due.
+
+        The returned frame buffer remains valid until the next call.
+        """
+        with self._cond:
+            if block:
+                endT = None if timeout is None else time.time() + timeout
+                while not self._queue and not self._decoderDone:
+                    remaining = None if endT is None else endT - time.time()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            elif self._queue and self._queue[0][0] > t:
+                return None
+            if not self._queue:
+                if not self._decoderDone and self.nextDecodeTime <= t:
+                    self.nUnderruns += 1  # decoder has fallen behind
+                return None
+            chosen = self._queue.popleft()
+            if self.dropLate:
+                while self._queue and self._queue[0][0] <= t:
+                    self._freeBuffers.append(chosen[1])
+                    self.nDropped += 1
+                    chosen = self._queue.popleft()
+            if self._current is not None:
+                self._freeBuffers.append(self._current[1])
+            self._current = chosen
+            self.nShown += 1
+            lag = t - chosen[0]
+            if not block or lag >= 0:
+                self._lagSum += lag
+                self.maxLag = max(self.maxLag, lag)
+            self._cond.notify_all()
+            return chosen
+
+    def resetStats(self):
+        """Reset the decode/lag statistics (see :meth:`getStats`)
+        """
+        self.nDecoded = 0
+        self.nShown = 0
+        self.nDropped = 0
+        self.nDecodeErrors = 0
+        self.nUnderruns = 0
+        self.maxDecodeTime = 0.0
+        self.maxLag = 0.0
+        self._decodeTimeSum = 0.0
+        self._lagSum = 0.0
+
+    def getStats(self):
+        """Return a dict of decoding statistics:
+
+            - nDecoded, nShown, nDropped: numbers of frames
+            - nDecodeErrors: frames that couldn't be decoded (and were skipped)
+            - nUnderruns: times a frame was due but hadn't been decoded yet
+            - meanDecodeTime, maxDecodeTime: seconds to decode a frame
+            - meanLag, maxLag: seconds between a frame being due (its
+              timestamp) and it being returned
+        """
+        with self._cond:
+            return {
+                'nDecoded': self.nDecoded,
+                'nShown': self.nShown,
+                'nDropped': self.nDropped,
+                'nDecodeErrors': self.nDecodeErrors,
+                'nUnderruns': self.nUnderruns,
+                'meanDecodeTime': self._decodeTimeSum / max(1, self.nDecoded),
+                'maxDecodeTime': self.maxDecodeTime,
+                'meanLag': self._lagSum / max(1, self.nShown),
+                'maxLag': self.maxLag,
+                'queued': len(self._queue)}
+
+    def _getBuffer(self, frame):
+        """Return a free buffer matching the frame (must hold the lock)
+        """
+        while self._freeBuffers:
+            buff = self._freeBuffers.pop()
+            if buff.shape == frame.shape and buff.dtype == frame.dtype:
+                return buff
+            self._nBuffers -= 1  # wrong size (new movie?) so discard
+        self._nBuffers += 1
+        return numpy.empty_like(frame)
+
+    def _run(self):
+        cond = self._cond
+        # queued frames + the one on screen + the one being decoded
+        maxBuffers = self.queueSize + 2
+        while True:
+            with cond:
+                while self._running and (
+                        self._decoderDone or
+                        len(self._queue) >= self.queueSize or
+                        (not self._freeBuffers and
+                         self._nBuffers >= maxBuffers)):
+                    cond.wait()
+                if not self._running:
+                    return
+                generation = self._generation
+                t = self.nextDecodeTime
+                if t > self.duration:
+                    self._decoderDone = True
+                    cond.notify_all()
+                    continue
+                self._frameN += 1
+
+            t0 = time.time()
+            try:
+                frame = self._decode(t)
+            except (OSError, IOError):
+                logging.warning("Frame {} of {} could not be decoded, "
+                                "skipping it".format(t, self.name))
+                with cond:
+                    self.nDecodeErrors += 1
+                continue
+            decodeTime = time.time() - t0
+
+            with cond:
+                if generation != self._generation:
+                    continue  # seek happened while decoding
+                buff = self._getBuffer(frame)
+                numpy.copyto(buff, frame)
+                self._queue.append((t, buff))
+                self.nDecoded += 1
+                self._decodeTimeSum += decodeTime
+                self.maxDecodeTime = max(self.maxDecodeTime, decodeTime)
+                cond.notify_all()
+
+
+# file types written with moviepy (video) or imageio (gif) rather than
+# as a sequence of images with PIL
+movieExtensions = ['.gif', '.mpg', '.mpeg', '.mp4', '.mov']
+
+
+class MovieFrameWriter(object):
+    """Write movie frames to disk in a background thread, as they are
+    captured, so that memory use stays flat however long the recording.
+
+    Frames wait in a bounded queue to be converted and encoded; when the
+    queue is full `addFrame` either waits for the writer (back-pressure) or
+    drops the frame.
+
+    :Parameters:
+
+        fileName: str
+            The extension determines the type of file(s) written, as for
+            `Window.saveMovieFrames`. For image types (e.g. .png) each frame
+            is written to its own numbered file (frame00001.png...). .gif
+            files are written with imageio, and mpg/mpeg/mp4/mov with moviepy
+
+        codec: str
+            the codec to be used by moviepy for mp4/mpg/mov files
+
+        fps: float
+            the frame rate of the movie
+
+        queueSize: int
+            the maximum number of frames waiting to be written
+
+        dropFrames: bool
+            if True, frames that arrive while the queue is full are dropped
+            (and counted). If False `addFrame` blocks until there is room
+
+        convert: callable or None
+            `convert(frame)` is called in the writer thread to turn each
+            frame into an (h, w, 3) uint8 numpy array or a PIL image, so
+            that the conversion doesn't cost the caller any time
+
+        nDigits: int
+            the number of digits in the frame number of image files
+    """
+
+    def __init__(self, fileName, codec='libx264', fps=30, queueSize=16,
+                 dropFrames=False, convert=None, nDigits=5):
+        super(MovieFrameWriter, self).__init__()
+        self.fileName = fileName
+        self.codec = codec
+        self.fps = fps
+        self.dropFrames = dropFrames
+        self.convert = convert
+        fileRoot, fileExt = os.path.splitext(fileName)
+        self.fileExt = fileExt.lower()
+        self._frameNameFormat = "%s%%0%dd%s" % (fileRoot, nDigits, fileExt)
+
+        self.nQueued = 0
+        self.nWritten = 0
+        self.nDropped = 0
+        self.maxQueued = 0
+        self._encoder = None
+        self._error = None
+        self._closed = False
+        self._queue = queue.Queue(max(1, int(queueSize)))
+        self._thread = threading.Thread(target=self._run,
+                                        name='MovieFrameWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def addFrame(self, frame):
+        """Queue a frame to be written.
+
+        Returns True if the frame was queued, or False if it was dropped
+        because the queue was full (only if `dropFrames` is True).
+        """
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise RuntimeError("MovieFrameWriter for {} is closed"
+                               .format(self.fileName))
+        try:
+            self._queue.put(frame, block=not self.dropFrames)
+        except queue.Full:
+            self.nDropped += 1
+            return False
+        self.nQueued += 1
+        self.maxQueued = max(self.maxQueued, self._queue.qsize())
+        return True
+
+    def close(self, timeout=None):
+        """Wait for the queued frames to be written and close the file(s).
+
+        Raises any error that stopped the writer thread.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join(timeout)
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def getStats(self):
+        """Return a dict of the numbers of frames queued, written and
+        dropped, and the maximum number waiting in the queue
+        """
+        return {'nQueued': self.nQueued,
+                'nWritten': self.nWritten,
+                'nDropped': self.nDropped,
+                'maxQueued': self.maxQueued}
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._error is not None:
+                continue  # drain the queue so addFrame() doesn't block
+            try:
+                self._write(frame)
+                self.nWritten += 1
+            except Exception as err:
+                logging.error("Failed to write movie frame {} to {}: {}"
+                              .format(self.nWritten, self.fileName, err))
+                self._error = err
+        try:
+            if self._encoder is not None:
+                self._encoder.close()
+        except Exception as err:
+            if self._error is None:
+                self._error = err
+
+    def _write(self, frame):
+        if self.convert is not None:
+            frame = self.convert(frame)
+        if self.fileExt not in movieExtensions:
+            if not hasattr(frame, 'save'):
+                from PIL import Image
+                frame = Image.fromarray(frame)
+            frame.save(self._frameNameFormat % (self.nWritten + 1,))
+            return
+        frame = numpy.asarray(frame)
+        if self._encoder is None:
+            self._encoder = self._openEncoder(frame.shape)
+        if self.fileExt == '.gif':
+            self._encoder.append_data(frame)
+        else:
+            self._encoder.write_frame(frame)
+
+    def _openEncoder(self, shape):
+        # lazy loading of moviepy / imageio (rarely needed)
+        if self.fileExt == '.gif':
+            import imageio
+            return imageio.get_writer(self.fileName, mode='I',
+                                      duration=1.0 / self.fps)
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+        return FFMPEG_VideoWriter(self.fileName, (shape[1], shape[0]),
+                                  self.fps, codec=self.codec)
@@ -0,0 +1,632 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Functions for splitting polygons (possibly self-crossing, with holes or
+several regions) into triangles, with numpy and no need for an OpenGL context
+
+Outlines that don't cross or touch are split by ear clipping, after joining
+any holes to the outline around them (as in Mapbox's earcut algorithm). Other
+shapes are cut into horizontal slabs at every vertex and crossing, which
+handles any outline but takes longer and makes more triangles.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from builtins import range
+from past.builtins import basestring
+from collections import OrderedDict
+from heapq import heapify, heappush, heappop
+
+import numpy
+
+# the GLU winding rules (same values as GL.GLU_TESS_WINDING_*)
+WINDING_ODD = 100130
+WINDING_NONZERO = 100131
+WINDING_POSITIVE = 100132
+WINDING_NEGATIVE = 100133
+WINDING_ABS_GEQ_TWO = 100134
+
+_windingRules = {
+    WINDING_ODD: lambda w: (w % 2) == 1,
+    WINDING_NONZERO: lambda w: w != 0,
+    WINDING_POSITIVE: lambda w: w > 0,
+    WINDING_NEGATIVE: lambda w: w < 0,
+    WINDING_ABS_GEQ_TWO: lambda w: numpy.abs(w) >= 2,
+}
+_windingRuleNames = {'odd': WINDING_ODD,
+                     'nonzero': WINDING_NONZERO,
+                     'positive': WINDING_POSITIVE,
+                     'negative': WINDING_NEGATIVE,
+                     'abs_geq_two': WINDING_ABS_GEQ_TWO}
+
+# number of (slab x edge) values to work on at a time, to limit memory use
+_blockSize = 2 ** 20
+# fraction of an edge's length from its ends within which crossings are ignored
+_eps = 1e-9
+
+# tesselated shapes, most recently used last
+tesselateCacheSize = 256
+_tesselateCache = OrderedDict()
+
+
+class TesselateError(Exception):
+    pass
+
+
+def _windingRule(windingRule):
+    if windingRule is None:
+        return WINDING_ODD
+    if isinstance(windingRule, basestring):
+        try:
+            return _windingRuleNames[windingRule.lower()]
+        except KeyError:
+            raise TesselateError("Unknown winding rule %r" % windingRule)
+    if windingRule not in _windingRules:
+        raise TesselateError("Unknown winding rule %r" % windingRule)
+    return windingRule
+
+
+def _toLoops(vertices):
+    """A list of (N, 2) float arrays from a single loop or a list of loops
+    """
+    if isinstance(vertices, numpy.ndarray) and vertices.dtype != object:
+        if vertices.ndim == 2:
+            return [numpy.asarray(vertices, dtype=numpy.float64)]
+        return [numpy.asarray(loop, dtype=numpy.float64) for loop in vertices]
+    if len(vertices) and hasattr(vertices[0][0], '__iter__'):
+        loops = vertices
+    else:
+        loops = [vertices]
+    return [numpy.asarray(loop, dtype=numpy.float64).reshape(-1, 2)
+            for loop in loops]
+
+
+def _edges(loops):
+    """The start and end points of the (non-horizontal) edges of the loops,
+    with the start below the end, and the direction (+1 up, -1 down) of each
+    """
+    starts = numpy.concatenate([loop for loop in loops if len(loop)])
+    ends = numpy.concatenate([numpy.roll(loop, -1, axis=0)
+                              for loop in loops if len(loop)])
+    dy = ends[:, 1] - starts[:, 1]
+    keep = dy != 0
+    starts, ends, dy = starts[keep], ends[keep], dy[keep]
+    up = dy > 0
+    lo = numpy.where(up[:, numpy.newaxis], starts, ends)
+    hi = numpy.where(up[:, numpy.newaxis], ends, starts)
+    return lo, hi, numpy.where(up, 1, -1)
+
+
+def _orient(a, b, c):
+    """Twice the signed area of triangles (a, b, c); positive if anticlockwise
+    """
+    return ((b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1]) -
+            (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0]))
+
+
+def _nearbyPairs(starts, ends):
+    """Blocks of index arrays (i, j) of pairs of edges that pass through the
+    same cell of a grid (so all the pairs that might cross or touch). The
+    cells are about the size of the edges, or smaller if the edges are long
+    compared to the space between them, so few other pairs are included
+    """
+    n = len(starts)
+    d = ends - starts
+    lengths = numpy.hypot(d[:, 0], d[:, 1])
+    total = lengths.sum()
+    origin = numpy.minimum(starts.min(axis=0), ends.min(axis=0))
+    top = numpy.maximum(starts.max(axis=0), ends.max(axis=0))
+    width, height = top - origin
+    size = min(numpy.sqrt(width * height / n), 2 * total / n,
+               2 * width * height / total)
+    # (but not so small that the edges are cut into too many pieces)
+    size = max(size, 4 * total / _blockSize)
+    if not size > 0:
+        size = 1.0
+    # each edge is cut into pieces up to half a cell long, each of them in
+    # at most 2 x 2 cells
+    pieces = numpy.maximum(numpy.ceil(lengths * 2 / size), 1).astype(int)
+    edges = numpy.repeat(numpy.arange(n), pieces)
+    k = numpy.arange(len(edges)) - numpy.repeat(numpy.cumsum(pieces) - pieces,
+                                                pieces)
+    p0 = starts[edges] + (k / pieces[edges])[:, numpy.newaxis] * d[edges]
+    p1 = starts[edges] + ((k + 1) / pieces[edges])[:, numpy.newaxis] * d[edges]
+    lo = numpy.floor((numpy.minimum(p0, p1) - origin) / size)
+    hi = numpy.floor((numpy.maximum(p0, p1) - origin) / size)
+    lo, hi = lo.astype(numpy.int64), hi.astype(numpy.int64)
+    rows = hi[:, 1].max() + 2
+    cells = []
+    for dx, dy in [(0, 0), (1, 0), (0, 1), (1, 1)]:
+        used = (lo[:, 0] + dx <= hi[:, 0]) & (lo[:, 1] + dy <= hi[:, 1])
+        cell = (lo[used, 0] + dx) * rows + lo[used, 1] + dy
+        cells.append(cell * n + edges[used])
+    # the edges in each cell, once each
+    cells = numpy.unique(numpy.concatenate(cells))
+    cells, edges = cells // n, cells % n
+    counts = (numpy.searchsorted(cells, cells, side='right') -
+              numpy.arange(len(cells)) - 1)
+    totals = numpy.cumsum(counts)
+    first = 0
+    while first < len(cells):
+        done = totals[first - 1] if first else 0
+        last = max(first + 1,
+                   numpy.searchsorted(totals, done + _blockSize, 'right'))
+        m = counts[first:last]
+        i = numpy.repeat(numpy.arange(first, last), m)
+        offsets = numpy.arange(len(i)) - numpy.repeat(numpy.cumsum(m) - m, m)
+        # (long edges share many cells, so pairs are often repeated)
+        pairs = numpy.unique(edges[i] * n + edges[i + 1 + offsets])
+        yield pairs // n, pairs % n
+        first = last
+
+
+def _crossingHeights(lo, hi):
+    """The y values at which pairs of edges cross (other than at their ends)
+    """
+    heights = []
+    d = hi - lo
+    for i, j in _nearbyPairs(lo, hi):
+        pi, di = lo[i], d[i]
+        denom = di[:, 0] * d[j, 1] - di[:, 1] * d[j, 0]
+        offset = lo[j] - pi
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            t = (offset[:, 0] * d[j, 1] - offset[:, 1] * d[j, 0]) / denom
+            u = (offset[:, 0] * di[:, 1] - offset[:, 1] * di[:, 0]) / denom
+        # (edges that only touch at their ends, within rounding error, are
+        # already split there)
+        crossing = ((denom != 0) & (t > _eps) & (t < 1 - _eps) &
+                    (u > _eps) & (u < 1 - _eps))
+        heights.append(pi[crossing, 1] + t[crossing] * di[crossing, 1])
+    return numpy.concatenate(heights) if heights else numpy.zeros(0)
+
+
+def _xAt(lo, hi, y):
+    """x of edges (lo, hi) at heights y, exact at the ends of the edges"""
+    t = (y - lo[..., 1]) / (hi[..., 1] - lo[..., 1])
+    return lo[..., 0] * (1 - t) + hi[..., 0] * t
+
+
+def _tesselateSlabs(loops, windingRule):
+    """Triangles of any loops: pairs of triangles filling the trapezoids
+    between edges in horizontal slabs that no edges cross within
+    """
+    if not any(len(loop) for loop in loops):
+        return numpy.zeros((0, 2))
+    lo, hi, direction = _edges(loops)
+    if not len(lo):
+        return numpy.zeros((0, 2))
+    inside = _windingRules[windingRule]
+
+    # split the plane into horizontal slabs, at each vertex and crossing, so
+    # that no edges cross within a slab
+    ys = numpy.unique(numpy.concatenate([lo[:, 1], hi[:, 1],
+                                         _crossingHeights(lo, hi)]))
+    triangles = []
+    nEdges = len(lo)
+    slabsPerBlock = max(1, _blockSize // nEdges)
+    for first in range(0, len(ys) - 1, slabsPerBlock):
+        bottom = ys[first:first + slabsPerBlock, numpy.newaxis]
+        top = ys[first + 1:first + 1 + slabsPerBlock, numpy.newaxis]
+        bottom = bottom[:len(top)]
+        # edges that span each slab (all others are wholly above or below)
+        active = (lo[:, 1] <= bottom) & (hi[:, 1] >= top)
+        xBottom = _xAt(lo, hi, bottom)
+        xTop = _xAt(lo, hi, top)
+        # sort the edges in each slab from left to right
+        xMid = numpy.where(active, xBottom + xTop, numpy.inf)
+        order = numpy.argsort(xMid, axis=1, kind='mergesort')
+        rows = numpy.arange(len(top))[:, numpy.newaxis]
+        active = active[rows, order]
+        xBottom = xBottom[rows, order]
+        xTop = xTop[rows, order]
+        # winding number of the region to the right of each edge; crossing a
+        # downward edge (left side of an anticlockwise loop) steps it up
+        winding = numpy.cumsum(numpy.where(active, -direction[order], 0),
+                               axis=1)
+        fill = (active[:, :-1] & active[:, 1:] &
+                inside(winding[:, :-1]))
+        s, k = numpy.nonzero(fill)
+        if not len(s):
+            continue
+        # fill the trapezoid between edges k and k+1 with two triangles
+        y0 = bottom[s, 0]
+        y1 = top[s, 0]
+        bl = numpy.column_stack([xBottom[s, k], y0])
+        br = numpy.column_stack([xBottom[s, k + 1], y0])
+        tr = numpy.column_stack([xTop[s, k + 1], y1])
+        tl = numpy.column_stack([xTop[s, k], y1])
+        lower = numpy.stack([bl, br, tr], axis=1)
+        upper = numpy.stack([bl, tr, tl], axis=1)
+        # skip the triangles with no area (at the tips of the shape)
+        tris = numpy.concatenate([lower[br[:, 0] > bl[:, 0]],
+                                  upper[tr[:, 0] > tl[:, 0]]])
+        triangles.append(tris)
+    if not triangles:
+        return numpy.zeros((0, 2))
+    return numpy.concatenate(triangles).reshape(-1, 2)
+
+
+def _loopArea(loop):
+    """Signed area of a loop; positive if it goes anticlockwise"""
+    following = numpy.roll(loop, -1, axis=0)
+    return (loop[:, 0] * following[:, 1] -
+            following[:, 0] * loop[:, 1]).sum() / 2
+
+
+def _cleanLoop(loop):
+    """The loop without repeated points, or points on the straight line
+    between their neighbours (including the tips of spikes), which add no area
+    """
+    while len(loop) >= 3:
+        loop = loop[numpy.any(loop != numpy.roll(loop, 1, axis=0), axis=1)]
+        turns = _orient(numpy.roll(loop, 1, axis=0), loop,
+                        numpy.roll(loop, -1, axis=0))
+        if turns.all():
+            return loop
+        loop = loop[turns != 0]
+    return loop[:0]
+
+
+def _isSimple(loops):
+    """Whether no edges of the loops cross or touch, other than neighbouring
+    edges of a loop at their shared vertex
+    """
+    starts = numpy.concatenate(loops)
+    ends = numpy.concatenate([numpy.roll(loop, -1, axis=0) for loop in loops])
+    # the next edge around the loop from each edge
+    lengths = numpy.array([len(loop) for loop in loops])
+    following = numpy.arange(1, len(starts) + 1)
+    following[numpy.cumsum(lengths) - 1] = numpy.cumsum(lengths) - lengths
+    lower = numpy.minimum(starts, ends)
+    upper = numpy.maximum(starts, ends)
+    for i, j in _nearbyPairs(starts, ends):
+        apart = (following[i] != j) & (following[j] != i)
+        i, j = i[apart], j[apart]
+        a, b, c, d = starts[i], ends[i], starts[j], ends[j]
+        o1 = numpy.sign(_orient(a, b, c))
+        o2 = numpy.sign(_orient(a, b, d))
+        o3 = numpy.sign(_orient(c, d, a))
+        o4 = numpy.sign(_orient(c, d, b))
+        # edges on the same line only touch if they overlap
+        overlap = numpy.all((lower[i] <= upper[j]) & (lower[j] <= upper[i]),
+                            axis=1)
+        touching = ((o1 * o2 <= 0) & (o3 * o4 <= 0) &
+                    (overlap | (o1 != 0) | (o2 != 0)))
+        if touching.any():
+            return False
+    return True
+
+
+def _pointsInLoop(points, loop):
+    """Whether each point (which isn't on the loop) is inside the loop"""
+    a = loop
+    b = numpy.roll(loop, -1, axis=0)
+    inside = numpy.zeros(len(points), dtype=bool)
+    rowsPerBlock = max(1, _blockSize // len(loop))
+    for first in range(0, len(points), rowsPerBlock):
+        p = points[first:first + rowsPerBlock, numpy.newaxis]
+        spans = (a[:, 1] > p[..., 1]) != (b[:, 1] > p[..., 1])
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            x = a[:, 0] + ((p[..., 1] - a[:, 1]) * (b[:, 0] - a[:, 0]) /
+                           (b[:, 1] - a[:, 1]))
+        crossings = (spans & (p[..., 0] < x)).sum(axis=1)
+        inside[first:first + rowsPerBlock] = crossings % 2 == 1
+    return inside
+
+
+def _faces(loops, inside):
+    """The filled regions of loops that don't cross or touch, as (outline,
+    holes) with the outline anticlockwise and the holes clockwise
+
+    Each loop bounds a region, inside it and outside the loops just inside
+    it, with the winding number of the region around the loop plus 1 if the
+    loop goes anticlockwise, or minus 1 if it goes clockwise.
+    """
+    areas = numpy.array([_loopArea(loop) for loop in loops])
+    # larger loops first, so the last loop found around a loop is its parent
+    order = numpy.argsort(-numpy.abs(areas), kind='mergesort')
+    loops = [loops[i] for i in order]
+    areas = areas[order]
+    firstPoints = numpy.array([loop[0] for loop in loops])
+    parents = numpy.full(len(loops), -1, dtype=int)
+    for i in range(len(loops) - 1):
+        around = _pointsInLoop(firstPoints[i + 1:], loops[i])
+        parents[i + 1:][around] = i
+    winding = numpy.zeros(len(loops), dtype=int)
+    children = [[] for loop in loops]
+    for i, parent in enumerate(parents):
+        outside = winding[parent] if parent >= 0 else 0
+        winding[i] = outside + (1 if areas[i] > 0 else -1)
+        if parent >= 0:
+            children[parent].append(i)
+    faces = []
+    for i, loop in enumerate(loops):
+        if inside(winding[i]):
+            outline = loop if areas[i] > 0 else loop[::-1]
+            holes = [loops[j] if areas[j] < 0 else loops[j][::-1]
+                     for j in children[i]]
+            faces.append((outline, holes))
+    return faces
+
+
+def _inTriangle(ax, ay, bx, by, cx, cy, px, py):
+    """Whether p is inside or on the edges of the anticlockwise triangle abc
+    """
+    return ((cx - px) * (ay - py) >= (ax - px) * (cy - py) and
+            (ax - px) * (by - py) >= (bx - px) * (ay - py) and
+            (bx - px) * (cy - py) >= (cx - px) * (by - py))
+
+
+def _earClip(outline, holes):
+    """Triangles of an anticlockwise outline with clockwise holes inside it
+
+    This follows Mapbox's earcut algorithm: each hole is joined to the outline
+    by a pair of edges, then ears (corners with no other points inside them)
+    are cut off one at a time. Points that might be in an ear are looked up
+    in a grid. Returns None if no ear can be found (from rounding error).
+    """
+    # vertices, linked into a ring by the indices of their neighbours
+    xs, ys, prv, nxt = [], [], [], []
+
+    def link(points):
+        first = len(xs)
+        n = len(points)
+        xs.extend(points[:, 0].tolist())
+        ys.extend(points[:, 1].tolist())
+        prv.extend(range(first - 1, first + n - 1))
+        nxt.extend(range(first + 1, first + n + 1))
+        prv[first] = first + n - 1
+        nxt[first + n - 1] = first
+        return first
+
+    def remove(p):
+        nxt[prv[p]] = nxt[p]
+        prv[nxt[p]] = prv[p]
+
+    def area(p, q, r):
+        # as in earcut, negative for a left (anticlockwise) turn
+        return ((ys[q] - ys[p]) * (xs[r] - xs[q]) -
+                (xs[q] - xs[p]) * (ys[r] - ys[q]))
+
+    def filterPoints(start, end=None):
+        # remove repeated points and points with no turn, from start to end
+        end = start if end is None else end
+        p = start
+        while True:
+            again = False
+            q = nxt[p]
+            if (xs[p] == xs[q] and ys[p] == ys[q]) or area(prv[p], p, q) == 0:
+                remove(p)
+                p = end = prv[p]
+                if p == nxt[p]:
+                    break
+                again = True
+            else:
+                p = q
+            if not again and p == end:
+                break
+        return end
+
+    def locallyInside(a, b):
+        if area(prv[a], a, nxt[a]) < 0:
+            return area(a, b, nxt[a]) >= 0 and area(a, prv[a], b) >= 0
+        return area(a, b, prv[a]) < 0 or area(a, nxt[a], b) < 0
+
+    def findBridge(hole, outer):
+        # the nearest edge to the left of the hole's leftmost point...
+        hx, hy = xs[hole], ys[hole]
+        qx = -numpy.inf
+        m = None
+        p = outer
+        while True:
+            q = nxt[p]
+            if ys[q] <= hy <= ys[p] and ys[q] != ys[p]:
+                x = xs[p] + (hy - ys[p]) * (xs[q] - xs[p]) / (ys[q] - ys[p])
+                if qx < x <= hx:
+                    qx = x
+                    m = p if xs[p] < xs[q] else q
+                    if x == hx:
+                        return m
+            p = q
+            if p == outer:
+                break
+        if m is None:
+            return None
+        # ...and its left end, unless other points are in the way, in which
+        # case the point closest in angle to the ray from the hole is used
+        mx, my = xs[m], ys[m]
+        tanMin = numpy.inf
+        p = stop = m
+        while True:
+            px, py = xs[p], ys[p]
+            if (hx >= px >= mx and hx != px and
+                    _inTriangle(hx if hy < my else qx, hy, mx, my,
+                                qx if hy < my else hx, hy, px, py)):
+                tan = abs(hy - py) / (hx - px)
+                if locallyInside(p, hole) and (
+                        tan < tanMin or tan == tanMin and (
+                            px > xs[m] or px == xs[m] and
+                            area(prv[m], m, prv[p]) < 0 and
+                            area(nxt[p], m, nxt[m]) < 0)):
+                    m = p
+                    tanMin = tan
+            p = nxt[p]
+            if p == stop:
+                break
+        return m
+
+    def split(a, b):
+        # join a to b, with copies of a and b making the way back
+        a2, b2 = len(xs), len(xs) + 1
+        xs.extend([xs[a], xs[b]])
+        ys.extend([ys[a], ys[b]])
+        an, bp = nxt[a], prv[b]
+        prv.extend([b2, bp])
+        nxt.extend([an, a2])
+        nxt[a], prv[b] = b, a
+        prv[an] = a2
+        nxt[bp] = b2
+        return b2
+
+    outer = link(outline)
+    leftmost = []
+    for hole in holes:
+        first = link(hole)
+        leftmost.append(first + numpy.lexsort((hole[:, 1], hole[:, 0]))[0])
+    for hole in sorted(leftmost, key=lambda p: (xs[p], ys[p])):
+        bridge = findBridge(hole, outer)
+        if bridge is None:
+            return None
+        back = split(bridge, hole)
+        filterPoints(back, nxt[back])
+        outer = filterPoints(bridge, nxt[bridge])
+
+    # only points that aren't convex corners can be inside an ear, and
+    # corners only turn more sharply as ears are cut off
+    ring = [outer]
+    while nxt[ring[-1]] != outer:
+        ring.append(nxt[ring[-1]])
+    minX, maxX = min(xs[p] for p in ring), max(xs[p] for p in ring)
+    minY, maxY = min(ys[p] for p in ring), max(ys[p] for p in ring)
+    reflex = [p for p in ring if area(prv[p], p, nxt[p]) >= 0]
+    cells = max(1, int(numpy.sqrt(len(reflex))))
+    xScale = cells / (maxX - minX) if maxX > minX else 0.0
+    yScale = cells / (maxY - minY) if maxY > minY else 0.0
+    grid = {}
+    cellOf = {}
+    for p in reflex:
+        cellOf[p] = (min(cells - 1, int((xs[p] - minX) * xScale)),
+                     min(cells - 1, int((ys[p] - minY) * yScale)))
+        grid.setdefault(cellOf[p], []).append(p)
+
+    def size(ear):
+        a, c = prv[ear], nxt[ear]
+        return (xs[c] - xs[a]) ** 2 + (ys[c] - ys[a]) ** 2
+
+    def isEar(ear):
+        a, c = prv[ear], nxt[ear]
+        if area(a, ear, c) >= 0:
+            return False
+        ax, ay, bx, by, cx, cy = xs[a], ys[a], xs[ear], ys[ear], xs[c], ys[c]
+        x0, x1 = min(ax, bx, cx), max(ax, bx, cx)
+        y0, y1 = min(ay, by, cy), max(ay, by, cy)
+        for i in range(min(cells - 1, int((x0 - minX) * xScale)),
+                       min(cells - 1, int((x1 - minX) * xScale)) + 1):
+            for j in range(min(cells - 1, int((y0 - minY) * yScale)),
+                           min(cells - 1, int((y1 - minY) * yScale)) + 1):
+                for p in grid.get((i, j), ()):
+                    px, py = xs[p], ys[p]
+                    if (p != a and p != c and nxt[prv[p]] == p and
+                            x0 <= px <= x1 and y0 <= py <= y1 and
+                            (px != ax or py != ay) and
+                            _inTriangle(ax, ay, bx, by, cx, cy, px, py) and
+                            area(prv[p], p, nxt[p]) >= 0):
+                        return False
+        return True
+
+    triangles = []
+    start = outer
+    retried = False
+    while prv[start] != nxt[start]:
+        ring = [start]
+        while nxt[ring[-1]] != start:
+            ring.append(nxt[ring[-1]])
+        ears = [(size(p), p) for p in ring if isEar(p)]
+        if not ears:
+            if retried:
+                return None
+            # stuck: remove points that make no turn, and try once more
+            retried = True
+            start = filterPoints(start)
+            continue
+        retried = False
+        # the smallest ears are cut off first, which keeps the triangles
+        # (and the areas searched for points inside them) small. Cutting off
+        # an ear only changes the corners next to it, so they are checked
+        # again (and all corners are, if no ears are left before the end)
+        heapify(ears)
+        while ears:
+            ear = heappop(ears)[1]
+            if nxt[prv[ear]] != ear or not isEar(ear):
+                continue
+            a, c = prv[ear], nxt[ear]
+            triangles.extend((a, ear, c))
+            remove(ear)
+            for p in (a, c):
+                if p in cellOf and area(prv[p], p, nxt[p]) < 0:
+                    grid[cellOf.pop(p)].remove(p)
+                heappush(ears, (size(p), p))
+            start = c
+    triangles = numpy.array(triangles, dtype=int)
+    return numpy.column_stack([numpy.take(xs, triangles),
+                               numpy.take(ys, triangles)])
+
+
+def _tesselate(loops, windingRule):
+    """Triangles of the loops: by ear clipping if no edges cross or touch,
+    otherwise by the slab method
+    """
+    simple = [loop for loop in map(_cleanLoop, loops) if len(loop)]
+    if not simple:
+        return numpy.zeros((0, 2))
+    if _isSimple(simple):
+        triangles = []
+        for outline, holes in _faces(simple, _windingRules[windingRule]):
+            faceTriangles = _earClip(outline, holes)
+            if faceTriangles is None:
+                break
+            triangles.append(faceTriangles)
+        else:
+            if not triangles:
+                return numpy.zeros((0, 2))
+            return numpy.concatenate(triangles)
+    return _tesselateSlabs(loops, windingRule)
+
+
+def tesselate(vertices, windingRule=None, cache=True):
+    """Split a polygon into triangles.
+
+    :Parameters:
+
+        vertices : a list or array of (x, y) points, or a list of such loops
+            the outline(s) of the shape. Loops are closed automatically and
+            can cross themselves or each other (e.g. to make holes)
+
+        windingRule : None, int or str
+            which regions are filled, from their winding number (how many
+            times the outlines go anticlockwise around them). One of the
+            GLU_TESS_WINDING_* values or 'odd' (the default), 'nonzero',
+            'positive', 'negative' or 'abs_geq_two', as for GLU tessellation
+
+        cache : bool
+            look up (and store) the result in a cache of recently tesselated
+            shapes, so that repeated shapes are only tesselated once
+
+    Returns an (N*3, 2) array of the vertices of N triangles, which is empty
+    if the shape has no area (e.g. a line). If cached the array is read-only.
+    """
+    windingRule = _windingRule(windingRule)
+    loops = _toLoops(vertices)
+    if not cache:
+        return _tesselate(loops, windingRule)
+
+    key = (windingRule, tuple(len(loop) for loop in loops),
+           b''.join(loop.tobytes() for loop in loops))
+    try:
+        triangles = _tesselateCache.pop(key)
+    except KeyError:
+        triangles = _tesselate(loops, windingRule)
+        triangles.flags.writeable = False
+        while len(_tesselateCache) >= tesselateCacheSize:
+            _tesselateCache.popitem(last=False)
+    _tesselateCache[key] = triangles  # now the most recently used
+    return triangles
+
+
+def clearTesselateCache():
+    """Empty the cache of tesselated shapes"""
+    _tesselateCache.clear()
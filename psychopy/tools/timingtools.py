@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Classes for recording frame timing with a fixed memory and time cost per
+frame, so that they can be left on for a whole experiment
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from builtins import object
+
+import numpy
+
+
+class FrameIntervalRecorder(object):
+    """Records the times of screen flips (or any other repeated event) and the
+    intervals between them.
+
+    The most recent `bufferSize` timestamps and intervals are kept in
+    preallocated numpy ring buffers. The mean, variance, min and max, and a
+    histogram from which percentiles are estimated, are updated with each
+    interval, so they cover every interval since the last `clear()` however
+    long the recording, at a small fixed cost per frame.
+
+    Intervals longer than `threshold` are counted as dropped frames and
+    `onDroppedFrame(interval, t)` is called for each, if given.
+
+    :Parameters:
+
+        bufferSize : int
+            the number of most recent intervals (and timestamps) kept
+
+        threshold : float or None
+            intervals (in s) above this are counted as dropped frames. None
+            to not check for dropped frames
+
+        onDroppedFrame : callable or None
+            called as onDroppedFrame(interval, t) for each dropped frame,
+            with the interval and the time of the flip that ended it
+
+        clock : object with a getTime() method, or None
+            used to timestamp calls to `record()` that don't give a time.
+            Defaults to `psychopy.logging.defaultClock`
+
+        histRange : (float, float)
+            the range (in s) of the histogram used to estimate percentiles.
+            Intervals outside it are counted in the first or last bin
+
+        histBinWidth : float
+            the width (in s) of the bins of that histogram, and so the
+            resolution of the percentiles
+
+    Example::
+
+        recorder = FrameIntervalRecorder(threshold=1.2 / 60)
+        for frameN in range(nFrames):
+            stim.draw()
+            win.flip()
+            recorder.record()
+        print(recorder.mean, recorder.std, recorder.percentile(99))
+
+    """
+
+    def __init__(self, bufferSize=10000, threshold=None, onDroppedFrame=None,
+                 clock=None, histRange=(0.0, 0.1), histBinWidth=0.0001):
+        super(FrameIntervalRecorder, self).__init__()
+        if bufferSize < 1:
+            raise ValueError("bufferSize must be at least 1")
+        if clock is None:
+            from psychopy import logging
+            clock = logging.defaultClock
+        self.clock = clock
+        self.threshold = threshold
+        self.onDroppedFrame = onDroppedFrame
+
+        self.bufferSize = int(bufferSize)
+        self._intervals = numpy.zeros(self.bufferSize, dtype=numpy.float64)
+        self._timestamps = numpy.zeros(self.bufferSize, dtype=numpy.float64)
+
+        self._histStart = float(histRange[0])
+        self._histBinWidth = float(histBinWidth)
+        self._histNBins = max(1, int(round(
+            (histRange[1] - histRange[0]) / histBinWidth)))
+        self._histCounts = numpy.zeros(self._histNBins, dtype=numpy.int64)
+
+        self.clear()
+
+    def clear(self):
+        """Forget all the intervals recorded so far, and the time of the last
+        flip (so the next call to `record()` only starts timing).
+        """
+        self._index = 0  # where the next interval goes in the buffers
+        self.lastT = None
+        self.nIntervals = 0
+        self.nDropped = 0
+        self._mean = 0.0
+        self._sumSqDev = 0.0  # sum of squared deviations from the mean
+        self.min = None
+        self.max = None
+        self._histCounts.fill(0)
+
+    def skipNext(self):
+        """Don't record an interval for the next call to `record()` (e.g.
+        after a pause in updating the screen), just restart timing from it.
+        """
+        self.lastT = None
+
+    def record(self, t=None):
+        """Record a flip at time `t` (from the clock if None).
+
+        Returns the interval since the last flip, or None if there was no
+        last flip to time from.
+        """
+        if t is None:
+            t = self.clock.getTime()
+        lastT = self.lastT
+        self.lastT = t
+        if lastT is None:
+            return None
+        interval = t - lastT
+
+        index = self._index % self.bufferSize
+        self._intervals[index] = interval
+        self._timestamps[index] = t
+        self._index += 1
+
+        # Welford's online mean and variance
+        n = self.nIntervals = self.nIntervals + 1
+        delta = interval - self._mean
+        self._mean += delta / n
+        self._sumSqDev += delta * (interval - self._mean)
+        if n == 1:
+            self.min = self.max = interval
+        elif interval < self.min:
+            self.min = interval
+        elif interval > self.max:
+            self.max = interval
+
+        binN = int((interval - self._histStart) / self._histBinWidth)
+        if binN < 0:
+            binN = 0
+        elif binN >= self._histNBins:
+            binN = self._histNBins - 1
+        self._histCounts[binN] += 1
+
+        if self.threshold is not None and interval > self.threshold:
+            self.nDropped += 1
+            if self.onDroppedFrame is not None:
+                self.onDroppedFrame(interval, t)
+        return interval
+
+    def _lastN(self, buff, n):
+        nKept = min(self._index, self.bufferSize)
+        if n is None or n > nKept:
+            n = nKept
+        if n <= 0:
+            return buff[:0].copy()
+        end = self._index % self.bufferSize
+        if n <= end:
+            return buff[end - n:end].copy()
+        return numpy.concatenate([buff[end - n:], buff[:end]])
+
+    def getIntervals(self, n=None):
+        """The last `n` intervals (all those still in the buffer if None),
+        oldest first, as a numpy array.
+        """
+        return self._lastN(self._intervals, n)
+
+    def getTimestamps(self, n=None):
+        """The times of the flips that ended the last `n` intervals (all
+        those still in the buffer if None), oldest first, as a numpy array.
+        """
+        return self._lastN(self._timestamps, n)
+
+    @property
+    def intervals(self):
+        """All the intervals still in the buffer, oldest first"""
+        return self.getIntervals()
+
+    @property
+    def mean(self):
+        """Mean of all the recorded intervals (None if there are none)"""
+        if not self.nIntervals:
+            return None
+        return self._mean
+
+    @property
+    def var(self):
+        """Variance of all the recorded intervals (None if there are
+        fewer than 2)
+        """
+        if self.nIntervals < 2:
+            return None
+        return self._sumSqDev / (self.nIntervals - 1)
+
+    @property
+    def std(self):
+        """Standard deviation of all the recorded intervals (None if there are
+        fewer than 2)
+        """
+        var = self.var
+        if var is None:
+            return None
+        return var ** 0.5
+
+    def percentile(self, q):
+        """Estimate the `q` th percentile (0-100, or a sequence of them) of all
+        the recorded intervals, from the histogram of intervals (so to within
+        a bin width).
+
+        For exact percentiles of the most recent intervals use
+        `numpy.percentile(recorder.intervals, q)` instead.
+        """
+        q = numpy.asarray(q, dtype=numpy.float64)
+        if not self.nIntervals:
+            return numpy.full(q.shape, numpy.nan)[()]
+        cumCounts = numpy.cumsum(self._histCounts)
+        rank = q / 100.0 * self.nIntervals
+        binN = numpy.searchsorted(cumCounts, rank, side='left')
+        binN = numpy.clip(binN, 0, self._histNBins - 1)
+        # interpolate linearly within the bin
+        below = numpy.where(binN > 0, cumCounts[binN - 1], 0)
+        inBin = numpy.maximum(self._histCounts[binN], 1)
+        frac = numpy.clip((rank - below) / inBin, 0.0, 1.0)
+        result = self._histStart + (binN + frac) * self._histBinWidth
+        # can't be outside the range actually recorded
+        return numpy.clip(result, self.min, self.max)[()]
+
+    def getStats(self):
+        """The summary statistics of all the recorded intervals, as a dict
+        """
+        median, p95, p99 = (self.percentile([50, 95, 99]) if self.nIntervals
+                            else (None, None, None))
+        return {'nIntervals': self.nIntervals,
+                'nDropped': self.nDropped,
+                'mean': self.mean,
+                'std': self.std,
+                'min': self.min,
+                'max': self.max,
+                'median': median,
+                'p95': p95,
+                'p99': p99}
+
+    def __len__(self):
+        """The number of intervals still in the buffer"""
+        return min(self._index, self.bufferSize)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Functions to build the meshes used by `psychopy.visual.windowwarp.Warper`
+(with numpy only, no OpenGL needed), and to cache them on disk
+"""
+
+from __future__ import absolute_import, division, print_function
+
+from builtins import range
+import hashlib
+import os
+
+import numpy as np
+
+from psychopy import logging
+
+# bump this if the meshes built for the same parameters change
+_meshVersion = 1
+
+# limits of the mesh cache: the least recently used meshes are removed
+# beyond either of them (a 128x128 grid mesh is ~6MB)
+maxCachedMeshes = 16
+maxCacheBytes = 100 * 2 ** 20
+
+
+def gridToQuads(grid):
+    """Convert a (rows, cols, N) grid of per-vertex values into the values
+    for the corners of its (rows-1) * (cols-1) quads, as an
+    ((rows-1) * (cols-1) * 4, N) array.
+
+    Quads are in row then column order, each with its corners in the order
+    (row, col), (row, col+1), (row+1, col+1), (row+1, col).
+    """
+    grid = np.asarray(grid)
+    corners = np.stack([grid[:-1, :-1], grid[:-1, 1:],
+                        grid[1:, 1:], grid[1:, :-1]], axis=2)
+    return corners.reshape(-1, grid.shape[-1])
+
+
+def sphericalMesh(xgrid, ygrid, monWidthCm, monHeightCm, distCm,
+                  eyepoint=(0.5, 0.5), isCylindrical=False):
+    """The vertices and texture coordinates of the quads that correct the
+    perspective on a flat screen with a spherical or cylindrical projection
+    (see `Warper`).
+
+    Returns (vertices, tcoords), both float32 arrays of shape
+    ((xgrid-1) * (ygrid-1) * 4, 2).
+    """
+    # eye position in cm
+    xEye = eyepoint[0] * monWidthCm
+    yEye = eyepoint[1] * monHeightCm
+
+    equalDistanceX = np.linspace(0, monWidthCm, xgrid)
+    equalDistanceY = np.linspace(0, monHeightCm, ygrid)
+
+    # vertex coordinates
+    x_c = np.linspace(-1.0, 1.0, xgrid)
+    y_c = np.linspace(-1.0, 1.0, ygrid)
+    x_coords, y_coords = np.meshgrid(x_c, y_c)
+
+    # positions of the vertices relative to the eye, in cm, by row then col
+    x = np.empty((ygrid, xgrid), dtype='float32')
+    y = np.empty((ygrid, xgrid), dtype='float32')
+    x[:, :] = equalDistanceX - xEye
+    y[:, :] = (equalDistanceY - yEye)[:, np.newaxis]
+
+    r = np.sqrt(np.square(x) + np.square(y) + np.square(distCm))
+
+    azimuth = np.arctan(x / distCm)
+    altitude = np.arcsin(y / r)
+
+    # calculate the texture coordinates
+    if isCylindrical:
+        tx = distCm * np.sin(azimuth)
+        ty = distCm * np.sin(altitude)
+    else:
+        tx = distCm * (1 + x / r) - distCm
+        ty = distCm * (1 + y / r) - distCm
+
+    # prevent div0
+    azimuth[azimuth == 0] = np.finfo(np.float32).eps
+    altitude[altitude == 0] = np.finfo(np.float32).eps
+
+    # the texture coordinates (which are now lying on the sphere)
+    # need to be remapped back onto the plane of the display.
+    # This effectively stretches the coordinates away from the eyepoint.
+    if isCylindrical:
+        tx = tx * azimuth / np.sin(azimuth)
+        ty = ty * altitude / np.sin(altitude)
+    else:
+        centralAngle = np.arccos(np.cos(altitude) * np.cos(np.abs(azimuth)))
+        # distance from eyepoint to texture vertex
+        arcLength = centralAngle * distCm
+        # remap the texture coordinate
+        theta = np.arctan2(ty, tx)
+        tx = arcLength * np.cos(theta)
+        ty = arcLength * np.sin(theta)
+
+    u_coords = tx / monWidthCm + 0.5
+    v_coords = ty / monHeightCm + 0.5
+
+    vertices = gridToQuads(np.dstack([x_coords, y_coords]))
+    tcoords = gridToQuads(np.dstack([u_coords, v_coords]))
+    return vertices.astype('float32'), tcoords.astype('float32')
+
+
+def readWarpfile(fileName):
+    """Read a warp definition file (see
+    http://paulbourke.net/dome/warpingfisheye/).
+
+    Returns (cols, rows, warpdata) where warpdata is a (cols * rows, 5)
+    array of x, y, u, v and opacity for each vertex. Raises IOError if the
+    file can't be read and ValueError if its contents are incorrect.
+    """
+    with open(fileName) as f:
+        filetype = int(f.readline())
+        cols, rows = [int(n) for n in f.readline().split()[:2]]
+    warpdata = np.loadtxt(fileName, skiprows=2, ndmin=2)
+    if (cols * rows != warpdata.shape[0] or
+            warpdata.shape[1] != 5 or
+            filetype != 2):
+        raise ValueError('warpfile data incorrect: ' + fileName)
+    return cols, rows, warpdata
+
+
+def warpfileMesh(cols, rows, warpdata):
+    """The vertices, texture coordinates and opacity (as RGBA) of the quads
+    for the data from a warpfile (see `readWarpfile`).
+
+    Returns float32 arrays of shape ((cols-1) * (rows-1) * 4, 2), the same
+    and ((cols-1) * (rows-1) * 4, 4).
+    """
+    quads = gridToQuads(np.reshape(warpdata, (rows, cols, 5)))
+    vertices = quads[:, 0:2].astype('float32')
+    tcoords = quads[:, 2:4].astype('float32')
+    opacity = np.ones((len(quads), 4), dtype='float32')
+    opacity[:, 3] = quads[:, 4]
+    return vertices, tcoords, opacity
+
+
+def fileHash(fileName):
+    """The sha1 hash (hex) of the contents of a file"""
+    sha = hashlib.sha1()
+    with open(fileName, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def cachedMesh(cacheDir, params, makeMesh):
+    """Return the mesh arrays for `params` from the cache in `cacheDir`, or
+    else make them by calling `makeMesh()` and add them to the cache.
+
+    :Parameters:
+
+        cacheDir : str or None
+            the folder of cached meshes. None to not use a cache
+
+        params : dict
+            everything the mesh depends on (monitor geometry, eyepoint, grid
+            size, warpfile hash...), which must have a stable repr()
+
+        makeMesh : callable
+            returns a tuple of arrays (or None for arrays not needed)
+
+    The cache holds at most `maxCachedMeshes` meshes and `maxCacheBytes`
+    bytes, the least recently used meshes being removed beyond that.
+    """
+    if cacheDir is None:
+        return makeMesh()
+    key = repr(sorted(params.items())) + repr(_meshVersion)
+    fileName = os.path.join(
+        cacheDir, 'warpMesh_%s.npz' % hashlib.sha1(key.encode()).hexdigest())
+    if os.path.isfile(fileName):
+        try:
+            with np.load(fileName) as cached:
+                arrays = [cached['arr_%i' % i]
+                          for i in range(len(cached.files))]
+            logging.debug('Loaded warp mesh from %s' % fileName)
+            try:
+                os.utime(fileName, None)  # recently used
+            except OSError:
+                pass
+            return tuple(arr if arr.size else None for arr in arrays)
+        except Exception:
+            logging.warning('Cached warp mesh %s could not be read, so it '
+                            'will be rebuilt' % fileName)
+
+    arrays = makeMesh()
+    try:
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        # write to a temporary file first, so that the cache never holds a
+        # partly written mesh
+        tmpName = fileName[:-4] + '_%i.tmp.npz' % os.getpid()
+        np.savez(tmpName, *[np.zeros(0) if arr is None else arr
+                            for arr in arrays])
+        if os.path.isfile(fileName):
+            os.remove(fileName)
+        os.rename(tmpName, fileName)
+    except (IOError, OSError) as err:
+        logging.warning('Could not cache the warp mesh in %s: %s'
+                        % (cacheDir, err))
+    else:
+        pruneCache(cacheDir, keep=fileName)
+    return arrays
+
+
+def pruneCache(cacheDir, maxFiles=None, maxBytes=None, keep=None):
+    """Remove the least recently used (by modification time) meshes from
+    the cache in `cacheDir`, until it holds at most `maxFiles` meshes and
+    `maxBytes` bytes (default `maxCachedMeshes` and `maxCacheBytes`). The
+    mesh file `keep` is never removed.
+    """
+    if maxFiles is None:
+        maxFiles = maxCachedMeshes
+    if maxBytes is None:
+        maxBytes = maxCacheBytes
+    meshes = []
+    try:
+        for name in os.listdir(cacheDir):
+            # not the temporary files of meshes being written
+            if not name.startswith('warpMesh_') or name.endswith('.tmp.npz'):
+                continue
+            path = os.path.join(cacheDir, name)
+            stat = os.stat(path)
+            meshes.append((path == keep, stat.st_mtime, path, stat.st_size))
+    except OSError as err:
+        logging.warning('Could not list the warp mesh cache %s: %s'
+                        % (cacheDir, err))
+        return
+    meshes.sort(reverse=True)  # keep, then the most recently used first
+    nFiles = nBytes = 0
+    for isKept, mtime, path, size in meshes:
+        nFiles += 1
+        nBytes += size
+        if isKept or (nFiles <= maxFiles and nBytes <= maxBytes):
+            continue
+        try:
+            os.remove(path)
+            logging.debug('Removed warp mesh %s from the cache' % path)
+        except OSError:
+            pass  # e.g. removed by another process
+        nFiles -= 1
+        nBytes -= size
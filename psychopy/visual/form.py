@@ -6,6 +6,8 @@
 # Copyright (C) 2018 Jonathan Peirce
 # Distributed under the terms of the GNU General Public License (GPL).
 
+import numpy as np
+
 from psychopy.visual.basevisual import (BaseVisualStim,
                                         ContainerMixin, ColorMixin)
 from psychopy import visual
@@ -67,11 +69,22 @@ class Form(BaseVisualStim, ContainerMixin, ColorMixin):
         self.units = units
         self._items = {'question': [], 'response': []}
         self._baseYpositions = []
+        self._rowHeights = []
         self.leftEdge = None
         self.rightEdge = None
         self.topEdge = None
         self.virtualHeight = 0  # Virtual height determines pos from boundary box
         self._scrollOffset = 0
+        # layout table, made by _doLayout: the lowest base position, the
+        # upper and lower extents of each row (negated, and without any
+        # scroll offset) and the scroll offset that each row was last
+        # positioned for
+        self._minBaseYpos = 0
+        self._rowTops = None
+        self._rowBottoms = None
+        self._rowTopsBound = None
+        self._rowBottomsBound = None
+        self._rowOffsets = None
 
         self._doLayout()
 
@@ -220,7 +233,7 @@ class Form(BaseVisualStim, ContainerMixin, ColorMixin):
             Offset position of items proportionate to scroll bar
         """
         sizeOffset = (1 - self.scrollbar.markerPos) * (self.size[1]-self.itemPadding)
-        maxItemPos = min(self._baseYpositions)
+        maxItemPos = self._minBaseYpos
         return (maxItemPos - (self.scrollbar.markerPos * maxItemPos) + sizeOffset)
 
     def _doLayout(self):
@@ -245,8 +258,10 @@ class Form(BaseVisualStim, ContainerMixin, ColorMixin):
                                         - max(aHeight, qHeight)  # Positionining based on larger of the two
                                         + (aHeight/2)            # necessary to offset size-based positioning
                                         - self.textHeight)       # Padding for unaccounted marker size in slider height
+            self._rowHeights.append(max(aHeight, qHeight))
             # update height ready for next row
             self.virtualHeight -= max(aHeight, qHeight) + self.itemPadding
+        self._makeLayoutTable()
 
         # position a slider on right-hand edge
         self.scrollbar = self._setScrollBar()
@@ -254,6 +269,43 @@ class Form(BaseVisualStim, ContainerMixin, ColorMixin):
         self.border = self._setBorder()
         self.aperture = self._setAperture()
 
+    def _makeLayoutTable(self):
+        """Store the extents of the rows of items, to find the rows that are
+        visible for a scroll offset with a binary search (see _visibleRows)
+        """
+        baseY = np.array(self._baseYpositions, dtype=float)
+        halfHeights = np.array(self._rowHeights, dtype=float) / 2
+        self._minBaseYpos = baseY.min() if len(baseY) else 0
+        self._rowTops = -(self.size[1]/2 + baseY + halfHeights)
+        self._rowBottoms = -(self.size[1]/2 + baseY - halfHeights)
+        # rows go down the form, but a tall question can reach into the
+        # rows next to it, so search ascending bounds of the extents: the
+        # lowest bottom so far and the highest top of the rows still to come
+        self._rowBottomsBound = np.maximum.accumulate(self._rowBottoms)
+        self._rowTopsBound = np.minimum.accumulate(
+            self._rowTops[::-1])[::-1]
+        self._rowOffsets = np.full(len(baseY), np.nan)
+
+    def _visibleRows(self, scrollOffset):
+        """The rows that are (at least partly) within the border
+        area for the given scroll offset
+
+        Returns
+        -------
+        list
+            The indices of the visible rows
+        """
+        # a row is visible if its bottom is below the top of the border and
+        # its top above the bottom of the border
+        bottomLimit = -self.size[1]/2 - scrollOffset
+        topLimit = self.size[1]/2 - scrollOffset
+        first = np.searchsorted(self._rowBottomsBound, bottomLimit,
+                                side='right')
+        last = np.searchsorted(self._rowTopsBound, topLimit, side='left')
+        return [idx for idx in range(first, last)
+                if (self._rowBottoms[idx] > bottomLimit and
+                    self._rowTops[idx] < topLimit)]
+
     def _inRange(self, item):
         """Check whether item position falls within border area
 
@@ -283,13 +335,21 @@ class Form(BaseVisualStim, ContainerMixin, ColorMixin):
             decoration.draw()
         self.aperture.enable()
 
-        # draw the items
+        # draw the items, only those within border range for efficiency.
+        # Items are only moved when the scroll offset has changed since they
+        # were last drawn, as moving them means recalculating their vertices
+        scrollOffset = self._getScrollOffet()
+        visibleRows = self._visibleRows(scrollOffset)
+        for idx in visibleRows:
+            if self._rowOffsets[idx] != scrollOffset:
+                y = self.size[1]/2 + self._baseYpositions[idx] - scrollOffset
+                for element in self._items.keys():
+                    items = self._items[element][idx]
+                    items.pos = (items.pos[0], y)
+                self._rowOffsets[idx] = scrollOffset
         for element in self._items.keys():
-            for idx, items in enumerate(self._items[element]):
-                items.pos = (items.pos[0], self.size[1]/2 + self._baseYpositions[idx] - self._getScrollOffet())
-                # Only draw if within border range for efficiency
-                if self._inRange(items):
-                    items.draw()
+            for idx in visibleRows:
+                self._items[element][idx].draw()
 
 
 if __name__ == "__main__":
@@ -38,6 +38,7 @@ import os
 from psychopy import logging, prefs #adding prefs to be able to check sound lib -JK
 from psychopy.tools.arraytools import val2array
 from psychopy.tools.attributetools import logAttrib, setAttribute
+from psychopy.tools.movietools import FrameQueue
 from psychopy.visual.basevisual import BaseVisualStim, ContainerMixin, TextureMixin
 
 from moviepy.video.io.VideoFileClip import VideoFileClip
@@ -80,7 +81,9 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
                  noAudio=False,
                  vframe_callback=None,
                  fps=None,
-                 interpolate=True):
+                 interpolate=True,
+                 decodeAhead=0,
+                 dropLateFrames=True):
         """
         :Parameters:
 
@@ -95,6 +98,15 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
             loop : bool, optional
                 Whether to start the movie over from the beginning if draw is
                 called and the movie is done.
+            decodeAhead : int
+                If greater than 0, frames are decoded in a background thread
+                and up to this many are queued ahead of the movie clock, so
+                that decoding doesn't happen inside draw(). 0 decodes each
+                frame when it is drawn.
+            dropLateFrames : *True* or False
+                With decodeAhead, skip frames that are already late so the
+                movie stays in time with its clock (otherwise every frame is
+                shown, late if necessary). See :meth:`getDecodeStats`.
 
         """
         # what local vars are defined (these are the init params) for use
@@ -123,6 +135,9 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         self.noAudio = noAudio
         self._audioStream = None
         self.useTexSubImage2D = True
+        self.decodeAhead = decodeAhead
+        self.dropLateFrames = dropLateFrames
+        self._frameQueue = None
 
         if noAudio:  # to avoid dependency problems in silent movies
             self.sound = None
@@ -153,6 +168,9 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         self._nextFrameT = None
         self._texID = None
         self.status = NOT_STARTED
+        if self._frameQueue is not None:
+            self._frameQueue.stop()
+            self._frameQueue = None
 
     def setMovie(self, filename, log=True):
         """See `~MovieStim.loadMovie` (the functions are identical).
@@ -205,6 +223,12 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         self._frameInterval = 1.0/self._mov.fps
         self.duration = self._mov.duration
         self.filename = filename
+        if self.decodeAhead > 0:
+            self._frameQueue = FrameQueue(
+                self._mov.get_frame, fps=self._mov.fps,
+                duration=self.duration, queueSize=self.decodeAhead,
+                dropLate=self.dropLateFrames, name=self.name)
+            self._frameQueue.start(0.0)
         self._updateFrameTexture()
         logAttrib(self, log, 'movie', filename)
 
@@ -297,6 +321,36 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         """
         return self._nextFrameT - self._frameInterval
 
+    def getDecodeStats(self):
+        """Return a dict of statistics about decoding (numbers of frames
+        decoded, shown and dropped, decode times and lag), or None if frames
+        aren't decoded ahead (see `decodeAhead`).
+        """
+        if self._frameQueue is None:
+            return None
+        return self._frameQueue.getStats()
+
+    def _getQueuedFrame(self):
+        """Take the next frame due from the decode-ahead queue, returning
+        False if the current frame should stay on screen
+        """
+        queue = self._frameQueue
+        if self._numpyFrame is None:
+            # need something to show, even if it isn't due yet
+            frame = queue.getFrame(0.0, block=True, timeout=1.0)
+        elif self.status != PLAYING:
+            return False
+        else:
+            frame = queue.getFrame(self._videoClock.getTime() -
+                                   self._retraceInterval/2.0)
+        if frame is None:
+            if queue.finished:
+                self._onEos()
+            return False
+        frameT, self._numpyFrame = frame
+        self._nextFrameT = frameT + self._frameInterval
+        return True
+
     def _updateFrameTexture(self):
         if self._nextFrameT is None or self._nextFrameT < 0:
             # movie has no current position (or invalid position -JK), 
@@ -306,21 +360,26 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
             self._videoClock.reset()
             self._nextFrameT = 0.0
 
-        # only advance if next frame (half of next retrace rate)
-        if self._nextFrameT > self.duration:
-            self._onEos()
-        elif self._numpyFrame is not None:
-            if self._nextFrameT > (self._videoClock.getTime() -
-                                   self._retraceInterval/2.0):
+        if self._frameQueue is not None:
+            # frames are decoded in the background
+            if not self._getQueuedFrame():
                 return None
-        try:
-            self._numpyFrame = self._mov.get_frame(self._nextFrameT) 
-        except OSError:
-            if self.autoLog:
-                logging.warning("Frame {} not found, moving one frame and trying again" 
-                    .format(self._nextFrameT), obj=self)
-            self._nextFrameT += self._frameInterval
-            self._updateFrameTexture()
+        else:
+            # only advance if next frame (half of next retrace rate)
+            if self._nextFrameT > self.duration:
+                self._onEos()
+            elif self._numpyFrame is not None:
+                if self._nextFrameT > (self._videoClock.getTime() -
+                                       self._retraceInterval/2.0):
+                    return None
+            try:
+                self._numpyFrame = self._mov.get_frame(self._nextFrameT)
+            except OSError:
+                if self.autoLog:
+                    logging.warning("Frame {} not found, moving one frame and trying again" 
+                        .format(self._nextFrameT), obj=self)
+                self._nextFrameT += self._frameInterval
+                self._updateFrameTexture()
         useSubTex = self.useTexSubImage2D
         if self._texID is None:
             self._texID = GL.GLuint()
@@ -375,7 +434,7 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         GL.glTexEnvi(GL.GL_TEXTURE_ENV, GL.GL_TEXTURE_ENV_MODE,
                      GL.GL_MODULATE)  # ?? do we need this - think not!
 
-        if self.status == PLAYING:
+        if self.status == PLAYING and self._frameQueue is None:
             self._nextFrameT += self._frameInterval
 
     def draw(self, win=None):
@@ -444,6 +503,8 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         # video is easy: set both times to zero and update the frame texture
         self._nextFrameT = t
         self._videoClock.reset(t)
+        if self._frameQueue is not None:
+            self._frameQueue.seek(t)
         self._audioSeek(t)
 
     def _audioSeek(self, t):
@@ -469,6 +530,9 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
     def _unload(self):
         # remove textures from graphics card to prevent crash
         self.clearTextures()
+        if self._frameQueue is not None:
+            self._frameQueue.stop()
+            self._frameQueue = None
         if self._mov is not None:
             self._mov.close()
         self._mov = None
@@ -1196,23 +1196,7 @@ class Rift(window.Window):
 
         # do bookkeeping
         if self.recordFrameIntervals:
-            self.frames += 1
-            deltaT = now - self.lastFrameT
-            self.lastFrameT = now
-            if self.recordFrameIntervalsJustTurnedOn:  # don't do anything
-                self.recordFrameIntervalsJustTurnedOn = False
-            else:  # past the first frame since turned on
-                self.frameIntervals.append(deltaT)
-                if deltaT > self.refreshThreshold:
-                    self.nDroppedFrames += 1
-                    if self.nDroppedFrames < reportNDroppedFrames:
-                        txt = 't of last frame was %.2fms (=1/%i)'
-                        msg = txt % (deltaT * 1000, 1 / deltaT)
-                        logging.warning(msg, t=now)
-                    elif self.nDroppedFrames == reportNDroppedFrames:
-                        logging.warning("Multiple dropped frames have "
-                                        "occurred - I'll stop bothering you "
-                                        "about them!")
+            self._recordFrameTime(now)
 
         # log events
         for logEntry in self._toLog:
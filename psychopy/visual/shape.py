@@ -33,7 +33,7 @@ from psychopy.visual.basevisual import (BaseVisualStim, ColorMixin,
                                         ContainerMixin)
 from psychopy.visual.helpers import setColor
 
-from psychopy.contrib import tesselate
+from psychopy.tools.polygontools import tesselate
 import copy
 import numpy
 
@@ -400,9 +400,15 @@ class ShapeStim(BaseShapeStim):
     is a list of points (x,y), e.g., to define a shape with a hole. Borders
     and contains() are not supported for multi-loop stimuli.
 
-    `windingRule` is an advanced feature to allow control over the GLU
-    tessellator winding rule (default: GLU_TESS_WINDING_ODD). This is relevant
-    only for self-crossing or multi-loop shapes. Cannot be set dynamically.
+    `windingRule` is an advanced feature to allow control over the
+    tessellator winding rule (default: GLU_TESS_WINDING_ODD; 'odd', 'nonzero',
+    'positive', 'negative' and 'abs_geq_two' are also accepted). This is
+    relevant only for self-crossing or multi-loop shapes. Cannot be set
+    dynamically.
+
+    Tessellation is done with numpy (see `psychopy.tools.polygontools`) and
+    recently used shapes are cached, so changing between a few sets of
+    vertices frame by frame is fast.
 
     See Coder demo > stimuli > shapes.py
 
@@ -412,6 +418,7 @@ class ShapeStim(BaseShapeStim):
     """
 
     # Author: Jeremy Gray, November 2015, using psychopy.contrib.tesselate
+    # (now psychopy.tools.polygontools)
 
     def __init__(self,
                  win,
@@ -480,30 +487,20 @@ class ShapeStim(BaseShapeStim):
         # likely requires changes in ContainerMixin to iterate over each
         # border loop
 
-        self.border = copy.deepcopy(newVertices)
+        if (isinstance(newVertices, numpy.ndarray) and
+                newVertices.dtype != object):
+            self.border = newVertices.copy()
+        else:
+            self.border = copy.deepcopy(newVertices)
         if self.closeShape:
             # convert original vertices to triangles (= tesselation) if
             # possible. (not possible if closeShape is False, don't even try)
-            GL.glPushMatrix()  # seemed to help at one point, superfluous?
-            if self.windingRule:
-                GL.gluTessProperty(tesselate.tess, GL.GLU_TESS_WINDING_RULE,
-                                   self.windingRule)
-            if hasattr(newVertices[0][0], '__iter__'):
-                loops = newVertices
-            else:
-                loops = [newVertices]
-            tessVertices = tesselate.tesselate(loops)
-            GL.glPopMatrix()
-            if self.windingRule:
-                GL.gluTessProperty(tesselate.tess, GL.GLU_TESS_WINDING_RULE,
-                                   tesselate.default_winding_rule)
+            tessVertices = tesselate(newVertices, self.windingRule)
 
-        if not self.closeShape or tessVertices == []:
-            # probably got a line if tesselate returned []
+        if not self.closeShape or not len(tessVertices):
+            # probably got a line if tesselate returned no triangles
             initVertices = newVertices
             self.closeShape = False
-        elif len(tessVertices) % 3:
-            raise tesselate.TesselateError("Could not properly tesselate")
         else:
             initVertices = tessVertices
         self.__dict__['_tesselVertices'] = numpy.array(initVertices, float)
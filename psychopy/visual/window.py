@@ -77,6 +77,7 @@ from . import backends
 from psychopy.tools.attributetools import attributeSetter, setAttribute
 from psychopy.tools.arraytools import val2array
 from psychopy.tools.monitorunittools import convertToPix
+from psychopy.tools.timingtools import FrameIntervalRecorder
 from .text import TextStim
 from .grating import GratingStim
 from .helpers import setColor
@@ -92,6 +93,8 @@ import numpy
 from psychopy.core import rush
 
 reportNDroppedFrames = 5  # stop raising warning after this
+# frame intervals kept by Window.frameIntervals (statistics cover them all)
+frameIntervalsBufferSize = 2 ** 16
 
 # import pyglet.gl, pyglet.window, pyglet.image, pyglet.font, pyglet.event
 from . import shaders as _shaders
@@ -431,12 +434,17 @@ class Window(object):
         self.frameClock = core.Clock()  # from psycho/core
         self.frames = 0  # frames since last fps calc
         self.movieFrames = []  # list of captured frames (Image objects)
+        self._movieWriter = None  # writes frames as captured, if recording
 
         self.recordFrameIntervals = False
         # Be able to omit the long timegap that follows each time turn it off
         self.recordFrameIntervalsJustTurnedOn = False
         self.nDroppedFrames = 0
-        self.frameIntervals = []
+        # called as onDroppedFrame(interval, t) for each dropped frame
+        self.onDroppedFrame = None
+        self.frameTiming = FrameIntervalRecorder(
+            bufferSize=frameIntervalsBufferSize,
+            onDroppedFrame=self._droppedFrame)
 
         self._toDraw = []
         self._toDrawDepths = []
@@ -570,6 +578,10 @@ class Window(object):
         your code, including inter-trial-intervals, `event.waitkeys()`,
         `core.wait()`, or `image.setImage()`.
 
+        Intervals are kept in a fixed-size buffer and summarized (mean, s.d.,
+        percentiles) by `Window.frameTiming`, so recording can safely be left
+        on for a whole experiment.
+
         see also:
             Window.saveFrameIntervals()
         """
@@ -585,6 +597,57 @@ class Window(object):
         """
         setAttribute(self, 'recordFrameIntervals', value, log)
 
+    @property
+    def frameIntervals(self):
+        """The recorded frame intervals (in s) as a list, oldest first.
+
+        Only the last `frameIntervalsBufferSize` intervals are kept; see
+        `Window.frameTiming` for statistics of all of them. Set to [] to
+        clear the recording.
+        """
+        return self.frameTiming.getIntervals().tolist()
+
+    @frameIntervals.setter
+    def frameIntervals(self, value):
+        if len(value):
+            raise ValueError("Window.frameIntervals can only be cleared "
+                             "(set to [])")
+        self.frameTiming.clear()
+
+    @property
+    def refreshThreshold(self):
+        """Frame intervals (in s) longer than this count as dropped frames
+        """
+        return self.frameTiming.threshold
+
+    @refreshThreshold.setter
+    def refreshThreshold(self, value):
+        self.frameTiming.threshold = value
+
+    def _droppedFrame(self, deltaT, t):
+        """Called by `frameTiming` for each dropped frame"""
+        self.nDroppedFrames += 1
+        if self.nDroppedFrames < reportNDroppedFrames:
+            txt = 't of last frame was %.2fms (=1/%i)'
+            msg = txt % (deltaT * 1000, 1 / deltaT)
+            logging.warning(msg, t=t)
+        elif self.nDroppedFrames == reportNDroppedFrames:
+            logging.warning("Multiple dropped frames have "
+                            "occurred - I'll stop bothering you "
+                            "about them!")
+        if self.onDroppedFrame is not None:
+            self.onDroppedFrame(deltaT, t)
+
+    def _recordFrameTime(self, now):
+        """Frame interval bookkeeping for a flip at time `now`"""
+        self.frames += 1
+        self.lastFrameT = now
+        if self.recordFrameIntervalsJustTurnedOn:  # don't do anything
+            self.recordFrameIntervalsJustTurnedOn = False
+            self.frameTiming.skipNext()
+        # past the first frame since turned on
+        self.frameTiming.record(now)
+
     def saveFrameIntervals(self, fileName=None, clear=True):
         """Save recorded screen frame intervals to disk, as comma-separated
         values.
@@ -598,13 +661,13 @@ class Window(object):
         """
         if not fileName:
             fileName = 'lastFrameIntervals.log'
-        if len(self.frameIntervals):
+        if len(self.frameTiming):
             intervalStr = str(self.frameIntervals)[1:-1]
             f = open(fileName, 'w')
             f.write(intervalStr)
             f.close()
         if clear:
-            self.frameIntervals = []
+            self.frameTiming.clear()
             self.frameClock.reset()
 
     def _setCurrent(self):
@@ -782,23 +845,7 @@ class Window(object):
 
         # do bookkeeping
         if self.recordFrameIntervals:
-            self.frames += 1
-            deltaT = now - self.lastFrameT
-            self.lastFrameT = now
-            if self.recordFrameIntervalsJustTurnedOn:  # don't do anything
-                self.recordFrameIntervalsJustTurnedOn = False
-            else:  # past the first frame since turned on
-                self.frameIntervals.append(deltaT)
-                if deltaT > self.refreshThreshold:
-                    self.nDroppedFrames += 1
-                    if self.nDroppedFrames < reportNDroppedFrames:
-                        txt = 't of last frame was %.2fms (=1/%i)'
-                        msg = txt % (deltaT * 1000, 1 / deltaT)
-                        logging.warning(msg, t=now)
-                    elif self.nDroppedFrames == reportNDroppedFrames:
-                        logging.warning("Multiple dropped frames have "
-                                        "occurred - I'll stop bothering you "
-                                        "about them!")
+            self._recordFrameTime(now)
 
         # log events
         for logEntry in self._toLog:
@@ -944,14 +991,79 @@ class Window(object):
         The default front buffer is to be called immediately after a
         win.flip() and gives a complete copy of the screen at the window's
         coordinates.
+
+        While recording with recordMovieFrames() the frame is instead
+        queued to be written to disk in the background, and None is
+        returned.
         """
+        if self._movieWriter is not None:
+            self._movieWriter.addFrame(self._readFrame(buffer=buffer))
+            return None
         im = self._getFrame(buffer=buffer)
         self.movieFrames.append(im)
         return im
 
+    def recordMovieFrames(self, fileName, codec='libx264', fps=30,
+                          queueSize=16, dropFrames=False):
+        """Start writing the frames captured by getMovieFrame() to disk as
+        they are captured, rather than keeping them all in memory until
+        saveMovieFrames() is called.
+
+        Frames are converted and encoded in a background thread. At most
+        `queueSize` frames wait to be written, so memory use stays flat
+        however long the recording runs. Call saveMovieFrames() (or close
+        the window) to finish writing the file(s).
+
+        :parameters:
+
+            fileName: name of file, including path (required)
+                As for saveMovieFrames(). Image sequences are numbered with
+                5 digits (frame00001.png, ...)
+
+            codec, fps: as for saveMovieFrames()
+
+            queueSize: the maximum number of frames waiting to be written
+
+            dropFrames: if the writer falls behind and the queue is full,
+                getMovieFrame() drops the frame if this is True, or waits
+                for room in the queue if False (the default)
+
+        Example::
+
+            win.recordMovieFrames('stimuli.mp4')
+            for frameN in range(6000):
+                stim.draw()
+                win.flip()
+                win.getMovieFrame()
+            win.saveMovieFrames()  # finish writing stimuli.mp4
+        """
+        from psychopy.tools.movietools import MovieFrameWriter
+        if self._movieWriter is not None:
+            self.saveMovieFrames()
+        logging.info('Recording frames to %s' % fileName)
+        self._movieWriter = MovieFrameWriter(
+            fileName, codec=codec, fps=fps, queueSize=queueSize,
+            dropFrames=dropFrames, convert=_rawFrameToArray)
+
     def _getFrame(self, rect=None, buffer='front'):
         """Return the current Window as an image.
         """
+        bufferDat, w, h = self._readFrame(rect=rect, buffer=buffer)
+        try:
+            im = Image.fromstring(mode='RGBA', size=(w, h),
+                                  data=bufferDat)
+        except Exception:
+            im = Image.frombytes(mode='RGBA', size=(w, h),
+                                 data=bufferDat)
+
+        im = im.transpose(Image.FLIP_TOP_BOTTOM)
+        im = im.convert('RGB')
+        return im
+
+    def _readFrame(self, rect=None, buffer='front'):
+        """Return the RGBA pixels of the current Window, bottom row first,
+        as (bufferDat, width, height)
+        """
         # GL.glLoadIdentity()
         # do the reading of the pixels
         if buffer == 'back' and self.useFBO:
@@ -984,24 +1096,18 @@ class Window(object):
         bufferDat = (GL.GLubyte * (4 * w * h))()
         GL.glReadPixels(left, top, w, h,
                         GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, bufferDat)
-        try:
-            im = Image.fromstring(mode='RGBA', size=(w, h),
-                                  data=bufferDat)
-        except Exception:
-            im = Image.frombytes(mode='RGBA', size=(w, h),
-                                 data=bufferDat)
-
-        im = im.transpose(Image.FLIP_TOP_BOTTOM)
-        im = im.convert('RGB')
 
         if self.useFBO and buffer == 'front':
             GL.glBindFramebufferEXT(GL.GL_FRAMEBUFFER_EXT, self.frameBuffer)
-        return im
+        return bufferDat, w, h
 
-    def saveMovieFrames(self, fileName, codec='libx264',
+    def saveMovieFrames(self, fileName=None, codec='libx264',
                         fps=30, clearFrames=True):
         """Writes any captured frames to disk.
 
+        If recordMovieFrames() was called this finishes writing the frames
+        recorded since then (the other arguments are not needed).
+
         Will write any format that is understood by PIL (tif, jpg, png, ...)
 
         :parameters:
@@ -1046,6 +1152,20 @@ class Window(object):
             myWin.saveMovieFrames('stimuli.gif')
 
         """
+        if self._movieWriter is not None:
+            writer, self._movieWriter = self._movieWriter, None
+            if fileName not in (None, writer.fileName):
+                logging.warning('Frames were recorded to %s, not %s' %
+                                (writer.fileName, fileName))
+            writer.close()
+            stats = writer.getStats()
+            logging.info('Wrote %i frames to %s (%i dropped)' %
+                         (stats['nWritten'], writer.fileName,
+                          stats['nDropped']))
+            return
+        if fileName is None:
+            raise ValueError('saveMovieFrames() needs a fileName unless '
+                             'recordMovieFrames() was called')
         fileRoot, fileExt = os.path.splitext(fileName)
         fileExt = fileExt.lower()  # easier than testing both later
         if len(self.movieFrames) == 0:
@@ -1113,6 +1233,12 @@ class Window(object):
         """
         self._closed = True
 
+        if self._movieWriter is not None:
+            try:
+                self.saveMovieFrames()
+            except Exception:
+                logging.error('Failed to finish writing movie frames')
+
         self.backend.close()  # moved here, dereferencing the window prevents
                               # backend specific actions to take place
 
@@ -1597,10 +1723,10 @@ class Window(object):
         self.recordFrameIntervals = True
         for frameN in range(nMaxFrames):
             self.flip()
-            if (len(self.frameIntervals) >= nIdentical and
-                    (numpy.std(self.frameIntervals[-nIdentical:]) <
-                     (threshold / 1000.0))):
-                rate = 1.0 / numpy.mean(self.frameIntervals[-nIdentical:])
+            lastIntervals = self.frameTiming.getIntervals(nIdentical)
+            if (len(lastIntervals) >= nIdentical and
+                    (numpy.std(lastIntervals) < (threshold / 1000.0))):
+                rate = 1.0 / numpy.mean(lastIntervals)
                 if self.screen is None:
                     scrStr = ""
                 else:
@@ -1609,7 +1735,7 @@ class Window(object):
                     msg = 'Screen%s actual frame rate measured at %.2f'
                     logging.debug(msg % (scrStr, rate))
                 self.recordFrameIntervals = recordFrmIntsOrig
-                self.frameIntervals = []
+                self.frameTiming.clear()
                 return rate
         # if we got here we reached end of maxFrames with no consistent value
         msg = ("Couldn't measure a consistent frame rate.\n"
@@ -1787,3 +1913,11 @@ def getMsPerFrame(myWin, nFrames=60, showVisual=False, msg='', msDelay=0.):
     return myWin.getMsPerFrame(nFrames=60, showVisual=showVisual, msg=msg,
                                msDelay=0.)
 
+
+def _rawFrameToArray(frame):
+    """Convert (bufferDat, width, height) from Window._readFrame() to an
+    (h, w, 3) array of RGB, top row first (as Window._getFrame() does)
+    """
+    bufferDat, w, h = frame
+    pixels = numpy.frombuffer(bufferDat, dtype=numpy.uint8).reshape(h, w, 4)
+    return numpy.ascontiguousarray(pixels[::-1, :, :3])
@@ -15,11 +15,11 @@ with this program. If not, see http://www.gnu.org/licenses/
 """
 from __future__ import absolute_import, division, print_function
 
-from builtins import map
-from builtins import range
 from builtins import object
+import os
 import numpy as np
-from psychopy import logging
+from psychopy import logging, prefs
+from psychopy.tools import warptools
 from OpenGL.arrays import ArrayDatatype as ADT
 import pyglet
 GL = pyglet.gl
@@ -38,7 +38,8 @@ class Warper(object):
                  warpGridsize=300,
                  eyepoint=(0.5, 0.5),
                  flipHorizontal=False,
-                 flipVertical=False):
+                 flipVertical=False,
+                 cacheDir='default'):
         """Warping is a final operation which can be optionally performed on
         each frame just before transmission to the display. It is useful
         for perspective correction when the eye to monitor distance is
@@ -85,6 +86,11 @@ class Warper(object):
             flipVertical: True or *False*
                 Flip the entire output vertically. useful if projector is
                 flipped upside down.
+            cacheDir : *'default'*, a folder name or None
+                Where the warp meshes are cached, so that each one is only
+                built once (per monitor geometry, eyepoint, grid size and
+                warpfile). 'default' uses a folder in the user prefs
+                directory and None disables the cache.
 
         :notes:
             1) The eye distance from the screen is initialized from the
@@ -116,6 +122,9 @@ class Warper(object):
         self.eyepoint = eyepoint
         self.flipHorizontal = flipHorizontal
         self.flipVertical = flipVertical
+        if cacheDir == 'default':
+            cacheDir = os.path.join(prefs.paths['userPrefsDir'], 'warpCache')
+        self.cacheDir = cacheDir
         self.initDefaultWarpSize()
 
         #   get the eye distance from the monitor object,
@@ -227,96 +236,22 @@ class Warper(object):
         """Correct perspective on flat screen using either a spherical or
         cylindrical projection.
         """
+        params = dict(warp='cylindrical' if isCylindrical else 'spherical',
+                      xgrid=self.xgrid, ygrid=self.ygrid,
+                      mon_width_cm=float(self.mon_width_cm),
+                      mon_height_cm=float(self.mon_height_cm),
+                      dist_cm=float(self.dist_cm),
+                      eyepoint=tuple(float(v) for v in self.eyepoint))
+
+        def makeMesh():
+            return warptools.sphericalMesh(
+                self.xgrid, self.ygrid, self.mon_width_cm,
+                self.mon_height_cm, self.dist_cm, self.eyepoint,
+                isCylindrical)
+
+        vertices, tcoords = warptools.cachedMesh(self.cacheDir, params,
+                                                 makeMesh)
         self.nverts = (self.xgrid - 1) * (self.ygrid - 1) * 4
-
-        # eye position in cm
-        xEye = self.eyepoint[0] * self.mon_width_cm
-        yEye = self.eyepoint[1] * self.mon_height_cm
-
-        # create vertex grid array, and texture coords
-        # times 4 for quads
-        vertices = np.zeros(
-            ((self.xgrid - 1) * (self.ygrid - 1) * 4, 2), dtype='float32')
-        tcoords = np.zeros(
-            ((self.xgrid - 1) * (self.ygrid - 1) * 4, 2), dtype='float32')
-
-        equalDistanceX = np.linspace(0, self.mon_width_cm, self.xgrid)
-        equalDistanceY = np.linspace(0, self.mon_height_cm, self.ygrid)
-
-        # vertex coordinates
-        x_c = np.linspace(-1.0, 1.0, self.xgrid)
-        y_c = np.linspace(-1.0, 1.0, self.ygrid)
-        x_coords, y_coords = np.meshgrid(x_c, y_c)
-
-        x = np.zeros(((self.xgrid), (self.ygrid)), dtype='float32')
-        y = np.zeros(((self.xgrid), (self.ygrid)), dtype='float32')
-
-        x[:, :] = equalDistanceX - xEye
-        y[:, :] = equalDistanceY - yEye
-        y = np.transpose(y)
-
-        r = np.sqrt(np.square(x) + np.square(y) + np.square(self.dist_cm))
-
-        azimuth = np.arctan(x / self.dist_cm)
-        altitude = np.arcsin(y / r)
-
-        # calculate the texture coordinates
-        if isCylindrical:
-            tx = self.dist_cm * np.sin(azimuth)
-            ty = self.dist_cm * np.sin(altitude)
-        else:
-            tx = self.dist_cm * (1 + x/r) - self.dist_cm
-            ty = self.dist_cm * (1 + y/r) - self.dist_cm
-
-        # prevent div0
-        azimuth[azimuth == 0] = np.finfo(np.float32).eps
-        altitude[altitude == 0] = np.finfo(np.float32).eps
-
-        # the texture coordinates (which are now lying on the sphere)
-        # need to be remapped back onto the plane of the display.
-        # This effectively stretches the coordinates away from the eyepoint.
-
-        if isCylindrical:
-            tx = tx * azimuth / np.sin(azimuth)
-            ty = ty * altitude / np.sin(altitude)
-        else:
-            centralAngle = np.arccos(
-                np.cos(altitude) * np.cos(np.abs(azimuth)))
-            # distance from eyepoint to texture vertex
-            arcLength = centralAngle * self.dist_cm
-            # remap the texture coordinate
-            theta = np.arctan2(ty, tx)
-            tx = arcLength * np.cos(theta)
-            ty = arcLength * np.sin(theta)
-
-        u_coords = tx / self.mon_width_cm + 0.5
-        v_coords = ty / self.mon_height_cm + 0.5
-
-        # loop to create quads
-        vdex = 0
-        for y in range(0, self.ygrid - 1):
-            for x in range(0, self.xgrid - 1):
-                index = y * (self.xgrid) + x
-
-                vertices[vdex + 0, 0] = x_coords[y, x]
-                vertices[vdex + 0, 1] = y_coords[y, x]
-                vertices[vdex + 1, 0] = x_coords[y, x + 1]
-                vertices[vdex + 1, 1] = y_coords[y, x + 1]
-                vertices[vdex + 2, 0] = x_coords[y + 1, x + 1]
-                vertices[vdex + 2, 1] = y_coords[y + 1, x + 1]
-                vertices[vdex + 3, 0] = x_coords[y + 1, x]
-                vertices[vdex + 3, 1] = y_coords[y + 1, x]
-
-                tcoords[vdex + 0, 0] = u_coords[y, x]
-                tcoords[vdex + 0, 1] = v_coords[y, x]
-                tcoords[vdex + 1, 0] = u_coords[y, x + 1]
-                tcoords[vdex + 1, 1] = v_coords[y, x + 1]
-                tcoords[vdex + 2, 0] = u_coords[y + 1, x + 1]
-                tcoords[vdex + 2, 1] = v_coords[y + 1, x + 1]
-                tcoords[vdex + 3, 0] = u_coords[y + 1, x]
-                tcoords[vdex + 3, 1] = v_coords[y + 1, x]
-
-                vdex += 4
         self.createVertexAndTextureBuffers(vertices, tcoords)
 
     def projectionWarpfile(self):
@@ -324,85 +259,38 @@ class Warper(object):
             See: http://paulbourke.net/dome/warpingfisheye/
         """
         try:
-            fh = open(self.warpfile)
-            lines = fh.readlines()
-            fh.close()
-            filetype = int(lines[0])
-            rc = list(map(int, lines[1].split()))
-            cols, rows = rc[0], rc[1]
-            warpdata = np.loadtxt(self.warpfile, skiprows=2)
+            params = dict(warp='warpfile',
+                          warpfileHash=warptools.fileHash(self.warpfile))
         except Exception:
             error = 'Unable to read warpfile: ' + self.warpfile
             logging.warning(error)
             print(error)
             return
 
-        if (cols * rows != warpdata.shape[0] or
-                warpdata.shape[1] != 5 or
-                filetype != 2):
+        def makeMesh():
+            cols, rows, warpdata = warptools.readWarpfile(self.warpfile)
+            vertices, tcoords, opacity = warptools.warpfileMesh(
+                cols, rows, warpdata)
+            return vertices, tcoords, opacity, np.array([cols, rows])
+
+        try:
+            vertices, tcoords, opacity, gridSize = warptools.cachedMesh(
+                self.cacheDir, params, makeMesh)
+        except ValueError:
             error = 'warpfile data incorrect: ' + self.warpfile
             logging.warning(error)
             print(error)
             return
+        except Exception:
+            error = 'Unable to read warpfile: ' + self.warpfile
+            logging.warning(error)
+            print(error)
+            return
 
-        self.xgrid = cols
-        self.ygrid = rows
+        self.xgrid = int(gridSize[0])
+        self.ygrid = int(gridSize[1])
 
         self.nverts = (self.xgrid - 1) * (self.ygrid - 1) * 4
-
-        # create vertex grid array, and texture coords times 4 for quads
-        vertices = np.zeros(
-            ((self.xgrid - 1) * (self.ygrid - 1) * 4, 2), dtype='float32')
-        tcoords = np.zeros(
-            ((self.xgrid - 1) * (self.ygrid - 1) * 4, 2), dtype='float32')
-        # opacity is RGBA
-        opacity = np.ones(
-            ((self.xgrid - 1) * (self.ygrid - 1) * 4, 4), dtype='float32')
-
-        # loop to create quads
-        vdex = 0
-        for y in range(0, self.ygrid - 1):
-            for x in range(0, self.xgrid - 1):
-                index = y * (self.xgrid) + x
-
-                vertices[vdex + 0, 0] = warpdata[index, 0]  # x_coords[y,x]
-                vertices[vdex + 0, 1] = warpdata[index, 1]  # y_coords[y,x]
-                # x_coords[y,x+1]
-                vertices[vdex + 1, 0] = warpdata[index + 1, 0]
-                # y_coords[y,x+1]
-                vertices[vdex + 1, 1] = warpdata[index + 1, 1]
-                # x_coords[y+1,x+1]
-                vertices[vdex + 2, 0] = warpdata[index + cols + 1, 0]
-                # y_coords[y+1,x+1]
-                vertices[vdex + 2, 1] = warpdata[index + cols + 1, 1]
-                # x_coords[y+1,x]
-                vertices[vdex + 3, 0] = warpdata[index + cols, 0]
-                # y_coords[y+1,x]
-                vertices[vdex + 3, 1] = warpdata[index + cols, 1]
-
-                # u_coords[y,x]
-                tcoords[vdex + 0, 0] = warpdata[index, 2]
-                # v_coords[y,x]
-                tcoords[vdex + 0, 1] = warpdata[index, 3]
-                # u_coords[y,x+1]:
-                tcoords[vdex + 1, 0] = warpdata[index + 1, 2]
-                # v_coords[y,x+1]:
-                tcoords[vdex + 1, 1] = warpdata[index + 1, 3]
-                # u_coords[y+1,x+1]:
-                tcoords[vdex + 2, 0] = warpdata[index + cols + 1, 2]
-                # v_coords[y+1,x+1]:
-                tcoords[vdex + 2, 1] = warpdata[index + cols + 1, 3]
-                # u_coords[y+1,x]
-                tcoords[vdex + 3, 0] = warpdata[index + cols, 2]
-                # v_coords[y+1,x]:
-                tcoords[vdex + 3, 1] = warpdata[index + cols, 3]
-
-                opacity[vdex, 3] = warpdata[index, 4]
-                opacity[vdex + 1, 3] = warpdata[index + 1, 4]
-                opacity[vdex + 2, 3] = warpdata[index + cols + 1, 4]
-                opacity[vdex + 3, 3] = warpdata[index + cols, 4]
-
-                vdex += 4
         self.createVertexAndTextureBuffers(vertices, tcoords, opacity)
 
     def createVertexAndTextureBuffers(self, vertices, tcoords, opacity=None):
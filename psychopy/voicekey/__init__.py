@@ -20,13 +20,17 @@ __version__ = 0.5
 import sys
 import os
 import numpy as np
+from scipy.io import wavfile
 
 # pyo: see http://ajaxsoundstudio.com/pyodoc
 try:
     import pyo64 as pyo
     have_pyo64 = True
 except Exception:
-    import pyo
+    try:
+        import pyo
+    except ImportError:
+        pyo = None  # file replay (config 'replay') still works
     have_pyo64 = False
 
 # pyo_server will point to a booted pyo server once pyo_init() is called:
@@ -55,7 +59,10 @@ class _BaseVoiceKey(object):
     """Abstract base class for virtual voice-keys.
 
     Accepts data as real-time input (from a microphone by default) or off-line
-    (if `file_in` is a valid file).
+    (if `file_in` is a valid file). With config `replay=True` a file or array
+    is replayed through the same chunk-by-chunk analysis without pyo or any
+    audio device, e.g., to benchmark detection latency and processing time
+    per chunk against recorded audio.
     Over-ride detect() and other methods as needed. See examples.
     """
 
@@ -105,12 +112,34 @@ class _BaseVoiceKey(object):
                     bandpass; try False if 32-bit python can't keep up
 
                 'zero_crossings': True
+
+                'buffer_sec': 60; how much per-chunk data and stats (in
+                    `.data`, `.power`, `.power_bp`, `.power_above`,
+                    `.zcross`) to keep, in seconds; older chunks are dropped
+
+                'replay': False; True to process `file_in` (a .wav file or
+                    an array of samples) headlessly, as fast as possible,
+                    when `.start()` is called; 'realtime' to pace the chunks
+                    at the rate they would arrive from a microphone.
+                    Timings (`.elapsed`, `.event_time`, etc) are then in
+                    seconds of the input rather than of the clock.
+
+                'rate': 44100, sampling rate of an array `file_in` when
+                    replaying
         """
-        if not (pyo_server and pyo_server.getIsBooted() and
-                pyo_server.getIsStarted()):
-            msg = 'Need a running pyo server: call voicekey.pyo_init()'
-            raise VoiceKeyException(msg)
-        self.rate = pyo_server.getSamplingRate()  # pyo_init enforces 16000+ Hz
+        self.replay = config.get('replay', False)
+        if self.replay:
+            if not (isinstance(file_in, np.ndarray) or
+                    os.path.isfile(file_in)):
+                msg = 'replay needs file_in to be a file or a numpy array'
+                raise VoiceKeyException(msg)
+            self.rate = config.get('rate', RATE)  # files: set in _set_source
+        else:
+            if not (pyo_server and pyo_server.getIsBooted() and
+                    pyo_server.getIsStarted()):
+                msg = 'Need a running pyo server: call voicekey.pyo_init()'
+                raise VoiceKeyException(msg)
+            self.rate = pyo_server.getSamplingRate()  # pyo_init: 16000+ Hz
         self.sec = float(sec)
         if self.sec > MAX_RECORDING_SEC:
             msg = 'for recording, time in seconds cannot be longer than {0}'
@@ -139,7 +168,9 @@ class _BaseVoiceKey(object):
                        'threshold': 10,
                        'baseline': 0,
                        'more_processing': True,
-                       'zero_crossings': True}
+                       'zero_crossings': True,
+                       'buffer_sec': 60,
+                       'replay': False}
         self.config.update(config)
         self.baseline = self.config['baseline']
         self.bad_baseline = False
@@ -157,7 +188,9 @@ class _BaseVoiceKey(object):
     def _set_source(self):
         """Data source: file_in, array, or microphone
         """
-        if os.path.isfile(self.file_in):
+        if self.replay:
+            self._set_replay_source()
+        elif os.path.isfile(self.file_in):
             _rate, self._sndTable = table_from_file(self.file_in,
                                                     start=self.config['start'],
                                                     stop=self.config['stop'])
@@ -181,6 +214,28 @@ class _BaseVoiceKey(object):
             ch = self.config['chnl_in']
             self._source = pyo.Input(chnl=ch, mul=self.config['vol'])
 
+    def _set_replay_source(self):
+        """Load the samples to replay (as floats, -1..1, scaled by vol)
+        """
+        if len(self.array_in):
+            samples = np.asarray(self.array_in)
+        elif self.file_in.lower().endswith('.wav'):
+            self.rate, samples = wavfile.read(self.file_in)
+        else:
+            self.rate, samples = samples_from_file(self.file_in)
+        if samples.ndim > 1:
+            samples = samples[:, 0]  # first channel only
+        if samples.dtype.kind in 'iu':
+            samples = samples / float(np.iinfo(samples.dtype).max + 1)
+        start, stop = self.config['start'], self.config['stop']
+        if (start, stop) != (0, -1):
+            if stop > start:
+                samples = samples[int(start * self.rate):int(stop * self.rate)]
+            elif start:
+                samples = samples[int(start * self.rate):]
+        self._replay_samples = samples * self.config['vol']
+        self.sec = len(samples) / self.rate
+
     def _set_defaults(self):
         """Set remaining defaults, initialize lists to hold summary stats
         """
@@ -203,15 +258,25 @@ class _BaseVoiceKey(object):
         self.t_exit = []  # time at chunk exit
         self.t_proc = []  # proportion of chunk-time spent doing _do_chunk
 
-        # data cache:
-        self.data = []  # raw unprocessed data, in chunks
-        self.power = []
-        self.power_bp = []
-        self.power_above = []
-        self.zcross = []
+        # data cache, for the most recent `buffer_sec` of chunks:
+        kept = min(self.sec, self.config['buffer_sec']) or \
+            self.config['buffer_sec']
+        size = max(int(kept * 1000. / self.msPerChunk) + 1, 32)
+        self.data = RingBuffer(size, np.int16)  # raw unprocessed data, chunks
+        self.power = RingBuffer(size)
+        self.power_bp = RingBuffer(size)
+        self.power_above = RingBuffer(size, np.int8)
+        self.zcross = RingBuffer(size)
         self.max_bp = 0
         self.max_bp_chunk = None
-        bandpass_pre_cache(rate=self.rate)  # for faster bandpass filtering
+
+        # band-pass filter that keeps its state from chunk to chunk, for
+        # power_bp; the latest filtered chunk is self.bp_chunk
+        self.bp_chunk = None
+        if self.config['more_processing']:
+            self._filterbank = FilterBank([(self.config['low'],
+                                            self.config['high'])],
+                                          rate=self.rate)
 
         # default event parameters:
         self.event_detected = False
@@ -233,20 +298,25 @@ class _BaseVoiceKey(object):
         triggers fill tables from self._source; make triggers in .start()
         """
         sec_per_chunk = self.msPerChunk / 1000.
+        if self.replay:
+            self._samples_per_chunk = max(int(round(sec_per_chunk *
+                                                    self.rate)), 1)
+            return
         self._chunktable = pyo.NewTable(length=sec_per_chunk)
         self._wholetable = pyo.NewTable(length=self.sec)
         if self.baseline < TOO_QUIET:
             self._baselinetable = pyo.NewTable(length=T_BASELINE_OFF)
 
-    def _set_baseline(self):
+    def _set_baseline(self, data=None):
         """Set self.baseline = rms(silent period) using _baselinetable data.
 
         Called automatically (via pyo trigger) when the baseline table
         is full. This is better than using chunks (which have gaps between
         them) or the whole table (which can be very large = slow to work
-        with).
+        with). When replaying, `data` are the samples of the baseline period.
         """
-        data = np.array(self._baselinetable.getTable())
+        if data is None:
+            data = np.array(self._baselinetable.getTable())
         tstart = int(T_BASELINE_ON * self.rate)
         segment_power = rms(data[tstart:])
 
@@ -268,33 +338,26 @@ class _BaseVoiceKey(object):
 
         This gets called every chunk -- keep it efficient, esp 32-bit python
         """
-        # band-pass filtering:
+        # band-pass filtering, continuing from the previous chunk:
         if self.config['more_processing']:
-            bp_chunk = bandpass(chunk, self.config['low'],
-                                self.config['high'], self.rate)
+            self.bp_chunk = bp_chunk = self._filterbank.process(chunk)[0]
         else:
             bp_chunk = chunk
 
         # loudness after bandpass filtering:
         self.power_bp.append(rms(bp_chunk))
 
-        _mx = max(bp_chunk)
+        _mx = np.max(bp_chunk)
         if _mx > self.max_bp:
             self.max_bp = _mx
             self.max_bp_chunk = self.count  # chunk containing the max
 
         if self.config['more_processing']:
-            # more bandpass
-            bp3k_chunk = bandpass(chunk, self.config['low'], 3000, self.rate)
-            bp8k_chunk = bandpass(chunk, self.config['low'], 8000, self.rate)
-            # "content filtered speech" (~ affect only):
-            bp2k8k_chunk = bandpass(chunk, 2000, 8000, self.rate)
-
             # basic loudness:
             self.power.append(rms(chunk))
 
             # above a threshold or not:
-            above_01 = int(self.power[self.count] > self.config['threshold'])
+            above_01 = int(self.power[-1] > self.config['threshold'])
             self.power_above.append(above_01)
 
         if self.config['zero_crossings']:
@@ -339,16 +402,10 @@ class _BaseVoiceKey(object):
 
         self.t_enter.append(get_time())
         self.elapsed = self.t_enter[-1] - self.t_enter[0]
-        self.t_baseline_has_elapsed = bool(self.elapsed > T_BASELINE_PERIOD)
 
         # Get the table content as np.array
         chunk = np.asarray(self._chunktable.getTable())
-        chunk = np.int16(chunk * 2 ** 15)
-        self.data.append(chunk)
-
-        # Calc basic stats, then use to detect features
-        self._process(chunk)
-        self.detect()  # conditionally call trip()
+        self._handle_chunk(chunk)
 
         # Trigger a new chunk recording, or stop if stopped or time is up:
         t_end = get_time()
@@ -360,12 +417,56 @@ class _BaseVoiceKey(object):
             self.stop()
         self.t_exit.append(t_end)
 
+    def _handle_chunk(self, chunk):
+        """Store a chunk (floats, -1..1) and its stats, then call detect()
+        """
+        self.t_baseline_has_elapsed = bool(self.elapsed > T_BASELINE_PERIOD)
+        chunk = np.int16(chunk * 2 ** 15)
+        self.data.append(chunk)
+
+        # Calc basic stats, then use to detect features
+        self._process(chunk)
+        self.detect()  # conditionally call trip()
+
+    def _replay_chunks(self):
+        """Process all of the replay samples, chunk by chunk, then stop.
+
+        `elapsed` is taken from the position in the samples, while
+        `t_enter` and `t_exit` are still clock times so that the processing
+        time per chunk (`t_proc`) can be measured.
+        """
+        samples = self._replay_samples
+        n = self._samples_per_chunk
+        sec_per_chunk = n / self.rate
+        baseline_end = int(T_BASELINE_OFF * self.rate)
+        pace = self.replay == 'realtime'
+        for index in range(len(samples) // n):
+            if self.stopped:
+                break
+            self.t_enter.append(get_time())
+            # chunk 0 is at elapsed 0, as for live input
+            self.elapsed = index * sec_per_chunk
+            if not self.baseline and (index + 1) * n >= baseline_end:
+                self._set_baseline(samples[:baseline_end])
+            self.count = index
+            self._handle_chunk(samples[index * n:(index + 1) * n])
+            t_end = get_time()
+            self.t_exit.append(t_end)
+            if pace:
+                sleep(self.t_start + (index + 1) * sec_per_chunk - t_end)
+        self.stop()
+
     def start(self, silent=False):
         """Start reading and processing audio data from a file or microphone.
+
+        When replaying, this returns once the input has all been processed.
         """
         if self.stopped:
             raise VoiceKeyException('cannot start a stopped recording')
         self.t_start = get_time()
+        if self.replay:
+            self._replay_chunks()
+            return self
 
         # triggers: fill tables, call _do_chunk & _set_baseline:
         self._chunktrig = pyo.Trig()
@@ -418,7 +519,7 @@ class _BaseVoiceKey(object):
     def started(self):
         """Boolean property, whether `.start()` has been called.
         """
-        return bool(hasattr(self, '_chunklooper'))  # .start() has been called
+        return bool(hasattr(self, 't_start'))  # .start() has been called
 
     def stop(self):
         """Stop a voice-key in progress.
@@ -432,9 +533,10 @@ class _BaseVoiceKey(object):
             return
         self.stopped = True
         self.t_stop = get_time()
-        self._source.stop()
-        self._chunktrig.stop()
-        self._wholetrig.stop()
+        if not self.replay:
+            self._source.stop()
+            self._chunktrig.stop()
+            self._wholetrig.stop()
 
         if self.config['autosave']:
             self.save()
@@ -613,7 +715,7 @@ class Recorder(_BaseVoiceKey):
         if hasattr(self, 'filename') and not os.path.isfile(self.filename):
             self.save()
 
-    def _set_baseline(self):
+    def _set_baseline(self, data=None):
         pass
 
     def detect(self):
@@ -635,18 +737,19 @@ class Player(_BaseVoiceKey):
     """
 
     def __init__(self, sec=None, source='rec.wav',
-                 start=0, stop=-1, rate=44100):
+                 start=0, stop=-1, rate=44100, **config):
         if type(source) in [np.ndarray]:
             sec = len(source) / rate
         elif os.path.isfile(source):
             sec = pyo.sndinfo(source)[1]
-        config = {'start': start,
-                  'stop': stop}
+        config.update({'start': start,
+                       'stop': stop,
+                       'rate': rate})
         super(Player, self).__init__(sec, file_in=source, **config)
     # def _set_defaults(self):  # ideally override but need more refactoring
     #    pass
 
-    def _set_baseline(self):
+    def _set_baseline(self, data=None):
         pass
 
     def detect(self):
@@ -665,6 +768,8 @@ def pyo_init(rate=44100, nchnls=1, buffersize=32, duplex=1):
     """Start and boot a global pyo server, restarting if needed.
     """
     global pyo_server
+    if pyo is None:
+        raise VoiceKeyException('pyo is needed for live voice-keys')
     if rate < 16000:
         raise ValueError('sample rate must be 16000 or higher')
 
@@ -10,11 +10,14 @@ import os
 import sys
 import time
 import numpy as np
-from scipy.signal import butter, lfilter
+from scipy.signal import butter, lfilter, sosfilt
 try:
     import pyo64 as pyo
 except Exception:
-    import pyo
+    try:
+        import pyo
+    except ImportError:
+        pyo = None  # only needed for live input, pyo tables and files
 
 
 class PyoFormatException(Exception):
@@ -84,6 +87,133 @@ def bandpass_pre_cache(lows=(80, 100, 120),
         _butter(6, band, rate=rate)
 
 
+_butter_sos_cache = {}
+
+
+def _butter_sos(order, band, rate=44100):
+    """Cache-ing version of scipy.signal's butter(), as second-order
+    sections (more stable than (b, a) for high orders and narrow bands).
+    """
+    key = (order, tuple(band), rate)
+    if not key in _butter_sos_cache:
+        low, high = band
+        nyqfreq = float(rate) / 2
+        _butter_sos_cache[key] = butter(order, (low / nyqfreq, high / nyqfreq),
+                                        btype='band', output='sos')
+    return _butter_sos_cache[key]
+
+
+class FilterBank(object):
+    """A bank of band-pass filters for streaming (chunked) data.
+
+    Each filter keeps its state from one chunk to the next, so filtering
+    consecutive chunks gives the same result as filtering the whole signal
+    at once, without a transient at the start of every chunk.
+    """
+
+    def __init__(self, bands, rate=44100, order=6):
+        """
+        :Parameters:
+
+            bands:
+                list of (low, high) pass-bands in Hz
+
+            rate:
+                sampling rate of the data in Hz
+
+            order:
+                order of the Butterworth filters
+        """
+        self.bands = [tuple(band) for band in bands]
+        self.rate = rate
+        self.order = order
+        self._sos = [_butter_sos(order, band, rate) for band in self.bands]
+        self.reset()
+
+    def reset(self):
+        """Clear the filter states, e.g., before a new (unrelated) signal.
+        """
+        self._zi = [np.zeros((sos.shape[0], 2)) for sos in self._sos]
+
+    def process(self, chunk):
+        """Filter the next chunk of the signal by every band.
+
+        Returns an array of shape (len(bands), len(chunk)); row `i` is the
+        chunk filtered by `bands[i]`.
+        """
+        out = np.empty((len(self.bands), len(chunk)))
+        for i, sos in enumerate(self._sos):
+            out[i], self._zi[i] = sosfilt(sos, chunk, zi=self._zi[i])
+        return out
+
+
+class RingBuffer(object):
+    """Fixed-size, preallocated buffer holding the last `capacity` values
+    appended (scalars or equal-shaped arrays), oldest first.
+
+    Supports len(), iteration, np.asarray() and (negative) indexing and
+    slicing like a list of the retained values, e.g., `buf[-5:]`.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = int(capacity)
+        if self.capacity < 1:
+            raise ValueError('RingBuffer capacity should be at least 1')
+        self.dtype = dtype
+        self._buffer = None  # allocated on first append (to get the shape)
+        self._next = 0  # total number of values appended
+        self._shape = ()
+
+    def append(self, value):
+        value = np.asarray(value)
+        if self._buffer is None:
+            self._shape = value.shape
+            self._buffer = np.zeros((self.capacity,) + self._shape,
+                                    dtype=self.dtype)
+        self._buffer[self._next % self.capacity] = value
+        self._next += 1
+
+    def clear(self):
+        self._next = 0
+
+    @property
+    def total(self):
+        """Number of values appended, including those no longer retained.
+        """
+        return self._next
+
+    def __len__(self):
+        return min(self._next, self.capacity)
+
+    def _positions(self, logical):
+        # positions in _buffer of logical indices (0 = oldest retained)
+        return (self._next - len(self) + logical) % self.capacity
+
+    def __getitem__(self, key):
+        n = len(self)
+        if isinstance(key, slice):
+            logical = np.arange(*key.indices(n))
+            if not n:
+                return np.zeros((0,) + self._shape, dtype=self.dtype)
+            return self._buffer[self._positions(logical)]
+        if key < 0:
+            key += n
+        if not 0 <= key < n:
+            raise IndexError('RingBuffer index out of range')
+        return self._buffer[self._positions(key)]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __array__(self, dtype=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def __repr__(self):
+        text = '<RingBuffer {0} of {1}>'
+        return text.format(len(self), self.capacity)
+
+
 def bandpass(data, low=80, high=1200, rate=44100, order=6):
     """Return bandpass filtered `data`.
     """
@@ -97,7 +227,7 @@ def rms(data):
     Identical to `std` when the mean is zero; faster to compute just rms.
     """
     if data.dtype == np.int16:
-        md2 = data.astype(np.float) ** 2  # int16 wrap around --> negative
+        md2 = data.astype(np.float64) ** 2  # int16 wrap around --> negative
     else:
         md2 = data ** 2
     return np.sqrt(np.mean(md2))